@@ -0,0 +1,194 @@
+import os
+import time
+import asyncio
+from uuid import uuid4
+from collections import OrderedDict
+from typing import AsyncGenerator, Dict, List, Optional
+from core.metrics import registry
+from agents.github_scheduler import BATCH
+from agents.repo_analyzer import GitHubRepoAnalyzer, GITHUB_TOKEN, OLLAMA_MODEL
+
+BATCH_MAX_REPOS = int(os.getenv("BATCH_MAX_REPOS", "100"))
+# Repositories analyzed at once; their GitHub calls also queue behind interactive ones
+BATCH_REPO_CONCURRENCY = int(os.getenv("BATCH_REPO_CONCURRENCY", "8"))
+# LLM summaries at once across the whole batch
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "2"))
+BATCH_JOB_RETENTION = int(os.getenv("BATCH_JOB_RETENTION", "50"))
+
+batch_repos_total = registry.counter(
+    "batch_analysis_repos_total", "Repositories processed by batch analyses", ("status",)
+)
+batch_jobs_running = registry.gauge(
+    "batch_analysis_jobs_running", "Batch analyses currently running"
+)
+
+SUMMARY_MARKER = "## 📊 Analysis Results"
+SUMMARY_END_MARKER = "\n✅ Analysis complete!"
+
+
+class BatchAnalysisJob:
+    """
+    Analyzes many repositories concurrently and records per-repo events that
+    any number of readers can replay and then follow live (NDJSON streams).
+    The job runs in its own task: a disconnected client does not stop it,
+    cancel() does.
+    """
+    def __init__(self, repo_urls: List[str], user_id: int, summarize: bool = False,
+                 github_token: str = GITHUB_TOKEN, ollama_model: str = OLLAMA_MODEL):
+        self.job_id = str(uuid4())
+        self.user_id = user_id
+        self.repo_urls = repo_urls
+        self.summarize = summarize
+        self.github_token = github_token
+        self.ollama_model = ollama_model
+        self.status = "pending"
+        self.created_at = time.time()
+        self.results: Dict[str, dict] = {url: {"repo": url, "status": "pending"} for url in repo_urls}
+        self.events: List[dict] = []
+        self._changed = asyncio.Condition()
+        self._task: Optional[asyncio.Task] = None
+        self.events.append({"event": "job", "job_id": self.job_id, "repos": len(repo_urls), "summarize": summarize})
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "cancelled")
+
+    def start(self):
+        self.status = "running"
+        self._task = asyncio.create_task(self._run())
+
+    def cancel(self) -> bool:
+        if self._task is None or self._task.done():
+            return False
+        self._task.cancel()
+        return True
+
+    async def _publish(self, event: dict):
+        async with self._changed:
+            self.events.append(event)
+            self._changed.notify_all()
+
+    async def follow(self) -> AsyncGenerator[dict, None]:
+        position = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: self.done or position < len(self.events))
+                pending = self.events[position:]
+                finished = self.done
+            for event in pending:
+                yield event
+            position += len(pending)
+            if finished and position >= len(self.events):
+                return
+
+    def snapshot(self) -> dict:
+        counts = {}
+        for result in self.results.values():
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "total": len(self.repo_urls),
+            "counts": counts,
+            "results": list(self.results.values()),
+        }
+
+    async def _run(self):
+        batch_jobs_running.inc()
+        repo_slots = asyncio.Semaphore(BATCH_REPO_CONCURRENCY)
+        llm_slots = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+        tasks = [asyncio.create_task(self._analyze_one(url, repo_slots, llm_slots)) for url in self.repo_urls]
+        try:
+            await asyncio.gather(*tasks)
+            self.status = "completed"
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for result in self.results.values():
+                if result["status"] in ("pending", "running"):
+                    result["status"] = "cancelled"
+                    batch_repos_total.inc(status="cancelled")
+            self.status = "cancelled"
+            print(f"🛑 Batch analysis {self.job_id} cancelled")
+        finally:
+            batch_jobs_running.dec()
+            snapshot = self.snapshot()
+            await self._publish({"event": "done", "job_id": self.job_id, "status": self.status, "counts": snapshot["counts"]})
+
+    async def _analyze_one(self, url: str, repo_slots: asyncio.Semaphore, llm_slots: asyncio.Semaphore):
+        async with repo_slots:
+            started = time.perf_counter()
+            self.results[url]["status"] = "running"
+            await self._publish({"event": "started", "repo": url})
+
+            analyzer = GitHubRepoAnalyzer(
+                github_token=self.github_token,
+                ollama_model=self.ollama_model,
+                priority=BATCH,
+                summarize=self.summarize,
+                llm_semaphore=llm_slots,
+            )
+            summary, in_summary, last_error = [], False, ""
+            try:
+                async for chunk in analyzer.analyze_stream(url):
+                    if in_summary:
+                        summary.append(chunk)
+                        continue
+                    if SUMMARY_MARKER in chunk:
+                        in_summary = True
+                        continue
+                    for line in chunk.splitlines():
+                        line = line.strip()
+                        # Status lines only; the profile markdown arrives as structured data at the end
+                        if not line or line[0] in "-#*|`":
+                            continue
+                        if line.startswith("❌"):
+                            last_error = line
+                        await self._publish({"event": "progress", "repo": url, "message": line})
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                last_error = str(e)
+
+            elapsed_ms = round((time.perf_counter() - started) * 1000)
+            if analyzer.profile is None:
+                result = {"repo": url, "status": "failed", "error": last_error or "analysis failed", "elapsed_ms": elapsed_ms}
+                event = {"event": "failed", **result}
+            else:
+                text = "".join(summary)
+                result = {
+                    "repo": url,
+                    "status": "completed",
+                    "ref": analyzer.fetcher.ref_name,
+                    "commit": analyzer.fetcher.ref,
+                    "profile": analyzer.profile,
+                    "summary": text.split(SUMMARY_END_MARKER, 1)[0].strip() if self.summarize else None,
+                    "elapsed_ms": elapsed_ms,
+                }
+                event = {"event": "completed", **result}
+            self.results[url] = result
+            batch_repos_total.inc(status=result["status"])
+            await self._publish(event)
+
+
+class BatchJobRegistry:
+    """In-process registry of batch jobs; finished jobs beyond the retention limit are forgotten"""
+    def __init__(self, retention: int = BATCH_JOB_RETENTION):
+        self.retention = retention
+        self._jobs: "OrderedDict[str, BatchAnalysisJob]" = OrderedDict()
+
+    def create(self, repo_urls: List[str], user_id: int, summarize: bool) -> BatchAnalysisJob:
+        job = BatchAnalysisJob(repo_urls, user_id, summarize)
+        self._jobs[job.job_id] = job
+        finished = [job_id for job_id, existing in self._jobs.items() if existing.done]
+        for job_id in finished[:max(0, len(finished) - self.retention)]:
+            del self._jobs[job_id]
+        job.start()
+        return job
+
+    def get(self, job_id: str) -> Optional[BatchAnalysisJob]:
+        return self._jobs.get(job_id)
+
+
+batch_jobs = BatchJobRegistry()
@@ -1,4 +1,5 @@
 from ollama import AsyncClient
+from core.metrics import LLMCallMetrics
 import os
 
 # Setup
@@ -27,7 +28,8 @@ async def stream_assistant_reply(message: str):
         yield "To help you deploy your application, please provide the GitHub repository URL of your code.\n"
         return  # Don't continue streaming the rest
 
-    response = await ollama_client.chat(
+    call_metrics = LLMCallMetrics("chat_agent", OLLAMA_MODEL)
+    response = ollama_client.chat(
         model=OLLAMA_MODEL,
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
@@ -40,5 +42,5 @@ async def stream_assistant_reply(message: str):
             "top_p": 0.9,
         }
     )
-    async for chunk in response:
+    async for chunk in call_metrics.track(response):
         yield chunk["message"]["content"]
\ No newline at end of file
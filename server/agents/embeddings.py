@@ -0,0 +1,54 @@
+from ollama import AsyncClient
+from collections import OrderedDict
+from typing import List, Optional
+import math
+import os
+
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL")
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "2048"))
+
+ollama_client = AsyncClient(host=OLLAMA_BASE_URL)
+
+
+class EmbeddingCache:
+    """
+    Small LRU cache in front of the Ollama embed endpoint, keyed by (model, text)
+    """
+    def __init__(self, max_entries: int = EMBED_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, List[float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def embed(self, texts: List[str], model: str) -> List[List[float]]:
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        missing = []
+        for idx, text in enumerate(texts):
+            key = (model, text)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                results[idx] = self._entries[key]
+                self.hits += 1
+            else:
+                missing.append(idx)
+                self.misses += 1
+
+        if missing:
+            response = await ollama_client.embed(model=model, input=[texts[idx] for idx in missing])
+            for idx, vector in zip(missing, response["embeddings"]):
+                vector = list(vector)
+                results[idx] = vector
+                self._entries[(model, texts[idx])] = vector
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return results
+
+
+def cosine_similarity(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,188 @@
+import os
+import time
+import asyncio
+import numpy as np
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from agents.embeddings import embedding_cache
+from agents.repo_tree import CONFIG_FILE_PRIORITY, is_ignored
+from agents.manifest_parsers import LOCKFILES
+
+# Small local embedding model served by Ollama (e.g. all-minilm); unset => disabled
+FILE_INDEX_EMBED_MODEL = os.getenv("FILE_INDEX_EMBED_MODEL")
+FILE_INDEX_MAX_CANDIDATES = int(os.getenv("FILE_INDEX_MAX_CANDIDATES", "300"))
+# Candidates whose first lines are fetched and embedded along with the path
+FILE_INDEX_HEAD_FILES = int(os.getenv("FILE_INDEX_HEAD_FILES", "20"))
+FILE_INDEX_HEAD_CHARS = int(os.getenv("FILE_INDEX_HEAD_CHARS", "1200"))
+FILE_INDEX_MAX_FILE_BYTES = int(os.getenv("FILE_INDEX_MAX_FILE_BYTES", str(200 * 1024)))
+FILE_INDEX_CACHE_SIZE = int(os.getenv("FILE_INDEX_CACHE_SIZE", "32"))
+FILE_INDEX_TIMEOUT = float(os.getenv("FILE_INDEX_TIMEOUT", "15"))
+FILE_INDEX_TOP_K = int(os.getenv("FILE_INDEX_TOP_K", "4"))
+
+# What deployment prompts need from source code
+DEPLOYMENT_QUERY = "application entrypoint, server start and port binding, database connection configuration, environment variables"
+
+SOURCE_EXTENSIONS = {
+    ".py", ".js", ".mjs", ".cjs", ".ts", ".go", ".java", ".kt", ".rb", ".php", ".rs", ".cs",
+    ".yml", ".yaml", ".toml", ".ini", ".cfg", ".conf", ".properties", ".json", ".tf", ".sh",
+}
+SKIP_DIRS = {
+    "test", "tests", "__tests__", "spec", "specs", "docs", "examples", "fixtures",
+    "dist", "build", "static", "assets", "public", ".github", "migrations",
+}
+# File stems that usually hold entrypoints or deployment-relevant settings
+HINT_STEMS = {
+    "main", "app", "server", "index", "wsgi", "asgi", "manage", "settings", "config",
+    "database", "db", "routes", "application", "startup", "bootstrap", "entrypoint", "nginx",
+}
+
+# (owner, repo, commit sha, model)
+IndexKey = Tuple[str, str, str, str]
+# path -> file content at the indexed commit ("" if unreadable)
+HeadFetcher = Callable[[str], Awaitable[str]]
+
+
+def candidate_files(tree: List[dict], limit: int = FILE_INDEX_MAX_CANDIDATES) -> List[str]:
+    """
+    Cheap prefilter over the tree: source and config files outside tests, docs
+    and vendored code, excluding manifests the parsers already read. Files with
+    entrypoint-like names come first, then shallower paths.
+    """
+    ranked = []
+    for item in tree:
+        if item.get("type") != "blob" or item.get("size", 0) > FILE_INDEX_MAX_FILE_BYTES:
+            continue
+        path = item["path"]
+        name = path.rpartition("/")[2]
+        stem, dot, extension = name.rpartition(".")
+        if not dot or f".{extension}" not in SOURCE_EXTENSIONS:
+            continue
+        if name in CONFIG_FILE_PRIORITY or name in LOCKFILES or ".min." in name or ".test." in name or ".spec." in name:
+            continue
+        if is_ignored(path) or any(part in SKIP_DIRS for part in path.split("/")[:-1]):
+            continue
+        ranked.append((stem.lower() not in HINT_STEMS, path.count("/"), path))
+    ranked.sort()
+    return [path for _, _, path in ranked[:limit]]
+
+
+def _document(path: str, head: str) -> str:
+    # Separators read as words, so "src/db/config.py" embeds close to "database config"
+    text = path.replace("/", " / ").replace("_", " ")
+    return f"{text}\n{head[:FILE_INDEX_HEAD_CHARS]}" if head else text
+
+
+class FileIndex:
+    """
+    Row-normalized embedding matrix over one commit's candidate files; a query is
+    a single matrix-vector product. Only some files are embedded with their first
+    lines; the heads of other files that rank in the top k are fetched on demand.
+    """
+    def __init__(self, paths: List[str], vectors: np.ndarray, heads: Dict[str, str], model: str,
+                 fetch_head: Optional[HeadFetcher] = None):
+        self.paths = paths
+        self.vectors = vectors
+        self.heads = heads
+        self.model = model
+        self.fetch_head = fetch_head
+        self._unreadable: set = set()
+
+    @classmethod
+    async def build(cls, paths: List[str], heads: Dict[str, str], model: str,
+                    fetch_head: Optional[HeadFetcher] = None) -> 'FileIndex':
+        embeddings = await embedding_cache.embed([_document(path, heads.get(path, "")) for path in paths], model)
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1, norms)
+        return cls(paths, vectors, heads, model, fetch_head)
+
+    def search(self, query_vector, k: int, exclude=()) -> List[Tuple[str, float]]:
+        if not self.paths:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1
+        scores = self.vectors @ query
+        order = np.argsort(-scores, kind="stable")
+        results = []
+        for idx in order:
+            path = self.paths[idx]
+            if path not in exclude:
+                results.append((path, float(scores[idx])))
+                if len(results) == k:
+                    break
+        return results
+
+    async def query(self, text: str, k: int = FILE_INDEX_TOP_K) -> List[Tuple[str, str]]:
+        """
+        (path, head) of the k files closest to text. Every indexed path competes;
+        missing heads are fetched (and kept) in ranked order, one batch per
+        round, until k readable files are found or the ranking runs out.
+        """
+        [query_vector] = await embedding_cache.embed([text], self.model)
+        ranked = [path for path, _ in self.search(query_vector, len(self.paths))]
+        found, position = [], 0
+        while len(found) < k and position < len(ranked):
+            batch = ranked[position:position + k - len(found)]
+            position += len(batch)
+            missing = [path for path in batch if path not in self.heads and path not in self._unreadable]
+            if missing and self.fetch_head is not None:
+                contents = await asyncio.gather(*(self.fetch_head(path) for path in missing), return_exceptions=True)
+                for path, content in zip(missing, contents):
+                    if isinstance(content, str) and content:
+                        self.heads[path] = content[:FILE_INDEX_HEAD_CHARS]
+                    else:
+                        self._unreadable.add(path)
+            found.extend((path, self.heads[path]) for path in batch if path in self.heads)
+        return found
+
+
+class FileIndexCache:
+    """LRU of built indexes keyed by commit SHA, so a repository is embedded once per commit"""
+    def __init__(self, max_entries: int = FILE_INDEX_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[IndexKey, FileIndex]" = OrderedDict()
+
+    def get(self, key: IndexKey) -> Optional[FileIndex]:
+        index = self._entries.get(key)
+        if index is not None:
+            self._entries.move_to_end(key)
+        return index
+
+    def put(self, key: IndexKey, index: FileIndex):
+        self._entries[key] = index
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_build(self, key: IndexKey, paths: List[str], heads: Dict[str, str],
+                           fetch_head: Optional[HeadFetcher] = None) -> Optional[FileIndex]:
+        index = self.get(key)
+        if index is not None:
+            return index
+        started = time.perf_counter()
+        try:
+            index = await asyncio.wait_for(FileIndex.build(paths, heads, key[3], fetch_head), timeout=FILE_INDEX_TIMEOUT)
+        except Exception as e:
+            print(f"⚠️ File index unavailable for {key[0]}/{key[1]}: {str(e)}")
+            return None
+        self.put(key, index)
+        print(f"🧭 Indexed {len(paths)} files of {key[0]}/{key[1]}@{key[2][:7]} in {(time.perf_counter() - started) * 1000:.0f}ms")
+        return index
+
+
+async def relevant_files(index_key, query: str, k: int = FILE_INDEX_TOP_K) -> List[Tuple[str, str]]:
+    """
+    Top-k (path, head) for query from a cached index; [] if the index was never
+    built or has been evicted
+    """
+    index = file_index_cache.get(tuple(index_key)) if index_key else None
+    if index is None:
+        return []
+    try:
+        return await asyncio.wait_for(index.query(query, k), timeout=FILE_INDEX_TIMEOUT)
+    except Exception as e:
+        print(f"⚠️ File index query failed: {str(e)}")
+        return []
+
+
+file_index_cache = FileIndexCache()
@@ -0,0 +1,205 @@
+import zlib
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+BLOCK_SIZE = 512
+# Most decompressed bytes produced per step, so a highly compressed chunk
+# cannot inflate past the byte budget before it is checked
+DECOMPRESS_STEP = 1024 * 1024
+
+
+class ArchiveUnavailable(Exception):
+    pass
+
+
+class ArchiveBudgetExceeded(ArchiveUnavailable):
+    pass
+
+
+def _octal(field: bytes) -> int:
+    # GNU base-256 encoding for large values
+    if field and field[0] & 0x80:
+        value = field[0] & 0x7F
+        for byte in field[1:]:
+            value = (value << 8) | byte
+        return value
+    field = field.rstrip(b"\0 ").strip()
+    return int(field, 8) if field else 0
+
+
+def _cstring(field: bytes) -> str:
+    return field.split(b"\0", 1)[0].decode("utf-8", "replace")
+
+
+def _parse_pax(data: bytes) -> Dict[str, str]:
+    records = {}
+    position = 0
+    while position < len(data):
+        space = data.index(b" ", position)
+        length = int(data[position:space])
+        record = data[space + 1:position + length - 1]  # drop trailing newline
+        key, _, value = record.partition(b"=")
+        records[key.decode()] = value.decode("utf-8", "replace")
+        position += length
+    return records
+
+
+class TarStreamExtractor:
+    """
+    Incremental gzip+tar reader that keeps only the members selected by `wanted`.
+
+    Bytes are fed as they arrive from the network; nothing is written to disk and
+    skipped members are never buffered. The first path component (GitHub's
+    "<owner>-<repo>-<sha>/" prefix) is stripped. `max_file_bytes` limits each kept
+    file and `max_total_bytes` limits the decompressed stream as a whole.
+    """
+    def __init__(self, wanted: Callable[[str], bool], max_file_bytes: int, max_total_bytes: int,
+                 strip_components: int = 1, gzipped: bool = True):
+        self.wanted = wanted
+        self.max_file_bytes = max_file_bytes
+        self.max_total_bytes = max_total_bytes
+        self.strip_components = strip_components
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+        self._buffer = bytearray()
+        self.total_bytes = 0
+        self.finished = False
+        self.global_headers: Dict[str, str] = {}
+
+        # Current member state
+        self._remaining = 0      # data bytes left in the current member
+        self._padding = 0        # padding bytes after the data
+        self._collect: Optional[bytearray] = None
+        self._collect_kind = None  # "file", "pax", "longname"
+        self._path = ""
+        self._pending_pax: Dict[str, str] = {}
+        self._pending_longname: Optional[str] = None
+
+    @property
+    def commit_sha(self) -> str:
+        # GitHub stores the commit SHA in the pax global header comment
+        return self.global_headers.get("comment", "")
+
+    def _strip(self, path: str) -> str:
+        parts = path.split("/", self.strip_components)
+        return parts[-1] if len(parts) > self.strip_components else ""
+
+    def feed(self, data: bytes) -> Iterator[Tuple[str, bytes]]:
+        """
+        Consume compressed bytes; yields (path, content) for completed wanted members
+        """
+        if self.finished:
+            return
+        if self._decompressor is None:
+            yield from self._consume(data)
+            return
+        data = self._decompressor.decompress(data, DECOMPRESS_STEP)
+        while True:
+            yield from self._consume(data)
+            tail = self._decompressor.unconsumed_tail
+            if not tail or self.finished:
+                return
+            data = self._decompressor.decompress(tail, DECOMPRESS_STEP)
+
+    def _consume(self, data: bytes) -> Iterator[Tuple[str, bytes]]:
+        self.total_bytes += len(data)
+        if self.total_bytes > self.max_total_bytes:
+            raise ArchiveBudgetExceeded(f"archive exceeds {self.max_total_bytes} bytes")
+        self._buffer.extend(data)
+        yield from self._drain()
+
+    def _drain(self) -> Iterator[Tuple[str, bytes]]:
+        buffer = self._buffer
+        position = 0
+        try:
+            while not self.finished:
+                if self._remaining:
+                    take = min(self._remaining, len(buffer) - position)
+                    if take <= 0:
+                        break
+                    if self._collect is not None:
+                        self._collect += buffer[position:position + take]
+                    position += take
+                    self._remaining -= take
+                    if self._remaining:
+                        break
+                    member = self._finish_member()
+                    if member:
+                        yield member
+                    continue
+
+                if self._padding:
+                    take = min(self._padding, len(buffer) - position)
+                    position += take
+                    self._padding -= take
+                    if self._padding:
+                        break
+                    continue
+
+                if len(buffer) - position < BLOCK_SIZE:
+                    break
+                header = bytes(buffer[position:position + BLOCK_SIZE])
+                position += BLOCK_SIZE
+                if header == b"\0" * BLOCK_SIZE:
+                    self.finished = True
+                    break
+                member = self._start_member(header)
+                if member:
+                    yield member
+        finally:
+            del buffer[:position]
+
+    def _start_member(self, header: bytes) -> Optional[Tuple[str, bytes]]:
+        name = _cstring(header[0:100])
+        size = _octal(header[124:136])
+        typeflag = header[156:157]
+        if header[257:262] == b"ustar":
+            prefix = _cstring(header[345:500])
+            if prefix:
+                name = f"{prefix}/{name}"
+
+        self._remaining = size
+        self._padding = (BLOCK_SIZE - size % BLOCK_SIZE) % BLOCK_SIZE
+        self._collect = None
+        self._collect_kind = None
+
+        if typeflag in (b"x", b"g"):
+            self._collect = bytearray()
+            self._collect_kind = "pax_global" if typeflag == b"g" else "pax"
+        elif typeflag == b"L":
+            self._collect = bytearray()
+            self._collect_kind = "longname"
+        else:
+            if self._pending_longname:
+                name = self._pending_longname
+            name = self._pending_pax.get("path", name)
+            if "size" in self._pending_pax:
+                self._remaining = int(self._pending_pax["size"])
+                self._padding = (BLOCK_SIZE - self._remaining % BLOCK_SIZE) % BLOCK_SIZE
+            self._pending_pax = {}
+            self._pending_longname = None
+
+            path = self._strip(name)
+            is_file = typeflag in (b"0", b"\0", b"7")
+            if is_file and path and self.wanted(path) and self._remaining <= self.max_file_bytes:
+                self._collect = bytearray()
+                self._collect_kind = "file"
+                self._path = path
+
+        if self._remaining == 0:
+            return self._finish_member()
+        return None
+
+    def _finish_member(self) -> Optional[Tuple[str, bytes]]:
+        collected, kind = self._collect, self._collect_kind
+        self._collect = None
+        self._collect_kind = None
+        if collected is None:
+            return None
+        if kind == "pax":
+            self._pending_pax = _parse_pax(bytes(collected))
+        elif kind == "pax_global":
+            self.global_headers.update(_parse_pax(bytes(collected)))
+        elif kind == "longname":
+            self._pending_longname = _cstring(bytes(collected))
+        elif kind == "file":
+            return self._path, bytes(collected)
+        return None
@@ -0,0 +1,220 @@
+import os
+import time
+import heapq
+import random
+import asyncio
+import itertools
+import aiohttp
+from typing import Optional
+from core.metrics import registry
+from core.http_client import http_client
+
+# Request priorities: lower runs first
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+# Secondary limits kick in around 900 requests/minute, so pace below that even with budget left
+GITHUB_MAX_RPS = float(os.getenv("GITHUB_MAX_RPS", "10"))
+GITHUB_MIN_RPS = float(os.getenv("GITHUB_MIN_RPS", "1"))
+GITHUB_BURST = float(os.getenv("GITHUB_BURST", "20"))
+# Share of the hourly budget only interactive requests may spend
+GITHUB_BATCH_RESERVE = float(os.getenv("GITHUB_BATCH_RESERVE", "0.1"))
+# Batch requests that would wait longer than this for a token (e.g. for the
+# window holding the reserve to reset) fail instead of stalling their job
+GITHUB_BATCH_MAX_WAIT = float(os.getenv("GITHUB_BATCH_MAX_WAIT", "120"))
+GITHUB_MAX_RETRIES = int(os.getenv("GITHUB_MAX_RETRIES", "4"))
+GITHUB_BACKOFF_BASE = float(os.getenv("GITHUB_BACKOFF_BASE", "1"))
+# Longer waits (e.g. an exhausted hourly budget) fail fast instead of hanging the request
+GITHUB_MAX_BACKOFF = float(os.getenv("GITHUB_MAX_BACKOFF", "60"))
+
+rate_limit_remaining = registry.gauge(
+    "github_rate_limit_remaining", "Requests left in the current GitHub rate-limit window", ("resource",)
+)
+rate_limit_limit = registry.gauge(
+    "github_rate_limit_limit", "Size of the GitHub rate-limit window", ("resource",)
+)
+rate_limit_reset = registry.gauge(
+    "github_rate_limit_reset_seconds", "Seconds until the GitHub rate-limit window resets", ("resource",)
+)
+rate_limited_total = registry.counter(
+    "github_rate_limited_total", "GitHub responses that were rate limited and retried", ("status",)
+)
+scheduler_wait = registry.histogram(
+    "github_scheduler_wait_seconds", "Time a GitHub request waited for a token", ("priority",)
+)
+scheduler_queue_depth = registry.gauge(
+    "github_scheduler_queue_depth", "GitHub requests waiting for a token", ("priority",)
+)
+
+
+class GitHubBudgetExhausted(Exception):
+    pass
+
+
+class GitHubScheduler:
+    """
+    Paces GitHub API calls with a token bucket whose rate follows the
+    X-RateLimit-* headers of the latest response. Waiting requests are served
+    in priority order, and batch work stops short of the last
+    GITHUB_BATCH_RESERVE of the budget so interactive analyses always get through;
+    a batch request that would wait longer than batch_max_wait raises
+    GitHubBudgetExhausted instead.
+    403/429 rate-limit responses are retried after Retry-After, the window
+    reset, or a jittered exponential backoff.
+    """
+    _instance: Optional['GitHubScheduler'] = None
+
+    def __init__(self, max_rps: float = GITHUB_MAX_RPS, burst: float = GITHUB_BURST,
+                 batch_reserve: float = GITHUB_BATCH_RESERVE, batch_max_wait: float = GITHUB_BATCH_MAX_WAIT):
+        self.max_rps = max_rps
+        self.burst = burst
+        self.batch_reserve = batch_reserve
+        self.batch_max_wait = batch_max_wait
+        self.rate = max_rps
+        self.tokens = burst
+        self._updated = time.monotonic()
+
+        # Latest view of the core budget; None until GitHub has told us
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0  # epoch seconds
+        self._paused_until = 0.0  # monotonic; set by Retry-After / exhausted budget
+
+        self._waiters = []  # heap of (priority, sequence)
+        self._sequence = itertools.count()
+        self._changed = asyncio.Condition()
+
+    @classmethod
+    def get_instance(cls) -> 'GitHubScheduler':
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _batch_blocked(self) -> bool:
+        if self.remaining is None or self.limit is None:
+            return False
+        return self.remaining <= self.limit * self.batch_reserve and time.time() < self.reset_at
+
+    def _wait_time(self, priority: int) -> float:
+        """Seconds until the head request (of this priority) may go; 0 = now"""
+        now = time.monotonic()
+        if self._paused_until > now:
+            return self._paused_until - now
+        if priority != INTERACTIVE and self._batch_blocked():
+            return max(0.0, self.reset_at - time.time())
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self, priority: int = INTERACTIVE):
+        name = PRIORITY_NAMES.get(priority, str(priority))
+        entry = (priority, next(self._sequence))
+        started = time.monotonic()
+        scheduler_queue_depth.inc(priority=name)
+        async with self._changed:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    self._refill()
+                    if self._waiters[0] == entry:
+                        delay = self._wait_time(priority)
+                        if delay <= 0:
+                            heapq.heappop(self._waiters)
+                            self.tokens -= 1
+                            break
+                        waited = time.monotonic() - started
+                        if priority != INTERACTIVE and waited + delay > self.batch_max_wait:
+                            raise GitHubBudgetExhausted(
+                                f"GitHub budget for batch requests is exhausted: next slot in {delay:.0f}s, "
+                                f"over the {self.batch_max_wait:.0f}s batch wait limit"
+                            )
+                    else:
+                        delay = None  # not our turn: wait to be notified
+                    try:
+                        await asyncio.wait_for(self._changed.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                raise
+            finally:
+                scheduler_queue_depth.dec(priority=name)
+                self._changed.notify_all()
+        scheduler_wait.observe(time.monotonic() - started, priority=name)
+
+    def observe(self, headers):
+        """Update the budget and refill rate from X-RateLimit-* headers"""
+        try:
+            remaining = int(headers["X-RateLimit-Remaining"])
+            limit = int(headers["X-RateLimit-Limit"])
+            reset_at = float(headers["X-RateLimit-Reset"])
+        except (KeyError, ValueError):
+            return
+        resource = headers.get("X-RateLimit-Resource", "core")
+        rate_limit_remaining.set(remaining, resource=resource)
+        rate_limit_limit.set(limit, resource=resource)
+        rate_limit_reset.set(max(0.0, reset_at - time.time()), resource=resource)
+        if resource != "core":
+            return
+
+        self.limit, self.remaining, self.reset_at = limit, remaining, reset_at
+        # Full speed while the budget is healthy, slowing as it drains, but never
+        # slower than what spends the rest evenly before the window resets
+        window = max(1.0, reset_at - time.time())
+        self._refill()
+        share = remaining / limit if limit else 1.0
+        self.rate = min(self.max_rps, max(GITHUB_MIN_RPS, self.max_rps * share, remaining / window))
+        if remaining == 0 and window <= GITHUB_MAX_BACKOFF:
+            # Reset is close: hold everything until then. Otherwise requests go
+            # out and fail fast rather than hang until the window resets.
+            self._paused_until = time.monotonic() + window
+
+    async def _retry_delay(self, response: aiohttp.ClientResponse, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying a rate-limited response; None if not rate limited"""
+        if response.status not in (403, 429):
+            return None
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return float(retry_after) + random.uniform(0, 1)
+        if response.headers.get("X-RateLimit-Remaining") == "0":
+            reset_at = float(response.headers.get("X-RateLimit-Reset", "0"))
+            return max(0.0, reset_at - time.time()) + random.uniform(0, 1)
+        if response.status == 403:
+            # Plain 403s are permission errors unless GitHub says otherwise
+            body = await response.text()
+            if "rate limit" not in body.lower():
+                return None
+        # Full jitter so concurrent retries do not land together
+        return random.uniform(0, min(GITHUB_MAX_BACKOFF, GITHUB_BACKOFF_BASE * 2 ** attempt))
+
+    async def get(self, url: str, priority: int = INTERACTIVE, **kwargs) -> aiohttp.ClientResponse:
+        """
+        GET through the shared session once a token is available. The response is
+        returned unread; use it as `async with await github_scheduler.get(...) as response`.
+        """
+        session = await http_client.session()
+        attempt = 0
+        while True:
+            await self.acquire(priority)
+            response = await session.get(url, **kwargs)
+            self.observe(response.headers)
+            delay = await self._retry_delay(response, attempt)
+            if delay is None or attempt >= GITHUB_MAX_RETRIES or delay > GITHUB_MAX_BACKOFF:
+                return response
+            response.release()
+            rate_limited_total.inc(status=str(response.status))
+            print(f"⏳ GitHub rate limited ({response.status}), retrying in {delay:.1f}s")
+            async with self._changed:
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            attempt += 1
+
+
+github_scheduler = GitHubScheduler.get_instance()
@@ -0,0 +1,218 @@
+import re
+import os
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from agents.embeddings import embedding_cache, cosine_similarity
+
+INTENT_EMBED_MODEL = os.getenv("INTENT_EMBED_MODEL")  # unset => rules only
+INTENT_EMBED_TIMEOUT = float(os.getenv("INTENT_EMBED_TIMEOUT", "2"))
+
+REPO_ANALYZER = "repo_analyzer"
+TERRAFORM_GENERATOR = "terraform_generator"
+DEPLOYMENT_VALIDATOR = "deployment_validator"
+CHAT_AGENT = "chat_agent"
+
+# Tie-break order when two intents score the same
+INTENT_PRIORITY = [TERRAFORM_GENERATOR, DEPLOYMENT_VALIDATOR, CHAT_AGENT]
+
+# === Weighted rules: phrase -> (intent, weight) ===
+# Phrases are matched on word boundaries, so "deploy" no longer fires on "deployment"
+INTENT_RULES: Dict[str, Tuple[str, float]] = {
+    # Terraform / infra generation
+    "terraform": (TERRAFORM_GENERATOR, 3.0),
+    "infrastructure": (TERRAFORM_GENERATOR, 2.0),
+    "infra": (TERRAFORM_GENERATOR, 1.5),
+    "generate infra": (TERRAFORM_GENERATOR, 3.0),
+    "deploy infrastructure": (TERRAFORM_GENERATOR, 4.0),
+    "ecs": (TERRAFORM_GENERATOR, 2.0),
+    "fargate": (TERRAFORM_GENERATOR, 2.0),
+    "rds": (TERRAFORM_GENERATOR, 2.0),
+    "elasticache": (TERRAFORM_GENERATOR, 2.0),
+    "alb": (TERRAFORM_GENERATOR, 2.0),
+    "load balancer": (TERRAFORM_GENERATOR, 2.0),
+    "cloudformation": (TERRAFORM_GENERATOR, 3.0),
+    "cloud formation": (TERRAFORM_GENERATOR, 3.0),
+    ".tf": (TERRAFORM_GENERATOR, 2.0),
+
+    # Deployment / validation
+    "deploy": (DEPLOYMENT_VALIDATOR, 1.5),
+    "validate": (DEPLOYMENT_VALIDATOR, 2.0),
+    "check prerequisites": (DEPLOYMENT_VALIDATOR, 3.0),
+    "ready to deploy": (DEPLOYMENT_VALIDATOR, 3.5),
+    "deployment check": (DEPLOYMENT_VALIDATOR, 3.0),
+    "can i deploy": (DEPLOYMENT_VALIDATOR, 3.5),
+    "validate deployment": (DEPLOYMENT_VALIDATOR, 4.0),
+
+    # Conceptual questions lean towards plain chat
+    "what is": (CHAT_AGENT, 1.5),
+    "what are": (CHAT_AGENT, 1.5),
+    "explain": (CHAT_AGENT, 1.5),
+    "difference between": (CHAT_AGENT, 2.5),
+    "how does": (CHAT_AGENT, 1.5),
+    "why": (CHAT_AGENT, 1.0),
+}
+
+# Minimum score for a rule-based decision, and the margin a winner needs over
+# the runner-up before we consider the input unambiguous
+MIN_SCORE = 1.0
+AMBIGUITY_MARGIN = 1.0
+
+# Example utterances used by the embedding fallback
+INTENT_PROTOTYPES: Dict[str, List[str]] = {
+    TERRAFORM_GENERATOR: [
+        "generate terraform for my application on aws",
+        "create the infrastructure with ecs fargate and an rds database",
+        "add a redis cache to my infrastructure",
+    ],
+    DEPLOYMENT_VALIDATOR: [
+        "deploy my application now",
+        "check if everything is ready for deployment",
+        "validate my deployment prerequisites",
+    ],
+    CHAT_AGENT: [
+        "what is the difference between ecs and eks",
+        "explain how a load balancer works",
+        "why is my container restarting",
+    ],
+}
+
+GITHUB_URL_PATTERN = r"https://github\.com/[^\s)]+"
+GITHUB_URL_RE = re.compile(GITHUB_URL_PATTERN)
+
+
+# Words and ".ext" suffixes (for ".tf") are the unit of matching. Splitting runs
+# on the UTF-8 bytes so it stays in C: every byte other than [a-z0-9.] (including
+# all non-ASCII ones) becomes a space, and dots start a new token.
+_SEPARATORS = bytes(c if chr(c) in "abcdefghijklmnopqrstuvwxyz0123456789." else 32 for c in range(256))
+
+
+def tokenize(text: str) -> List[bytes]:
+    return text.lower().encode().translate(_SEPARATORS).replace(b".", b" .").split()
+
+
+def _build_phrase_index(rules: Dict[str, Tuple[str, float]]) -> Dict[bytes, List[Tuple[List[bytes], str]]]:
+    """
+    Index phrases by their first token, longest phrase first, so matching is one
+    dict lookup per input token no matter how many rules exist
+    """
+    index: Dict[bytes, List[Tuple[List[bytes], str]]] = {}
+    for phrase in rules:
+        tokens = tokenize(phrase)
+        index.setdefault(tokens[0], []).append((tokens, phrase))
+    for candidates in index.values():
+        candidates.sort(key=lambda candidate: len(candidate[0]), reverse=True)
+    return index
+
+
+class IntentResult:
+    def __init__(self, intent: str, scores: Dict[str, float], github_url: str = "",
+                 matched: Optional[List[str]] = None, method: str = "rules"):
+        self.intent = intent
+        self.scores = scores
+        self.github_url = github_url
+        self.matched = matched or []
+        self.method = method
+
+    def __repr__(self):
+        return f"IntentResult(intent={self.intent!r}, scores={self.scores}, method={self.method!r})"
+
+
+class IntentClassifier:
+    """
+    Single-pass intent classifier.
+
+    The input is lowercased and tokenized once (with C-level bytes operations for
+    ASCII text). Tokens that start some phrase are looked up in a phrase index
+    (longest match wins, like "deploy infrastructure" over "deploy"), so the cost
+    is linear in the input and independent of the number of rules.
+    Matches add weighted votes per intent; a GitHub URL always routes to the repo analyzer.
+    """
+    def __init__(self, rules: Dict[str, Tuple[str, float]] = INTENT_RULES,
+                 embed_model: Optional[str] = INTENT_EMBED_MODEL):
+        self.rules = {phrase.lower(): rule for phrase, rule in rules.items()}
+        self.phrase_index = _build_phrase_index(self.rules)
+        self.first_tokens = frozenset(self.phrase_index)
+        self.embed_model = embed_model
+        self._prototype_vectors: Optional[Dict[str, List[List[float]]]] = None
+
+    def classify_rules(self, text: str) -> IntentResult:
+        if "https://github.com/" in text:
+            match = GITHUB_URL_RE.search(text)
+            if match:
+                url = match.group(0)
+                return IntentResult(REPO_ANALYZER, {REPO_ANALYZER: float("inf")}, github_url=url, matched=[url])
+
+        scores: Dict[str, float] = {}
+        matched = []
+        tokens = tokenize(text)
+        first_tokens = self.first_tokens
+        # Most long inputs mention no phrase at all: a set check settles that in C
+        starts = [] if first_tokens.isdisjoint(tokens) else [
+            idx for idx, token in enumerate(tokens) if token in first_tokens
+        ]
+        covered = 0  # tokens before this index belong to an earlier match
+        for idx in starts:
+            if idx < covered:
+                continue
+            for phrase_tokens, phrase in self.phrase_index[tokens[idx]]:
+                width = len(phrase_tokens)
+                if width == 1 or tokens[idx:idx + width] == phrase_tokens:
+                    intent, weight = self.rules[phrase]
+                    scores[intent] = scores.get(intent, 0.0) + weight
+                    matched.append(phrase)
+                    covered = idx + width
+                    break
+
+        if not scores:
+            return IntentResult(CHAT_AGENT, scores, matched=matched)
+
+        # Highest score; ties go to the intent listed first in INTENT_PRIORITY
+        intent, score = None, 0.0
+        for candidate in INTENT_PRIORITY:
+            if scores.get(candidate, 0.0) > score:
+                intent, score = candidate, scores[candidate]
+        if intent is None or score < MIN_SCORE:
+            intent = CHAT_AGENT
+        return IntentResult(intent, scores, matched=matched)
+
+    def is_ambiguous(self, result: IntentResult) -> bool:
+        if result.intent == REPO_ANALYZER or not result.scores:
+            return False
+        ranked = sorted(result.scores.values(), reverse=True)
+        runner_up = ranked[1] if len(ranked) > 1 else 0.0
+        return ranked[0] - runner_up < AMBIGUITY_MARGIN
+
+    async def _embedding_vote(self, text: str) -> Optional[str]:
+        if self._prototype_vectors is None:
+            vectors = {}
+            for intent, examples in INTENT_PROTOTYPES.items():
+                vectors[intent] = await embedding_cache.embed(examples, self.embed_model)
+            self._prototype_vectors = vectors
+
+        [query] = await embedding_cache.embed([text], self.embed_model)
+        best_intent, best_score = None, -1.0
+        for intent, vectors in self._prototype_vectors.items():
+            score = max(cosine_similarity(query, vector) for vector in vectors)
+            if score > best_score:
+                best_intent, best_score = intent, score
+        return best_intent
+
+    async def classify(self, text: str) -> IntentResult:
+        result = self.classify_rules(text)
+        if not self.embed_model or not self.is_ambiguous(result):
+            return result
+
+        try:
+            intent = await asyncio.wait_for(self._embedding_vote(text), timeout=INTENT_EMBED_TIMEOUT)
+        except Exception as e:
+            print(f"⚠️ Embedding fallback failed, keeping rule decision: {str(e)}")
+            return result
+
+        # Only let the embedding choose between intents the rules already considered
+        if intent in result.scores:
+            result.intent = intent
+            result.method = "embedding"
+        return result
+
+
+intent_classifier = IntentClassifier()
@@ -0,0 +1,527 @@
+import re
+import json
+import tomllib
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field, asdict
+from pathlib import PurePosixPath
+from typing import Callable, Dict, List, Optional
+
+try:
+    import yaml
+except ImportError:  # PyYAML is optional; compose files fall back to a line scanner
+    yaml = None
+
+# Files whose contents are never worth sending to the LLM
+LOCKFILES = {
+    "package-lock.json", "yarn.lock", "pnpm-lock.yaml", "poetry.lock",
+    "Pipfile.lock", "Cargo.lock", "Gemfile.lock", "go.sum", "composer.lock",
+}
+
+# dependency name (lowercase) -> framework label
+FRAMEWORKS = {
+    # node
+    "express": "Express", "next": "Next.js", "react": "React", "@angular/core": "Angular",
+    "vue": "Vue", "@nestjs/core": "NestJS", "fastify": "Fastify", "koa": "Koa", "nuxt": "Nuxt",
+    # python
+    "fastapi": "FastAPI", "flask": "Flask", "django": "Django", "starlette": "Starlette",
+    "tornado": "Tornado", "aiohttp": "aiohttp", "streamlit": "Streamlit",
+    # java
+    "spring-boot-starter-web": "Spring Boot", "spring-boot-starter": "Spring Boot",
+    "spring-boot-starter-webflux": "Spring Boot", "quarkus-core": "Quarkus", "micronaut-runtime": "Micronaut",
+    # go
+    "github.com/gin-gonic/gin": "Gin", "github.com/labstack/echo/v4": "Echo",
+    "github.com/gofiber/fiber/v2": "Fiber", "github.com/gorilla/mux": "Gorilla Mux",
+    # rust
+    "actix-web": "Actix Web", "axum": "Axum", "rocket": "Rocket",
+    # ruby
+    "rails": "Rails", "sinatra": "Sinatra",
+}
+
+# dependency name (lowercase) -> backing service
+DATASTORES = {
+    "pg": "postgres", "postgres": "postgres", "psycopg2": "postgres", "psycopg2-binary": "postgres",
+    "psycopg": "postgres", "asyncpg": "postgres", "org.postgresql:postgresql": "postgres", "postgresql": "postgres",
+    "github.com/lib/pq": "postgres", "github.com/jackc/pgx/v5": "postgres",
+    "mysql": "mysql", "mysql2": "mysql", "pymysql": "mysql", "mysqlclient": "mysql",
+    "mysql-connector-python": "mysql", "mysql:mysql-connector-java": "mysql", "com.mysql:mysql-connector-j": "mysql",
+    "github.com/go-sql-driver/mysql": "mysql",
+    "redis": "redis", "ioredis": "redis", "aioredis": "redis", "spring-boot-starter-data-redis": "redis",
+    "github.com/redis/go-redis/v9": "redis", "github.com/go-redis/redis/v8": "redis",
+    "mongoose": "mongodb", "mongodb": "mongodb", "pymongo": "mongodb", "motor": "mongodb",
+    "spring-boot-starter-data-mongodb": "mongodb", "go.mongodb.org/mongo-driver": "mongodb",
+}
+
+# Listening port a framework uses when nothing else says otherwise
+FRAMEWORK_DEFAULT_PORTS = {
+    "Express": 3000, "Next.js": 3000, "NestJS": 3000, "Fastify": 3000, "Koa": 3000, "Nuxt": 3000,
+    "Angular": 4200, "React": 3000, "Vue": 8080,
+    "FastAPI": 8000, "Django": 8000, "Flask": 5000, "Starlette": 8000, "Streamlit": 8501,
+    "Spring Boot": 8080, "Quarkus": 8080, "Micronaut": 8080,
+    "Gin": 8080, "Echo": 8080, "Fiber": 3000, "Actix Web": 8080, "Axum": 3000, "Rocket": 8000,
+    "Rails": 3000, "Sinatra": 4567,
+}
+
+
+@dataclass
+class RepoProfile:
+    """
+    Facts extracted deterministically from manifests; serializable with to_dict()
+    """
+    runtimes: List[str] = field(default_factory=list)
+    runtime_versions: Dict[str, str] = field(default_factory=dict)
+    package_managers: List[str] = field(default_factory=list)
+    frameworks: List[str] = field(default_factory=list)
+    dependencies: Dict[str, List[str]] = field(default_factory=dict)
+    datastores: List[str] = field(default_factory=list)
+    ports: List[int] = field(default_factory=list)
+    default_port: Optional[int] = None
+    start_command: Optional[str] = None
+    start_command_source: Optional[str] = None
+    build_command: Optional[str] = None
+    base_images: List[str] = field(default_factory=list)
+    compose_services: List[str] = field(default_factory=list)
+    env_vars: List[str] = field(default_factory=list)
+    config_files: List[str] = field(default_factory=list)
+
+    def _add(self, attribute: str, *values):
+        items = getattr(self, attribute)
+        for value in values:
+            if value and value not in items:
+                items.append(value)
+
+    def add_dependencies(self, ecosystem: str, names: List[str]):
+        bucket = self.dependencies.setdefault(ecosystem, [])
+        for name in names:
+            if name and name not in bucket:
+                bucket.append(name)
+            key = name.lower()
+            self._add("frameworks", FRAMEWORKS.get(key))
+            self._add("datastores", DATASTORES.get(key))
+
+    def set_start_command(self, command: str, source: str, authoritative: bool = False):
+        """
+        First writer wins (root manifests are applied first), except that the
+        first Dockerfile CMD/ENTRYPOINT overrides package-manager guesses
+        """
+        from_dockerfile = PurePosixPath(self.start_command_source or "").name == "Dockerfile"
+        if not self.start_command or (authoritative and not from_dockerfile):
+            self.start_command = command
+            self.start_command_source = source
+
+    def add_port(self, value):
+        try:
+            port = int(str(value).strip().split("/")[0])
+        except (TypeError, ValueError):
+            return
+        if 0 < port < 65536 and port not in self.ports:
+            self.ports.append(port)
+
+    @property
+    def port(self) -> Optional[int]:
+        return self.ports[0] if self.ports else self.default_port
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["port"] = self.port
+        return data
+
+
+# === Individual parsers: (path, content, profile) -> None ===
+
+def _parse_package_json(path: str, content: str, profile: RepoProfile):
+    data = json.loads(content)
+    profile._add("runtimes", "node")
+    profile._add("package_managers", "npm")
+    deps = list((data.get("dependencies") or {}).keys())
+    dev_deps = list((data.get("devDependencies") or {}).keys())
+    profile.add_dependencies("npm", deps)
+    # Dev dependencies only identify frameworks (e.g. @angular/core is sometimes dev-only)
+    for name in dev_deps:
+        profile._add("frameworks", FRAMEWORKS.get(name.lower()))
+
+    engines = data.get("engines") or {}
+    if engines.get("node"):
+        profile.runtime_versions.setdefault("node", engines["node"])
+
+    scripts = data.get("scripts") or {}
+    if scripts.get("start"):
+        profile.set_start_command("npm start", path)
+    if scripts.get("build") and not profile.build_command:
+        profile.build_command = "npm run build"
+    for script in scripts.values():
+        match = re.search(r"(?:--port[ =]|-p |PORT=)(\d{2,5})", str(script))
+        if match:
+            profile.add_port(match.group(1))
+
+
+_REQUIREMENT_NAME = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)")
+
+
+def _requirement_name(line: str) -> Optional[str]:
+    line = line.split("#", 1)[0].strip()
+    if not line or line.startswith(("-", "git+", "http")):
+        return None
+    match = _REQUIREMENT_NAME.match(line)
+    return match.group(1).lower().replace("_", "-") if match else None
+
+
+def _parse_requirements(path: str, content: str, profile: RepoProfile):
+    profile._add("runtimes", "python")
+    profile._add("package_managers", "pip")
+    names = [_requirement_name(line) for line in content.splitlines()]
+    profile.add_dependencies("pypi", [name for name in names if name])
+
+
+def _parse_pyproject(path: str, content: str, profile: RepoProfile):
+    data = tomllib.loads(content)
+    profile._add("runtimes", "python")
+    project = data.get("project") or {}
+    names = [_requirement_name(dep) for dep in project.get("dependencies") or []]
+    if project.get("requires-python"):
+        profile.runtime_versions.setdefault("python", project["requires-python"])
+
+    poetry = (data.get("tool") or {}).get("poetry") or {}
+    if poetry:
+        profile._add("package_managers", "poetry")
+        poetry_deps = poetry.get("dependencies") or {}
+        if isinstance(poetry_deps.get("python"), str):
+            profile.runtime_versions.setdefault("python", poetry_deps["python"])
+        names.extend(name.lower() for name in poetry_deps if name.lower() != "python")
+    else:
+        profile._add("package_managers", "pip")
+    profile.add_dependencies("pypi", [name for name in names if name])
+
+
+def _parse_pipfile(path: str, content: str, profile: RepoProfile):
+    data = tomllib.loads(content)
+    profile._add("runtimes", "python")
+    profile._add("package_managers", "pipenv")
+    profile.add_dependencies("pypi", [name.lower() for name in (data.get("packages") or {})])
+    python_version = (data.get("requires") or {}).get("python_version")
+    if python_version:
+        profile.runtime_versions.setdefault("python", python_version)
+
+
+def _parse_setup_py(path: str, content: str, profile: RepoProfile):
+    profile._add("runtimes", "python")
+    match = re.search(r"install_requires\s*=\s*\[(.*?)\]", content, re.S)
+    if match:
+        names = [_requirement_name(item) for item in re.findall(r"['\"]([^'\"]+)['\"]", match.group(1))]
+        profile.add_dependencies("pypi", [name for name in names if name])
+
+
+def _strip_ns(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _parse_pom(path: str, content: str, profile: RepoProfile):
+    root = ET.fromstring(content)
+    profile._add("runtimes", "java")
+    profile._add("package_managers", "maven")
+    names = []
+    for element in root.iter():
+        tag = _strip_ns(element.tag)
+        if tag == "dependency":
+            values = {_strip_ns(child.tag): (child.text or "").strip() for child in element}
+            artifact = values.get("artifactId")
+            if artifact:
+                names.append(artifact)
+                if values.get("groupId"):
+                    profile._add("datastores", DATASTORES.get(f"{values['groupId']}:{artifact}".lower()))
+        elif tag in ("java.version", "maven.compiler.source", "maven.compiler.release") and element.text:
+            profile.runtime_versions.setdefault("java", element.text.strip())
+        elif tag == "parent":
+            values = {_strip_ns(child.tag): (child.text or "").strip() for child in element}
+            if values.get("artifactId") == "spring-boot-starter-parent":
+                profile._add("frameworks", "Spring Boot")
+    profile.add_dependencies("maven", names)
+    if not profile.build_command:
+        profile.build_command = "mvn -B package -DskipTests"
+
+
+_GRADLE_DEPENDENCY = re.compile(
+    r"(?:implementation|api|compile|runtimeOnly|compileOnly)\s*\(?\s*['\"]([^:'\"]+):([^:'\"]+)(?::[^'\"]*)?['\"]"
+)
+
+
+def _parse_gradle(path: str, content: str, profile: RepoProfile):
+    profile._add("runtimes", "java")
+    profile._add("package_managers", "gradle")
+    names = []
+    for group, artifact in _GRADLE_DEPENDENCY.findall(content):
+        names.append(artifact)
+        profile._add("datastores", DATASTORES.get(f"{group}:{artifact}".lower()))
+    if "org.springframework.boot" in content:
+        profile._add("frameworks", "Spring Boot")
+    if "org.jetbrains.kotlin" in content or 'kotlin("jvm")' in content:
+        profile._add("runtimes", "kotlin")
+    match = re.search(r"(?:sourceCompatibility|languageVersion)\s*=?\s*(?:JavaVersion\.VERSION_|JavaLanguageVersion\.of\()?['\"]?(\d+(?:\.\d+)?)", content)
+    if match:
+        profile.runtime_versions.setdefault("java", match.group(1))
+    profile.add_dependencies("gradle", names)
+    if not profile.build_command:
+        profile.build_command = "./gradlew build -x test"
+
+
+def _parse_go_mod(path: str, content: str, profile: RepoProfile):
+    profile._add("runtimes", "go")
+    profile._add("package_managers", "go modules")
+    names = []
+    in_block = False
+    for raw in content.splitlines():
+        line = raw.split("//", 1)[0].strip()
+        if line.startswith("go "):
+            profile.runtime_versions.setdefault("go", line.split()[1])
+        elif line.startswith("require ("):
+            in_block = True
+        elif in_block and line == ")":
+            in_block = False
+        elif in_block and line:
+            names.append(line.split()[0])
+        elif line.startswith("require "):
+            names.append(line.split()[1])
+    profile.add_dependencies("go", names)
+    if not profile.build_command:
+        profile.build_command = "go build ./..."
+
+
+def _parse_cargo(path: str, content: str, profile: RepoProfile):
+    data = tomllib.loads(content)
+    profile._add("runtimes", "rust")
+    profile._add("package_managers", "cargo")
+    profile.add_dependencies("cargo", list((data.get("dependencies") or {}).keys()))
+    rust_version = (data.get("package") or {}).get("rust-version")
+    if rust_version:
+        profile.runtime_versions.setdefault("rust", rust_version)
+    if not profile.build_command:
+        profile.build_command = "cargo build --release"
+
+
+def _parse_gemfile(path: str, content: str, profile: RepoProfile):
+    profile._add("runtimes", "ruby")
+    profile._add("package_managers", "bundler")
+    profile.add_dependencies("rubygems", re.findall(r"^\s*gem\s+['\"]([^'\"]+)['\"]", content, re.M))
+    match = re.search(r"^\s*ruby\s+['\"]([^'\"]+)['\"]", content, re.M)
+    if match:
+        profile.runtime_versions.setdefault("ruby", match.group(1))
+
+
+def _parse_composer(path: str, content: str, profile: RepoProfile):
+    data = json.loads(content)
+    profile._add("runtimes", "php")
+    profile._add("package_managers", "composer")
+    require = data.get("require") or {}
+    if "php" in require:
+        profile.runtime_versions.setdefault("php", require["php"])
+    profile.add_dependencies("composer", [name for name in require if name != "php"])
+    if "laravel/framework" in require:
+        profile._add("frameworks", "Laravel")
+
+
+def _dockerfile_command(instruction: str) -> str:
+    instruction = instruction.strip()
+    if instruction.startswith("["):
+        try:
+            return " ".join(json.loads(instruction))
+        except ValueError:
+            pass
+    return instruction
+
+
+def _parse_dockerfile(path: str, content: str, profile: RepoProfile):
+    # Join line continuations first
+    text = re.sub(r"\\\r?\n", " ", content)
+    entrypoint = command = None
+    stages = set()  # "FROM ... AS name" aliases, which later FROM lines may build on
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        keyword, _, rest = line.partition(" ")
+        keyword = keyword.upper()
+        rest = rest.strip()
+        if keyword == "FROM":
+            # FROM [--platform=...] image [AS name]
+            words = [word for word in rest.split() if not word.startswith("--")]
+            if not words:
+                continue
+            image = words[0]
+            if image.lower() != "scratch" and image.lower() not in stages:
+                profile._add("base_images", image)
+            if len(words) >= 3 and words[1].upper() == "AS":
+                stages.add(words[2].lower())
+        elif keyword == "EXPOSE":
+            for port in rest.split():
+                profile.add_port(port)
+        elif keyword in ("ENV", "ARG"):
+            if "=" in rest:
+                names = re.findall(r"([A-Za-z_][A-Za-z0-9_]*)=", rest)
+            else:
+                names = rest.split()[:1]
+            profile._add("env_vars", *names)
+        elif keyword == "CMD":
+            command = _dockerfile_command(rest)
+        elif keyword == "ENTRYPOINT":
+            entrypoint = _dockerfile_command(rest)
+    start = " ".join(part for part in (entrypoint, command) if part)
+    if start:
+        profile.set_start_command(start, path, authoritative=True)
+
+
+# image name fragment -> datastore, for compose services
+COMPOSE_DATASTORE_IMAGES = (
+    ("postgres", "postgres"), ("mysql", "mysql"), ("mariadb", "mysql"),
+    ("redis", "redis"), ("mongo", "mongodb"),
+)
+
+
+def _compose_port(entry) -> Optional[str]:
+    if isinstance(entry, dict):
+        return str(entry.get("target", ""))
+    # "8080:80", "127.0.0.1:8080:80/tcp", "3000"
+    return str(entry).split(":")[-1]
+
+
+def _parse_compose(path: str, content: str, profile: RepoProfile):
+    if yaml is not None:
+        data = yaml.safe_load(content) or {}
+        services = data.get("services") or {}
+        for name, service in services.items():
+            profile._add("compose_services", name)
+            service = service or {}
+            image = str(service.get("image", ""))
+            store = next((store for key, store in COMPOSE_DATASTORE_IMAGES if key in image), None)
+            if store:
+                profile._add("datastores", store)
+            else:
+                for port in service.get("ports") or []:
+                    profile.add_port(_compose_port(port))
+            environment = service.get("environment") or {}
+            if isinstance(environment, list):
+                names = [str(item).split("=", 1)[0] for item in environment]
+            else:
+                names = list(environment.keys())
+            profile._add("env_vars", *names)
+        return
+
+    # Line scanner fallback: service names, image-backed datastores and port mappings
+    services: Dict[str, dict] = {}
+    current = None
+    for raw in content.splitlines():
+        service = re.match(r"^  ([A-Za-z0-9_.-]+):\s*$", raw)
+        if service:
+            current = services.setdefault(service.group(1), {"image": "", "ports": []})
+            continue
+        if current is None:
+            continue
+        image = re.match(r"^\s+image:\s*['\"]?([^'\"\s]+)", raw)
+        if image:
+            current["image"] = image.group(1)
+        port = re.match(r"^\s+-\s*['\"]?(?:[\d.]+:)?(?:\d+:)?(\d+)(?:/\w+)?['\"]?\s*$", raw)
+        if port:
+            current["ports"].append(port.group(1))
+
+    for name, service in services.items():
+        profile._add("compose_services", name)
+        store = next((store for key, store in COMPOSE_DATASTORE_IMAGES if key in service["image"]), None)
+        if store:
+            profile._add("datastores", store)
+        else:
+            for port in service["ports"]:
+                profile.add_port(port)
+
+
+def _parse_env_example(path: str, content: str, profile: RepoProfile):
+    for raw in content.splitlines():
+        line = raw.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        name = line.split("=", 1)[0].replace("export ", "").strip()
+        if re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", name):
+            profile._add("env_vars", name)
+            if name == "PORT":
+                profile.add_port(line.split("=", 1)[1].strip().strip("'\""))
+
+
+def _parse_procfile(path: str, content: str, profile: RepoProfile):
+    match = re.search(r"^web:\s*(.+)$", content, re.M)
+    if match:
+        profile.set_start_command(match.group(1).strip(), path)
+
+
+PARSERS: Dict[str, Callable[[str, str, RepoProfile], None]] = {
+    "package.json": _parse_package_json,
+    "requirements.txt": _parse_requirements,
+    "pyproject.toml": _parse_pyproject,
+    "Pipfile": _parse_pipfile,
+    "setup.py": _parse_setup_py,
+    "pom.xml": _parse_pom,
+    "build.gradle": _parse_gradle,
+    "build.gradle.kts": _parse_gradle,
+    "go.mod": _parse_go_mod,
+    "Cargo.toml": _parse_cargo,
+    "Gemfile": _parse_gemfile,
+    "composer.json": _parse_composer,
+    "Dockerfile": _parse_dockerfile,
+    "docker-compose.yml": _parse_compose,
+    "docker-compose.yaml": _parse_compose,
+    "compose.yml": _parse_compose,
+    "compose.yaml": _parse_compose,
+    ".env.example": _parse_env_example,
+    ".env.sample": _parse_env_example,
+    "Procfile": _parse_procfile,
+}
+
+
+def _depth(path: str) -> int:
+    return path.count("/")
+
+
+def build_repo_profile(files: Dict[str, str]) -> RepoProfile:
+    """
+    Build a RepoProfile from {path: content}. Root-level manifests are applied
+    first so they win over nested ones; unparseable files are skipped.
+    """
+    profile = RepoProfile()
+    for path in sorted(files, key=lambda item: (_depth(item), item)):
+        name = PurePosixPath(path).name
+        profile._add("config_files", path)
+        parser = PARSERS.get(name)
+        if parser is None:
+            continue
+        try:
+            parser(path, files[path], profile)
+        except Exception as e:
+            print(f"⚠️ Could not parse {path}: {str(e)}")
+
+    if profile.default_port is None:
+        for framework in profile.frameworks:
+            if framework in FRAMEWORK_DEFAULT_PORTS:
+                profile.default_port = FRAMEWORK_DEFAULT_PORTS[framework]
+                break
+    return profile
+
+
+def format_profile(profile: RepoProfile) -> str:
+    """
+    Markdown summary streamed to the user before the LLM runs
+    """
+    def listing(values) -> str:
+        return ", ".join(str(value) for value in values) if values else "None found"
+
+    runtimes = [
+        f"{runtime} {profile.runtime_versions[runtime]}" if runtime in profile.runtime_versions else runtime
+        for runtime in profile.runtimes
+    ]
+    port = profile.port
+    port_note = "" if profile.ports or port is None else " (framework default)"
+    lines = [
+        f"- **Runtime:** {listing(runtimes)}",
+        f"- **Frameworks:** {listing(profile.frameworks)}",
+        f"- **Package managers:** {listing(profile.package_managers)}",
+        f"- **Datastores:** {listing(profile.datastores)}",
+        f"- **Port:** {port if port is not None else 'None found'}{port_note}",
+        f"- **Start command:** `{profile.start_command}`" if profile.start_command else "- **Start command:** None found",
+        f"- **Env vars:** {listing(profile.env_vars)}",
+    ]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,155 @@
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+from core.metrics import registry
+from agents.repo_tree import CONFIG_FILE_PRIORITY
+from agents.manifest_parsers import LOCKFILES
+
+# Context window requested from Ollama; prompts are packed against the same number
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "4096"))
+
+# Word pieces of up to 4 characters and single punctuation marks. Slightly
+# overestimates BPE tokenizers on prose and tracks them closely on code/JSON.
+_PIECE_RE = re.compile(r"\w{1,4}|[^\w\s]")
+
+# Items smaller than this are dropped rather than cut down to a useless stub
+MIN_ITEM_TOKENS = 48
+
+prompt_tokens_dropped = registry.counter(
+    "prompt_tokens_dropped_total", "Estimated tokens cut from prompts to fit num_ctx", ("prompt", "section")
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(_PIECE_RE.findall(text)) if text else 0
+
+
+def file_rank(path: str) -> tuple:
+    """Sort key: manifests before lockfiles, root before nested, then by config priority"""
+    name = path.rpartition("/")[2]
+    return (name in LOCKFILES, path.count("/"), CONFIG_FILE_PRIORITY.get(name, len(CONFIG_FILE_PRIORITY)), path)
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """
+    Keep whole lines from the top while they fit, then note how many were
+    omitted. A single oversized first line is cut by characters.
+    """
+    if budget <= 0:
+        return ""
+    if estimate_tokens(text) <= budget:
+        return text
+    lines = text.splitlines()
+    marker_tokens = 12
+    kept, used = [], 0
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget - marker_tokens:
+            break
+        kept.append(line)
+        used += cost
+    if not kept:
+        cut = text[:budget * 4]
+        while cut and estimate_tokens(cut) > budget - marker_tokens:
+            cut = cut[:int(len(cut) * 0.8)]
+        return f"{cut}\n[... truncated to fit context]" if cut else ""
+    return "\n".join(kept) + f"\n[... {len(lines) - len(kept)} more lines omitted]"
+
+
+@dataclass
+class PromptSection:
+    """
+    One variable part of a prompt. Either `text`, or `items` as (label, text)
+    pairs already in relevance order (see file_rank). `share` is the fraction of
+    the budget guaranteed to the section; unused budget goes to the remaining
+    sections by `priority` (lower first). `summarize(text, budget)` replaces
+    plain truncation when the section overflows.
+    """
+    name: str
+    text: str = ""
+    items: List[Tuple[str, str]] = field(default_factory=list)
+    share: float = 0.0
+    priority: int = 0
+    summarize: Optional[Callable[[str, int], str]] = None
+
+
+@dataclass
+class PackedPrompt:
+    sections: Dict[str, str]
+    tokens: Dict[str, int]
+    dropped: Dict[str, int]
+    budget: int
+
+    def __getitem__(self, name: str) -> str:
+        return self.sections.get(name, "")
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(self.tokens.values())
+
+
+def _render_items(items: List[Tuple[str, str]]) -> str:
+    return "\n\n".join(f"--- {label} ---\n{text}" for label, text in items)
+
+
+class PromptPacker:
+    """
+    Fits prompt sections into num_ctx minus the tokens reserved for the answer
+    and for the fixed template. Results depend only on the inputs, so the same
+    repository always yields the same prompt.
+    """
+    def __init__(self, name: str, num_ctx: int = OLLAMA_NUM_CTX, reserve_output: int = 512):
+        self.name = name
+        self.num_ctx = num_ctx
+        self.reserve_output = reserve_output
+
+    def pack(self, template: str, sections: List[PromptSection]) -> PackedPrompt:
+        available = max(0, self.num_ctx - self.reserve_output - estimate_tokens(template))
+        needs = {
+            s.name: estimate_tokens(s.text if not s.items else _render_items(s.items))
+            for s in sections
+        }
+
+        # Guaranteed shares first, then leftovers by priority
+        allocation = {s.name: min(needs[s.name], int(s.share * available)) for s in sections}
+        leftover = available - sum(allocation.values())
+        for section in sorted(sections, key=lambda s: (s.priority, s.name)):
+            extra = min(needs[section.name] - allocation[section.name], max(0, leftover))
+            allocation[section.name] += extra
+            leftover -= extra
+
+        packed, tokens, dropped = {}, {}, {}
+        for section in sections:
+            budget = allocation[section.name]
+            if needs[section.name] <= budget:
+                text = section.text if not section.items else _render_items(section.items)
+            elif section.items:
+                text = self._fit_items(section.items, budget)
+            elif section.summarize:
+                text = truncate_to_tokens(section.summarize(section.text, budget), budget)
+            else:
+                text = truncate_to_tokens(section.text, budget)
+            packed[section.name] = text
+            tokens[section.name] = estimate_tokens(text)
+            dropped[section.name] = max(0, needs[section.name] - tokens[section.name])
+            if dropped[section.name]:
+                prompt_tokens_dropped.inc(dropped[section.name], prompt=self.name, section=section.name)
+                print(f"✂️ {self.name}: cut ~{dropped[section.name]} tokens from '{section.name}' "
+                      f"(budget {budget} of {self.num_ctx})")
+        return PackedPrompt(packed, tokens, dropped, available)
+
+    def _fit_items(self, items: List[Tuple[str, str]], budget: int) -> str:
+        rendered, used, omitted = [], 0, []
+        for label, text in items:
+            header = f"--- {label} ---\n"
+            remaining = budget - used - estimate_tokens(header) - 16  # room for the omitted note
+            if remaining < MIN_ITEM_TOKENS:
+                omitted.append(label)
+                continue
+            body = truncate_to_tokens(text, remaining)
+            rendered.append(header + body)
+            used += estimate_tokens(header + body) + 1
+        if omitted:
+            rendered.append(f"[{len(omitted)} more files omitted: {', '.join(omitted)}]")
+        return "\n\n".join(rendered)
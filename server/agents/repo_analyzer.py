@@ -1,45 +1,295 @@
 import json
 import aiohttp
 from ollama import AsyncClient
+from core.metrics import LLMCallMetrics
+from core.http_client import http_client
+from agents.github_scheduler import github_scheduler, INTERACTIVE
+from agents.repo_cache import repo_analysis_cache
+from agents.github_archive import TarStreamExtractor, ArchiveUnavailable
+from agents.manifest_parsers import build_repo_profile, format_profile, PARSERS
+from agents.prompt_packer import PromptPacker, PromptSection, file_rank, OLLAMA_NUM_CTX
+from agents.file_index import (
+    file_index_cache, candidate_files, relevant_files, FILE_INDEX_EMBED_MODEL, FILE_INDEX_HEAD_FILES, FILE_INDEX_HEAD_CHARS,
+    FILE_INDEX_TOP_K, DEPLOYMENT_QUERY
+)
+from agents.repo_tree import TreeStreamParser, match_config_files, subtree_candidates, join_subtree_paths, merge_entries
+from collections import OrderedDict
+from contextlib import nullcontext
+from urllib.parse import urlsplit
 import os
-from typing import Dict, AsyncGenerator
+import re
+import time
+from typing import Dict, AsyncGenerator, Optional
 import asyncio
 
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 OLLAMA_MODEL = os.getenv("OLLAMA_CHAT_MODEL")
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL")
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+GITHUB_FETCH_CONCURRENCY = int(os.getenv("GITHUB_FETCH_CONCURRENCY", "5"))
+
+# "contents" = one contents API call per file, "archive" = one tarball download
+GITHUB_FETCH_MODE = os.getenv("GITHUB_FETCH_MODE", "contents")
+GITHUB_ARCHIVE_MAX_BYTES = int(os.getenv("GITHUB_ARCHIVE_MAX_BYTES", str(200 * 1024 * 1024)))
+GITHUB_ARCHIVE_MAX_FILE_BYTES = int(os.getenv("GITHUB_ARCHIVE_MAX_FILE_BYTES", str(1024 * 1024)))
+GITHUB_ARCHIVE_MAX_FILES = int(os.getenv("GITHUB_ARCHIVE_MAX_FILES", "25"))
+CONTENTS_MAX_FILES = 10
+ANALYSIS_NUM_PREDICT = 500
+GITHUB_ETAG_CACHE_SIZE = int(os.getenv("GITHUB_ETAG_CACHE_SIZE", "512"))
+# Parsed bodies vary from a few hundred bytes to tens of MB (trees of huge repos), so bound memory too
+GITHUB_ETAG_CACHE_BYTES = int(os.getenv("GITHUB_ETAG_CACHE_BYTES", str(64 * 1024 * 1024)))
+# Extra tree requests allowed when GitHub truncates a recursive tree listing
+GITHUB_TREE_MAX_SUBTREE_REQUESTS = int(os.getenv("GITHUB_TREE_MAX_SUBTREE_REQUESTS", "64"))
+
+# Branches move, so resolved refs are re-checked (with a conditional request) after a short TTL
+GITHUB_REF_CACHE_TTL = float(os.getenv("GITHUB_REF_CACHE_TTL", "60"))
+GITHUB_DEFAULT_BRANCH_TTL = float(os.getenv("GITHUB_DEFAULT_BRANCH_TTL", "3600"))
+GITHUB_REF_CACHE_SIZE = int(os.getenv("GITHUB_REF_CACHE_SIZE", "1024"))
+
+COMMIT_SHA_RE = re.compile(r"[0-9a-fA-F]{40}")
+
+
+class EtagCache:
+    """
+    url -> (etag, parsed body), so unchanged resources are revalidated with a 304.
+    LRU bounded by entry count and by the size of the response bodies, which
+    stands in for the memory their parsed form holds.
+    """
+    def __init__(self, max_entries: int = GITHUB_ETAG_CACHE_SIZE, max_bytes: int = GITHUB_ETAG_CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # url -> (etag, data, size)
+
+    def get(self, url: str) -> Optional[tuple]:
+        entry = self._entries.get(url)
+        if entry is None:
+            return None
+        self._entries.move_to_end(url)
+        return entry[0], entry[1]
+
+    def put(self, url: str, etag: str, data, size: int):
+        self.discard(url)
+        if size > self.max_bytes:
+            return
+        self._entries[url] = (etag, data, size)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self.bytes -= evicted
+
+    def discard(self, url: str):
+        entry = self._entries.pop(url, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_etag_cache = EtagCache()
+
+# (owner, repo) -> (default branch, expires at); (owner, repo, ref) -> (commit sha, expires at)
+_default_branch_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_ref_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+
+def _cache_get(cache: OrderedDict, key: tuple) -> Optional[str]:
+    entry = cache.get(key)
+    if entry is None or entry[1] < time.monotonic():
+        return None
+    cache.move_to_end(key)
+    return entry[0]
+
+
+def _cache_put(cache: OrderedDict, key: tuple, value: str, ttl: float):
+    cache[key] = (value, time.monotonic() + ttl)
+    cache.move_to_end(key)
+    while len(cache) > GITHUB_REF_CACHE_SIZE:
+        cache.popitem(last=False)
 
 # Initialize Ollama AsyncClient
 ollama_client = AsyncClient(host=OLLAMA_BASE_URL)
 
 class SimpleGitHubFetcher:
-    def __init__(self, github_token: str):
+    def __init__(self, github_token: str, base_url: str = GITHUB_API_URL, priority: int = INTERACTIVE):
         self.github_token = github_token
-        self.base_url = "https://api.github.com"
+        self.base_url = base_url.rstrip("/")
+        self.priority = priority  # github_scheduler priority for every request
+        self.ref = ""       # commit SHA every fetch is pinned to
+        self.ref_name = ""  # branch, tag or SHA it was resolved from
 
-    def parse_url(self, github_url: str) -> tuple[str, str]:
-        parts = github_url.strip().rstrip("/").split("github.com/")[-1].split("/")
-        return parts[0], parts[1].replace(".git", "")
+    def parse_url(self, github_url: str) -> tuple[str, str, str]:
+        """
+        Returns (owner, repo, ref). ref is "" for the default branch; for
+        /tree/<ref>/... and /blob/<ref>/... links it is everything after the
+        marker, since branch names may contain slashes (see resolve_ref).
+        """
+        path = urlsplit(github_url.strip()).path if "://" in github_url else github_url.strip()
+        parts = [part for part in path.split("github.com/")[-1].split("/") if part]
+        owner, repo = parts[0], parts[1].removesuffix(".git")
+        ref = ""
+        if len(parts) > 3 and parts[2] in ("tree", "blob", "commit"):
+            ref = "/".join(parts[3:])
+        return owner, repo, ref
 
-    async def get_tree(self, owner: str, repo: str) -> list:
+    async def get_default_branch(self, owner: str, repo: str) -> str:
+        cached = _cache_get(_default_branch_cache, (owner, repo))
+        if cached:
+            return cached
         headers = {
             "Authorization": f"token {self.github_token}",
             "Accept": "application/vnd.github.v3+json"
         }
+        status, data = await self.get_json_conditional(f"{self.base_url}/repos/{owner}/{repo}", headers)
+        if status != 200:
+            print(f"⚠️ Could not read repository metadata (status {status})")
+            return ""
+        branch = data.get("default_branch", "")
+        if branch:
+            _cache_put(_default_branch_cache, (owner, repo), branch, GITHUB_DEFAULT_BRANCH_TTL)
+        return branch
 
-        for branch in ["main", "master"]:
-            url = f"{self.base_url}/repos/{owner}/{repo}/git/trees/{branch}?recursive=1"
-            print(f"🔍 Fetching tree from branch '{branch}'...")
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        tree = data.get("tree", [])
-                        print(f"✅ Found {len(tree)} files in repository")
-                        return tree
-                    else:
-                        print(f"⚠️ Branch '{branch}' not found (status {response.status})")
-        return []
+    async def resolve_ref(self, owner: str, repo: str, ref: str = "") -> tuple[str, str]:
+        """
+        Resolve a branch, tag or SHA (default branch if empty) to a commit SHA.
+        Returns (ref name, commit sha); ("", "") if nothing resolves.
+
+        A ref taken from a URL may carry a file path ("feature/x/src/app.py"), so
+        its prefixes are tried longest first. Git forbids a branch "feature" next
+        to a branch "feature/x", but a tag "feature" can coexist with that branch,
+        so the longest prefix that resolves is the one the URL meant.
+        """
+        first = ref.split("/", 1)[0]
+        if COMMIT_SHA_RE.fullmatch(first):
+            return first, first.lower()
+        if not ref:
+            ref = await self.get_default_branch(owner, repo)
+            if not ref:
+                return "", ""
+            candidates = [ref]
+        else:
+            parts = ref.split("/")
+            candidates = ["/".join(parts[:i]) for i in range(len(parts), 0, -1)]
+
+        headers = {
+            "Authorization": f"token {self.github_token}",
+            "Accept": "application/vnd.github.sha"
+        }
+        for candidate in candidates:
+            cached = _cache_get(_ref_cache, (owner, repo, candidate))
+            if cached:
+                return candidate, cached
+            url = f"{self.base_url}/repos/{owner}/{repo}/commits/{candidate}"
+            status, sha = await self.get_json_conditional(url, headers, reader=lambda response: response.text())
+            if status == 200 and sha:
+                sha = sha.strip()
+                _cache_put(_ref_cache, (owner, repo, candidate), sha, GITHUB_REF_CACHE_TTL)
+                return candidate, sha
+        return "", ""
+
+    async def get_json_conditional(self, url: str, headers: dict, reader=None):
+        """
+        GET a JSON resource with If-None-Match. Returns (status, data); a 304 is
+        answered from the local ETag cache and reported as 200.
+        `reader(response)` replaces response.json() for bodies parsed incrementally.
+        """
+        cached = _etag_cache.get(url)
+        if cached:
+            headers = {**headers, "If-None-Match": cached[0]}
+
+        async with await github_scheduler.get(url, self.priority, headers=headers) as response:
+            if response.status == 304 and cached:
+                return 200, cached[1]
+            if response.status != 200:
+                return response.status, None
+            data = await reader(response) if reader else await response.json()
+            etag = response.headers.get("ETag")
+            if etag:
+                _etag_cache.put(url, etag, data, response.content.total_bytes)
+            return 200, data
+
+    async def _read_tree(self, response) -> dict:
+        """
+        Parse a git/trees body as it streams in, keeping only the fields we use
+        """
+        parser = TreeStreamParser()
+        entries = []
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            entries.extend(parser.feed(chunk))
+        entries.extend(parser.feed(b"", final=True))
+        return {"sha": parser.sha, "tree": entries, "truncated": parser.truncated}
+
+    async def _walk_truncated_tree(self, owner: str, repo: str, tree_sha: str, partial: list, headers: dict) -> list:
+        """
+        GitHub truncates recursive listings of very large trees. Rebuild the listing
+        breadth-first from subtrees (shallow directories first) within
+        GITHUB_TREE_MAX_SUBTREE_REQUESTS; entries from the truncated listing fill
+        in whatever the budget did not reach.
+        """
+        async def fetch(sha: str, recursive: bool) -> Optional[dict]:
+            suffix = "?recursive=1" if recursive else ""
+            url = f"{self.base_url}/repos/{owner}/{repo}/git/trees/{sha}{suffix}"
+            async with semaphore:
+                status, data = await self.get_json_conditional(url, headers, reader=self._read_tree)
+            return data if status == 200 else None
+
+        semaphore = asyncio.Semaphore(GITHUB_FETCH_CONCURRENCY)
+        budget = GITHUB_TREE_MAX_SUBTREE_REQUESTS
+
+        root = await fetch(tree_sha, recursive=False)
+        budget -= 1
+        if root is None:
+            return partial
+        entries = list(root["tree"])
+        pending = subtree_candidates(entries)
+
+        while pending and budget > 0:
+            batch, pending = pending[:budget], pending[budget:]
+            budget -= len(batch)
+            results = await asyncio.gather(*(fetch(sha, recursive=True) for _, sha in batch))
+            for (prefix, sha), data in zip(batch, results):
+                if data is None:
+                    continue
+                subtree = join_subtree_paths(prefix, data["tree"])
+                if data["truncated"]:
+                    # Still too big: keep its direct children and walk one level deeper
+                    subtree = [entry for entry in subtree if "/" not in entry["path"][len(prefix) + 1:]]
+                    pending.extend(subtree_candidates(subtree))
+                entries.extend(subtree)
+            pending.sort(key=lambda item: (item[0].count("/"), item[0]))
+
+        print(f"🌲 Rebuilt truncated tree from subtrees: {len(entries)} entries "
+              f"({GITHUB_TREE_MAX_SUBTREE_REQUESTS - budget} requests)")
+        return merge_entries(entries, partial)
+
+    async def get_tree(self, owner: str, repo: str, ref: str = "") -> tuple[str, list]:
+        """
+        Returns (tree_sha, tree entries) for ref (default branch if empty), and pins
+        the fetcher to the resolved commit; ("", []) if the ref cannot be read
+        """
+        ref_name, commit_sha = await self.resolve_ref(owner, repo, ref)
+        if not commit_sha:
+            print(f"⚠️ Could not resolve ref '{ref or 'default branch'}' for {owner}/{repo}")
+            return "", []
+        self.ref, self.ref_name = commit_sha, ref_name
+
+        headers = {
+            "Authorization": f"token {self.github_token}",
+            "Accept": "application/vnd.github.v3+json"
+        }
+        url = f"{self.base_url}/repos/{owner}/{repo}/git/trees/{commit_sha}?recursive=1"
+        print(f"🔍 Fetching tree at '{ref_name}' ({commit_sha[:7]})...")
+        status, data = await self.get_json_conditional(url, headers, reader=self._read_tree)
+        if status != 200:
+            print(f"⚠️ Tree for {commit_sha[:7]} not readable (status {status})")
+            return "", []
+        tree = data["tree"]
+        if data["truncated"]:
+            print(f"⚠️ Tree listing truncated at {len(tree)} entries, walking subtrees...")
+            tree = await self._walk_truncated_tree(owner, repo, data["sha"], tree, headers)
+        print(f"✅ Found {len(tree)} files in repository")
+        return data["sha"], tree
 
     async def get_file(self, owner: str, repo: str, path: str) -> str:
         headers = {
@@ -47,54 +297,175 @@ class SimpleGitHubFetcher:
             "Accept": "application/vnd.github.v3.raw"
         }
         url = f"{self.base_url}/repos/{owner}/{repo}/contents/{path}"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    return await response.text()
+        params = {"ref": self.ref} if self.ref else None
+        async with await github_scheduler.get(url, self.priority, headers=headers, params=params) as response:
+            if response.status == 200:
+                return await response.text()
         return ""
 
+    async def iter_archive_files(self, owner: str, repo: str, paths: list) -> AsyncGenerator[tuple, None]:
+        """
+        Download the repository tarball once and stream-extract only `paths`
+        in memory, yielding (path, content) as each member completes.
+        Raises ArchiveUnavailable if the download fails or exceeds the byte budget.
+        """
+        headers = {
+            "Authorization": f"token {self.github_token}",
+            "Accept": "application/vnd.github.v3+json"
+        }
+        wanted = set(paths)
+        extractor = TarStreamExtractor(
+            wanted.__contains__,
+            max_file_bytes=GITHUB_ARCHIVE_MAX_FILE_BYTES,
+            max_total_bytes=GITHUB_ARCHIVE_MAX_BYTES
+        )
+        ref_suffix = f"/{self.ref}" if self.ref else ""
+        url = f"{self.base_url}/repos/{owner}/{repo}/tarball{ref_suffix}"
+        # Archives can take longer than the pool's default total timeout
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=30)
+
+        async with await github_scheduler.get(url, self.priority, headers=headers, timeout=timeout) as response:
+            if response.status != 200:
+                raise ArchiveUnavailable(f"tarball request failed with status {response.status}")
+            found = set()
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                for path, data in extractor.feed(chunk):
+                    # A path can appear more than once in a tar; the first copy is the one yielded
+                    if path in found:
+                        continue
+                    found.add(path)
+                    yield path, data.decode("utf-8", "replace")
+                # Stop downloading once everything we need has been seen
+                if len(found) == len(wanted) or extractor.finished:
+                    break
+
 
 class GitHubRepoAnalyzer:
-    def __init__(self, github_token: str, ollama_model: str = "phi3:mini"):
+    def __init__(self, github_token: str, ollama_model: str = "phi3:mini", fetch_concurrency: int = GITHUB_FETCH_CONCURRENCY,
+                 fetch_mode: str = GITHUB_FETCH_MODE, priority: int = INTERACTIVE,
+                 embed_model: Optional[str] = FILE_INDEX_EMBED_MODEL, summarize: bool = True,
+                 llm_semaphore: Optional[asyncio.Semaphore] = None):
         self.github_token = github_token
         self.ollama_model = ollama_model
-        self.fetcher = SimpleGitHubFetcher(github_token)
+        self.fetch_concurrency = max(1, fetch_concurrency)
+        self.fetch_mode = fetch_mode
+        self.max_files = GITHUB_ARCHIVE_MAX_FILES if fetch_mode == "archive" else CONTENTS_MAX_FILES
+        self.fetcher = SimpleGitHubFetcher(github_token, priority=priority)
         self.ollama_client = ollama_client  # Use the global async client
+        self.cacheable = False
+        self.profile: Optional[dict] = None  # RepoProfile.to_dict() of the last analysis
+        self.embed_model = embed_model
+        self.context_files: list = []  # (path, head) of the most deployment-relevant source files
+        self.file_index_key: Optional[list] = None
+        self.summarize = summarize  # False => stop after the deterministic profile (no LLM call)
+        self.llm_semaphore = llm_semaphore  # caps concurrent summaries across analyzers (batch runs)
+
+    async def _fetch_files(self, owner: str, repo: str, paths: list) -> AsyncGenerator[tuple, None]:
+        """
+        Fetch files and yield (path, content) in completion order: from a single
+        streamed tarball in archive mode, otherwise concurrently through the
+        contents API (bounded by GITHUB_FETCH_CONCURRENCY)
+        """
+        remaining = dict.fromkeys(paths)  # ordered set; also drops duplicate paths
+        if self.fetch_mode == "archive":
+            try:
+                async for path, content in self.fetcher.iter_archive_files(owner, repo, list(remaining)):
+                    if path not in remaining:
+                        continue
+                    del remaining[path]
+                    yield path, content
+                # Anything not in the archive does not exist at this ref
+                for path in remaining:
+                    yield path, ""
+                return
+            except (ArchiveUnavailable, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"⚠️ Archive fetch failed ({str(e)}), falling back to contents API for {len(remaining)} files")
+
+        semaphore = asyncio.Semaphore(self.fetch_concurrency)
+
+        async def fetch(path: str) -> tuple:
+            async with semaphore:
+                print(f"📖 Fetching file: {path}")
+                try:
+                    return path, await self.fetcher.get_file(owner, repo, path)
+                except Exception as e:
+                    print(f"⚠️ Failed to fetch {path}: {str(e)}")
+                    return path, ""
+
+        tasks = [asyncio.create_task(fetch(path)) for path in remaining]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Client went away mid-stream: don't leave fetches running
+            for task in tasks:
+                task.cancel()
 
     async def analyze_stream(self, repo_url: str) -> AsyncGenerator[str, None]:
         """
-        Streaming version that yields progress and results line by line
+        Streaming version that yields progress and results line by line.
+
+        Results are cached per (owner, repo, tree SHA, model): an unchanged repo
+        costs one conditional tree request and streams the stored analysis, and
+        concurrent requests for the same repo share a single run.
         """
         print(f"🚀 Starting analysis for: {repo_url}")
         yield "🔍 Analyzing repository structure...\n"
         
         try:
-            owner, repo = self.fetcher.parse_url(repo_url)
-            print(f"📦 Parsed repo: {owner}/{repo}")
+            owner, repo, ref = self.fetcher.parse_url(repo_url)
+            print(f"📦 Parsed repo: {owner}/{repo}" + (f" (ref {ref})" if ref else ""))
             yield f"📦 Repository: **{owner}/{repo}**\n\n"
             
-            tree = await self.fetcher.get_tree(owner, repo)
-            if not tree:
+            tree_sha, tree = await self.fetcher.get_tree(owner, repo, ref)
+            if tree:
+                yield f"📌 Pinned to `{self.fetcher.ref_name}` @ `{self.fetcher.ref[:7]}`\n\n"
+            else:
                 error_msg = "❌ Unable to fetch repository structure. Check if the repo is public and the token is valid.\n"
                 print(error_msg)
                 yield error_msg
                 return
-            
+        except Exception as e:
+            error_msg = f"❌ Error during analysis: {str(e)}\n"
+            print(error_msg)
+            yield error_msg
+            return
+
+        if not tree_sha:
+            # Nothing stable to key on: analyze without caching
+            async for chunk in self._analyze_tree(owner, repo, tree):
+                yield chunk
+            return
+
+        cache_key = (owner, repo, tree_sha, self.ollama_model if self.summarize else "profile-only")
+        if repo_analysis_cache.get(cache_key) is not None:
+            print(f"⚡ Cache hit for {owner}/{repo}@{tree_sha[:7]}")
+            yield f"⚡ Repository unchanged since last analysis (tree `{tree_sha[:7]}`), reusing results\n\n"
+
+        metadata = {}
+        async for chunk in repo_analysis_cache.stream(
+            cache_key,
+            lambda: self._analyze_tree(owner, repo, tree),
+            lambda: self.cacheable,
+            lambda: {"profile": self.profile, "context_files": self.context_files, "file_index": self.file_index_key},
+            metadata_sink=metadata
+        ):
+            yield chunk
+        self.profile = metadata.get("profile")
+        self.context_files = metadata.get("context_files") or []
+        self.file_index_key = metadata.get("file_index")
+
+    async def _analyze_tree(self, owner: str, repo: str, tree: list) -> AsyncGenerator[str, None]:
+        """
+        Fetch the config files from the tree and stream the LLM analysis
+        """
+        self.cacheable = False
+        try:
             yield f"✅ Found {len(tree)} files\n"
             yield "📥 Fetching configuration files...\n\n"
             
-            config_files = [
-                "package.json", "package-lock.json", "yarn.lock",
-                "requirements.txt", "pyproject.toml", "setup.py", "Pipfile",
-                "pom.xml", "build.gradle", "build.gradle.kts",
-                "go.mod", "Cargo.toml", "composer.json", "Gemfile",
-                "Dockerfile", "docker-compose.yml", "docker-compose.yaml",
-                ".env.example", ".env.sample",
-                "next.config.js", "next.config.ts", "angular.json", "vue.config.js",
-                "tsconfig.json", "vercel.json", "netlify.toml"
-            ]
-
-            matched_files = [item["path"] for item in tree if item["type"] == "blob" and any(f in item["path"] for f in config_files)]
+            # Exact basename matches, root manifests first; lockfiles are never fetched
+            matched_files = match_config_files(tree)
             has_env_file = any(".env" in f for f in matched_files)
             self.missing_env_flag = not has_env_file
             
@@ -105,99 +476,151 @@ class GitHubRepoAnalyzer:
                 return
 
             yield f"📋 Found {len(matched_files)} configuration files:\n"
-            for f in matched_files[:10]:
+            selected_files = matched_files[:self.max_files]
+            for f in selected_files:
                 yield f"  - {f}\n"
             yield "\n"
 
-            files_content = {}
-            for idx, file_path in enumerate(matched_files[:10], 1):
-                print(f"📖 Fetching file {idx}/{min(len(matched_files), 10)}: {file_path}")
-                yield f"📖 Reading {file_path}...\n"
-                await asyncio.sleep(0.01)  # Allow UI to update
-                
-                content = await self.fetcher.get_file(owner, repo, file_path)
+            # Source files for the embedding index ride along in the same fetch
+            index_candidates = candidate_files(tree) if self.embed_model and self.fetcher.ref else []
+            head_paths = index_candidates[:FILE_INDEX_HEAD_FILES]
+            wanted = set(selected_files)
+
+            fetched, heads = {}, {}
+            yield f"📖 Reading {len(selected_files)} files...\n"
+            async for file_path, content in self._fetch_files(owner, repo, selected_files + head_paths):
+                if file_path not in wanted:
+                    if content:
+                        heads[file_path] = content[:FILE_INDEX_HEAD_CHARS]
+                    continue
                 if content:
-                    files_content[file_path] = content[:2000] + "\n...(truncated)" if len(content) > 2000 else content
-                    yield f"   ✅ Done\n"
+                    fetched[file_path] = content
+                    yield f"   ✅ {file_path}\n"
                 else:
-                    yield f"   ⚠️ Could not read\n"
-                
-                await asyncio.sleep(0.01)
+                    yield f"   ⚠️ Could not read {file_path}\n"
+
+            # Keep the prompt order stable regardless of completion order
+            files_content = {path: fetched[path] for path in selected_files if path in fetched}
 
             if not files_content:
                 yield "⚠️ Could not read any configuration files\n"
                 return
 
-            yield "\n🤖 Analyzing with AI...\n\n"
-            print(f"🤖 Sending {len(files_content)} files to Ollama for analysis")
+            # Deterministic facts first: parsed locally in milliseconds
+            profile = build_repo_profile(files_content)
+            self.profile = profile.to_dict()
+            yield "\n## 🧾 Repository Profile\n\n"
+            yield format_profile(profile)
 
-            context = "\n".join([
-                f"===== {filename} =====\n{content}" for filename, content in files_content.items()
-            ])
+            self.context_files, self.file_index_key = [], None
+            if index_candidates:
+                index_key = (owner, repo, self.fetcher.ref, self.embed_model)
+                fetcher = self.fetcher  # pinned to the indexed commit
+                fetch_head = lambda path: fetcher.get_file(owner, repo, path)
+                if await file_index_cache.get_or_build(index_key, index_candidates, heads, fetch_head) is not None:
+                    self.file_index_key = list(index_key)
+                    self.context_files = await relevant_files(index_key, DEPLOYMENT_QUERY, FILE_INDEX_TOP_K)
+                    if self.context_files:
+                        yield "\n🧭 Relevant source files: " + ", ".join(f"`{path}`" for path, _ in self.context_files) + "\n"
+
+            if not self.summarize:
+                yield "\n✅ Profile complete!\n"
+                self.cacheable = len(files_content) == len(selected_files)
+                return
 
-            prompt = f"""
-You are a code analysis assistant. Your task is to extract **factual information only** from the repository content below.
-DO NOT guess, infer, or describe what "might" be there — report only what you can confirm from file names or visible file contents.
+            yield "\n🤖 Summarizing with AI...\n\n"
+            print(f"🤖 Sending profile of {len(files_content)} files to Ollama for summary")
 
-Analyze the repository context and return:
+            # Long lists last, so truncation drops the tail of the dependency list first
+            profile_for_prompt = {k: v for k, v in self.profile.items() if k not in ("dependencies", "config_files")}
+            profile_for_prompt["config_files"] = self.profile["config_files"]
+            profile_for_prompt["dependencies"] = self.profile["dependencies"]
+
+            # Files the local parsers do not understand are passed on as excerpts
+            unparsed = sorted(
+                (path for path in files_content if path.rsplit("/", 1)[-1] not in PARSERS),
+                key=file_rank
+            )
+
+            prompt_template = """
+You are a code analysis assistant. Below is a repository profile that was extracted deterministically from the repository's manifest files.
+Summarize it. DO NOT add anything that is not in the profile or the excerpts — no guesses about what "might" be there.
+
+Return:
 
 Languages:
-- (List each language explicitly mentioned or implied by file types, e.g. .py → Python, .java → Java)
+- (From "runtimes" and "runtime_versions")
 
 Frameworks & Libraries:
-- (Extract from dependency or build files only — requirements.txt, package.json, pom.xml, build.gradle, etc. Include versions if listed.)
+- (From "frameworks" and the most important entries of "dependencies")
 
 Configuration Files:
-- (List only config files actually present, e.g., package.json, pom.xml, tsconfig.json, docker-compose.yml)
+- (From "config_files")
 
 Environment Variables:
-- (List environment variables explicitly present in .env, .env.example, config.yml/json, or referenced in code. 
-If none are visible, output "None found" without speculation.)
+- (From "env_vars". If the list is empty, output "None found" without speculation.)
 
 Rules:
 - Do not explain anything.
 - Do not repeat file names multiple times.
-- If a .env, .env.example, or config file with variables is not present, list “None found” and add a final message asking the user to upload or provide the necessary environment variables manually.
-- Do not include Docker, Terraform, AWS, or cloud infra unless specified in a file.
+- If "env_vars" is empty, list “None found” and add a final message asking the user to upload or provide the necessary environment variables manually.
+- Do not include Docker, Terraform, AWS, or cloud infra unless it appears in the profile.
 - Keep your answer factual and concise.
 
-Repository Context:
-{context}
+Repository Profile (JSON):
+{profile}
+
+Other configuration files (excerpts):
+{excerpts}
+
+Relevant source files (excerpts):
+{sources}
 """
+            packed = PromptPacker("repo_analyzer", reserve_output=ANALYSIS_NUM_PREDICT).pack(prompt_template, [
+                PromptSection("profile", json.dumps(profile_for_prompt, indent=1), share=0.6, priority=0),
+                PromptSection("excerpts", items=[(path, files_content[path]) for path in unparsed], share=0.2, priority=1),
+                PromptSection("sources", items=self.context_files, share=0.15, priority=2),
+            ])
+            prompt = prompt_template.format(
+                profile=packed["profile"], excerpts=packed["excerpts"] or "None", sources=packed["sources"] or "None"
+            )
 
             # Use TRUE async streaming from Ollama
             print("⏳ Streaming response from Ollama...")
             yield "---\n\n## 📊 Analysis Results:\n\n"
             
-            # Stream using AsyncClient - same as chat_agent
-            response = await self.ollama_client.chat(
-                model=self.ollama_model,
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": "You are a code analysis assistant. Extract only factual information from repository files."
-                    },
-                    {
-                        "role": "user", 
-                        "content": prompt
+            async with self.llm_semaphore or nullcontext():
+                # Stream using AsyncClient - same as chat_agent
+                call_metrics = LLMCallMetrics("repo_analyzer", self.ollama_model)
+                response = self.ollama_client.chat(
+                    model=self.ollama_model,
+                    messages=[
+                        {
+                            "role": "system", 
+                            "content": "You are a code analysis assistant. Summarize only the facts given in the repository profile."
+                        },
+                        {
+                            "role": "user", 
+                            "content": prompt
+                        }
+                    ],
+                    stream=True,
+                    options={
+                        "temperature": 0.1,
+                        "top_p": 0.9,
+                        "num_predict": ANALYSIS_NUM_PREDICT,
+                        "num_ctx": OLLAMA_NUM_CTX
                     }
-                ],
-                stream=True,
-                options={
-                    "temperature": 0.1,
-                    "top_p": 0.9,
-                    "num_predict": 500
-                }
-            )
-            
-            # Stream tokens as they arrive
-            token_count = 0
-            async for chunk in response:
-                if 'message' in chunk and 'content' in chunk['message']:
-                    token = chunk['message']['content']
-                    yield token
-                    token_count += 1
+                )
             
+                # Stream tokens as they arrive
+                token_count = 0
+                async for chunk in call_metrics.track(response):
+                    if 'message' in chunk and 'content' in chunk['message']:
+                        token = chunk['message']['content']
+                        yield token
+                        token_count += 1
+
             print(f"✅ Streamed {token_count} tokens from Ollama")
             
             yield "\n✅ Analysis complete!\n"
@@ -205,7 +628,9 @@ Repository Context:
                 yield "\n `.env` file not found in the repository.\n"
                 yield "Please upload your `.env` file to continue with deployment.\n"
                 
+            self.cacheable = len(files_content) == len(selected_files)
             print("✅ Analysis streaming completed")
+            print(f"🔌 HTTP pool: {http_client.stats()}")
             
         except Exception as e:
             error_msg = f"❌ Error during analysis: {str(e)}\n"
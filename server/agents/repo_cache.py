@@ -0,0 +1,145 @@
+import os
+import asyncio
+from collections import OrderedDict
+from typing import AsyncGenerator, Callable, Dict, List, Optional, Tuple
+from core.metrics import registry
+
+REPO_CACHE_MAX_ENTRIES = int(os.getenv("REPO_CACHE_MAX_ENTRIES", "256"))
+REPO_CACHE_MAX_BYTES = int(os.getenv("REPO_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+repo_cache_requests = registry.counter(
+    "repo_analysis_cache_requests_total", "Repository analysis lookups", ("result",)
+)
+
+# (owner, repo, tree_sha, model)
+CacheKey = Tuple[str, str, str, str]
+
+
+class _InFlightAnalysis:
+    """
+    A running analysis whose chunks are buffered so any number of requests can
+    replay what was produced so far and then follow along live
+    """
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.metadata: dict = {}
+        self.done = False
+        self.cacheable = False
+        self.changed = asyncio.Condition()
+        self.task: Optional[asyncio.Task] = None
+
+    async def publish(self, chunk: str):
+        async with self.changed:
+            self.chunks.append(chunk)
+            self.changed.notify_all()
+
+    async def finish(self):
+        async with self.changed:
+            self.done = True
+            self.changed.notify_all()
+
+    async def follow(self) -> AsyncGenerator[str, None]:
+        position = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: self.done or position < len(self.chunks))
+                pending = self.chunks[position:]
+                finished = self.done
+            for chunk in pending:
+                yield chunk
+            position += len(pending)
+            if finished and position >= len(self.chunks):
+                return
+
+
+class RepoAnalysisCache:
+    """
+    LRU cache of finished analyses keyed by (owner, repo, tree SHA, model), with
+    single-flight de-duplication of concurrent analyses of the same key
+    """
+    def __init__(self, max_entries: int = REPO_CACHE_MAX_ENTRIES, max_bytes: int = REPO_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (chunks, metadata such as the repo profile)
+        self._entries: "OrderedDict[CacheKey, Tuple[List[str], dict]]" = OrderedDict()
+        self._sizes: Dict[CacheKey, int] = {}
+        self.total_bytes = 0
+        self._in_flight: Dict[CacheKey, _InFlightAnalysis] = {}
+
+    def get(self, key: CacheKey) -> Optional[Tuple[List[str], dict]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: CacheKey, chunks: List[str], metadata: Optional[dict] = None):
+        if key in self._entries:
+            self.total_bytes -= self._sizes.pop(key)
+        size = sum(len(chunk) for chunk in chunks)
+        self._entries[key] = (chunks, metadata or {})
+        self._entries.move_to_end(key)
+        self._sizes[key] = size
+        self.total_bytes += size
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes):
+            evicted, _ = self._entries.popitem(last=False)
+            self.total_bytes -= self._sizes.pop(evicted)
+
+    async def _produce(self, key: CacheKey, flight: _InFlightAnalysis,
+                       analysis_factory: Callable[[], AsyncGenerator[str, None]],
+                       is_cacheable: Callable[[], bool],
+                       metadata_factory: Callable[[], dict]):
+        try:
+            async for chunk in analysis_factory():
+                await flight.publish(chunk)
+            flight.cacheable = is_cacheable()
+            flight.metadata = metadata_factory() or {}
+        except Exception as e:
+            print(f"❌ Shared analysis failed for {key[0]}/{key[1]}: {str(e)}")
+            await flight.publish(f"❌ Error during analysis: {str(e)}\n")
+        finally:
+            if flight.cacheable:
+                self.put(key, list(flight.chunks), flight.metadata)
+            self._in_flight.pop(key, None)
+            await flight.finish()
+
+    async def stream(self, key: CacheKey,
+                     analysis_factory: Callable[[], AsyncGenerator[str, None]],
+                     is_cacheable: Callable[[], bool] = lambda: True,
+                     metadata_factory: Callable[[], dict] = dict,
+                     metadata_sink: Optional[dict] = None) -> AsyncGenerator[str, None]:
+        """
+        Stream the analysis for key: from the cache if present, by attaching to an
+        in-flight run for the same key, or by starting a new one. Once the stream
+        ends, the run's metadata is copied into metadata_sink.
+
+        The run itself executes in its own task so it completes (and is cached)
+        even if the request that started it disconnects.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            repo_cache_requests.inc(result="hit")
+            chunks, metadata = cached
+            for chunk in chunks:
+                yield chunk
+            if metadata_sink is not None:
+                metadata_sink.update(metadata)
+            return
+
+        flight = self._in_flight.get(key)
+        if flight is not None:
+            repo_cache_requests.inc(result="shared")
+        else:
+            repo_cache_requests.inc(result="miss")
+            flight = _InFlightAnalysis()
+            self._in_flight[key] = flight
+            flight.task = asyncio.create_task(
+                self._produce(key, flight, analysis_factory, is_cacheable, metadata_factory)
+            )
+
+        async for chunk in flight.follow():
+            yield chunk
+        if metadata_sink is not None:
+            metadata_sink.update(flight.metadata)
+
+
+repo_analysis_cache = RepoAnalysisCache()
@@ -0,0 +1,151 @@
+import re
+import json
+import codecs
+from typing import Dict, Iterator, List, Tuple
+
+# basename -> rank; lower ranks are more useful to the analysis (manifests first)
+CONFIG_FILE_PRIORITY: Dict[str, int] = {name: rank for rank, name in enumerate([
+    "package.json", "requirements.txt", "pyproject.toml", "pom.xml",
+    "build.gradle", "build.gradle.kts", "go.mod", "Cargo.toml", "Gemfile",
+    "composer.json", "Pipfile", "setup.py",
+    "Dockerfile", "docker-compose.yml", "docker-compose.yaml",
+    ".env.example", ".env.sample", "Procfile",
+    "next.config.js", "next.config.ts", "angular.json", "vue.config.js",
+    "tsconfig.json", "vercel.json", "netlify.toml",
+])}
+
+# Directories whose manifests describe dependencies, not the app
+IGNORED_DIRS = {"node_modules", "vendor", ".git", "bower_components", "site-packages", "__pycache__"}
+
+# Keys kept from each tree entry (GitHub also sends url and mode)
+ENTRY_KEYS = ("path", "type", "sha", "size")
+
+
+def _basename(path: str) -> str:
+    return path.rpartition("/")[2]
+
+
+def is_ignored(path: str) -> bool:
+    return any(part in IGNORED_DIRS for part in path.split("/")[:-1])
+
+
+def match_config_files(tree: List[dict], priority: Dict[str, int] = CONFIG_FILE_PRIORITY) -> List[str]:
+    """
+    Exact-basename lookup of config files, ranked by path depth (root manifests
+    first), then by file priority, then by path
+    """
+    matched = []
+    for item in tree:
+        if item.get("type") != "blob":
+            continue
+        path = item["path"]
+        rank = priority.get(_basename(path))
+        if rank is None or is_ignored(path):
+            continue
+        matched.append((path.count("/"), rank, path))
+    matched.sort()
+    return [path for _, _, path in matched]
+
+
+class TreeStreamParser:
+    """
+    Incremental parser for GitHub's git/trees response.
+
+    Bytes are fed as they arrive; entries of the "tree" array are decoded one at a
+    time with raw_decode and trimmed to ENTRY_KEYS, so the full response body is
+    never held in memory at once. The top-level "sha" and "truncated" values are
+    picked up before and after the array.
+    """
+    _SHA_RE = re.compile(r'"sha"\s*:\s*"([^"]+)"')
+    _TREE_START_RE = re.compile(r'"tree"\s*:\s*\[')
+    _TRUNCATED_RE = re.compile(r'"truncated"\s*:\s*(true|false)')
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._state = "prefix"  # prefix -> array -> suffix
+        self.sha = ""
+        self.truncated = False
+        self.count = 0
+
+    def feed(self, data: bytes, final: bool = False) -> Iterator[dict]:
+        self._buffer += self._decoder.decode(data, final)
+        yield from self._drain(final)
+
+    def _drain(self, final: bool) -> Iterator[dict]:
+        if self._state == "prefix":
+            start = self._TREE_START_RE.search(self._buffer)
+            if not start:
+                return
+            sha = self._SHA_RE.search(self._buffer, 0, start.start())
+            if sha:
+                self.sha = sha.group(1)
+            self._buffer = self._buffer[start.end():]
+            self._state = "array"
+
+        if self._state == "array":
+            buffer = self._buffer
+            position, length = 0, len(buffer)
+            while True:
+                while position < length and buffer[position] in " \t\r\n,":
+                    position += 1
+                if position >= length:
+                    break
+                if buffer[position] == "]":
+                    position += 1
+                    self._state = "suffix"
+                    break
+                try:
+                    item, end = self._json.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    break  # entry split across chunks: wait for more data
+                position = end
+                self.count += 1
+                yield {key: item[key] for key in ENTRY_KEYS if key in item}
+            self._buffer = buffer[position:]
+
+        if self._state == "suffix":
+            truncated = self._TRUNCATED_RE.search(self._buffer)
+            if truncated:
+                self.truncated = truncated.group(1) == "true"
+                self._buffer = ""
+            elif len(self._buffer) > 4096:
+                # Nothing interesting can be this far away; keep the tail only
+                self._buffer = self._buffer[-64:]
+
+
+def join_subtree_paths(prefix: str, entries: List[dict]) -> List[dict]:
+    """
+    Copies of a subtree listing's entries with paths relative to the repo root.
+    The originals are left alone: they are the parsed bodies held in the ETag cache.
+    """
+    if not prefix:
+        return list(entries)
+    return [{**entry, "path": f"{prefix}/{entry['path']}"} for entry in entries]
+
+
+def subtree_candidates(entries: List[dict]) -> List[Tuple[str, str]]:
+    """
+    (path, sha) of directories worth walking, shallowest first
+    """
+    directories = [
+        (entry["path"], entry["sha"]) for entry in entries
+        if entry.get("type") == "tree" and entry.get("sha")
+        and _basename(entry["path"]) not in IGNORED_DIRS and not is_ignored(entry["path"])
+    ]
+    directories.sort(key=lambda item: (item[0].count("/"), item[0]))
+    return directories
+
+
+def merge_entries(*groups: List[dict]) -> List[dict]:
+    seen = set()
+    merged = []
+    for group in groups:
+        for entry in group:
+            if entry["path"] not in seen:
+                seen.add(entry["path"])
+                merged.append(entry)
+    return merged
@@ -1,10 +1,15 @@
 import os
-import re
 from dotenv import load_dotenv
 from core.context_vars import user_id_ctx
+from core.session_store import session_store
 from agents.chat_agent import stream_assistant_reply
 from agents.repo_analyzer import GitHubRepoAnalyzer
-from agents.terraform_agent import terraform_generator
+from agents.terraform_agent import terraform_generator, speculate_terraform
+from agents.terraform_speculation import terraform_speculator
+from agents.intent_classifier import (
+    intent_classifier, GITHUB_URL_RE,
+    REPO_ANALYZER, TERRAFORM_GENERATOR, DEPLOYMENT_VALIDATOR
+)
 
 load_dotenv()
 
@@ -14,37 +19,43 @@ OLLAMA_MODEL = os.getenv("OLLAMA_CHAT_MODEL")
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL")
 
 # === Session Context (tracks last agent used per chat) ===
-SESSION_CONTEXT = {
-    # Structure: {
-    #   "chat_id": {
-    #       "last_agent": "agent_name",
-    #       "repo_data": {...},  # Store full analysis here
-    #       "repo_url": "https://...",
-    #   }
-    # }
-}
+# Stored in core.session_store (bounded in-process LRU/TTL, or Redis when
+# SESSION_STORE_URL is set so all workers share it). Structure per chat_id:
+#   {
+#       "last_agent": "agent_name",
+#       "repo_data": {...},  # Store full analysis here
+#       "repo_url": "https://...",
+#       "terraform_config": "...",
+#   }
 
 # === Helper Functions ===
 def is_github_url(text: str) -> bool:
     """Check if text contains a GitHub URL"""
-    return bool(re.search(r"https://github\.com/[^\s)]+", text))
+    return bool(GITHUB_URL_RE.search(text))
 
 def extract_github_url(text: str) -> str:
     """Extract GitHub URL from text"""
-    match = re.search(r"https://github\.com/[^\s)]+", text)
+    match = GITHUB_URL_RE.search(text)
     return match.group(0) if match else ""
 
 # === Main Router ===
-async def route_to_agent(user_input: str, chat_id: str = "default"):
+async def route_to_agent(user_input: str, chat_id: str = "default", regenerate: bool = False):
     """
     Smart routing logic that determines which agent to use.
+    `regenerate` skips reuse of earlier identical terraform generations.
     Returns: (agent_name, response_generator)
     """
     print(f"🎯 Routing input: {user_input[:100]}...")
+
+    intent = await intent_classifier.classify(user_input)
+    print(f"🧭 Intent: {intent}")
+    if intent.intent != TERRAFORM_GENERATOR:
+        # Speculative generations give way when the LLM has no slot to spare
+        await terraform_speculator.make_room()
     
     # === Priority 1: GitHub URL Detection ===
-    if is_github_url(user_input):
-        github_url = extract_github_url(user_input)
+    if intent.intent == REPO_ANALYZER:
+        github_url = intent.github_url
         print(f"✅ Detected GitHub URL: {github_url}")
         print(f"🔀 Routing to: repo_analyzer")
         
@@ -55,18 +66,16 @@ async def route_to_agent(user_input: str, chat_id: str = "default"):
                 ollama_model=OLLAMA_MODEL
             )
             
-            # Initialize storage for this chat (MOVED BEFORE ASSIGNMENT)
-            if chat_id not in SESSION_CONTEXT:
-                SESSION_CONTEXT[chat_id] = {}
-            
-            # Now it's safe to assign properties
-            SESSION_CONTEXT[chat_id]["last_agent"] = "repo_analyzer"
-            SESSION_CONTEXT[chat_id]["repo_url"] = github_url
-            SESSION_CONTEXT[chat_id]["repo_data"] = {
+            repo_data = {
                 "files": [],
                 "analysis": "",
                 "dependencies": {}
             }
+            await session_store.update(chat_id, {
+                "last_agent": "repo_analyzer",
+                "repo_url": github_url,
+                "repo_data": repo_data
+            })
             
             full_response = ""
             chunk_count = 0
@@ -76,33 +85,37 @@ async def route_to_agent(user_input: str, chat_id: str = "default"):
                 yield chunk
             
             # Store the complete analysis
-            SESSION_CONTEXT[chat_id]["repo_data"]["full_analysis"] = full_response
+            repo_data["full_analysis"] = full_response
+            repo_data["profile"] = analyzer.profile
+            repo_data["context_files"] = analyzer.context_files
+            repo_data["file_index"] = analyzer.file_index_key
+            repo_data["repo_url"] = github_url
+            repo_data["commit"] = analyzer.fetcher.ref
+            await session_store.update(chat_id, {"repo_data": repo_data})
             
             print(f"✅ repo_stream completed: {chunk_count} chunks")
             print(f"💾 Stored analysis for chat_id: {chat_id}")
+
+            # The usual next message asks for terraform: start it now if the LLM is idle
+            try:
+                await speculate_terraform(repo_data, getattr(user_id_ctx.get(), "user_id", None))
+            except Exception as e:
+                print(f"⚠️ Speculative terraform not started: {str(e)}")
         
         return "repo_analyzer", repo_stream()
     
-    # === Priority 2: Terraform Keywords ===
-    terraform_keywords = [
-        'terraform', 'infrastructure', 'ecs', 'rds', 
-        'alb', 'load balancer', 'generate infra', 'deploy infrastructure',
-        'cloudformation', 'cloud formation'
-    ]
-    if any(keyword in user_input.lower() for keyword in terraform_keywords):
-        # Initialize session context if needed
-        if chat_id not in SESSION_CONTEXT:
-            SESSION_CONTEXT[chat_id] = {}
-        
+    # === Priority 2: Terraform Intent ===
+    if intent.intent == TERRAFORM_GENERATOR:
         # Check if we have repo context
-        repo_context = SESSION_CONTEXT[chat_id].get("repo_data")
+        session = await session_store.get(chat_id)
+        repo_context = session.get("repo_data")
         
         if repo_context:
             print(f"✅ Found repo context for terraform generation")
         else:
             print(f"⚠️ No repo context found - generating generic terraform")
         
-        SESSION_CONTEXT[chat_id]["last_agent"] = "terraform_generator"
+        await session_store.update(chat_id, {"last_agent": "terraform_generator"})
         print(f"🔀 Routing to: terraform_generator")
         
         async def terraform_stream():
@@ -112,30 +125,24 @@ async def route_to_agent(user_input: str, chat_id: str = "default"):
             user_context = user_id_ctx.get()
             user_id = user_context.user_id
             
-            async for chunk in terraform_generator(user_input, repo_context, chat_id=chat_id, user_id=user_id):
+            async for chunk in terraform_generator(user_input, repo_context, chat_id=chat_id, user_id=user_id,
+                                                 regenerate=regenerate):
                 chunk_count += 1
                 full_terraform += chunk
                 yield chunk
             
             # Store the terraform config for later validation/deployment
-            SESSION_CONTEXT[chat_id]["terraform_config"] = full_terraform
+            await session_store.update(chat_id, {"terraform_config": full_terraform})
             
             print(f"✅ terraform_stream completed: {chunk_count} chunks")
     
         return "terraform_generator", terraform_stream()
     
-    # === Priority 3: Deployment/Validation Keywords ===
-    deployment_keywords = [
-        'deploy', 'validate', 'check prerequisites', 'ready to deploy',
-        'deployment check', 'can i deploy', 'validate deployment'
-    ]
-    if any(keyword in user_input.lower() for keyword in deployment_keywords):
-        # Initialize session context if needed
-        if chat_id not in SESSION_CONTEXT:
-            SESSION_CONTEXT[chat_id] = {}
-        
+    # === Priority 3: Deployment/Validation Intent ===
+    if intent.intent == DEPLOYMENT_VALIDATOR:
         # Check if we have terraform config
-        if "terraform_config" in SESSION_CONTEXT[chat_id]:
+        session = await session_store.get(chat_id)
+        if "terraform_config" in session:
             print(f"🔀 Routing to: deployment_validator")
             
             async def deployment_stream():
@@ -158,10 +165,7 @@ async def route_to_agent(user_input: str, chat_id: str = "default"):
             return "chat_agent", no_terraform_stream()
     
     # === Priority 4: Default to Chat Agent ===
-    if chat_id not in SESSION_CONTEXT:
-        SESSION_CONTEXT[chat_id] = {}
-    
-    SESSION_CONTEXT[chat_id]["last_agent"] = "chat_agent"
+    await session_store.update(chat_id, {"last_agent": "chat_agent"})
     print(f"🔀 Routing to: chat_agent")
     
     async def chat_stream():
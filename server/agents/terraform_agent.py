@@ -3,61 +3,346 @@ from ollama import AsyncClient
 import os
 import asyncio
 import uuid
+import time
+import shutil
+import hashlib
 from datetime import datetime, timezone
 from chat.dynamo_instance import DynamoDBConnection
+from core.event_bus import event_bus
+from core.metrics import LLMCallMetrics, registry
+from agents.prompt_packer import PromptPacker, PromptSection, estimate_tokens, OLLAMA_NUM_CTX
+from agents.file_index import relevant_files, DEPLOYMENT_QUERY
+from agents.terraform_files import TerraformFileParser, merge_patch
+from agents.terraform_validator import validate_terraform, failing_files, format_diagnostics
+from agents.terraform_templates import select_template, render_template, TEMPLATE_VERSION
+from agents.terraform_speculation import terraform_speculator
+from jobs.job_manager import job_manager, JobQueueFull
+from jobs.artifact_store import artifact_store
+from core.env_store import env_store, parse_env
+import re
+import json
 from pathlib import Path
 import boto3
 
 OLLAMA_BASE_URL = os.getenv('OLLAMA_BASE_URL')
 OLLAMA_CHAT_MODEL = os.getenv('OLLAMA_CHAT_MODEL')
+# Scratch space while a job runs; finished files move to the artifact store
 TERRAFORM_OUTPUT_DIR = os.getenv("TERRAFORM_OUTPUT_DIR", "./generated_terraform")
+# Context kept free for the generated files
+TERRAFORM_OUTPUT_RESERVE = int(os.getenv("TERRAFORM_OUTPUT_RESERVE", "2048"))
+# Seconds between token-count progress events while a file is being generated
+TERRAFORM_PROGRESS_INTERVAL = float(os.getenv("TERRAFORM_PROGRESS_INTERVAL", "2"))
+# Rounds of re-prompting only the files that failed validation (0 disables)
+TERRAFORM_REPAIR_ATTEMPTS = int(os.getenv("TERRAFORM_REPAIR_ATTEMPTS", "1"))
+# Part of the generation cache key: bump when the prompt changes so old results are not reused
+TERRAFORM_PROMPT_VERSION = 1
 dynamo_db = DynamoDBConnection.get_instance().table
 ollama_client = AsyncClient(host=OLLAMA_BASE_URL)
 
-async def terraform_generator(user_input: str, repo_context: dict = None, chat_id: str = "default", user_id: int = None):
+generation_path = registry.counter(
+    "terraform_generation_path_total", "Terraform generations by how they were produced", ("path",)
+)
+
+# job_id -> other chats that asked for the same generation while it was running
+_waiting_chats = {}
+
+# "Add Redis cache to my app", "please switch the DB to Postgres": edits to the chat's last generation
+_MODIFY_RE = re.compile(
+    r"^\s*(?:(?:please|can you|could you|now)\s+)*"
+    r"(?:add|remove|delete|drop|change|modify|update|replace|increase|decrease|enable|disable|"
+    r"switch|rename|attach|include|scale|make|use|set|move|put|expose|restrict|allow|turn)\b",
+    re.IGNORECASE,
+)
+# What a speculative generation answers: plain "generate terraform for my app" style requests
+SPECULATIVE_REQUEST = "generate terraform for this repository"
+_GENERIC_REQUEST_RE = re.compile(
+    r"^(?:(?:please|can you|could you|now|ok|okay|great|thanks|so)[,\s]+)*"
+    r"(?:(?:generate|create|write|make|build|produce|give me|i need|i want)\s+)?(?:the\s+|some\s+|me\s+)?"
+    r"(?:aws\s+)?(?:terraform|infra(?:structure)?|iac)(?:\s+(?:code|config(?:uration)?|files))?"
+    r"(?:\s+(?:for|to deploy)\s+(?:this|my|the|it)(?:\s+(?:repo(?:sitory)?|app(?:lication)?|project|service|code))?)?"
+    r"(?:\s+please)?$"
+)
+_FRESH_RE = re.compile(r"\b(?:from scratch|start over|brand new|new (?:terraform|infra\w*|config\w*))\b", re.IGNORECASE)
+
+
+def _canonical_request(user_input: str) -> str:
+    """Lowercased, whitespace-collapsed request; every plain "generate terraform" phrasing maps to one text"""
+    normalized = " ".join(user_input.lower().split()).rstrip(".!?")
+    return SPECULATIVE_REQUEST if _GENERIC_REQUEST_RE.match(normalized) else normalized
+
+
+def generation_key(user_input: str, repo_context: dict, env_names: list, user_id: int,
+                   base_job_id: str = None, template: str = None) -> str:
     """
-    Start background generation and return immediately
+    Content hash of everything a generation depends on. Scoped to the user: the
+    prompt carries .env values, so output is never shared across accounts.
+    Modifications also depend on the generation they were applied to, template
+    renders on the template version.
     """
-    job_id = str(uuid.uuid4())
-    
-    # Start background task (don't wait for it)
-    asyncio.create_task(
-        _generate_in_background(job_id, user_input, repo_context, chat_id, user_id)
-    )
-    
+    repo_context = repo_context or {}
+    if repo_context.get("commit"):
+        # Analyses are pinned to a commit; the profile is derived from it deterministically
+        analysis = [repo_context.get("repo_url"), repo_context["commit"], repo_context.get("profile")]
+    else:
+        analysis = repo_context.get("full_analysis", "")
+    material = json.dumps([
+        TERRAFORM_PROMPT_VERSION,
+        OLLAMA_CHAT_MODEL,
+        user_id,
+        _canonical_request(user_input),
+        analysis,
+        sorted(set(env_names)),
+        *([base_job_id] if base_job_id else []),
+        *([template] if template else []),
+    ], sort_keys=True, default=str)
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+def _save_chat_message(chat_id: str, user_id: int, content: str, **fields) -> dict:
+    message = {
+        "chat_id": chat_id,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "message_id": str(uuid.uuid4()),
+        "role": "assistant",
+        "user_id": user_id,  # Already an integer
+        "content": content,
+        "is_active": 1,
+        **fields
+    }
+    dynamo_db.put_item(Item=message)
+    event_bus.publish(user_id, "message", message)
+    return message
+
+
+def _artifact_url(job_id: str) -> str:
+    return f"/jobs/{job_id}/artifact"
+
+
+def _completion_content(files: list, job_id: str, validation: dict = None, changes: dict = None,
+                        template: dict = None) -> str:
+    if changes:
+        updated = set(changes["files"])
+        listing = "".join(f"- `{name}`{' (updated)' if name in updated else ''}\n" for name in files)
+        summary = ", ".join(f"{len(changes[kind])} {kind}" for kind in ("added", "replaced", "removed") if changes[kind])
+        listing += f"\n🧩 Applied as a patch: {summary or 'no block changes'}\n"
+    else:
+        listing = "".join(f"- `{name}`\n" for name in files)
+    if template:
+        listing += f"\n⚡ Rendered from the `{template['name']}` template (no LLM call)\n"
+    checks = f"\n{format_diagnostics(validation)}" if validation and "valid" in validation else ""
+    return f"**Terraform generation complete!**\n\n Download: `{_artifact_url(job_id)}` (zip, or `?format=tar`)\n{listing}{checks}\n Job ID: `{job_id}`\n\n **Next steps:**\n1. Download the archive\n2. Run `terraform init`\n3. Review variables\n4. Ask me to validate deployment"
+
+
+async def _modification_base(user_input: str, chat_id: str, user_id: int):
+    """The chat's latest generation whose files are still stored, when the request reads as a change to it"""
+    if not _MODIFY_RE.search(user_input) or _FRESH_RE.search(user_input):
+        return None
+    base_job = await job_manager.find_latest_for_chat("terraform", chat_id, user_id)
+    if base_job and await asyncio.to_thread(artifact_store.has, base_job["job_id"]):
+        return base_job
+    return None
+
+
+def _load_artifact_files(job_id: str) -> dict:
+    manifest = artifact_store.get_manifest(job_id) or {"files": []}
+    return {
+        entry["name"]: artifact_store.read_file(job_id, entry["name"]).decode("utf-8", errors="replace")
+        for entry in manifest["files"]
+    }
+
+
+async def terraform_generator(user_input: str, repo_context: dict = None, chat_id: str = "default",
+                              user_id: int = None, regenerate: bool = False):
+    """
+    Queue generation as a tracked job and return immediately. Identical requests
+    reuse the stored result or attach to the running job, unless regenerate is set.
+    A request that reads as a change ("Add Redis ...") to a chat that already has
+    generated files is applied to those files as a patch.
+    """
+    env = await env_store.get(user_id)
+    env_names = env.names if env else []
+    base_job = await _modification_base(user_input, chat_id, user_id)
+    base_job_id = base_job["job_id"] if base_job else None
+    template = None if base_job_id else select_template(user_input, repo_context, env_names)
+    dedupe_key = generation_key(user_input, repo_context, env_names, user_id, base_job_id,
+                                f"{template.name}@{TEMPLATE_VERSION}" if template else None)
+
+    if not regenerate:
+        previous = await job_manager.find_latest("terraform", dedupe_key)
+        # Only while its files are still in the artifact store
+        if previous and await asyncio.to_thread(artifact_store.has, previous["job_id"]):
+            previous_result = previous.get("result") or {}
+            speculative = await terraform_speculator.claim(previous["job_id"], chat_id)
+            print(f"♻️ Reusing terraform job {previous['job_id']} for chat {chat_id}")
+            _save_chat_message(chat_id, user_id,
+                               _completion_content(previous_result.get("files", []), previous["job_id"],
+                                                   previous_result.get("validation"), previous_result.get("changes"),
+                                                   previous_result.get("template")),
+                               job_id=previous["job_id"], artifact_url=_artifact_url(previous["job_id"]))
+            if speculative:
+                yield f"⚡ Your Terraform was prepared while you were reading the analysis.\n\n"
+            else:
+                yield f"♻️ This exact configuration was already generated, reusing it.\n\n"
+            yield f"📋 Job ID: `{previous['job_id']}`\n\n"
+            yield f"📦 Download: `{_artifact_url(previous['job_id'])}`\n\n"
+            yield f"🔄 Ask to regenerate if you want a fresh run.\n"
+            return
+
+    if not regenerate and (running := job_manager.active_job(dedupe_key)):
+        # Claimed before submit() attaches, so the run is no longer preemptible
+        await terraform_speculator.claim(running, chat_id)
+    else:
+        # Interactive generations do not queue for the LLM behind speculative ones
+        await terraform_speculator.make_room()
+
+    new_job_id = str(uuid.uuid4())
+    try:
+        job_id = await job_manager.submit(
+            "terraform",
+            {"user_input": user_input, "repo_context": repo_context, "chat_id": chat_id, "user_id": user_id,
+             "base_job_id": base_job_id},
+            user_id=user_id,
+            chat_id=chat_id,
+            job_id=new_job_id,
+            dedupe_key=dedupe_key,
+            attach=not regenerate,
+        )
+    except JobQueueFull:
+        yield f"⏳ Too many Terraform generations are queued right now. Please try again in a few minutes.\n"
+        return
+
+    if job_id != new_job_id:
+        _waiting_chats.setdefault(job_id, set()).add(chat_id)
+        yield f"🔗 An identical Terraform generation is already running, I'll notify you here when it's ready.\n\n"
+        yield f"📋 Job ID: `{job_id}`\n"
+        return
+
     # Return immediate response
-    yield f"🚀 Generating Terraform configuration...\n\n"
+    if base_job_id:
+        yield f"🧩 Updating the Terraform from job `{base_job_id}` with only the blocks that change...\n\n"
+    elif template:
+        yield f"⚡ This is a standard `{template.name}` stack, rendering it from a template...\n\n"
+        yield f"📋 Job ID: `{job_id}`\n\n"
+        yield f"⏱️ Ready in a few seconds at `/jobs/{job_id}`.\n"
+        return
+    else:
+        yield f"🚀 Generating Terraform configuration...\n\n"
     yield f"📋 Job ID: `{job_id}`\n\n"
-    yield f"⏱️ This will take 2-3 minutes.\n"
+    yield f"⏱️ This will take 2-3 minutes. Check progress at `/jobs/{job_id}`.\n"
     yield f"💬 You can continue chatting. I'll notify you when it's ready!\n"
 
 
-async def _generate_in_background(job_id: str, user_input: str, repo_context: dict, chat_id: str, user_id: int):
-    
-    env_file_path = Path(f"./user_uploads/{user_id}/.env")
-    env_vars_text = ""
-
-    if env_file_path.exists():
-        env_vars_text += env_file_path.read_text()
-        print(f"Loaded .env file for {chat_id}")
-    else:
-        print(f" No .env file found for {chat_id}")
-    
+async def speculate_terraform(repo_context: dict, user_id: int) -> str:
     """
-    Generate terraform in background and save to file
+    Called when a repo analysis finishes: if nothing else needs the LLM, queue
+    the plain "generate terraform" request for it as a silent, preemptible job,
+    so the user's likely next message is answered from a finished result.
+    Returns the job id, or None when skipped.
     """
+    if not terraform_speculator.enabled or user_id is None or not repo_context:
+        return None
+    env = await env_store.get(user_id)
+    env_names = env.names if env else []
+    template = select_template(SPECULATIVE_REQUEST, repo_context, env_names)
+    dedupe_key = generation_key(SPECULATIVE_REQUEST, repo_context, env_names, user_id, None,
+                                f"{template.name}@{TEMPLATE_VERSION}" if template else None)
+    if job_manager.active_job(dedupe_key):
+        return None
+    previous = await job_manager.find_latest("terraform", dedupe_key)
+    if previous and await asyncio.to_thread(artifact_store.has, previous["job_id"]):
+        return None
+    if not terraform_speculator.gateway_idle():
+        terraform_speculator.skipped()
+        print("⏭️ Skipping speculative terraform: the LLM is busy")
+        return None
+
+    job_id = await job_manager.submit(
+        "terraform",
+        {"user_input": SPECULATIVE_REQUEST, "repo_context": repo_context, "chat_id": None, "user_id": user_id,
+         "speculative": True},
+        user_id=user_id,
+        dedupe_key=dedupe_key,
+        preemptible=True,
+    )
+    terraform_speculator.track(job_id)
+    print(f"🔮 Speculative terraform job {job_id} queued for user {user_id}")
+    return job_id
+
+
+async def _run_terraform_job(job_id: str, payload: dict) -> dict:
     try:
-        if repo_context:
-            prompt = f"""
+        files, validation, details = await _generate_in_background(
+            job_id, payload["user_input"], payload.get("repo_context"), payload["chat_id"], payload.get("user_id"),
+            payload.get("base_job_id")
+        )
+    finally:
+        _waiting_chats.pop(job_id, None)
+    return {"files": files, "validation": validation, "artifact_url": _artifact_url(job_id), **details}
+
+
+job_manager.register("terraform", _run_terraform_job)
+
+
+def _env_keys_only(env_text: str, budget: int) -> str:
+    """Overflowing .env files keep as many variable names as fit the budget; values are dropped"""
+    header = "Variables (values omitted to fit context):"
+    names = list(parse_env(env_text))
+    kept, used = [], estimate_tokens(header) + 16  # room for the omitted note
+    for name in names:
+        cost = estimate_tokens(name) + 1
+        if used + cost > budget:
+            break
+        kept.append(name)
+        used += cost
+    omitted = len(names) - len(kept)
+    note = f"\n[{omitted} more variables omitted]" if omitted else ""
+    return header + "".join(f"\n{name}" for name in kept) + note
+
+
+def _analysis_for_prompt(full_analysis: str, has_profile: bool) -> str:
+    """
+    Drop the fetch progress lines of the streamed analysis; when the profile is
+    sent as JSON, its markdown rendering is redundant as well
+    """
+    marker = "## 📊 Analysis Results" if has_profile else "## 🧾 Repository Profile"
+    position = full_analysis.find(marker)
+    return full_analysis[position:] if position >= 0 else full_analysis
+
+
+async def _context_files(user_input: str, repo_context: dict) -> list:
+    """
+    Source files most relevant to this request, from the repo's embedding index;
+    falls back to the files picked during analysis if the index is gone
+    """
+    if not repo_context:
+        return []
+    files = await relevant_files(repo_context.get("file_index"), f"{user_input}\n{DEPLOYMENT_QUERY}")
+    return files or [tuple(item) for item in repo_context.get("context_files") or []]
+
+
+def _build_prompt(user_input: str, repo_context: dict, env_vars_text: str, context_files: list = ()) -> tuple:
+    """
+    Returns (system prompt, user request), packed to fit OLLAMA_NUM_CTX
+    """
+    packer = PromptPacker("terraform_agent", reserve_output=TERRAFORM_OUTPUT_RESERVE)
+    if repo_context:
+        profile = repo_context.get("profile")
+        template = """
                     Generate production-ready Terraform for AWS.
 
+                    Repository Profile (JSON):
+                    {profile}
+
                     Repository Analysis:
-                    {repo_context.get('full_analysis', '')}
+                    {analysis}
+
+                    Relevant Source Files:
+                    {sources}
 
                     Environment Variables (.env):
-                    {env_vars_text or 'None provided'}
+                    {env}
 
-                    User Request: {user_input}
+                    User Request: {request}
 
                     Generate complete Terraform files including:
                     - main.tf
@@ -71,58 +356,281 @@ async def _generate_in_background(job_id: str, user_input: str, repo_context: di
                     ### FILE: variables.tf
                     [content]
                 """
-        else:
-            prompt = f"""Generate Terraform for: {user_input}
+        packed = packer.pack(template, [
+            PromptSection("request", user_input, share=0.1, priority=0),
+            PromptSection("profile", json.dumps(profile, indent=1) if profile else "", share=0.3, priority=1),
+            PromptSection("env", env_vars_text, share=0.15, priority=2, summarize=_env_keys_only),
+            PromptSection("analysis", _analysis_for_prompt(repo_context.get('full_analysis', ''), bool(profile)),
+                          share=0.25, priority=3),
+            PromptSection("sources", items=list(context_files), share=0.1, priority=4),
+        ])
+        prompt = template.format(
+            profile=packed["profile"] or "None",
+            analysis=packed["analysis"],
+            env=packed["env"] or "None provided",
+            request=packed["request"],
+            sources=packed["sources"] or "None",
+        )
+    else:
+        template = """Generate Terraform for: {request}
 
         Environment Variables (.env):
-        {env_vars_text or 'None provided'}
+        {env}
         """
-        
-        print(f"🔨 Generating Terraform for job {job_id}...")
-        
-        # Generate (no streaming, unlimited tokens)
+        packed = packer.pack(template, [
+            PromptSection("request", user_input, share=0.3, priority=0),
+            PromptSection("env", env_vars_text, share=0.3, priority=1, summarize=_env_keys_only),
+        ])
+        prompt = template.format(request=packed["request"], env=packed["env"] or "None provided")
+    return prompt, packed["request"]
+
+
+def _build_modify_prompt(user_input: str, current_files: dict, env_vars_text: str) -> tuple:
+    """
+    Returns (system prompt, user request) asking only for the blocks that change;
+    the current files are packed first so the model can reference what exists
+    """
+    packer = PromptPacker("terraform_modify", reserve_output=TERRAFORM_OUTPUT_RESERVE)
+    template = """
+                You are changing an existing Terraform configuration for AWS.
+
+                Current Files:
+                {files}
+
+                Environment Variables (.env):
+                {env}
+
+                Requested Change: {request}
+
+                Reply with ONLY the top-level blocks (resource, data, module, variable,
+                output, locals, provider) that are new or changed, each written out in
+                full. Do not repeat blocks that stay the same. Put each block under the
+                file it belongs in, new variables in variables.tf and new outputs in
+                outputs.tf:
+                ### FILE: main.tf
+                [changed or new blocks]
+
+                To delete a block, add a line like this in any file section:
+                # REMOVE: resource "aws_instance" "old"
+            """
+    packed = packer.pack(template, [
+        PromptSection("request", user_input, share=0.1, priority=0),
+        PromptSection("files", items=list(current_files.items()), share=0.7, priority=1),
+        PromptSection("env", env_vars_text, share=0.1, priority=2, summarize=_env_keys_only),
+    ])
+    prompt = template.format(files=packed["files"], env=packed["env"] or "None provided", request=packed["request"])
+    return prompt, packed["request"]
+
+
+def _replace_file(output_dir: Path, name: str, content: str):
+    # Temp file and rename, so readers never see a partial file
+    temp = output_dir / f".{name}.tmp"
+    temp.write_text(content)
+    os.replace(temp, output_dir / name)
+
+
+def _write_terraform_file(output_dir: Path, name: str, content: str, written: list):
+    """Write one generated file; a name the model repeats is appended to, not overwritten"""
+    if name in written:
+        content = (output_dir / name).read_text() + "\n" + content
+    else:
+        written.append(name)
+    _replace_file(output_dir, name, content)
+
+
+async def _repair_file(name: str, content: str, diagnostics: list) -> str:
+    """Re-prompt the model with one file and its errors; returns the corrected file ("" if none came back)"""
+    problems = "\n".join(f"- line {d['line']}: {d['message']}" for d in diagnostics)
+    call_metrics = LLMCallMetrics("terraform_repair", OLLAMA_CHAT_MODEL)
+    try:
         response = await ollama_client.chat(
             model=OLLAMA_CHAT_MODEL,
             messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": user_input}
+                {"role": "system", "content": "You fix Terraform files. Reply with only the complete corrected file in one ```hcl code block. Keep everything that is not broken unchanged."},
+                {"role": "user", "content": f"File {name}:\n```hcl\n{content}\n```\n\nProblems:\n{problems}"}
             ],
             stream=False,
-            options={
-                "num_predict": -1,  # Unlimited
-                "temperature": 0.2,
-            }
+            options={"num_predict": -1, "temperature": 0, "num_ctx": OLLAMA_NUM_CTX}
         )
-        
-        content = response["message"]["content"]
-        
-        # Save to file
-        output_dir = Path(TERRAFORM_OUTPUT_DIR) / job_id
-        output_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Save full content
-        terraform_file = output_dir / "terraform_config.tf"
-        terraform_file.write_text(content)
-        
-        file_path = str(terraform_file.absolute())
-        
-        print(f"✅ Terraform saved to: {file_path}")
-        
-        # Insert completion message into DynamoDB
-        completion_msg = {
-            "chat_id": chat_id,
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "message_id": str(uuid.uuid4()),
-            "role": "assistant",
-            "user_id": user_id,  # Already an integer
-            "content": f"**Terraform generation complete!**\n\n File saved to:\n`{file_path}`\n\n Job ID: `{job_id}`\n\n **Next steps:**\n1. Download the file\n2. Run `terraform init`\n3. Review variables\n4. Ask me to validate deployment",
-            "is_active": 1,
-            "job_id": job_id,
-            "file_path": file_path
+        call_metrics.observe_chunk(response)
+        call_metrics.finish()
+    except Exception as e:
+        call_metrics.finish(e)
+        raise
+    parser = TerraformFileParser()
+    parser.feed(response["message"]["content"])
+    fixed = parser.finish()
+    return fixed[0][1] if fixed else ""
+
+
+async def _validate_and_repair(job_id: str, output_dir: Path, written: list) -> dict:
+    """
+    Validate the generated files; files with errors are re-prompted on their own
+    and kept only if the whole set then has fewer errors
+    """
+    files = await asyncio.to_thread(lambda: {name: (output_dir / name).read_text() for name in written})
+    validation = await validate_terraform(files)
+    repaired = []
+    for _ in range(TERRAFORM_REPAIR_ATTEMPTS):
+        failing = failing_files(validation)
+        if not failing:
+            break
+        job_manager.progress(job_id, f"Fixing {', '.join(failing)}", files=list(written), errors=validation["errors"])
+        candidate = dict(files)
+        for name in failing:
+            errors = [d for d in validation["diagnostics"] if d["file"] == name and d["severity"] == "error"]
+            try:
+                candidate[name] = await _repair_file(name, files[name], errors) or files[name]
+            except Exception as e:
+                print(f"⚠️ Repair of {name} failed: {str(e)}")
+        revalidation = await validate_terraform(candidate)
+        if revalidation["errors"] >= validation["errors"]:
+            break
+        for name in failing:
+            if candidate[name] != files[name]:
+                await asyncio.to_thread(_replace_file, output_dir, name, candidate[name])
+                repaired.append(name)
+        files, validation = candidate, revalidation
+    validation["repaired"] = sorted(set(repaired))
+    print(f"🔎 Validation for {job_id}: {validation['errors']} errors, {validation['warnings']} warnings"
+          f"{', repaired ' + ', '.join(validation['repaired']) if repaired else ''}")
+    return validation
+
+
+async def _stream_from_llm(job_id: str, prompt: str, user_input: str, output_dir: Path, written: list,
+                          base_files: dict = None) -> tuple:
+    """
+    Stream the model's answer, writing each `### FILE:` section to its own file
+    as soon as the next one starts. With base_files the sections are a patch,
+    merged into those files once the response is complete. Returns (tokens, changes),
+    with the completion tokens Ollama reports at the end of the stream.
+    """
+    parser = TerraformFileParser()
+    patch = {}  # modify mode: sections are held until the response is complete
+
+    async def section_done(name: str, content: str):
+        if base_files is not None:
+            patch[name] = patch[name] + "\n" + content if name in patch else content
+        else:
+            await asyncio.to_thread(_write_terraform_file, output_dir, name, content, written)
+
+    # Stream (unlimited tokens); files are written as their sections complete.
+    # Progress counts chunks: the token count only arrives with the final one.
+    chunks, last_progress = 0, time.monotonic()
+    call_metrics = LLMCallMetrics("terraform_agent", OLLAMA_CHAT_MODEL)
+    response = ollama_client.chat(
+        model=OLLAMA_CHAT_MODEL,
+        messages=[
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": user_input}
+        ],
+        stream=True,
+        options={
+            "num_predict": -1,  # Unlimited
+            "temperature": 0.2,
+            "num_ctx": OLLAMA_NUM_CTX,
         }
+    )
+    action = "received changes for" if base_files is not None else "wrote"
+    async for chunk in call_metrics.track(response):
+        chunks += 1
+        for name, content in parser.feed(chunk["message"]["content"]):
+            await section_done(name, content)
+            print(f"📄 {job_id}: {action} {name} after {chunks} chunks")
+            job_manager.progress(job_id, f"{action.capitalize()} {name}", chunks=chunks, files=list(written or patch))
+            last_progress = time.monotonic()
+        if time.monotonic() - last_progress >= TERRAFORM_PROGRESS_INTERVAL:
+            job_manager.progress(job_id, f"Received {chunks} chunks", chunks=chunks, files=list(written or patch))
+            last_progress = time.monotonic()
+
+    for name, content in parser.finish():
+        await section_done(name, content)
+    tokens = call_metrics.completion_tokens or chunks
+    if base_files is None:
+        return tokens, None
+    if not patch:
+        raise ValueError("The model response contained no Terraform changes")
+    merged, changes = merge_patch(base_files, patch)
+    print(f"🧩 {job_id}: patched {', '.join(changes['files']) or 'nothing'} "
+          f"({len(changes['added'])} added, {len(changes['replaced'])} replaced, {len(changes['removed'])} removed)")
+    for name, content in merged.items():
+        await asyncio.to_thread(_write_terraform_file, output_dir, name, content, written)
+    return tokens, changes
+
+
+async def _generate_in_background(job_id: str, user_input: str, repo_context: dict, chat_id: str, user_id: int,
+                                  base_job_id: str = None):
+    """
+    Generate terraform in background: standard stacks are rendered from a
+    template, everything else is streamed from the LLM (as a patch to
+    base_job_id's files when given). All file I/O runs in worker threads.
+    Returns (files, validation, extra result fields).
+    """
+    env = await env_store.get(user_id)
+    env_vars_text = env.text if env else ""
+    if env:
+        print(f"Loaded .env file for {chat_id}")
+    else:
+        print(f" No .env file found for {chat_id}")
+
+    try:
+        # A retried job starts from a clean directory
+        output_dir = Path(TERRAFORM_OUTPUT_DIR) / job_id
+        await asyncio.to_thread(shutil.rmtree, output_dir, True)
+        await asyncio.to_thread(output_dir.mkdir, parents=True, exist_ok=True)
+
+        written, tokens, details = [], 0, {}
+        base_files = await asyncio.to_thread(_load_artifact_files, base_job_id) if base_job_id else {}
+        if base_job_id and not base_files:
+            # Expired from the artifact store since the request was queued
+            print(f"⚠️ Files of job {base_job_id} are gone, generating {job_id} from scratch")
+            base_job_id = None
+        template = None if base_job_id else select_template(user_input, repo_context, env.names if env else [])
+        if template:
+            started = time.perf_counter()
+            for name, content in render_template(template).items():
+                await asyncio.to_thread(_write_terraform_file, output_dir, name, content, written)
+            details["template"] = template.to_dict()
+            print(f"⚡ {job_id}: rendered the {template.name} template in {(time.perf_counter() - started) * 1000:.1f} ms")
+        # The request is packed too: it is repeated in the user message
+        elif base_job_id:
+            prompt, user_input = _build_modify_prompt(user_input, base_files, env_vars_text)
+            print(f"🧩 Modifying Terraform of job {base_job_id} as job {job_id}...")
+            job_manager.progress(job_id, f"Generating changes to job {base_job_id}")
+            tokens, changes = await _stream_from_llm(job_id, prompt, user_input, output_dir, written, base_files)
+            details.update(base_job_id=base_job_id, changes=changes)
+        else:
+            context_files = await _context_files(user_input, repo_context)
+            prompt, user_input = _build_prompt(user_input, repo_context, env_vars_text, context_files)
+            print(f"🔨 Generating Terraform for job {job_id}...")
+            job_manager.progress(job_id, "Generating Terraform configuration")
+            tokens, _ = await _stream_from_llm(job_id, prompt, user_input, output_dir, written)
+        details["path"] = "template" if template else "llm"
+        generation_path.inc(path=details["path"])
+
+        if not written:
+            raise ValueError("The model response contained no Terraform files")
+        job_manager.progress(job_id, "All files written, validating", tokens=tokens, files=list(written))
+        try:
+            validation = await _validate_and_repair(job_id, output_dir, written)
+        except Exception as e:
+            print(f"⚠️ Validation skipped for {job_id}: {str(e)}")
+            validation = {"error": str(e)}
+
+        # Content-addressed store: files identical to earlier generations are kept once
+        manifest = await asyncio.to_thread(artifact_store.put_dir, job_id, output_dir, written)
+        await asyncio.to_thread(shutil.rmtree, output_dir, True)
+        print(f"✅ Terraform stored as artifact {job_id} ({', '.join(e['name'] for e in manifest['files'])})")
         
-        dynamo_db.put_item(Item=completion_msg)
-        print(f"✅ Completion message saved to DynamoDB for chat {chat_id}")
+        # Insert completion message into DynamoDB, also in chats that attached to this job
+        for target_chat in [chat_id, *(_waiting_chats.pop(job_id, set()) - {chat_id})]:
+            if target_chat is None:
+                continue  # speculative run nobody has asked for yet
+            _save_chat_message(target_chat, user_id,
+                               _completion_content(written, job_id, validation, details.get("changes"), details.get("template")),
+                               job_id=job_id, artifact_url=_artifact_url(job_id))
+            print(f"✅ Completion message saved to DynamoDB for chat {target_chat}")
+        return written, validation, details
         
     except Exception as e:
         print(f"❌ Error generating Terraform: {str(e)}")
@@ -131,17 +639,13 @@ async def _generate_in_background(job_id: str, user_input: str, repo_context: di
         
         # Save error message to DynamoDB
         try:
-            error_msg = {
-                "chat_id": chat_id,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "message_id": str(uuid.uuid4()),
-                "role": "assistant",
-                "user_id": user_id,  # Already an integer
-                "content": f"Terraform generation failed\n\n Job ID: `{job_id}`\n\n Error: {str(e)}",
-                "is_active": 1,
-                "job_id": job_id
-            }
-            dynamo_db.put_item(Item=error_msg)
+            for target_chat in [chat_id, *(_waiting_chats.pop(job_id, set()) - {chat_id})]:
+                if target_chat is None:
+                    continue
+                _save_chat_message(target_chat, user_id, f"Terraform generation failed\n\n Job ID: `{job_id}`\n\n Error: {str(e)}",
+                                   job_id=job_id)
         except Exception as save_error:
             print(f"❌ Failed to save error message: {str(save_error)}")
-            traceback.print_exc()
\ No newline at end of file
+            traceback.print_exc()
+        # Re-raised so the job is recorded as failed
+        raise
\ No newline at end of file
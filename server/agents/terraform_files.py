@@ -0,0 +1,224 @@
+import re
+from typing import Dict, List, Optional, Tuple
+from agents.terraform_validator import line_depths
+
+# "### FILE: main.tf", "## File: `variables.tf`", "**FILE: outputs.tf**", "// FILE: x.tf"
+FILE_MARKER_RE = re.compile(r"^\s*(?:#{1,6}|//|\*\*)?\s*FILE:\s*`?([\w./-]+?)`?\s*(?:\*\*)?\s*:?\s*$", re.IGNORECASE)
+_FENCE_RE = re.compile(r"^\s*```")
+_SAFE_NAME_RE = re.compile(r"^[\w-][\w.-]*$")
+
+# Name used when the model ignores the separators altogether
+DEFAULT_FILE_NAME = "main.tf"
+
+# Top-level `type "label" ... {` block header, or `name =` attribute (.tfvars, locals-free files)
+_HEADER_RE = re.compile(r'^\s*([A-Za-z_][\w-]*)((?:\s+(?:"[^"]*"|[A-Za-z_][\w-]*))*)\s*\{')
+_ATTRIBUTE_RE = re.compile(r"^\s*([A-Za-z_][\w-]*)\s*=")
+_LABEL_RE = re.compile(r'"([^"]*)"|([A-Za-z_][\w-]*)')
+# Patch directive: `# REMOVE: resource "aws_instance" "old"` or `# REMOVE: aws_instance.old`
+_REMOVE_RE = re.compile(r"^\s*(?:#|//)\s*REMOVE:?\s+(.+?)\s*$", re.IGNORECASE)
+_DOTTED_KINDS = {"data": "data", "module": "module", "var": "variable", "output": "output"}
+
+
+def safe_file_name(name: str) -> Optional[str]:
+    """
+    Basename only, so a model-chosen name can never leave the output directory;
+    a name that tries to climb out ("../x.tf") is rejected outright
+    """
+    parts = name.strip().replace("\\", "/").split("/")
+    if ".." in parts:
+        return None
+    return parts[-1] if _SAFE_NAME_RE.match(parts[-1]) else None
+
+
+def _clean(lines: List[str]) -> str:
+    """
+    Section body without markdown: when the section has code fences, only the
+    fenced lines are kept (drops "Here is variables.tf:" style prose)
+    """
+    if any(_FENCE_RE.match(line) for line in lines):
+        kept, inside = [], False
+        for line in lines:
+            if _FENCE_RE.match(line):
+                inside = not inside
+            elif inside:
+                kept.append(line)
+        lines = kept
+    return "\n".join(lines).strip("\n") + "\n" if any(line.strip() for line in lines) else ""
+
+
+class TerraformFileParser:
+    """
+    Incremental splitter for a streamed "### FILE: name" response. feed() takes
+    raw chunks (markers may be split across them) and returns the files that a
+    new marker has just completed; finish() returns the last one. Only the file
+    being generated is held in memory.
+    """
+    def __init__(self):
+        self._partial = ""
+        self._name: Optional[str] = None
+        self._lines: List[str] = []
+        self.seen_marker = False
+
+    def _complete(self) -> List[Tuple[str, str]]:
+        lines, self._lines = self._lines, []
+        if self._name is None:
+            # Text before the first marker is prose unless no marker ever comes
+            return []
+        content = _clean(lines)
+        return [(self._name, content)] if content else []
+
+    def _line(self, line: str) -> List[Tuple[str, str]]:
+        match = FILE_MARKER_RE.match(line)
+        if match is None:
+            self._lines.append(line)
+            return []
+        completed = self._complete()
+        self.seen_marker = True
+        self._name = safe_file_name(match.group(1))
+        if self._name is None:
+            print(f"⚠️ Ignoring unsafe file name from model: {match.group(1)!r}")
+        return completed
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        completed = []
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            completed.extend(self._line(line))
+        return completed
+
+    def finish(self) -> List[Tuple[str, str]]:
+        completed = []
+        if self._partial:
+            completed.extend(self._line(self._partial))
+            self._partial = ""
+        if not self.seen_marker:
+            self._name = DEFAULT_FILE_NAME
+        completed.extend(self._complete())
+        return completed
+
+
+def block_key(line: str) -> Optional[str]:
+    """Identity of the top-level block or attribute starting on this line: `resource aws_s3_bucket logs`, `region =`"""
+    match = _HEADER_RE.match(line)
+    if match:
+        labels = [quoted or bare for quoted, bare in _LABEL_RE.findall(match.group(2))]
+        return " ".join([match.group(1), *labels])
+    match = _ATTRIBUTE_RE.match(line)
+    return f"{match.group(1)} =" if match else None
+
+
+def _removal_key(target: str) -> Optional[str]:
+    parts = target.split(".")
+    if len(parts) >= 2 and "{" not in target and '"' not in target:
+        if parts[0] in _DOTTED_KINDS:
+            return " ".join([_DOTTED_KINDS[parts[0]], *parts[1:]])
+        return " ".join(["resource", *parts])
+    return block_key(target + " {")
+
+
+def _leading_comments(segment: str) -> str:
+    lines = segment.split("\n")
+    count = 0
+    while count < len(lines) and lines[count].strip().startswith(("#", "//")):
+        count += 1
+    return "".join(line + "\n" for line in lines[:count])
+
+
+def split_blocks(text: str) -> List[Tuple[Optional[str], str]]:
+    """
+    Split a file into (key, text) segments that join back (with "\\n") into the
+    original. Keyed segments are whole top-level blocks or attributes, including
+    the comment lines directly above them; everything else has key None.
+    """
+    lines = text.split("\n")
+    depths = line_depths(text)
+    segments, pending, i = [], [], 0
+    while i < len(lines):
+        key = block_key(lines[i]) if depths[i] == 0 else None
+        if key is None:
+            pending.append(lines[i])
+            i += 1
+            continue
+        end = i
+        while end + 1 < len(lines) and depths[end + 1] != 0:
+            end += 1
+        lead = len(pending)
+        while lead and pending[lead - 1].strip().startswith(("#", "//")):
+            lead -= 1
+        if lead:
+            segments.append((None, "\n".join(pending[:lead])))
+        segments.append((key, "\n".join(pending[lead:] + lines[i:end + 1])))
+        pending = []
+        i = end + 1
+    if pending:
+        segments.append((None, "\n".join(pending)))
+    return segments
+
+
+def merge_patch(base: Dict[str, str], patch: Dict[str, str]) -> Tuple[Dict[str, str], dict]:
+    """
+    Apply a patch of complete top-level blocks to a set of files. A block whose
+    key already exists replaces it in whichever file holds it; a new one is
+    appended to the file it was sent under; `# REMOVE:` directives delete.
+    Returns the merged files and {"replaced", "added", "removed", "files"}.
+    """
+    files = {name: split_blocks(text) for name, text in base.items()}
+    where = {}
+    for name, segments in files.items():
+        for index, (key, _) in enumerate(segments):
+            if key is not None:
+                where.setdefault(key, (name, index))
+
+    changes = {"replaced": [], "added": [], "removed": []}
+    changed, removals = set(), []
+    for name, text in patch.items():
+        kept = []
+        for line in text.split("\n"):
+            match = _REMOVE_RE.match(line)
+            if match:
+                removals.append(match.group(1))
+            else:
+                kept.append(line)
+        segments = [(key, segment) for key, segment in split_blocks("\n".join(kept)) if key is not None]
+        if not segments and name not in files and "\n".join(kept).strip():
+            # Nothing recognisable as blocks: a brand-new file is taken as written
+            files[name] = [(None, "\n".join(kept))]
+            changed.add(name)
+            continue
+        for key, segment in segments:
+            if key in where:
+                owner, index = where[key]
+                current = files[owner][index][1]
+                if block_key(segment.lstrip("\n").split("\n", 1)[0]) == key:
+                    segment = _leading_comments(current) + segment.lstrip("\n")  # keep the base's comments
+                if current.strip() != segment.strip():
+                    files[owner][index] = (key, segment)
+                    changes["replaced"].append(key)
+                    changed.add(owner)
+            else:
+                target = files.setdefault(name, [])
+                if target:
+                    target.append((None, ""))
+                target.append((key, segment))
+                where[key] = (name, len(target) - 1)
+                changes["added"].append(key)
+                changed.add(name)
+
+    for target in removals:
+        key = _removal_key(target)
+        if key in where:
+            owner, index = where.pop(key)
+            files[owner][index] = (key, None)
+            changes["removed"].append(key)
+            changed.add(owner)
+
+    merged = {}
+    for name, segments in files.items():
+        text = "\n".join(segment for _, segment in segments if segment is not None)
+        if name in changed:
+            text = re.sub(r"\n{3,}", "\n\n", text).strip("\n") + "\n"
+        if text.strip():
+            merged[name] = text
+    changes["files"] = sorted(changed)
+    return merged, changes
@@ -0,0 +1,150 @@
+import os
+import time
+import asyncio
+from typing import Dict, Optional
+from core.metrics import registry, llm_in_flight
+from jobs.job_manager import job_manager, CANCELLED, FAILED, SUCCEEDED
+from jobs.artifact_store import artifact_store
+
+TERRAFORM_SPECULATION_ENABLED = os.getenv("TERRAFORM_SPECULATION_ENABLED", "1") == "1"
+# Unused speculative results are discarded after this many seconds
+TERRAFORM_SPECULATION_TTL = float(os.getenv("TERRAFORM_SPECULATION_TTL", "1800"))
+TERRAFORM_SPECULATION_SWEEP_INTERVAL = float(os.getenv("TERRAFORM_SPECULATION_SWEEP_INTERVAL", "60"))
+# LLM requests the gateway serves at once (Ollama's OLLAMA_NUM_PARALLEL); speculation
+# only gives way when interactive work would otherwise queue for one of these slots
+TERRAFORM_SPECULATION_LLM_SLOTS = int(os.getenv("TERRAFORM_SPECULATION_LLM_SLOTS", "1"))
+
+speculation_total = registry.counter(
+    "terraform_speculation_total", "Speculative terraform generations by outcome", ("outcome",)
+)
+speculation_hit_rate = registry.gauge(
+    "terraform_speculation_hit_rate", "Share of resolved speculative generations a user request used"
+)
+
+# Outcomes that end a speculation; hit rate = hits / all of them
+_RESOLVED = ("hit", "expired", "preempted", "failed")
+
+
+class TerraformSpeculator:
+    """
+    Bookkeeping for speculative terraform jobs started after a repo analysis.
+    The jobs themselves are ordinary preemptible jobs; this tracks which ones
+    are unclaimed, records hits when a user request lands on one, and sweeps
+    out results nobody asked for within the TTL.
+    """
+    def __init__(self, ttl: float = TERRAFORM_SPECULATION_TTL, enabled: bool = TERRAFORM_SPECULATION_ENABLED,
+                 llm_slots: int = TERRAFORM_SPECULATION_LLM_SLOTS):
+        self.ttl = ttl
+        self.enabled = enabled
+        self.llm_slots = llm_slots
+        # job_id -> monotonic start time of unclaimed speculative jobs
+        self._jobs: Dict[str, float] = {}
+        self._outcomes: Dict[str, int] = {outcome: 0 for outcome in ("started", "skipped_busy", *_RESOLVED)}
+        self._sweep_task: Optional[asyncio.Task] = None
+
+    def _record(self, outcome: str):
+        self._outcomes[outcome] += 1
+        speculation_total.inc(outcome=outcome)
+        resolved = sum(self._outcomes[o] for o in _RESOLVED)
+        if resolved:
+            speculation_hit_rate.set(self._outcomes["hit"] / resolved)
+
+    def gateway_idle(self) -> bool:
+        """No job queued or running and no LLM request in flight"""
+        return job_manager.idle() and llm_in_flight.total() == 0
+
+    def skipped(self):
+        self._record("skipped_busy")
+
+    def track(self, job_id: str):
+        self._jobs[job_id] = time.monotonic()
+        self._record("started")
+
+    async def claim(self, job_id: str, chat_id: str) -> bool:
+        """A user request resolved to job_id; True if that was an unclaimed speculation"""
+        if self._jobs.pop(job_id, None) is None:
+            return False
+        await job_manager.adopt(job_id, chat_id)
+        self._record("hit")
+        print(f"🎯 Speculative terraform job {job_id} used by chat {chat_id}")
+        return True
+
+    async def preempt(self) -> int:
+        """Stop every speculative job still queued or running"""
+        if not self._jobs:
+            return 0
+        return await job_manager.preempt()
+
+    async def make_room(self) -> int:
+        """
+        An interactive LLM request is starting: stop just enough running speculative
+        jobs for it to get a free LLM slot. Nothing is stopped while slots are free,
+        or when the busy slots belong to other interactive work, since cancelling
+        speculation then frees nothing.
+        """
+        if not self._jobs:
+            return 0
+        needed = int(llm_in_flight.total()) + 1 - self.llm_slots
+        if needed <= 0:
+            return 0
+        if not any(job_manager.is_running(job_id) for job_id in self._jobs):
+            return 0
+        # Queued speculation goes first, or a worker freed below would start it straight away
+        cancelled = await job_manager.preempt(running=False)
+        return cancelled + await job_manager.preempt(limit=needed, running=True)
+
+    async def sweep(self, now: Optional[float] = None) -> dict:
+        """Resolve speculations that were preempted, failed, or went unused past the TTL"""
+        now = now or time.monotonic()
+        resolved = {}
+        for job_id, started in list(self._jobs.items()):
+            job = await job_manager.get(job_id)
+            status = job["status"] if job else CANCELLED
+            if status == CANCELLED:
+                outcome = "preempted"
+            elif status == FAILED:
+                outcome = "failed"
+            elif now - started >= self.ttl:
+                if status != SUCCEEDED:
+                    await job_manager.cancel(job_id)
+                await asyncio.to_thread(artifact_store.delete, job_id)
+                outcome = "expired"
+            else:
+                continue
+            if self._jobs.pop(job_id, None) is not None:
+                self._record(outcome)
+                resolved[job_id] = outcome
+        return resolved
+
+    async def _sweep_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                resolved = await self.sweep()
+                if resolved:
+                    print(f"🧹 Speculation sweep: {resolved} (hit rate {self.stats()['hit_rate']})")
+            except Exception as e:
+                print(f"⚠️ Speculation sweep failed: {str(e)}")
+
+    def start(self, interval: float = TERRAFORM_SPECULATION_SWEEP_INTERVAL):
+        if self._sweep_task is None and self.enabled:
+            self._sweep_task = asyncio.create_task(self._sweep_loop(interval))
+
+    async def close(self):
+        if self._sweep_task is not None:
+            self._sweep_task.cancel()
+            await asyncio.gather(self._sweep_task, return_exceptions=True)
+            self._sweep_task = None
+        # Speculative runs are not worth resuming after a restart
+        await self.preempt()
+
+    def stats(self) -> dict:
+        resolved = sum(self._outcomes[o] for o in _RESOLVED)
+        return {
+            **self._outcomes,
+            "pending": len(self._jobs),
+            "hit_rate": round(self._outcomes["hit"] / resolved, 3) if resolved else None,
+        }
+
+
+terraform_speculator = TerraformSpeculator()
@@ -0,0 +1,745 @@
+import os
+import re
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional
+
+# Set to 0 to send every request to the LLM
+TERRAFORM_TEMPLATES_ENABLED = os.getenv("TERRAFORM_TEMPLATES_ENABLED", "1") == "1"
+# Part of the generation cache key: bump when a template changes so old results are not reused
+TEMPLATE_VERSION = 2
+
+# runtime -> (task cpu, task memory, health check grace seconds)
+TEMPLATE_RUNTIMES = {
+    "node": (256, 512, 60),
+    "python": (256, 512, 60),
+    "java": (512, 1024, 120),
+    "kotlin": (512, 1024, 120),
+}
+RUNTIME_DEFAULT_PORTS = {"node": 3000, "python": 8000, "java": 8080, "kotlin": 8080}
+# engine -> (port, engine version)
+DATABASE_ENGINES = {"postgres": (5432, "16"), "mysql": (3306, "8.0")}
+# Fargate task cpu units -> memory sizes (MiB) it can run with
+FARGATE_SIZES = {
+    256: (512, 1024, 2048),
+    512: tuple(range(1024, 4097, 1024)),
+    1024: tuple(range(2048, 8193, 1024)),
+    2048: tuple(range(4096, 16385, 1024)),
+    4096: tuple(range(8192, 30721, 1024)),
+    8192: tuple(range(16384, 61441, 4096)),
+    16384: tuple(range(32768, 122881, 8192)),
+}
+TEMPLATE_MAX_TASKS = 20
+
+# Anything the templates cannot express goes to the LLM
+_UNSUPPORTED_RE = re.compile(
+    r"\b(?:lambda|serverless|eks|kubernetes|k8s|ec2|auto ?scal\w*|s3|buckets?|cloudfront|cdn|dynamo\w*|sqs|sns|"
+    r"kinesis|kafka|msk|api ?gateway|cognito|waf|route ?53|domains?|https|ssl|tls|certificates?|acm|mongo\w*|"
+    r"docdb|documentdb|aurora|opensearch|elasticsearch|nat|vpn|bastion|gcp|azure|google cloud|multi[- ]region|"
+    r"cron|scheduled|workers?|queues?|microservices|monitoring|alarms?|gpu)\b",
+    re.IGNORECASE,
+)
+_DATABASE_RE = re.compile(r"\b(?:rds|postgres\w*|mysql|database|db)\b", re.IGNORECASE)
+_CACHE_RE = re.compile(r"\b(?:redis|elasticache|cache|caching)\b", re.IGNORECASE)
+_PLACEHOLDER_RE = re.compile(r"\{\{(\w+)\}\}")
+
+# Sizing the templates take from the request: "2 vCPU", "cpu: 1024", "4GB memory",
+# "ram 512", "3 replicas", "desired count 2", "port 8080"
+_NUMBER = r"(\d+(?:\.\d+)?)"
+_CPU_RES = (
+    re.compile(rf"{_NUMBER}\s*(v?cpus?|cores?|cpu units)\b", re.IGNORECASE),
+    # "cpu 1024", but not the "1" of "2 vCPU 1 GB RAM"
+    re.compile(rf"\b(v?cpus?)\s*(?:[:=]|of)?\s*{_NUMBER}\b(?!\s*(?:[gm]i?b?)\b)", re.IGNORECASE),
+)
+_MEMORY_RES = (
+    re.compile(rf"{_NUMBER}\s*(gi?b?|mi?b?)\s+(?:of\s+)?(?:memory|ram)\b", re.IGNORECASE),
+    re.compile(rf"\b(?:memory|ram)\s*(?:[:=]|of|to)?\s*{_NUMBER}\s*(gi?b?|mi?b?)?\b", re.IGNORECASE),
+)
+_TASKS_RES = (
+    re.compile(r"\b(\d+)\s*(?:replicas?|tasks?|instances?|containers?|copies)\b", re.IGNORECASE),
+    re.compile(r"\b(?:replicas|desired[ _]count|tasks|instances)\s*(?:[:=]|of|to)?\s*(\d+)\b", re.IGNORECASE),
+)
+_PORT_RE = re.compile(r"\bport\s*(?:[:=]|of)?\s*(\d{2,5})\b", re.IGNORECASE)
+# Sizing vocabulary: a term that is present but could not be read means the LLM decides
+_SIZING_TERMS = {
+    "cpu": re.compile(r"\b(?:v?cpus?|cores?)\b", re.IGNORECASE),
+    "memory": re.compile(r"\b(?:memory|ram)\b", re.IGNORECASE),
+    "desired_count": re.compile(r"\b(?:replicas?|desired[ _]count|tasks|instances|containers|copies|scale)\b",
+                                re.IGNORECASE),
+    "port": re.compile(r"\bports?\b", re.IGNORECASE),
+}
+
+
+@dataclass
+class TemplatePlan:
+    """A selected template and the values it is rendered with; serializable with to_dict()"""
+    runtime: str
+    app_name: str
+    port: int
+    database: Optional[str] = None
+    cache: bool = False
+    env_names: List[str] = field(default_factory=list)
+    cpu: Optional[int] = None        # Fargate cpu units; None = the runtime's default
+    memory: Optional[int] = None     # MiB; None = the runtime's default
+    desired_count: int = 1
+
+    @property
+    def name(self) -> str:
+        parts = ["ecs-fargate-alb"]
+        if self.database:
+            parts.append(f"rds-{self.database}")
+        if self.cache:
+            parts.append("redis")
+        return "+".join(parts)
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["name"] = self.name
+        data["version"] = TEMPLATE_VERSION
+        return data
+
+
+def _app_name(repo_url: str) -> str:
+    # ALB/target group names are capped at 32 characters, suffixes included
+    name = re.sub(r"[^a-z0-9-]+", "-", (repo_url or "").rstrip("/").rpartition("/")[2].lower().removesuffix(".git"))
+    name = name.strip("-")[:20].strip("-")
+    return name if name[:1].isalpha() else f"app-{name}".strip("-")[:20]
+
+
+def _memory_mib(value: str, unit: Optional[str]) -> int:
+    unit = (unit or "m").lower()
+    return round(float(value) * 1024) if unit.startswith("g") else round(float(value))
+
+
+def request_sizing(user_input: str) -> Optional[Dict[str, int]]:
+    """
+    cpu (units), memory (MiB), desired_count and port the request asks for. None
+    when it talks about sizing in a way that cannot be read or that Fargate cannot
+    run, so the LLM handles it instead of the template dropping it.
+    """
+    sizing: Dict[str, int] = {}
+    for regex in _CPU_RES:
+        for match in regex.finditer(user_input):
+            number, unit = (match.group(1), match.group(2)) if regex is _CPU_RES[0] else (match.group(2), match.group(1))
+            value = float(number)
+            sizing["cpu"] = round(value) if "unit" in unit.lower() or value >= 128 else round(value * 1024)
+    for regex in _MEMORY_RES:
+        for match in regex.finditer(user_input):
+            sizing["memory"] = _memory_mib(match.group(1), match.group(2))
+    for regex in _TASKS_RES:
+        for match in regex.finditer(user_input):
+            sizing["desired_count"] = int(match.group(1))
+    for match in _PORT_RE.finditer(user_input):
+        sizing["port"] = int(match.group(1))
+    if any(term.search(user_input) and key not in sizing for key, term in _SIZING_TERMS.items()):
+        return None
+
+    if not 1 <= sizing.get("desired_count", 1) <= TEMPLATE_MAX_TASKS:
+        return None
+    if not 1 <= sizing.get("port", 80) <= 65535:
+        return None
+    cpu, memory = sizing.get("cpu"), sizing.get("memory")
+    if cpu is not None and cpu not in FARGATE_SIZES:
+        return None
+    if memory is not None and not any(memory in sizes for units, sizes in FARGATE_SIZES.items() if cpu in (None, units)):
+        return None
+    return sizing
+
+
+def select_template(user_input: str, repo_context: dict, env_names: List[str] = ()) -> Optional[TemplatePlan]:
+    """
+    The template for this request, or None when it needs the LLM: no analysed
+    repository, a runtime or datastore the templates do not cover, several
+    services, sizing the template cannot express, or a request mentioning
+    anything beyond ECS/ALB/RDS/ElastiCache
+    """
+    profile = (repo_context or {}).get("profile")
+    if not TERRAFORM_TEMPLATES_ENABLED or not profile or _UNSUPPORTED_RE.search(user_input):
+        return None
+    sizing = request_sizing(user_input)
+    if sizing is None:
+        return None
+    runtimes = [runtime for runtime in profile.get("runtimes", []) if runtime in TEMPLATE_RUNTIMES]
+    if len({"java" if runtime == "kotlin" else runtime for runtime in runtimes}) != 1:
+        return None
+    if len(profile.get("compose_services") or []) > 1 + len(profile.get("datastores") or []):
+        return None  # more application services than one container can express
+
+    datastores = set(profile.get("datastores") or [])
+    if datastores - {"postgres", "mysql", "redis"}:
+        return None
+    engines = [engine for engine in DATABASE_ENGINES if engine in datastores or re.search(engine, user_input, re.IGNORECASE)]
+    if len(engines) > 1:
+        return None
+    database = engines[0] if engines else ("postgres" if _DATABASE_RE.search(user_input) else None)
+
+    runtime = runtimes[0]
+    default_cpu, default_memory, _ = TEMPLATE_RUNTIMES[runtime]
+    cpu = sizing.get("cpu")
+    memory = sizing.get("memory")
+    # Fill in the half Fargate needs, staying at or above the runtime's default where it allows
+    if cpu is not None and memory is None:
+        memory = next((size for size in FARGATE_SIZES[cpu] if size >= default_memory), FARGATE_SIZES[cpu][-1])
+    elif memory is not None and cpu is None:
+        fits = [units for units, sizes in FARGATE_SIZES.items() if memory in sizes]
+        cpu = next((units for units in fits if units >= default_cpu), fits[-1])
+    return TemplatePlan(
+        runtime=runtime,
+        app_name=_app_name((repo_context or {}).get("repo_url", "")) or "app",
+        port=sizing.get("port") or profile.get("port") or RUNTIME_DEFAULT_PORTS[runtime],
+        database=database,
+        cache="redis" in datastores or bool(_CACHE_RE.search(user_input)),
+        env_names=sorted(set(env_names) | set(profile.get("env_vars") or [])),
+        cpu=cpu,
+        memory=memory,
+        desired_count=sizing.get("desired_count", 1),
+    )
+
+
+def _render(text: str, **params) -> str:
+    return _PLACEHOLDER_RE.sub(lambda match: str(params[match.group(1)]), text)
+
+
+_MAIN_TF = '''terraform {
+  required_version = ">= 1.5.0"
+  required_providers {
+    aws = {
+      source  = "hashicorp/aws"
+      version = "~> 5.0"
+    }
+  }
+}
+
+provider "aws" {
+  region = var.aws_region
+}
+
+data "aws_availability_zones" "available" {
+  state = "available"
+}
+
+locals {
+  name = var.app_name
+  azs  = slice(data.aws_availability_zones.available.names, 0, 2)
+  tags = {
+    Application = var.app_name
+    ManagedBy   = "terraform"
+  }
+}
+
+resource "aws_vpc" "main" {
+  cidr_block           = var.vpc_cidr
+  enable_dns_support   = true
+  enable_dns_hostnames = true
+  tags                 = merge(local.tags, { Name = "${local.name}-vpc" })
+}
+
+resource "aws_internet_gateway" "main" {
+  vpc_id = aws_vpc.main.id
+  tags   = local.tags
+}
+
+resource "aws_subnet" "public" {
+  count                   = length(local.azs)
+  vpc_id                  = aws_vpc.main.id
+  cidr_block              = cidrsubnet(var.vpc_cidr, 8, count.index)
+  availability_zone       = local.azs[count.index]
+  map_public_ip_on_launch = true
+  tags                    = merge(local.tags, { Name = "${local.name}-public-${count.index}" })
+}
+
+resource "aws_subnet" "private" {
+  count             = length(local.azs)
+  vpc_id            = aws_vpc.main.id
+  cidr_block        = cidrsubnet(var.vpc_cidr, 8, count.index + 10)
+  availability_zone = local.azs[count.index]
+  tags              = merge(local.tags, { Name = "${local.name}-private-${count.index}" })
+}
+
+resource "aws_route_table" "public" {
+  vpc_id = aws_vpc.main.id
+
+  route {
+    cidr_block = "0.0.0.0/0"
+    gateway_id = aws_internet_gateway.main.id
+  }
+
+  tags = local.tags
+}
+
+resource "aws_route_table_association" "public" {
+  count          = length(aws_subnet.public)
+  subnet_id      = aws_subnet.public[count.index].id
+  route_table_id = aws_route_table.public.id
+}
+'''
+
+_ALB_TF = '''resource "aws_security_group" "alb" {
+  name        = "${local.name}-alb"
+  description = "Public HTTP to the load balancer"
+  vpc_id      = aws_vpc.main.id
+
+  ingress {
+    from_port   = 80
+    to_port     = 80
+    protocol    = "tcp"
+    cidr_blocks = ["0.0.0.0/0"]
+  }
+
+  egress {
+    from_port   = 0
+    to_port     = 0
+    protocol    = "-1"
+    cidr_blocks = ["0.0.0.0/0"]
+  }
+
+  tags = local.tags
+}
+
+resource "aws_lb" "main" {
+  name               = "${local.name}-alb"
+  load_balancer_type = "application"
+  security_groups    = [aws_security_group.alb.id]
+  subnets            = aws_subnet.public[*].id
+  tags               = local.tags
+}
+
+resource "aws_lb_target_group" "app" {
+  name        = "${local.name}-tg"
+  port        = var.container_port
+  protocol    = "HTTP"
+  vpc_id      = aws_vpc.main.id
+  target_type = "ip"
+
+  health_check {
+    path                = var.health_check_path
+    matcher             = "200-399"
+    interval            = 30
+    healthy_threshold   = 2
+    unhealthy_threshold = 3
+  }
+
+  tags = local.tags
+}
+
+resource "aws_lb_listener" "http" {
+  load_balancer_arn = aws_lb.main.arn
+  port              = 80
+  protocol          = "HTTP"
+
+  default_action {
+    type             = "forward"
+    target_group_arn = aws_lb_target_group.app.arn
+  }
+}
+'''
+
+_ECS_TF = '''locals {
+  app_environment = merge(
+    { PORT = tostring(var.container_port) },{{environment_sources}}
+    var.app_environment,
+  )
+  app_secrets = concat([]{{secret_sources}})
+}
+
+resource "aws_ecs_cluster" "main" {
+  name = "${local.name}-cluster"
+
+  setting {
+    name  = "containerInsights"
+    value = "enabled"
+  }
+
+  tags = local.tags
+}
+
+resource "aws_cloudwatch_log_group" "app" {
+  name              = "/ecs/${local.name}"
+  retention_in_days = var.log_retention_days
+  tags              = local.tags
+}
+
+data "aws_iam_policy_document" "ecs_tasks_assume" {
+  statement {
+    actions = ["sts:AssumeRole"]
+
+    principals {
+      type        = "Service"
+      identifiers = ["ecs-tasks.amazonaws.com"]
+    }
+  }
+}
+
+resource "aws_iam_role" "execution" {
+  name               = "${local.name}-execution"
+  assume_role_policy = data.aws_iam_policy_document.ecs_tasks_assume.json
+  tags               = local.tags
+}
+
+resource "aws_iam_role_policy_attachment" "execution" {
+  role       = aws_iam_role.execution.name
+  policy_arn = "arn:aws:iam::aws:policy/service-role/AmazonECSTaskExecutionRolePolicy"
+}
+
+resource "aws_iam_role" "task" {
+  name               = "${local.name}-task"
+  assume_role_policy = data.aws_iam_policy_document.ecs_tasks_assume.json
+  tags               = local.tags
+}
+
+resource "aws_security_group" "app" {
+  name        = "${local.name}-app"
+  description = "Load balancer to the {{runtime}} service"
+  vpc_id      = aws_vpc.main.id
+
+  ingress {
+    from_port       = var.container_port
+    to_port         = var.container_port
+    protocol        = "tcp"
+    security_groups = [aws_security_group.alb.id]
+  }
+
+  egress {
+    from_port   = 0
+    to_port     = 0
+    protocol    = "-1"
+    cidr_blocks = ["0.0.0.0/0"]
+  }
+
+  tags = local.tags
+}
+
+resource "aws_ecs_task_definition" "app" {
+  family                   = local.name
+  requires_compatibilities = ["FARGATE"]
+  network_mode             = "awsvpc"
+  cpu                      = var.task_cpu
+  memory                   = var.task_memory
+  execution_role_arn       = aws_iam_role.execution.arn
+  task_role_arn            = aws_iam_role.task.arn
+
+  container_definitions = jsonencode([
+    {
+      name         = local.name
+      image        = var.container_image
+      essential    = true
+      portMappings = [{ containerPort = var.container_port, protocol = "tcp" }]
+      environment  = [for key, value in local.app_environment : { name = key, value = value }]
+      secrets      = local.app_secrets
+      logConfiguration = {
+        logDriver = "awslogs"
+        options = {
+          "awslogs-group"         = aws_cloudwatch_log_group.app.name
+          "awslogs-region"        = var.aws_region
+          "awslogs-stream-prefix" = "app"
+        }
+      }
+    }
+  ])
+
+  tags = local.tags
+}
+
+resource "aws_ecs_service" "app" {
+  name                              = local.name
+  cluster                           = aws_ecs_cluster.main.id
+  task_definition                   = aws_ecs_task_definition.app.arn
+  desired_count                     = var.desired_count
+  launch_type                       = "FARGATE"
+  health_check_grace_period_seconds = var.health_check_grace_period
+
+  network_configuration {
+    subnets          = aws_subnet.public[*].id
+    security_groups  = [aws_security_group.app.id]
+    assign_public_ip = true
+  }
+
+  load_balancer {
+    target_group_arn = aws_lb_target_group.app.arn
+    container_name   = local.name
+    container_port   = var.container_port
+  }
+
+  depends_on = [aws_lb_listener.http]
+  tags       = local.tags
+}
+'''
+
+_RDS_TF = '''resource "aws_db_subnet_group" "main" {
+  name       = "${local.name}-db"
+  subnet_ids = aws_subnet.private[*].id
+  tags       = local.tags
+}
+
+resource "aws_security_group" "db" {
+  name        = "${local.name}-db"
+  description = "{{engine}} from the application only"
+  vpc_id      = aws_vpc.main.id
+
+  ingress {
+    from_port       = {{db_port}}
+    to_port         = {{db_port}}
+    protocol        = "tcp"
+    security_groups = [aws_security_group.app.id]
+  }
+
+  tags = local.tags
+}
+
+resource "aws_db_instance" "main" {
+  identifier                  = "${local.name}-db"
+  engine                      = "{{engine}}"
+  engine_version              = var.db_engine_version
+  instance_class              = var.db_instance_class
+  allocated_storage           = var.db_allocated_storage
+  db_name                     = var.db_name
+  username                    = var.db_username
+  manage_master_user_password = true
+  db_subnet_group_name        = aws_db_subnet_group.main.name
+  vpc_security_group_ids      = [aws_security_group.db.id]
+  storage_encrypted           = true
+  backup_retention_period     = 7
+  skip_final_snapshot         = var.db_skip_final_snapshot
+  final_snapshot_identifier   = "${local.name}-db-final"
+  tags                        = local.tags
+}
+
+# The password lives in Secrets Manager; the task reads it at start-up
+resource "aws_iam_role_policy" "execution_db_secret" {
+  name = "${local.name}-db-secret"
+  role = aws_iam_role.execution.id
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Effect   = "Allow"
+      Action   = ["secretsmanager:GetSecretValue"]
+      Resource = [aws_db_instance.main.master_user_secret[0].secret_arn]
+    }]
+  })
+}
+
+locals {
+  database_environment = {
+    DB_HOST = aws_db_instance.main.address
+    DB_PORT = tostring(aws_db_instance.main.port)
+    DB_NAME = var.db_name
+    DB_USER = var.db_username
+  }
+  database_secrets = [
+    { name = "DB_PASSWORD", valueFrom = "${aws_db_instance.main.master_user_secret[0].secret_arn}:password::" }
+  ]
+}
+'''
+
+_ELASTICACHE_TF = '''resource "aws_elasticache_subnet_group" "main" {
+  name       = "${local.name}-cache"
+  subnet_ids = aws_subnet.private[*].id
+}
+
+resource "aws_security_group" "cache" {
+  name        = "${local.name}-cache"
+  description = "Redis from the application only"
+  vpc_id      = aws_vpc.main.id
+
+  ingress {
+    from_port       = 6379
+    to_port         = 6379
+    protocol        = "tcp"
+    security_groups = [aws_security_group.app.id]
+  }
+
+  tags = local.tags
+}
+
+resource "aws_elasticache_cluster" "main" {
+  cluster_id         = "${local.name}-cache"
+  engine             = "redis"
+  node_type          = var.cache_node_type
+  num_cache_nodes    = 1
+  port               = 6379
+  subnet_group_name  = aws_elasticache_subnet_group.main.name
+  security_group_ids = [aws_security_group.cache.id]
+  tags               = local.tags
+}
+
+locals {
+  cache_environment = {
+    REDIS_HOST = aws_elasticache_cluster.main.cache_nodes[0].address
+    REDIS_PORT = "6379"
+    REDIS_URL  = "redis://${aws_elasticache_cluster.main.cache_nodes[0].address}:6379"
+  }
+}
+'''
+
+_VARIABLES_TF = '''variable "aws_region" {
+  type    = string
+  default = "us-east-1"
+}
+
+variable "app_name" {
+  description = "Prefix for resource names (lowercase, at most 20 characters)"
+  type        = string
+  default     = "{{app_name}}"
+}
+
+variable "vpc_cidr" {
+  type    = string
+  default = "10.0.0.0/16"
+}
+
+variable "container_image" {
+  description = "Image to run, e.g. <account>.dkr.ecr.<region>.amazonaws.com/{{app_name}}:latest"
+  type        = string
+}
+
+variable "container_port" {
+  type    = number
+  default = {{port}}
+}
+
+variable "task_cpu" {
+  type    = number
+  default = {{cpu}}
+}
+
+variable "task_memory" {
+  type    = number
+  default = {{memory}}
+}
+
+variable "desired_count" {
+  type    = number
+  default = {{desired_count}}
+}
+
+variable "health_check_path" {
+  type    = string
+  default = "/"
+}
+
+variable "health_check_grace_period" {
+  type    = number
+  default = {{grace}}
+}
+
+variable "log_retention_days" {
+  type    = number
+  default = 14
+}
+
+variable "app_environment" {
+  description = "Extra environment variables for the container (see terraform.tfvars.example)"
+  type        = map(string)
+  default     = {}
+}
+'''
+
+_DATABASE_VARIABLES_TF = '''
+variable "db_engine_version" {
+  type    = string
+  default = "{{engine_version}}"
+}
+
+variable "db_instance_class" {
+  type    = string
+  default = "db.t3.micro"
+}
+
+variable "db_allocated_storage" {
+  type    = number
+  default = 20
+}
+
+variable "db_name" {
+  type    = string
+  default = "{{db_name}}"
+}
+
+variable "db_username" {
+  type    = string
+  default = "app"
+}
+
+variable "db_skip_final_snapshot" {
+  type    = bool
+  default = false
+}
+'''
+
+_CACHE_VARIABLES_TF = '''
+variable "cache_node_type" {
+  type    = string
+  default = "cache.t3.micro"
+}
+'''
+
+_OUTPUTS_TF = '''output "app_url" {
+  value = "http://${aws_lb.main.dns_name}"
+}
+
+output "ecs_cluster_name" {
+  value = aws_ecs_cluster.main.name
+}
+
+output "ecs_service_name" {
+  value = aws_ecs_service.app.name
+}
+
+output "log_group" {
+  value = aws_cloudwatch_log_group.app.name
+}
+'''
+
+_DATABASE_OUTPUTS_TF = '''
+output "db_endpoint" {
+  value = aws_db_instance.main.endpoint
+}
+
+output "db_password_secret_arn" {
+  value = aws_db_instance.main.master_user_secret[0].secret_arn
+}
+'''
+
+_CACHE_OUTPUTS_TF = '''
+output "redis_endpoint" {
+  value = aws_elasticache_cluster.main.cache_nodes[0].address
+}
+'''
+
+# Set by the templates themselves, so not repeated in the example tfvars
+_PROVIDED_ENV = {"PORT", "DB_HOST", "DB_PORT", "DB_NAME", "DB_USER", "DB_PASSWORD", "REDIS_HOST", "REDIS_PORT", "REDIS_URL"}
+
+
+def render_template(plan: TemplatePlan) -> Dict[str, str]:
+    """Files for the plan (name -> content); deterministic, no I/O"""
+    default_cpu, default_memory, grace = TEMPLATE_RUNTIMES[plan.runtime]
+    cpu, memory = plan.cpu or default_cpu, plan.memory or default_memory
+    environment_sources, secret_sources = "", ""
+    variables, outputs = _VARIABLES_TF, _OUTPUTS_TF
+    files = {"main.tf": _MAIN_TF, "alb.tf": _ALB_TF}
+    if plan.database:
+        db_port, engine_version = DATABASE_ENGINES[plan.database]
+        db_name = re.sub(r"[^a-z0-9]", "", plan.app_name)
+        files["rds.tf"] = _render(_RDS_TF, engine=plan.database, db_port=db_port)
+        variables += _render(_DATABASE_VARIABLES_TF, engine_version=engine_version,
+                             db_name=db_name if db_name[:1].isalpha() else f"app{db_name}")
+        outputs += _DATABASE_OUTPUTS_TF
+        environment_sources += "\n    local.database_environment,"
+        secret_sources += ", local.database_secrets"
+    if plan.cache:
+        files["elasticache.tf"] = _ELASTICACHE_TF
+        variables += _CACHE_VARIABLES_TF
+        outputs += _CACHE_OUTPUTS_TF
+        environment_sources += "\n    local.cache_environment,"
+
+    files["ecs.tf"] = _render(_ECS_TF, runtime=plan.runtime, environment_sources=environment_sources,
+                              secret_sources=secret_sources)
+    files["variables.tf"] = _render(variables, app_name=plan.app_name, port=plan.port, cpu=cpu, memory=memory,
+                                    desired_count=plan.desired_count, grace=grace)
+    files["outputs.tf"] = outputs
+
+    example_env = "".join(f'  {name} = ""\n' for name in plan.env_names if name not in _PROVIDED_ENV)
+    files["terraform.tfvars.example"] = (
+        f'container_image = "<account>.dkr.ecr.<region>.amazonaws.com/{plan.app_name}:latest"\n\n'
+        f"app_environment = {{\n{example_env}}}\n"
+    )
+    return files
@@ -0,0 +1,279 @@
+import os
+import re
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+from core.metrics import registry
+
+try:
+    import hcl2
+except ImportError:  # python-hcl2 is optional; syntax falls back to the structural scanner below
+    hcl2 = None
+
+TERRAFORM_VALIDATION_WORKERS = int(os.getenv("TERRAFORM_VALIDATION_WORKERS", "2"))
+# Diagnostics listed in the chat message; all of them are stored with the job
+TERRAFORM_VALIDATION_SHOWN = int(os.getenv("TERRAFORM_VALIDATION_SHOWN", "5"))
+
+validation_total = registry.counter(
+    "terraform_validation_total", "Generated terraform validations", ("result",)
+)
+validation_seconds = registry.histogram(
+    "terraform_validation_seconds", "Time to validate one generation",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, float("inf"))
+)
+
+_BLOCK_RE = re.compile(r'^\s*(resource|data|module|variable|output)\s+"?([\w-]+)"?(?:\s+"?([\w-]+)"?)?\s*\{')
+_VAR_REF_RE = re.compile(r"\bvar\.([A-Za-z_][\w-]*)")
+# Closing brace, `name = ...`, or a block header `type "label" ... {`
+_TOP_LEVEL_RE = re.compile(r'^\s*(?:\}|[A-Za-z_][\w-]*\s*=|[A-Za-z_][\w-]*(?:\s+(?:"[^"]*"|[A-Za-z_][\w-]*))*\s*\{)')
+_HEREDOC_RE = re.compile(r"<<-?\s*([A-Za-z_]\w*)")
+_CLOSERS = {"}": "{", "]": "[", ")": "("}
+
+
+def _diagnostic(file: str, line: int, message: str, severity: str = "error", check: str = "syntax") -> dict:
+    return {"file": file, "line": line, "severity": severity, "check": check, "message": message}
+
+
+def _scan(name: str, text: str) -> Tuple[List[dict], str, List[int]]:
+    """
+    One pass over the file: bracket/string/heredoc structure errors, the text
+    with comments blanked out (line numbers preserved), and the nesting depth
+    at the start of every line.
+    """
+    errors, code, depths = [], [], []
+    stack: List[Tuple[str, int]] = []  # '"' string, '${' interpolation, or an opening bracket
+    line, i, n = 1, 0, len(text)
+    heredoc: Optional[str] = None
+    depths.append(0)
+
+    while i < n:
+        char = text[i]
+        if char == "\n":
+            if stack and stack[-1][0] == '"':
+                errors.append(_diagnostic(name, stack[-1][1], "Unterminated string"))
+                stack.pop()
+            code.append(char)
+            line += 1
+            i += 1
+            depths.append(sum(1 for opener, _ in stack if opener in "{[("))
+            if heredoc is not None:
+                end = text.find("\n", i)
+                end = n if end < 0 else end
+                if text[i:end].strip() == heredoc:
+                    heredoc = None
+            continue
+        if heredoc is not None:
+            code.append(char)
+            i += 1
+            continue
+
+        in_string = bool(stack) and stack[-1][0] == '"'
+        if in_string:
+            if char == "\\":
+                code.append(text[i:i + 2])
+                i += 2
+                continue
+            if char == '"':
+                stack.pop()
+            elif text.startswith("${", i) or text.startswith("%{", i):
+                stack.append(("${", line))
+                code.append(text[i:i + 2])
+                i += 2
+                continue
+            code.append(char)
+            i += 1
+            continue
+
+        if char == "#" or text.startswith("//", i):
+            end = text.find("\n", i)
+            end = n if end < 0 else end
+            code.append(" " * (end - i))
+            i = end
+            continue
+        if text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            if end < 0:
+                errors.append(_diagnostic(name, line, "Unterminated block comment"))
+                end = n
+            else:
+                end += 2
+            comment = text[i:end]
+            code.append(re.sub(r"[^\n]", " ", comment))
+            line += comment.count("\n")
+            depths.extend([depths[-1]] * comment.count("\n"))
+            i = end
+            continue
+        if char == "<" and text.startswith("<<", i):
+            match = _HEREDOC_RE.match(text, i)
+            if match:
+                heredoc = match.group(1)
+                code.append(match.group(0))
+                i = match.end()
+                continue
+        if char == "`" and text.startswith("```", i):
+            errors.append(_diagnostic(name, line, "Markdown code fence in HCL"))
+        elif char == '"':
+            stack.append(('"', line))
+        elif char in "{[(":
+            stack.append((char, line))
+        elif char in _CLOSERS:
+            if char == "}" and stack and stack[-1][0] == "${":
+                stack.pop()
+            elif stack and stack[-1][0] == _CLOSERS[char]:
+                stack.pop()
+            else:
+                errors.append(_diagnostic(name, line, f"Unexpected '{char}'"))
+        code.append(char)
+        i += 1
+
+    if heredoc is not None:
+        errors.append(_diagnostic(name, line, f"Unterminated heredoc <<{heredoc}"))
+    for opener, opened_at in stack:
+        label = "string" if opener == '"' else f"'{opener}'"
+        errors.append(_diagnostic(name, opened_at, f"Unclosed {label} (file ends at line {line})"))
+    return errors, "".join(code), depths
+
+
+def line_depths(text: str) -> List[int]:
+    """Bracket nesting depth at the start of every line (strings, heredocs and comments skipped)"""
+    return _scan("", text)[2]
+
+
+def _hcl2_errors(name: str, text: str) -> List[dict]:
+    try:
+        hcl2.loads(text)
+    except Exception as e:
+        message = str(e).strip().splitlines()[0] if str(e).strip() else type(e).__name__
+        return [_diagnostic(name, getattr(e, "line", None) or 1, message)]
+    return []
+
+
+def inspect_file(name: str, text: str) -> dict:
+    """
+    Per-file pass, run in the process pool: syntax diagnostics plus the
+    declarations, block addresses and variable references the cross-file
+    checks need
+    """
+    scan_errors, code, depths = _scan(name, text)
+    errors = _hcl2_errors(name, text) if hcl2 is not None else scan_errors
+
+    declared, blocks, refs = {}, [], []
+    for number, source in enumerate(code.split("\n"), start=1):
+        top_level = number - 1 < len(depths) and depths[number - 1] == 0
+        if top_level:
+            match = _BLOCK_RE.match(source)
+            if match:
+                kind, first, second = match.groups()
+                if kind == "variable":
+                    declared.setdefault(first, number)
+                address = {
+                    "resource": f"{first}.{second}",
+                    "data": f"data.{first}.{second}",
+                    "module": f"module.{first}",
+                    "variable": f"var.{first}",
+                    "output": f"output.{first}",
+                }[kind]
+                blocks.append((address, number))
+            elif hcl2 is None and source.strip() and not _TOP_LEVEL_RE.match(source):
+                errors.append(_diagnostic(name, number, f"Not an HCL block or attribute: {source.strip()[:60]}"))
+        refs.extend((ref, number) for ref in _VAR_REF_RE.findall(source))
+    return {"file": name, "errors": errors, "declared": declared, "blocks": blocks, "refs": refs}
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: forking a process that already runs threads (to_thread, boto3) is unsafe
+        _pool = ProcessPoolExecutor(TERRAFORM_VALIDATION_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_validation_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def _inspect_all(files: Dict[str, str]) -> List[dict]:
+    global _pool
+    loop = asyncio.get_running_loop()
+    try:
+        pool = _get_pool()
+        return await asyncio.gather(*(loop.run_in_executor(pool, inspect_file, name, text) for name, text in files.items()))
+    except (BrokenProcessPool, OSError) as e:
+        print(f"⚠️ Validation pool unavailable, validating in a thread: {str(e)}")
+        _pool = None
+        return await asyncio.to_thread(lambda: [inspect_file(name, text) for name, text in files.items()])
+
+
+async def validate_terraform(files: Dict[str, str]) -> dict:
+    """
+    Syntax-check each .tf/.tfvars file in parallel worker processes, then check
+    across files that every var.x is declared and that no block address is
+    defined twice. Returns a JSON-serializable report.
+    """
+    started = time.perf_counter()
+    hcl_files = {name: text for name, text in files.items() if name.endswith((".tf", ".tfvars"))}
+    reports = await _inspect_all(hcl_files)
+
+    diagnostics = [error for report in reports for error in report["errors"]]
+    tf_reports = [report for report in reports if report["file"].endswith(".tf")]
+    declared = {var for report in tf_reports for var in report["declared"]}
+    first_seen = {}
+    for report in tf_reports:
+        for address, line in report["blocks"]:
+            if address in first_seen:
+                other_file, other_line = first_seen[address]
+                diagnostics.append(_diagnostic(
+                    report["file"], line, f"Duplicate {address} (first defined in {other_file}:{other_line})", check="duplicate"
+                ))
+            else:
+                first_seen[address] = (report["file"], line)
+        reported = set()
+        for var, line in report["refs"]:
+            if var not in declared and var not in reported:
+                reported.add(var)
+                diagnostics.append(_diagnostic(report["file"], line, f"Undeclared variable '{var}'", check="undeclared_variable"))
+    used = {var for report in tf_reports for var, _ in report["refs"]}
+    for report in tf_reports:
+        for var, line in report["declared"].items():
+            if var not in used:
+                diagnostics.append(_diagnostic(report["file"], line, f"Variable '{var}' is declared but never used",
+                                               severity="warning", check="unused_variable"))
+
+    diagnostics.sort(key=lambda d: (d["severity"] != "error", d["file"], d["line"]))
+    errors = sum(1 for d in diagnostics if d["severity"] == "error")
+    elapsed = time.perf_counter() - started
+    validation_total.inc(result="valid" if not errors else "invalid")
+    validation_seconds.observe(elapsed)
+    return {
+        "valid": errors == 0,
+        "parser": "python-hcl2" if hcl2 is not None else "builtin",
+        "errors": errors,
+        "warnings": len(diagnostics) - errors,
+        "files": sorted(hcl_files),
+        "diagnostics": diagnostics,
+        "elapsed_ms": round(elapsed * 1000, 1),
+    }
+
+
+def failing_files(report: dict) -> List[str]:
+    return sorted({d["file"] for d in report.get("diagnostics", []) if d["severity"] == "error"})
+
+
+def format_diagnostics(report: dict, limit: int = TERRAFORM_VALIDATION_SHOWN) -> str:
+    repaired = f"🔧 Fixed after re-prompting: {', '.join(report['repaired'])}\n" if report.get("repaired") else ""
+    if report.get("valid"):
+        count = len(report["files"])
+        return f"✅ Validation passed ({count} file{'s' if count != 1 else ''}, {report['warnings']} warnings)\n{repaired}"
+    shown = [d for d in report["diagnostics"] if d["severity"] == "error"][:limit]
+    lines = "".join(f"- `{d['file']}:{d['line']}` {d['message']}\n" for d in shown)
+    more = f"- ... and {report['errors'] - len(shown)} more\n" if report["errors"] > len(shown) else ""
+    return f"⚠️ Validation found {report['errors']} errors:\n{lines}{more}{repaired}"
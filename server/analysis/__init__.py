@@ -0,0 +1,3 @@
+from fastapi import APIRouter
+
+analysis_router = APIRouter(prefix="/analysis", tags=["analysis"])
\ No newline at end of file
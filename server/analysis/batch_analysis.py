@@ -0,0 +1,85 @@
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from analysis import analysis_router
+from analysis.schemas.batch_analysis_schema import BatchAnalysisRequest
+from agents.batch_analyzer import batch_jobs, BATCH_MAX_REPOS
+from agents.intent_classifier import GITHUB_URL_RE
+from core.context_vars import user_id_ctx
+from core.utility import create_response
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _current_user_id() -> int:
+    user_context = user_id_ctx.get()
+    if not user_context or not hasattr(user_context, 'user_id'):
+        raise HTTPException(status_code=401, detail="User not authenticated")
+    return user_context.user_id
+
+
+def _get_own_job(job_id: str, user_id: int):
+    job = batch_jobs.get(job_id)
+    if job is None or job.user_id != user_id:
+        return None
+    return job
+
+
+@analysis_router.post("/batch")
+async def start_batch_analysis(batch_data: BatchAnalysisRequest):
+    """
+    Analyze many repositories concurrently. Streams NDJSON events: `job` (with the
+    job_id handle), then `started` / `progress` / `completed` / `failed` per repo,
+    and a final `done`.
+    """
+    user_id = _current_user_id()
+
+    # Drop duplicates but keep the submitted order
+    repo_urls = list(dict.fromkeys(url.strip().rstrip("/") for url in batch_data.repo_urls))
+    invalid = [url for url in repo_urls if not GITHUB_URL_RE.fullmatch(url)]
+    if invalid:
+        raise HTTPException(status_code=422, detail=f"Not GitHub repository URLs: {invalid[:5]}")
+    if len(repo_urls) > BATCH_MAX_REPOS:
+        raise HTTPException(status_code=422, detail=f"At most {BATCH_MAX_REPOS} repositories per batch")
+
+    job = batch_jobs.create(repo_urls, user_id, batch_data.summarize)
+    print(f"📦 Batch analysis {job.job_id}: {len(repo_urls)} repos for user {user_id}")
+
+    async def event_stream():
+        async for event in job.follow():
+            yield json.dumps(event, default=str) + "\n"
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+
+@analysis_router.get("/batch/{job_id}")
+async def get_batch_analysis(job_id: str):
+    job = _get_own_job(job_id, _current_user_id())
+    if job is None:
+        return create_response(404, "batch_not_found", "Error")
+    return job.snapshot()
+
+
+@analysis_router.get("/batch/{job_id}/events")
+async def follow_batch_analysis(job_id: str):
+    """Replay a batch's events from the start and follow it live (e.g. after a reconnect)"""
+    job = _get_own_job(job_id, _current_user_id())
+    if job is None:
+        return create_response(404, "batch_not_found", "Error")
+
+    async def event_stream():
+        async for event in job.follow():
+            yield json.dumps(event, default=str) + "\n"
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+
+@analysis_router.delete("/batch/{job_id}")
+async def cancel_batch_analysis(job_id: str):
+    job = _get_own_job(job_id, _current_user_id())
+    if job is None:
+        return create_response(404, "batch_not_found", "Error")
+    if not job.cancel():
+        return create_response(409, "batch_already_finished", "Error")
+    return create_response(200, "batch_cancelled", "Success")
@@ -0,0 +1,11 @@
+from pydantic import BaseModel, Field
+from typing import List
+
+
+'''REQUEST SCHEMA SECTION'''
+
+
+class BatchAnalysisRequest(BaseModel):
+    repo_urls: List[str] = Field(min_length=1)
+    # Profiles are built without the LLM; set to also stream an AI summary per repo
+    summarize: bool = False
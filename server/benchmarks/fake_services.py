@@ -0,0 +1,365 @@
+"""
+Local stand-ins for the services the app talks to, used by load_benchmark:
+a streaming Ollama server, a GitHub API serving generated fixture repos, and
+an in-memory DynamoDB table (MySQL is replaced by SQLite through DATABASE_URL).
+"""
+import io
+import json
+import time
+import asyncio
+import tarfile
+import hashlib
+from aiohttp import web
+
+# Valid for both validators, so generations finish without a repair round
+TERRAFORM_REPLY = '''### FILE: main.tf
+```hcl
+terraform {
+  required_providers {
+    aws = {
+      source  = "hashicorp/aws"
+      version = "~> 5.0"
+    }
+  }
+}
+
+provider "aws" {
+  region = var.region
+}
+
+resource "aws_dynamodb_table" "items" {
+  name         = "${var.app_name}-items"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "id"
+
+  attribute {
+    name = "id"
+    type = "S"
+  }
+}
+
+resource "aws_iam_role" "lambda" {
+  name = "${var.app_name}-lambda"
+  assume_role_policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Action    = "sts:AssumeRole"
+      Effect    = "Allow"
+      Principal = { Service = "lambda.amazonaws.com" }
+    }]
+  })
+}
+
+resource "aws_lambda_function" "api" {
+  function_name = "${var.app_name}-api"
+  role          = aws_iam_role.lambda.arn
+  handler       = "main.handler"
+  runtime       = "python3.12"
+  filename      = var.package_path
+
+  environment {
+    variables = {
+      TABLE_NAME = aws_dynamodb_table.items.name
+    }
+  }
+}
+```
+
+### FILE: variables.tf
+```hcl
+variable "region" {
+  type    = string
+  default = "us-east-1"
+}
+
+variable "app_name" {
+  type    = string
+  default = "bench"
+}
+
+variable "package_path" {
+  type    = string
+  default = "build/lambda.zip"
+}
+```
+
+### FILE: outputs.tf
+```hcl
+output "function_name" {
+  value = aws_lambda_function.api.function_name
+}
+```
+'''
+
+# A repair round gets back the first file on its own
+REPAIR_REPLY = "```hcl" + TERRAFORM_REPLY.split("```hcl", 1)[1].split("```", 1)[0] + "```\n"
+
+FILLER_WORDS = (
+    "Use multi-stage builds, pin base image digests, run as a non-root user, keep layers small, "
+    "scan images in CI, and cache dependencies before copying the source tree."
+).split()
+
+
+def _tokens(text: str, size: int = 4) -> list:
+    """Roughly model-sized pieces: terraform is streamed a few characters at a time"""
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class FakeOllama:
+    """
+    /api/chat with configurable time-to-first-token and tokens/sec. Terraform
+    prompts get a fixed multi-file answer, everything else `reply_tokens` words.
+    """
+    def __init__(self, ttft: float = 0.2, tokens_per_sec: float = 50, reply_tokens: int = 120):
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.reply_tokens = reply_tokens
+        self.requests = 0
+
+    def _reply(self, messages: list) -> list:
+        system = messages[0].get("content", "") if messages else ""
+        if "You fix Terraform" in system:
+            return _tokens(REPAIR_REPLY)
+        if "terraform" in system.lower():
+            return _tokens(TERRAFORM_REPLY)
+        return [FILLER_WORDS[i % len(FILLER_WORDS)] + " " for i in range(self.reply_tokens)]
+
+    def _final(self, model: str, prompt_chars: int, tokens: int, started: float) -> dict:
+        elapsed_ns = int((time.perf_counter() - started) * 1e9)
+        return {
+            "model": model, "created_at": "2024-01-01T00:00:00Z",
+            "message": {"role": "assistant", "content": ""},
+            "done": True, "done_reason": "stop",
+            "total_duration": elapsed_ns, "load_duration": 0,
+            "prompt_eval_count": prompt_chars // 4, "prompt_eval_duration": int(self.ttft * 1e9),
+            "eval_count": tokens, "eval_duration": max(elapsed_ns - int(self.ttft * 1e9), 1),
+        }
+
+    async def chat(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        body = await request.json()
+        started = time.perf_counter()
+        model = body.get("model", "bench")
+        tokens = self._reply(body.get("messages", []))
+        prompt_chars = sum(len(m.get("content", "")) for m in body.get("messages", []))
+
+        if not body.get("stream", True):
+            await asyncio.sleep(self.ttft + len(tokens) / self.tokens_per_sec)
+            final = self._final(model, prompt_chars, len(tokens), started)
+            final["message"]["content"] = "".join(tokens)
+            return web.json_response(final)
+
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        await asyncio.sleep(self.ttft)
+        first = time.perf_counter()
+        for idx, token in enumerate(tokens):
+            # Paced against the clock so slow writes do not lower the rate further
+            delay = first + idx / self.tokens_per_sec - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            line = {"model": model, "created_at": "2024-01-01T00:00:00Z",
+                    "message": {"role": "assistant", "content": token}, "done": False}
+            await response.write(json.dumps(line).encode() + b"\n")
+        await response.write(json.dumps(self._final(model, prompt_chars, len(tokens), started)).encode() + b"\n")
+        await response.write_eof()
+        return response
+
+    async def embed(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        inputs = body.get("input", [])
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        vectors = []
+        for text in inputs:
+            digest = hashlib.sha256(text.encode()).digest()
+            vectors.append([(byte - 128) / 128 for byte in digest])
+        return web.json_response({"model": body.get("model", "bench"), "embeddings": vectors})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/api/chat", self.chat)
+        app.router.add_post("/api/embed", self.embed)
+        app.router.add_get("/api/tags", lambda request: web.json_response({"models": []}))
+        return app
+
+
+def fixture_repo(index: int, extra_files: int = 40) -> dict:
+    """path -> content for bench/app<index>; node, python and go services in turn"""
+    kind = ("node", "python", "go")[index % 3]
+    files = {
+        "README.md": f"# app{index}\n\nFixture service for load tests.\n",
+        ".env.example": "DATABASE_URL=\nREDIS_URL=\nPORT=8080\n",
+        "Dockerfile": {
+            "node": "FROM node:20-alpine\nWORKDIR /app\nCOPY . .\nRUN npm ci\nEXPOSE 8080\nCMD [\"node\", \"server.js\"]\n",
+            "python": "FROM python:3.12-slim\nWORKDIR /app\nCOPY . .\nRUN pip install -r requirements.txt\nEXPOSE 8080\nCMD [\"uvicorn\", \"main:app\"]\n",
+            "go": "FROM golang:1.22 AS build\nWORKDIR /src\nCOPY . .\nRUN go build -o /app\nFROM gcr.io/distroless/base\nCOPY --from=build /app /app\nEXPOSE 8080\nCMD [\"/app\"]\n",
+        }[kind],
+    }
+    if kind == "node":
+        files["package.json"] = json.dumps({
+            "name": f"app{index}", "version": "1.0.0", "scripts": {"start": "node server.js"},
+            "dependencies": {"express": "^4.19.0", "pg": "^8.11.0", "redis": "^4.6.0"},
+        }, indent=2)
+        source = ("src/handler{}.js", "module.exports = (req, res) => res.json({{ ok: {} }});\n")
+    elif kind == "python":
+        files["requirements.txt"] = "fastapi==0.110.0\nuvicorn==0.29.0\nsqlalchemy==2.0.29\npsycopg2-binary==2.9.9\n"
+        files["pyproject.toml"] = f"[project]\nname = \"app{index}\"\nversion = \"1.0.0\"\n"
+        source = ("app/routes/route{}.py", "def handler():\n    return {{\"ok\": {}}}\n")
+    else:
+        files["go.mod"] = f"module example.com/app{index}\n\ngo 1.22\n\nrequire github.com/lib/pq v1.10.9\n"
+        source = ("internal/handler{}.go", "package internal\n\nfunc Handler{0}() int {{ return {0} }}\n")
+    for n in range(extra_files):
+        files[source[0].format(n)] = source[1].format(n)
+    return files
+
+
+class FakeGitHub:
+    """
+    The GitHub endpoints the repo analyzer uses, for repos bench/app0..app<N-1>.
+    Responses carry ETags (conditional requests get 304s) and a generous rate limit.
+    """
+    def __init__(self, repos: int = 50, latency: float = 0.02, extra_files: int = 40):
+        self.latency = latency
+        self.requests = 0
+        self.repos = {}
+        for index in range(repos):
+            files = fixture_repo(index, extra_files)
+            commit = hashlib.sha1(f"app{index}-commit".encode()).hexdigest()
+            tree_sha = hashlib.sha1(json.dumps(files, sort_keys=True).encode()).hexdigest()
+            self.repos[f"app{index}"] = {"files": files, "commit": commit, "tree": tree_sha}
+
+    def _headers(self, etag: str = None) -> dict:
+        headers = {
+            "X-RateLimit-Limit": "100000", "X-RateLimit-Remaining": "99999",
+            "X-RateLimit-Reset": str(int(time.time()) + 3600), "X-RateLimit-Resource": "core",
+        }
+        if etag:
+            headers["ETag"] = f'"{etag}"'
+        return headers
+
+    async def _repo(self, request: web.Request) -> dict:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        repo = self.repos.get(request.match_info["repo"])
+        if repo is None or request.match_info["owner"] != "bench":
+            raise web.HTTPNotFound(text=json.dumps({"message": "Not Found"}), content_type="application/json")
+        return repo
+
+    def _conditional(self, request: web.Request, etag: str, make_response):
+        if request.headers.get("If-None-Match") == f'"{etag}"':
+            return web.Response(status=304, headers=self._headers(etag))
+        return make_response()
+
+    async def repository(self, request: web.Request) -> web.Response:
+        repo = await self._repo(request)
+        etag = hashlib.sha1(repo["commit"].encode()).hexdigest()
+        return self._conditional(request, etag, lambda: web.json_response(
+            {"name": request.match_info["repo"], "full_name": f"bench/{request.match_info['repo']}",
+             "default_branch": "main", "private": False}, headers=self._headers(etag)))
+
+    async def commit(self, request: web.Request) -> web.Response:
+        repo = await self._repo(request)
+        if request.match_info["ref"] not in ("main", repo["commit"]):
+            return web.json_response({"message": "No commit found"}, status=422, headers=self._headers())
+        return self._conditional(request, repo["commit"], lambda: web.Response(
+            text=repo["commit"], headers=self._headers(repo["commit"])))
+
+    async def tree(self, request: web.Request) -> web.Response:
+        repo = await self._repo(request)
+        entries = [
+            {"path": path, "mode": "100644", "type": "blob", "size": len(content.encode()),
+             "sha": hashlib.sha1(content.encode()).hexdigest(), "url": ""}
+            for path, content in sorted(repo["files"].items())
+        ]
+        return self._conditional(request, repo["tree"], lambda: web.json_response(
+            {"sha": repo["tree"], "url": "", "tree": entries, "truncated": False}, headers=self._headers(repo["tree"])))
+
+    async def contents(self, request: web.Request) -> web.Response:
+        repo = await self._repo(request)
+        content = repo["files"].get(request.match_info["path"])
+        if content is None:
+            return web.json_response({"message": "Not Found"}, status=404, headers=self._headers())
+        return web.Response(text=content, headers=self._headers())
+
+    async def tarball(self, request: web.Request) -> web.Response:
+        repo = await self._repo(request)
+        buffer = io.BytesIO()
+        prefix = f"bench-{request.match_info['repo']}-{repo['commit'][:7]}"
+        with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+            for path, content in repo["files"].items():
+                data = content.encode()
+                info = tarfile.TarInfo(f"{prefix}/{path}")
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+        return web.Response(body=buffer.getvalue(), content_type="application/x-gzip", headers=self._headers())
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        base = "/repos/{owner}/{repo}"
+        app.router.add_get(base, self.repository)
+        app.router.add_get(base + "/commits/{ref:.+}", self.commit)
+        app.router.add_get(base + "/git/trees/{sha}", self.tree)
+        app.router.add_get(base + "/contents/{path:.+}", self.contents)
+        app.router.add_get(base + "/tarball", self.tarball)
+        app.router.add_get(base + "/tarball/{ref:.+}", self.tarball)
+        return app
+
+
+class MemoryTable:
+    """
+    The subset of a boto3 DynamoDB Table the app uses (put_item, query with
+    equality key/filter conditions). `latency` is spent blocking, like boto3.
+    """
+    def __init__(self, latency: float = 0.005, hash_key: str = "chat_id", sort_key: str = "timestamp",
+                 indexes: dict = None):
+        self.latency = latency
+        self.hash_key = hash_key
+        self.sort_key = sort_key
+        self.indexes = indexes or {"user_chat_index": "user_id"}
+        self._items = {}
+
+    @staticmethod
+    def _matches(item: dict, condition) -> bool:
+        if condition is None:
+            return True
+        expression = condition.get_expression()
+        operator, values = expression["operator"], expression["values"]
+        if operator == "AND":
+            return all(MemoryTable._matches(item, value) for value in values)
+        if operator == "=":
+            return item.get(values[0].name) == values[1]
+        raise NotImplementedError(f"condition operator {operator}")
+
+    def put_item(self, Item: dict, **kwargs) -> dict:
+        time.sleep(self.latency)
+        if any(isinstance(value, float) for value in Item.values()):
+            # Same rejection as boto3's serializer
+            raise TypeError("Float types are not supported. Use Decimal types instead.")
+        self._items[(Item[self.hash_key], Item.get(self.sort_key))] = dict(Item)
+        return {}
+
+    def query(self, KeyConditionExpression=None, FilterExpression=None, IndexName=None,
+              ScanIndexForward=True, Limit=None, **kwargs) -> dict:
+        time.sleep(self.latency)
+        items = [
+            item for item in self._items.values()
+            if self._matches(item, KeyConditionExpression) and self._matches(item, FilterExpression)
+        ]
+        items.sort(key=lambda item: str(item.get(self.sort_key, "")), reverse=not ScanIndexForward)
+        items = items[:Limit] if Limit else items
+        return {"Items": [dict(item) for item in items], "Count": len(items)}
+
+
+def run_fake_services(ollama_port: int, github_port: int, ollama: dict, github: dict, ready):
+    """Process entry point: serve both fakes until terminated"""
+    async def serve():
+        runners = []
+        for service, port in ((FakeOllama(**ollama), ollama_port), (FakeGitHub(**github), github_port)):
+            runner = web.AppRunner(service.app(), access_log=None)
+            await runner.setup()
+            await web.TCPSite(runner, "127.0.0.1", port).start()
+            runners.append(runner)
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
@@ -0,0 +1,83 @@
+"""
+Micro-benchmark and accuracy comparison for the intent classifier, on the
+labelled utterances of tests/test_intent_classifier.py.
+
+Run from the server directory:
+    python -m benchmarks.intent_benchmark
+"""
+import re
+import time
+from agents.intent_classifier import (
+    IntentClassifier, INTENT_RULES,
+    REPO_ANALYZER, TERRAFORM_GENERATOR, DEPLOYMENT_VALIDATOR, CHAT_AGENT
+)
+from tests.test_intent_classifier import ACCURACY_SET
+
+
+def legacy_route(text: str) -> str:
+    """The keyword scan route_to_agent used before the classifier"""
+    if re.search(r"https://github\.com/[^\s)]+", text):
+        re.search(r"https://github\.com/[^\s)]+", text)
+        return REPO_ANALYZER
+    terraform_keywords = [
+        'terraform', 'infrastructure', 'ecs', 'rds',
+        'alb', 'load balancer', 'generate infra', 'deploy infrastructure',
+        'cloudformation', 'cloud formation'
+    ]
+    if any(keyword in text.lower() for keyword in terraform_keywords):
+        return TERRAFORM_GENERATOR
+    deployment_keywords = [
+        'deploy', 'validate', 'check prerequisites', 'ready to deploy',
+        'deployment check', 'can i deploy', 'validate deployment'
+    ]
+    if any(keyword in text.lower() for keyword in deployment_keywords):
+        return DEPLOYMENT_VALIDATOR
+    return CHAT_AGENT
+
+
+def accuracy(route) -> float:
+    correct = sum(1 for text, expected in ACCURACY_SET if route(text) == expected)
+    return correct / len(ACCURACY_SET)
+
+
+def time_per_call(route, iterations: int = 2000, texts=None, repeats: int = 5) -> float:
+    """Best of `repeats` runs, in µs per call, so scheduler noise does not decide the comparison"""
+    texts = texts or [text for text, _ in ACCURACY_SET]
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            for text in texts:
+                route(text)
+        best = min(best, time.perf_counter() - started)
+    return best / (iterations * len(texts)) * 1e6
+
+
+def main():
+    classifier = IntentClassifier(embed_model=None)
+    new_route = lambda text: classifier.classify_rules(text).intent
+
+    # Long input to show scaling with message size
+    long_text = "please take a look at my service configuration " * 200
+
+    print(f"{'router':<12} {'accuracy':>9} {'µs/call':>9} {'µs/long':>9}")
+    for name, route in [("legacy", legacy_route), ("classifier", new_route)]:
+        long_us = time_per_call(route, 200, [long_text])
+        print(f"{name:<12} {accuracy(route):>9.0%} {time_per_call(route):>9.2f} {long_us:>9.2f}")
+
+    # Rule-count scaling: 500 extra synthetic keywords
+    extra = {f"synthetic keyword {i}": (CHAT_AGENT, 1.0) for i in range(500)}
+    big_classifier = IntentClassifier(rules={**INTENT_RULES, **extra}, embed_model=None)
+    extra_keywords = list(extra)
+    legacy_big = lambda text: any(keyword in text.lower() for keyword in extra_keywords) or legacy_route(text)
+    print("\nwith 500 extra rules:")
+    print(f"  legacy     {time_per_call(legacy_big, 200):>9.2f} µs/call")
+    print(f"  classifier {time_per_call(lambda text: big_classifier.classify_rules(text).intent, 200):>9.2f} µs/call")
+
+    misses = [(text, expected, new_route(text)) for text, expected in ACCURACY_SET if new_route(text) != expected]
+    for text, expected, got in misses:
+        print(f"  miss: {text!r} expected={expected} got={got}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+"""
+End-to-end load test of /chat/ask against local stand-ins for every external
+service: a streaming Ollama (configurable TTFT and tokens/sec), a GitHub API
+serving fixture repos, an in-memory DynamoDB table and SQLite instead of MySQL.
+
+The app runs under uvicorn in its own process, the fakes in another, and this
+process drives concurrent chat, repo-analysis and terraform scenarios. The JSON
+report has p50/p95/p99 latency, TTFB and time to first token per scenario,
+terraform job completion times, throughput, and the app's event-loop lag.
+
+Run from the server directory:
+    python -m benchmarks.load_benchmark --requests 200 --concurrency 16 --output bench.json
+    python -m benchmarks.load_benchmark --compare bench.json   # run again, print deltas
+"""
+import os
+import re
+import sys
+import json
+import time
+import socket
+import random
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+import multiprocessing
+from datetime import datetime, timezone
+import httpx
+import jwt
+from benchmarks.fake_services import MemoryTable, run_fake_services
+
+SCENARIOS = ("chat", "repo", "terraform")
+JWT_SECRET = "load-benchmark-secret-not-for-production"
+JOB_ID_RE = re.compile(r"Job ID: `([0-9a-f-]{36})`")
+FINISHED = ("succeeded", "failed", "cancelled")
+LAG_INTERVAL = 0.01
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentiles(values: list) -> dict:
+    """Nearest-rank percentiles in milliseconds"""
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered) + 0.5)) - 1))]
+    return {
+        "p50": round(rank(50) * 1000, 2), "p95": round(rank(95) * 1000, 2), "p99": round(rank(99) * 1000, 2),
+        "mean": round(sum(ordered) / len(ordered) * 1000, 2), "max": round(ordered[-1] * 1000, 2),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+# === App process ===
+
+def run_app(port: int, env: dict, users: int, dynamo_latency: float, lag_path: str, log_path: str, stop):
+    """
+    Process entry point: the real FastAPI app with the DynamoDB table swapped for
+    MemoryTable. Setting `stop` shuts it down gracefully and writes the lag samples.
+    """
+    os.environ.update(env)
+    sys.stdout = sys.stderr = open(log_path, "w", buffering=1)
+
+    # Must be in place before any module grabs DynamoDBConnection.get_instance().table
+    from chat.dynamo_instance import DynamoDBConnection
+    connection = object.__new__(DynamoDBConnection)
+    connection._table = MemoryTable(latency=dynamo_latency)
+    DynamoDBConnection._instance = connection
+
+    import uvicorn
+    from main import app
+    from config.database import sessionLocal
+    from auth.models.UserModel import UserModel
+
+    db = sessionLocal()
+    for idx in range(users):
+        db.add(UserModel(user_id=idx + 1, firstname="Bench", lastname=str(idx),
+                         email=f"bench{idx}@example.com", hashed_password="-"))
+    db.commit()
+    db.close()
+
+    samples = []
+
+    async def sample_lag():
+        # How late a short sleep wakes up = how long something else held the loop
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(LAG_INTERVAL)
+            samples.append((time.time(), time.perf_counter() - started - LAG_INTERVAL))
+
+    async def serve():
+        sampler = asyncio.create_task(sample_lag())
+        config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+        server = uvicorn.Server(config)
+
+        async def stop_when_asked():
+            # Not a signal: uvicorn re-raises those after shutdown, killing the process
+            await asyncio.to_thread(stop.wait)
+            server.should_exit = True
+
+        stopper = asyncio.create_task(stop_when_asked())
+        await server.serve()
+        sampler.cancel()
+        stopper.cancel()
+        with open(lag_path, "w") as handle:
+            json.dump(samples, handle)
+
+    asyncio.run(serve())
+
+
+# === Load driver ===
+
+class LoadDriver:
+    def __init__(self, base_url: str, tokens: list, args):
+        self.base_url = base_url
+        self.tokens = tokens
+        self.args = args
+        self.results = []
+
+    def _message(self, scenario: str, seq: int) -> str:
+        if scenario == "chat":
+            return f"What are the best practices for Docker images? (question {seq})"
+        if scenario == "repo":
+            return f"https://github.com/bench/app{seq % self.args.repos}"
+        # Outside the standard ECS templates, so this exercises the LLM path
+        return f"Generate terraform for a serverless API with lambda and dynamodb named svc{seq}"
+
+    async def _wait_for_job(self, client: httpx.AsyncClient, headers: dict, job_id: str, started: float):
+        deadline = time.perf_counter() + self.args.job_timeout
+        while time.perf_counter() < deadline:
+            response = await client.get(f"/jobs/{job_id}", headers=headers)
+            if response.status_code == 200 and response.json().get("status") in FINISHED:
+                return response.json()["status"], time.perf_counter() - started
+            await asyncio.sleep(self.args.poll_interval)
+        return "timeout", None
+
+    async def request(self, client: httpx.AsyncClient, user: int, scenario: str, seq: int) -> dict:
+        headers = {"Authorization": f"Bearer {self.tokens[user]}"}
+        result = {"scenario": scenario, "ok": False, "ttfb": None, "ttft": None, "latency": None, "job_latency": None}
+        started = time.perf_counter()
+        body = ""
+        try:
+            async with client.stream("POST", "/chat/ask", headers=headers,
+                                     json={"content": self._message(scenario, seq)}) as response:
+                result["status"] = response.status_code
+                async for chunk in response.aiter_text():
+                    now = time.perf_counter()
+                    if result["ttfb"] is None:
+                        result["ttfb"] = now - started
+                    body += chunk
+                    # The first line is the chat id; the first byte after it is the answer
+                    if result["ttft"] is None and "\n" in body and len(body) > body.index("\n") + 1:
+                        result["ttft"] = now - started
+            result["latency"] = time.perf_counter() - started
+            result["ok"] = response.status_code == 200 and "❌" not in body
+            if scenario == "terraform" and result["ok"]:
+                match = JOB_ID_RE.search(body)
+                if match:
+                    status, result["job_latency"] = await self._wait_for_job(client, headers, match.group(1), started)
+                    result["ok"] = status == "succeeded"
+                else:
+                    result["ok"] = False
+            if not result["ok"]:
+                result["error"] = body[-200:]
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        return result
+
+    async def run(self) -> tuple:
+        weights = dict(self.args.mix)
+        rng = random.Random(self.args.seed)
+        total = self.args.warmup + self.args.requests
+        plan = rng.choices(list(weights), weights=list(weights.values()), k=total)
+        queue = asyncio.Queue()
+        for seq, scenario in enumerate(plan):
+            queue.put_nowait((seq, scenario))
+        window = {}
+
+        async def worker(user: int, client: httpx.AsyncClient):
+            while not queue.empty():
+                seq, scenario = queue.get_nowait()
+                if seq == self.args.warmup:
+                    window["start"] = time.time()
+                result = await self.request(client, user, scenario, seq)
+                if seq >= self.args.warmup:
+                    self.results.append(result)
+
+        limits = httpx.Limits(max_connections=self.args.concurrency * 2)
+        timeout = httpx.Timeout(self.args.request_timeout)
+        async with httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=timeout) as client:
+            window["start"] = time.time()
+            await asyncio.gather(*(worker(user, client) for user in range(self.args.concurrency)))
+        return window["start"], time.time()
+
+
+def build_report(results: list, lag: list, started: float, finished: float, args, app_log: str) -> dict:
+    elapsed = max(finished - started, 1e-9)
+
+    def summarize(rows: list) -> dict:
+        ok = [row for row in rows if row["ok"]]
+        summary = {
+            "requests": len(rows),
+            "errors": len(rows) - len(ok),
+            "throughput_rps": round(len(ok) / elapsed, 3),
+            "latency_ms": _percentiles([row["latency"] for row in ok]),
+            "ttfb_ms": _percentiles([row["ttfb"] for row in ok if row["ttfb"] is not None]),
+            "ttft_ms": _percentiles([row["ttft"] for row in ok if row["ttft"] is not None]),
+        }
+        job_latency = [row["job_latency"] for row in ok if row["job_latency"] is not None]
+        if job_latency:
+            summary["job_latency_ms"] = _percentiles(job_latency)
+        errors = [row.get("error", "") for row in rows if not row["ok"]]
+        if errors:
+            summary["sample_errors"] = errors[:3]
+        return summary
+
+    window_lag = [value for stamp, value in lag if started <= stamp <= finished]
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+            "app_log": app_log,
+        },
+        "wall_seconds": round(elapsed, 3),
+        "overall": summarize(results),
+        "scenarios": {name: summarize([row for row in results if row["scenario"] == name])
+                      for name in SCENARIOS if any(row["scenario"] == name for row in results)},
+        "loop_lag_ms": {**(_percentiles(window_lag) or {}), "samples": len(window_lag)},
+    }
+
+
+def compare(report: dict, baseline: dict):
+    """Print the change of every latency percentile and throughput against a previous report"""
+    def rows(section: dict, prefix: str):
+        for metric in ("latency_ms", "ttfb_ms", "ttft_ms", "job_latency_ms"):
+            for pct in ("p50", "p95", "p99"):
+                yield f"{prefix}.{metric}.{pct}", (section.get(metric) or {}).get(pct)
+        yield f"{prefix}.throughput_rps", section.get("throughput_rps")
+
+    def flatten(data: dict) -> dict:
+        flat = dict(rows(data.get("overall", {}), "overall"))
+        for name, section in data.get("scenarios", {}).items():
+            flat.update(rows(section, name))
+        for pct in ("p50", "p95", "p99"):
+            flat[f"loop_lag_ms.{pct}"] = data.get("loop_lag_ms", {}).get(pct)
+        return flat
+
+    new, old = flatten(report), flatten(baseline)
+    print(f"\n{'metric':<36} {baseline['meta'].get('commit') or 'baseline':>12} {report['meta'].get('commit') or 'current':>12} {'change':>9}")
+    for key, value in new.items():
+        before = old.get(key)
+        if value is None or before is None:
+            continue
+        change = f"{(value - before) / before * 100:+.1f}%" if before else "n/a"
+        print(f"{key:<36} {before:>12} {value:>12} {change:>9}")
+
+
+def parse_mix(text: str) -> list:
+    mix = []
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario '{name}', expected one of {', '.join(SCENARIOS)}")
+        mix.append((name.strip(), float(weight or 1)))
+    return mix
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=100, help="measured requests")
+    parser.add_argument("--warmup", type=int, default=5, help="requests run first and left out of the report")
+    parser.add_argument("--concurrency", type=int, default=8, help="virtual users, each with its own account")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("chat=3,repo=1,terraform=1"))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--ttft", type=float, default=0.2, help="fake Ollama time to first token (s)")
+    parser.add_argument("--tokens-per-sec", type=float, default=50)
+    parser.add_argument("--reply-tokens", type=int, default=120, help="tokens per chat/analysis reply")
+    parser.add_argument("--repos", type=int, default=50, help="fixture repos to spread analyses over")
+    parser.add_argument("--repo-files", type=int, default=40, help="source files per fixture repo")
+    parser.add_argument("--github-latency", type=float, default=0.02, help="per-request delay of the fake GitHub (s)")
+    parser.add_argument("--dynamo-latency", type=float, default=0.005, help="blocking delay per DynamoDB call (s)")
+    parser.add_argument("--request-timeout", type=float, default=300)
+    parser.add_argument("--job-timeout", type=float, default=300)
+    parser.add_argument("--poll-interval", type=float, default=0.25)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra app settings, e.g. --env JOB_WORKERS=4")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="previous report to print deltas against")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="load-benchmark-")
+    ollama_port, github_port, app_port = _free_port(), _free_port(), _free_port()
+    env = {
+        "DATABASE_URL": f"sqlite:///{workdir}/app.db",
+        "OLLAMA_BASE_URL": f"http://127.0.0.1:{ollama_port}",
+        "OLLAMA_CHAT_MODEL": "bench-model",
+        "GITHUB_API_URL": f"http://127.0.0.1:{github_port}",
+        "GITHUB_TOKEN": "bench-token",
+        "GITHUB_MAX_RPS": "10000",
+        "GITHUB_BURST": "10000",
+        "SECRET_KEY": JWT_SECRET,
+        "ALGORITHM": "HS256",
+        "SESSION_STORE_URL": "memory://",
+        "ARTIFACT_STORE_DIR": f"{workdir}/artifacts",
+        "ENV_UPLOAD_DIR": f"{workdir}/uploads",
+        "TERRAFORM_OUTPUT_DIR": f"{workdir}/terraform",
+        "AWS_REGION": "us-east-1",
+        **dict(item.split("=", 1) for item in args.env),
+    }
+    lag_path, app_log = f"{workdir}/loop_lag.json", f"{workdir}/app.log"
+
+    context = multiprocessing.get_context("spawn")
+    ready = context.Event()
+    fakes = context.Process(target=run_fake_services, daemon=True, args=(
+        ollama_port, github_port,
+        {"ttft": args.ttft, "tokens_per_sec": args.tokens_per_sec, "reply_tokens": args.reply_tokens},
+        {"repos": args.repos, "latency": args.github_latency, "extra_files": args.repo_files},
+        ready,
+    ))
+    fakes.start()
+    if not ready.wait(30):
+        sys.exit("fake services did not start")
+    stop = context.Event()
+    server = context.Process(target=run_app, args=(app_port, env, args.concurrency, args.dynamo_latency,
+                                                   lag_path, app_log, stop))
+    server.start()
+
+    base_url = f"http://127.0.0.1:{app_port}"
+    deadline = time.time() + 60
+    while True:
+        try:
+            if httpx.get(base_url + "/", timeout=1).status_code == 200:
+                break
+        except httpx.HTTPError:
+            pass
+        if time.time() > deadline or not server.is_alive():
+            server.terminate()
+            fakes.terminate()
+            sys.exit(f"app did not start, see {app_log}")
+        time.sleep(0.2)
+
+    tokens = [jwt.encode({"sub": f"bench{idx}@example.com"}, JWT_SECRET, "HS256") for idx in range(args.concurrency)]
+    driver = LoadDriver(base_url, tokens, args)
+    print(f"🏋️ {args.requests} requests (+{args.warmup} warmup) from {args.concurrency} users, "
+          f"mix {dict(args.mix)}", file=sys.stderr)
+    started, finished = asyncio.run(driver.run())
+
+    stop.set()
+    server.join(60)
+    if server.is_alive():
+        server.terminate()
+    fakes.terminate()
+    fakes.join()
+    try:
+        with open(lag_path) as handle:
+            lag = json.load(handle)
+    except (OSError, ValueError):
+        lag = []
+
+    report = build_report(driver.results, lag, started, finished, args, app_log)
+    baseline = None
+    if args.compare:
+        # Read first: --output may name the same file
+        with open(args.compare) as handle:
+            baseline = json.load(handle)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(text + "\n")
+        print(f"📄 Report written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    if baseline:
+        compare(report, baseline)
+
+
+if __name__ == "__main__":
+    main()
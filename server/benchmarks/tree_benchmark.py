@@ -0,0 +1,95 @@
+"""
+Tree parsing and config-file matching on a synthetic 200k-entry monorepo.
+
+Run from the server directory:
+    python -m benchmarks.tree_benchmark
+"""
+import json
+import time
+import random
+import tracemalloc
+from agents.repo_tree import TreeStreamParser, match_config_files, CONFIG_FILE_PRIORITY
+
+ENTRIES = 200_000
+CHUNK_SIZE = 64 * 1024
+
+
+def synthetic_tree_body(entries: int = ENTRIES, seed: int = 7) -> bytes:
+    """A git/trees response shaped like GitHub's, with manifests scattered deep in packages"""
+    rng = random.Random(seed)
+    names = ["index.ts", "util.py", "README.md", "main.go", "style.css", "test_app.py", "lib.rs"]
+    manifests = list(CONFIG_FILE_PRIORITY)
+    tree = [
+        {"path": ".env.example", "mode": "100644", "type": "blob", "sha": "e" * 40, "size": 120,
+         "url": "https://api.github.com/repos/acme/mono/git/blobs/" + "e" * 40},
+        {"path": "package.json", "mode": "100644", "type": "blob", "sha": "f" * 40, "size": 900,
+         "url": "https://api.github.com/repos/acme/mono/git/blobs/" + "f" * 40},
+    ]
+    for i in range(entries - len(tree)):
+        depth = rng.randint(2, 7)
+        directory = "/".join(f"pkg{rng.randint(0, 300)}" for _ in range(depth))
+        if rng.random() < 0.01:
+            name = rng.choice(manifests)
+        elif rng.random() < 0.02:
+            directory = f"node_modules/lib{i % 500}"
+            name = "package.json"
+        else:
+            name = rng.choice(names)
+        sha = f"{i:040x}"
+        tree.append({
+            "path": f"{directory}/{name}", "mode": "100644", "type": "blob", "sha": sha,
+            "size": rng.randint(10, 50_000), "url": f"https://api.github.com/repos/acme/mono/git/blobs/{sha}",
+        })
+    return json.dumps({"sha": "a" * 40, "url": "", "tree": tree, "truncated": False}).encode()
+
+
+def legacy_match(tree: list) -> list:
+    """The substring scan _analyze_tree used before match_config_files"""
+    config_files = list(CONFIG_FILE_PRIORITY)
+    return [
+        item["path"] for item in tree
+        if item["type"] == "blob" and any(f in item["path"] for f in config_files)
+    ]
+
+
+def measure(label: str, fn):
+    # Timed and traced separately: tracemalloc slows allocation-heavy code a lot
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {elapsed * 1000:>9.1f} ms {peak / 1024 / 1024:>9.1f} MiB peak")
+    return result
+
+
+def stream_parse(body: bytes) -> list:
+    parser = TreeStreamParser()
+    entries = []
+    for offset in range(0, len(body), CHUNK_SIZE):
+        entries.extend(parser.feed(body[offset:offset + CHUNK_SIZE]))
+    entries.extend(parser.feed(b"", final=True))
+    return entries
+
+
+def main():
+    body = synthetic_tree_body()
+    print(f"tree body: {len(body) / 1024 / 1024:.1f} MiB, {ENTRIES} entries\n")
+    print(f"{'step':<28} {'time':>12} {'memory':>15}")
+
+    # Peak for json.loads includes holding the whole body as text, like response.json()
+    full = measure("json.loads (whole body)", lambda: json.loads(body.decode())["tree"])
+    streamed = measure("TreeStreamParser (64 KiB)", lambda: stream_parse(body))
+    assert [e["path"] for e in full] == [e["path"] for e in streamed]
+
+    legacy = measure("legacy substring match", lambda: legacy_match(full))
+    indexed = measure("match_config_files", lambda: match_config_files(streamed))
+
+    print(f"\nlegacy matched {len(legacy)} paths; first 5: {legacy[:5]}")
+    print(f"indexed matched {len(indexed)} paths; first 5: {indexed[:5]}")
+
+
+if __name__ == "__main__":
+    main()
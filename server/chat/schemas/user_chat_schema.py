@@ -13,6 +13,8 @@ class UserChatRequest(BaseModel):
     # timestamp will default to current time if omitted by the client
     timestamp: Optional[str] = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
     chat_id: Optional[str] = None
+    # Bypass reuse of an identical earlier terraform generation
+    regenerate: bool = False
 
 
 class UserChatResponse(BaseModel):
@@ -1,5 +1,6 @@
-from fastapi import Depends, HTTPException, UploadFile, File
-from pathlib import Path
+from fastapi import Depends, HTTPException, Request
+from starlette.datastructures import UploadFile as StarletteUploadFile
+from starlette.formparsers import MultiPartParser, MultiPartException
 from sqlalchemy.orm import Session
 from config.database import get_db_connection
 from fastapi.responses import StreamingResponse
@@ -11,6 +12,8 @@ from agents.chat_agent import stream_assistant_reply
 from uuid import uuid4
 from chat.dynamo_instance import DynamoDBConnection
 from core.context_vars import user_id_ctx
+from core.event_bus import event_bus, format_sse
+from core.env_store import env_store, capped_stream, EnvFileTooLarge, ENV_UPLOAD_MAX_BYTES, ENV_UPLOAD_CHUNK
 from datetime import datetime, timezone
 from boto3.dynamodb.conditions import Key, Attr
 import logging
@@ -20,6 +23,9 @@ from agents.supervisor_runner import route_to_agent
 
 logger = logging.getLogger(__name__)
 
+# Boundaries, part headers and small form fields around the .env itself
+_MULTIPART_OVERHEAD = 16 * 1024
+
 dynamo_db = DynamoDBConnection.get_instance().table
 
 @chat_router.get("/all")
@@ -78,6 +84,56 @@ async def get_chat_history(chat_id: str):
         logger.error(f"Error in /chat/history: {str(e)}")
         return create_response(500, "error_fetch_items", "Error")
 
+class EventStreamResponse(StreamingResponse):
+    """
+    Unsubscribes however the stream ends. A client disconnect can stop the response
+    while the generator sits at a yield, where its own finally would not run until
+    the generator is garbage collected.
+    """
+    def __init__(self, subscription, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.subscription = subscription
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            event_bus.unsubscribe(self.subscription)
+
+@chat_router.get("/events")
+async def stream_user_events(request: Request):
+    """
+    Server-sent events for the current user: `job` (status changes),
+    `job_progress` and `message` (new assistant message in a chat). Send the
+    Last-Event-ID header on reconnect to replay what was missed.
+    """
+    user_context = user_id_ctx.get()
+    if not user_context or not hasattr(user_context, 'user_id'):
+        raise HTTPException(status_code=401, detail="User not authenticated")
+
+    last_event_id = request.headers.get("Last-Event-ID")
+    subscription = event_bus.subscribe(
+        user_context.user_id,
+        int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    )
+
+    async def event_stream():
+        yield "retry: 5000\n\n"
+        while True:
+            events = await subscription.next_batch()
+            if not events:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            yield "".join(format_sse(event) for event in events)
+
+    return EventStreamResponse(
+        subscription,
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # === 5. FastAPI Endpoint ===
 @chat_router.post('/ask')
 async def ask_streaming_agent(user_chat_data: UserChatRequest, db: Session = Depends(get_db_connection)):
@@ -128,7 +184,8 @@ async def ask_streaming_agent(user_chat_data: UserChatRequest, db: Session = Dep
                 print("🎯 Calling route_to_agent...")
                 agent_name, response_generator = await route_to_agent(
                     user_chat_data.content, 
-                    chat_id=final_chat_id
+                    chat_id=final_chat_id,
+                    regenerate=user_chat_data.regenerate
                 )
                 print(f"✅ Agent selected: {agent_name}")
                 
@@ -170,6 +227,7 @@ async def ask_streaming_agent(user_chat_data: UserChatRequest, db: Session = Dep
                         "is_active": 1
                     }
                     dynamo_db.put_item(Item=assistant_msg)
+                    event_bus.publish(user_id, "message", assistant_msg)
                     print("✅ Assistant message saved to DynamoDB")
                 except Exception as e:
                     print(f"❌ Failed to save to DynamoDB: {str(e)}")
@@ -220,25 +278,65 @@ async def delete_chat(chat_id: str):
         logger.error(f"Error in /chat/delete: {str(e)}")
         return create_response(500, "delete_item_failed", "Error")
 
-@chat_router.post("/upload-env")
-async def upload_env_file(file: UploadFile = File(...)):
+_ENV_UPLOAD_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object", "required": ["file"],
+            "properties": {"file": {"type": "string", "format": "binary"}},
+        }}},
+    }
+}
+
+
+@chat_router.post("/upload-env", openapi_extra=_ENV_UPLOAD_BODY)
+async def upload_env_file(request: Request):
+    """
+    Multipart upload of the user's .env (field "file"). The body is parsed as it
+    arrives and reading stops once it exceeds ENV_UPLOAD_MAX_BYTES; the file is
+    streamed to a temp file and renamed over the previous one only when complete.
+    """
+    user_context = user_id_ctx.get()
+    if not user_context or not hasattr(user_context, 'user_id'):
+        raise HTTPException(status_code=401, detail="User not authenticated")
+    user_id = user_context.user_id
+
+    # Rejected before reading anything when the client announces an oversized body
+    body_limit = ENV_UPLOAD_MAX_BYTES + _MULTIPART_OVERHEAD
+    if int(request.headers.get("content-length") or 0) > body_limit:
+        return create_response(413, "env_file_too_large", "Error")
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=415, detail="Expected multipart/form-data with a 'file' field")
+
+    form = None
     try:
-        user_context = user_id_ctx.get()
-        user_id = user_context.user_id
-        
-        contents = await file.read()
+        parser = MultiPartParser(request.headers, capped_stream(request.stream(), body_limit),
+                                 max_files=1, max_fields=10, max_part_size=_MULTIPART_OVERHEAD)
+        form = await parser.parse()
+        upload = form.get("file")
+        if not isinstance(upload, StarletteUploadFile):
+            raise HTTPException(status_code=422, detail="Missing 'file' field")
 
-        # Save to local folder with user ID
-        upload_path = Path(f"./user_uploads/{user_id}")
-        upload_path.mkdir(parents=True, exist_ok=True)
-        file_path = upload_path / ".env"
-        file_path.write_bytes(contents)
+        async def upload_chunks():
+            while chunk := await upload.read(ENV_UPLOAD_CHUNK):
+                yield chunk
 
-        # Optional: Log or save to DB/S3 later
-        
-        print(f"✅ Received .env for user {user_id}: saved to {file_path}")
+        env = await env_store.save(user_id, upload_chunks())
+        print(f"✅ Received .env for user {user_id}: {len(env.variables)} variables saved to {env_store.path(user_id)}")
         return create_response(200, "file_uploaded_successfully", "Success")
 
+    except EnvFileTooLarge:
+        print(f"⚠️ Rejected .env upload for user {user_id}: over {ENV_UPLOAD_MAX_BYTES} bytes")
+        return create_response(413, "env_file_too_large", "Error")
+    except UnicodeDecodeError:
+        return create_response(422, "env_file_invalid", "Error")
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=e.message)
+    except HTTPException:
+        raise
     except Exception as e:
+        logger.error(f"Error in /chat/upload-env: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
-        return create_response(500, "delete_item_failed", "Error")
\ No newline at end of file
+    finally:
+        if form is not None:
+            await form.close()
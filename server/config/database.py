@@ -1,11 +1,15 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
-URL_DATABASE = 'mysql+pymysql://root:@localhost:3306/aivina'
+URL_DATABASE = os.getenv("DATABASE_URL", 'mysql+pymysql://root:@localhost:3306/aivina')
 
-#Create the database engine
-engine = create_engine(URL_DATABASE)
+#Create the database engine (SQLite stand-ins are shared with the threadpool)
+engine = create_engine(
+    URL_DATABASE,
+    connect_args={"check_same_thread": False} if URL_DATABASE.startswith("sqlite") else {}
+)
 
 #Create a local session for the engine
 sessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -21,4 +25,35 @@ def get_db_connection():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def add_missing_columns(table):
+    """
+    create_all only creates missing tables; add the columns (and their indexes)
+    a model gained since its table was created. Nullable, no server default.
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table(table.name):
+        return
+    existing = {column["name"] for column in inspector.get_columns(table.name)}
+    missing = [column for column in table.columns if column.name not in existing]
+    if not missing:
+        return
+    added = set()
+    for column in missing:
+        column_type = column.type.compile(dialect=engine.dialect)
+        try:
+            with engine.begin() as connection:
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+        except Exception as e:
+            # Workers starting together race for the same ALTER
+            if column.name not in {c["name"] for c in inspect(engine).get_columns(table.name)}:
+                raise
+            print(f"⚠️ Column {table.name}.{column.name} added concurrently: {str(e)[:80]}")
+            continue
+        added.add(column.name)
+        print(f"🛠️ Added column {table.name}.{column.name}")
+    for index in table.indexes:
+        if any(column.name in added for column in index.columns):
+            index.create(engine, checkfirst=True)
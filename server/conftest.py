@@ -0,0 +1 @@
+# Lets the tests import the app's top-level packages (agents, core, ...) as main.py does
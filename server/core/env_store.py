@@ -0,0 +1,141 @@
+import os
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from core.metrics import registry
+
+ENV_UPLOAD_DIR = os.getenv("ENV_UPLOAD_DIR", "./user_uploads")
+ENV_UPLOAD_MAX_BYTES = int(os.getenv("ENV_UPLOAD_MAX_BYTES", str(64 * 1024)))
+ENV_UPLOAD_CHUNK = 8 * 1024
+ENV_CACHE_SIZE = int(os.getenv("ENV_CACHE_SIZE", "1000"))
+
+env_cache_lookups = registry.counter("env_cache_lookups_total", "Parsed .env lookups", ("result",))
+env_uploads = registry.counter("env_uploads_total", "Uploaded .env files", ("result",))
+
+
+class EnvFileTooLarge(Exception):
+    pass
+
+
+def parse_env(text: str) -> Dict[str, str]:
+    """KEY=VALUE lines; comments, blank lines and `export ` prefixes are skipped, matching quotes stripped"""
+    variables = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, _, value = line.partition("=")
+        key = key.strip()
+        if key.startswith("export "):
+            key = key[len("export "):].strip()
+        value = value.strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+            value = value[1:-1]
+        if key:
+            variables[key] = value
+    return variables
+
+
+@dataclass(frozen=True)
+class ParsedEnv:
+    text: str
+    variables: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.variables)
+
+
+async def capped_stream(chunks: AsyncIterator[bytes], limit: int) -> AsyncIterator[bytes]:
+    """Pass chunks through, raising EnvFileTooLarge as soon as more than `limit` bytes arrive"""
+    received = 0
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > limit:
+            raise EnvFileTooLarge(f"more than {limit} bytes")
+        yield chunk
+
+
+class EnvStore:
+    """
+    Per-user uploaded .env files. Uploads are streamed to a temp file under a
+    hard size cap and renamed into place; reads return a parsed copy cached per
+    user and revalidated with one stat (off the event loop), so an upload handled
+    by another worker is still picked up.
+    """
+    def __init__(self, root: str = ENV_UPLOAD_DIR, max_entries: int = ENV_CACHE_SIZE):
+        self.root = Path(root)
+        self.max_entries = max_entries
+        # user_id -> ((mtime_ns, size), parsed)
+        self._cache: "OrderedDict[int, Tuple[Tuple[int, int], ParsedEnv]]" = OrderedDict()
+
+    def path(self, user_id: int) -> Path:
+        return self.root / str(user_id) / ".env"
+
+    def _remember(self, user_id: int, version: Tuple[int, int], parsed: ParsedEnv):
+        self._cache[user_id] = (version, parsed)
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def _load(self, user_id: int, cached_version: Optional[Tuple[int, int]]):
+        path = self.path(user_id)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None, None
+        version = (stat.st_mtime_ns, stat.st_size)
+        if version == cached_version:
+            return version, None
+        return version, path.read_text(encoding="utf-8-sig", errors="replace")
+
+    async def get(self, user_id: Optional[int]) -> Optional[ParsedEnv]:
+        if user_id is None:
+            return None  # speculative and anonymous runs have no uploads
+        cached = self._cache.get(user_id)
+        version, text = await asyncio.to_thread(self._load, user_id, cached[0] if cached else None)
+        if version is None:
+            self._cache.pop(user_id, None)
+            return None
+        if text is None:
+            env_cache_lookups.inc(result="hit")
+            self._cache.move_to_end(user_id)
+            return cached[1]
+        env_cache_lookups.inc(result="miss")
+        parsed = ParsedEnv(text, parse_env(text))
+        self._remember(user_id, version, parsed)
+        return parsed
+
+    async def save(self, user_id: int, chunks: AsyncIterator[bytes], limit: int = ENV_UPLOAD_MAX_BYTES) -> ParsedEnv:
+        """Stream chunks to disk; the previous file stays in place unless the whole upload succeeds"""
+        target = self.path(user_id)
+        temp = target.with_name(f".env.{os.getpid()}.{id(chunks)}.tmp")
+
+        def open_temp():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            # Secrets: readable by the server user only
+            return os.fdopen(os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb")
+
+        handle = await asyncio.to_thread(open_temp)
+        try:
+            async for chunk in capped_stream(chunks, limit):
+                await asyncio.to_thread(handle.write, chunk)
+            await asyncio.to_thread(handle.close)
+            text = (await asyncio.to_thread(temp.read_bytes)).decode("utf-8-sig")
+            await asyncio.to_thread(os.replace, temp, target)
+        except BaseException as e:
+            handle.close()
+            temp.unlink(missing_ok=True)
+            env_uploads.inc(result="too_large" if isinstance(e, EnvFileTooLarge) else "failed")
+            raise
+
+        stat = await asyncio.to_thread(target.stat)
+        parsed = ParsedEnv(text, parse_env(text))
+        self._remember(user_id, (stat.st_mtime_ns, stat.st_size), parsed)
+        env_uploads.inc(result="stored")
+        return parsed
+
+
+env_store = EnvStore()
@@ -0,0 +1,111 @@
+import os
+import json
+import asyncio
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Set
+from core.metrics import registry
+
+# Undelivered events a slow subscriber may hold before the oldest are dropped
+EVENT_SUBSCRIBER_BUFFER = int(os.getenv("EVENT_SUBSCRIBER_BUFFER", "100"))
+# Recent events kept per user so a reconnect (Last-Event-ID) misses nothing
+EVENT_HISTORY_SIZE = int(os.getenv("EVENT_HISTORY_SIZE", "50"))
+EVENT_HISTORY_USERS = int(os.getenv("EVENT_HISTORY_USERS", "5000"))
+EVENT_HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+
+event_subscribers = registry.gauge("event_bus_subscribers", "Open event stream subscriptions")
+events_published = registry.counter("event_bus_events_total", "Events published to users", ("type",))
+events_dropped = registry.counter("event_bus_dropped_total", "Events dropped for subscribers that fell behind")
+
+
+class Subscription:
+    """
+    One open event stream. Idle subscriptions cost a deque and an asyncio.Event:
+    no task or queue per subscriber is woken until one of its user's events arrives.
+    """
+    __slots__ = ("user_id", "_pending", "_wakeup")
+
+    def __init__(self, user_id: int, buffer: int = EVENT_SUBSCRIBER_BUFFER):
+        self.user_id = user_id
+        self._pending: deque = deque(maxlen=buffer)
+        self._wakeup = asyncio.Event()
+
+    def deliver(self, event: dict):
+        if len(self._pending) == self._pending.maxlen:
+            events_dropped.inc()
+        self._pending.append(event)
+        self._wakeup.set()
+
+    async def next_batch(self, timeout: float = EVENT_HEARTBEAT_SECONDS) -> List[dict]:
+        """Events published since the last call; [] after `timeout` seconds without any"""
+        if not self._pending:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self._wakeup.clear()
+        batch = list(self._pending)
+        self._pending.clear()
+        return batch
+
+
+class EventBus:
+    """
+    In-process pub/sub keyed by user. publish() is synchronous and only touches
+    the subscriptions of that user, so fan-out cost does not grow with the number
+    of idle subscribers. Events only reach streams opened on the same worker.
+    """
+    def __init__(self, history_size: int = EVENT_HISTORY_SIZE, history_users: int = EVENT_HISTORY_USERS):
+        self.history_size = history_size
+        self.history_users = history_users
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._history: "OrderedDict[int, deque]" = OrderedDict()
+        self._last_id = 0
+
+    def publish(self, user_id: Optional[int], event_type: str, data: Any) -> Optional[int]:
+        if user_id is None:
+            return None
+        self._last_id += 1
+        event = {"id": self._last_id, "event": event_type, "data": data}
+
+        history = self._history.get(user_id)
+        if history is None:
+            history = self._history[user_id] = deque(maxlen=self.history_size)
+            while len(self._history) > self.history_users:
+                self._history.popitem(last=False)
+        else:
+            self._history.move_to_end(user_id)
+        history.append(event)
+
+        for subscription in self._subscribers.get(user_id, ()):
+            subscription.deliver(event)
+        events_published.inc(type=event_type)
+        return self._last_id
+
+    def subscribe(self, user_id: int, last_event_id: Optional[int] = None) -> Subscription:
+        subscription = Subscription(user_id)
+        if last_event_id is not None:
+            for event in self._history.get(user_id, ()):
+                if event["id"] > last_event_id:
+                    subscription.deliver(event)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        event_subscribers.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self._subscribers.get(subscription.user_id)
+        if subscriptions is None or subscription not in subscriptions:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscribers[subscription.user_id]
+        event_subscribers.dec()
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._subscribers.values())
+
+
+def format_sse(event: dict) -> str:
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+
+event_bus = EventBus()
@@ -0,0 +1,101 @@
+import os
+import aiohttp
+from typing import Optional
+from core.metrics import registry
+
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_LIMIT_PER_HOST = int(os.getenv("HTTP_LIMIT_PER_HOST", "20"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+HTTP_TOTAL_TIMEOUT = float(os.getenv("HTTP_TOTAL_TIMEOUT", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+
+http_requests_total = registry.counter(
+    "http_client_requests_total", "Outgoing HTTP requests", ("host",)
+)
+http_connections_created = registry.counter(
+    "http_client_connections_created_total", "New TCP/TLS connections opened", ("host",)
+)
+http_connections_reused = registry.counter(
+    "http_client_connections_reused_total", "Requests served on a pooled keep-alive connection", ("host",)
+)
+
+
+async def _on_request_start(session, context, params):
+    context.host = params.url.host
+    http_requests_total.inc(host=context.host)
+
+
+async def _on_connection_create_end(session, context, params):
+    http_connections_created.inc(host=getattr(context, "host", ""))
+
+
+async def _on_connection_reuseconn(session, context, params):
+    http_connections_reused.inc(host=getattr(context, "host", ""))
+
+
+class HttpClient:
+    """
+    One long-lived aiohttp session per process so outgoing calls (GitHub, ...)
+    share a keep-alive connection pool instead of paying a TCP+TLS handshake per request.
+
+    Started and closed by the FastAPI lifespan; created lazily when used outside the app.
+    """
+    _instance: Optional['HttpClient'] = None
+
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @classmethod
+    def get_instance(cls) -> 'HttpClient':
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    async def start(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=HTTP_POOL_LIMIT,
+                limit_per_host=HTTP_LIMIT_PER_HOST,
+                ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+                keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=HTTP_TOTAL_TIMEOUT,
+                sock_connect=HTTP_CONNECT_TIMEOUT,
+                sock_read=HTTP_READ_TIMEOUT,
+            )
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_request_start.append(_on_request_start)
+            trace_config.on_connection_create_end.append(_on_connection_create_end)
+            trace_config.on_connection_reuseconn.append(_on_connection_reuseconn)
+
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=timeout,
+                trace_configs=[trace_config],
+            )
+        return self._session
+
+    async def session(self) -> aiohttp.ClientSession:
+        return await self.start()
+
+    def stats(self) -> dict:
+        created = http_connections_created.total()
+        reused = http_connections_reused.total()
+        total = created + reused
+        return {
+            "requests": http_requests_total.total(),
+            "connections_created": created,
+            "connections_reused": reused,
+            "reuse_ratio": round(reused / total, 3) if total else 0.0,
+        }
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+http_client = HttpClient.get_instance()
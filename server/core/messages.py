@@ -2,11 +2,20 @@ SUCCESS = {
         "register_user": "User has been registered successfully.",
         "chat_delete": "Chat successfully deleted",
         "file_uploaded_successfully": "Env file has been securely uploaded",
+        "batch_cancelled": "Batch analysis has been cancelled",
+        "job_cancelled": "Job has been cancelled",
 }
 
 ERROR = {
         "invalid_user": "User registration failed. Please try again!",
         "invalid_user_login": "Login Failed! Username or Password is incorrect",
         "error_fetch_items": "Failed to fetch table items. Please try again",
-        "delete_item_failed": "Failed to delete chat. Please try again"
+        "delete_item_failed": "Failed to delete chat. Please try again",
+        "batch_not_found": "Batch analysis not found",
+        "batch_already_finished": "Batch analysis has already finished",
+        "job_not_found": "Job not found",
+        "job_already_finished": "Job has already finished",
+        "artifact_not_found": "No downloadable files for this job (not finished, failed or expired)",
+        "env_file_too_large": "Env file is too large",
+        "env_file_invalid": "Env file must be UTF-8 text"
 }
\ No newline at end of file
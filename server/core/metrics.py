@@ -0,0 +1,308 @@
+import time
+import inspect
+import threading
+from typing import Dict, Tuple, Optional
+
+# Default latency buckets (seconds) for LLM timings - from sub-second TTFT up to
+# multi-minute terraform generations
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+THROUGHPUT_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 250)
+
+
+def _format_labels(label_names: Tuple[str, ...], label_values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+    def _samples(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def total(self) -> float:
+        return sum(self._values.values())
+
+    def _samples(self):
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def total(self) -> float:
+        """Sum over all label sets"""
+        with self._lock:
+            return sum(self._values.values())
+
+    def _samples(self):
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # key -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for idx, upper in enumerate(self.buckets):
+                if value <= upper:
+                    state[idx] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def _samples(self):
+        for key, state in sorted(self._values.items()):
+            for idx, upper in enumerate(self.buckets):
+                le = f'le="{_format_value(upper)}"'
+                yield f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {state[idx]}"
+            yield f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(state[-2])}"
+            yield f"{self.name}_count{_format_labels(self.label_names, key)} {state[-1]}"
+
+
+class MetricsRegistry:
+    """
+    Process-wide registry that renders every metric in Prometheus text format
+    """
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, label_names))
+
+    def histogram(self, name: str, documentation: str, label_names: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, label_names, buckets))
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+registry = MetricsRegistry()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# === LLM metrics (per agent and model) ===
+LLM_LABELS = ("agent", "model")
+
+llm_requests_total = registry.counter(
+    "llm_requests_total", "Total LLM requests issued", LLM_LABELS
+)
+llm_errors_total = registry.counter(
+    "llm_errors_total", "Total LLM requests that failed", LLM_LABELS
+)
+llm_in_flight = registry.gauge(
+    "llm_requests_in_flight", "LLM requests currently running", LLM_LABELS
+)
+llm_time_to_first_token = registry.histogram(
+    "llm_time_to_first_token_seconds", "Wall-clock time until the first content token", LLM_LABELS
+)
+llm_request_duration = registry.histogram(
+    "llm_request_duration_seconds", "Wall-clock time of the whole LLM request", LLM_LABELS
+)
+llm_prompt_eval_duration = registry.histogram(
+    "llm_prompt_eval_seconds", "Prompt evaluation time reported by Ollama", LLM_LABELS
+)
+llm_eval_duration = registry.histogram(
+    "llm_eval_seconds", "Token generation time reported by Ollama", LLM_LABELS
+)
+llm_queue_delay = registry.histogram(
+    "llm_queue_delay_seconds", "Wall-clock time not accounted for by Ollama (queueing and transport)", LLM_LABELS
+)
+llm_tokens_per_second = registry.histogram(
+    "llm_tokens_per_second", "Generation throughput (eval_count / eval_duration)", LLM_LABELS,
+    buckets=THROUGHPUT_BUCKETS
+)
+llm_prompt_tokens_total = registry.counter(
+    "llm_prompt_tokens_total", "Prompt tokens evaluated", LLM_LABELS
+)
+llm_completion_tokens_total = registry.counter(
+    "llm_completion_tokens_total", "Completion tokens generated", LLM_LABELS
+)
+
+
+def _get(chunk, key, default=None):
+    # Ollama responses are pydantic models that also support item access
+    try:
+        value = chunk[key]
+    except (KeyError, TypeError, IndexError):
+        value = getattr(chunk, key, default)
+    return default if value is None else value
+
+
+class LLMCallMetrics:
+    """
+    Records timings for a single Ollama call.
+
+    Usage:
+        call = LLMCallMetrics("chat_agent", model)
+        async for chunk in call.track(client.chat(..., stream=True)):
+            ...
+    or for non-streaming calls:
+        call.observe_chunk(response); call.finish()
+    """
+    def __init__(self, agent: str, model: Optional[str]):
+        self.labels = {"agent": agent, "model": model or "unknown"}
+        self.started_at = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.final_chunk = None
+        self.finished = False
+        llm_requests_total.inc(**self.labels)
+        llm_in_flight.inc(**self.labels)
+
+    def observe_chunk(self, chunk):
+        if self.first_token_at is None:
+            message = _get(chunk, "message")
+            content = _get(message, "content", "") if message is not None else _get(chunk, "response", "")
+            if content:
+                self.first_token_at = time.perf_counter()
+                llm_time_to_first_token.observe(self.first_token_at - self.started_at, **self.labels)
+        if _get(chunk, "done", False):
+            self.final_chunk = chunk
+
+    @property
+    def completion_tokens(self) -> Optional[int]:
+        """eval_count reported on the final chunk; None until it has arrived"""
+        return _get(self.final_chunk, "eval_count") if self.final_chunk is not None else None
+
+    def finish(self, error: Optional[BaseException] = None):
+        if self.finished:
+            return
+        self.finished = True
+        elapsed = time.perf_counter() - self.started_at
+        llm_in_flight.dec(**self.labels)
+        llm_request_duration.observe(elapsed, **self.labels)
+
+        if error is not None:
+            llm_errors_total.inc(**self.labels)
+
+        if self.final_chunk is None:
+            return
+
+        # Ollama reports durations in nanoseconds on the final chunk
+        prompt_eval_ns = _get(self.final_chunk, "prompt_eval_duration", 0)
+        eval_ns = _get(self.final_chunk, "eval_duration", 0)
+        total_ns = _get(self.final_chunk, "total_duration", 0)
+        prompt_tokens = _get(self.final_chunk, "prompt_eval_count", 0)
+        eval_count = _get(self.final_chunk, "eval_count", 0)
+
+        if prompt_eval_ns:
+            llm_prompt_eval_duration.observe(prompt_eval_ns / 1e9, **self.labels)
+        if eval_ns:
+            llm_eval_duration.observe(eval_ns / 1e9, **self.labels)
+            if eval_count:
+                llm_tokens_per_second.observe(eval_count / (eval_ns / 1e9), **self.labels)
+        if total_ns:
+            llm_queue_delay.observe(max(elapsed - total_ns / 1e9, 0.0), **self.labels)
+        if prompt_tokens:
+            llm_prompt_tokens_total.inc(prompt_tokens, **self.labels)
+        if eval_count:
+            llm_completion_tokens_total.inc(eval_count, **self.labels)
+
+    async def track(self, stream):
+        """
+        Wrap an Ollama streaming response (or the coroutine returning it),
+        recording metrics as chunks pass through
+        """
+        error = None
+        try:
+            if inspect.isawaitable(stream):
+                stream = await stream
+            async for chunk in stream:
+                self.observe_chunk(chunk)
+                yield chunk
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.finish(error)
+
+
+def render_metrics() -> str:
+    return registry.render()
@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import asyncio
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from core.metrics import registry
+
+SESSION_STORE_URL = os.getenv("SESSION_STORE_URL", "memory://")
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(24 * 60 * 60)))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "1000"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024 * 1024)))
+
+session_entries = registry.gauge("session_store_entries", "Sessions currently held in memory")
+session_bytes = registry.gauge("session_store_bytes", "Approximate bytes held by in-memory sessions")
+session_evictions = registry.counter("session_store_evictions_total", "Sessions evicted from memory", ("reason",))
+
+
+def _encode(value: Any) -> str:
+    return json.dumps(value, default=str, separators=(",", ":"))
+
+
+class SessionStore(ABC):
+    """
+    Per-chat context shared between agents.
+
+    Sessions are flat dicts of top-level fields ("last_agent", "repo_url",
+    "repo_data", "terraform_config", ...). update() merges fields, so callers
+    should write back whole top-level values instead of mutating nested ones.
+    """
+
+    @abstractmethod
+    async def get(self, chat_id: str) -> Dict[str, Any]:
+        """Return the session for chat_id (empty dict if missing or expired)"""
+
+    @abstractmethod
+    async def update(self, chat_id: str, fields: Dict[str, Any]) -> None:
+        """Merge fields into the session and refresh its TTL"""
+
+    @abstractmethod
+    async def delete(self, chat_id: str) -> None:
+        """Drop the session"""
+
+    async def close(self) -> None:
+        pass
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    LRU + TTL store bounded by entry count and by approximate encoded size
+    """
+    def __init__(self, ttl_seconds: int = SESSION_TTL_SECONDS, max_entries: int = SESSION_MAX_ENTRIES,
+                 max_bytes: int = SESSION_MAX_BYTES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # chat_id -> (expires_at, {field: (value, size)})
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Tuple[Any, int]]]]" = OrderedDict()
+        self.total_bytes = 0
+
+    def _entry_size(self, fields: Dict[str, Tuple[Any, int]]) -> int:
+        return sum(size for _, size in fields.values())
+
+    def _drop(self, chat_id: str, reason: Optional[str] = None):
+        _, fields = self._entries.pop(chat_id)
+        self.total_bytes -= self._entry_size(fields)
+        if reason:
+            session_evictions.inc(reason=reason)
+
+    def _publish_gauges(self):
+        session_entries.set(len(self._entries))
+        session_bytes.set(self.total_bytes)
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = [chat_id for chat_id, (expires_at, _) in self._entries.items() if expires_at <= now]
+        for chat_id in expired:
+            self._drop(chat_id, "ttl")
+        # Least recently used first; keep the most recent entry even if it alone exceeds the budget
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes):
+            self._drop(next(iter(self._entries)), "capacity")
+        self._publish_gauges()
+
+    async def get(self, chat_id: str) -> Dict[str, Any]:
+        entry = self._entries.get(chat_id)
+        if entry is None:
+            return {}
+        expires_at, fields = entry
+        if expires_at <= time.monotonic():
+            self._drop(chat_id, "ttl")
+            self._publish_gauges()
+            return {}
+        self._entries.move_to_end(chat_id)
+        return {field: value for field, (value, _) in fields.items()}
+
+    async def update(self, chat_id: str, fields: Dict[str, Any]) -> None:
+        entry = self._entries.get(chat_id)
+        current = entry[1] if entry is not None else {}
+        for field, value in fields.items():
+            size = len(field) + len(_encode(value))
+            if field in current:
+                self.total_bytes -= current[field][1]
+            current[field] = (value, size)
+            self.total_bytes += size
+        self._entries[chat_id] = (time.monotonic() + self.ttl_seconds, current)
+        self._entries.move_to_end(chat_id)
+        self._evict()
+
+    async def delete(self, chat_id: str) -> None:
+        if chat_id in self._entries:
+            self._drop(chat_id)
+            self._publish_gauges()
+
+
+class RedisProtocolError(Exception):
+    pass
+
+
+class _RespConnection:
+    """
+    Minimal RESP2 client connection - enough for HSET/HGETALL/EXPIRE/DEL
+    """
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @staticmethod
+    def encode(*args) -> bytes:
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(f"${len(data)}\r\n".encode())
+            parts.append(data + b"\r\n")
+        return b"".join(parts)
+
+    async def read_reply(self):
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b"+":
+            return payload.decode()
+        if prefix == b"-":
+            raise RedisProtocolError(payload.decode())
+        if prefix == b":":
+            return int(payload)
+        if prefix == b"$":
+            length = int(payload)
+            if length == -1:
+                return None
+            data = await self.reader.readexactly(length + 2)
+            return data[:-2]
+        if prefix == b"*":
+            length = int(payload)
+            if length == -1:
+                return None
+            return [await self.read_reply() for _ in range(length)]
+        raise RedisProtocolError(f"Unexpected reply prefix: {line!r}")
+
+    async def execute_many(self, commands: List[tuple]) -> list:
+        self.writer.write(b"".join(self.encode(*command) for command in commands))
+        await self.writer.drain()
+        replies = []
+        for _ in commands:
+            try:
+                replies.append(await self.read_reply())
+            except RedisProtocolError as e:
+                replies.append(e)
+        return replies
+
+    def close(self):
+        self.writer.close()
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Networked store speaking the Redis protocol, so every uvicorn worker sees the
+    same context. Each session is a hash of JSON-encoded fields with a TTL; HSET
+    merges fields atomically on the server.
+    """
+    def __init__(self, url: str, ttl_seconds: int = SESSION_TTL_SECONDS, pool_size: int = 10,
+                 key_prefix: str = "session:"):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.ttl_seconds = ttl_seconds
+        self.key_prefix = key_prefix
+        self._pool: asyncio.LifoQueue = asyncio.LifoQueue()
+        self._slots = asyncio.Semaphore(pool_size)
+
+    def _key(self, chat_id: str) -> str:
+        return f"{self.key_prefix}{chat_id}"
+
+    async def _connect(self) -> _RespConnection:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        connection = _RespConnection(reader, writer)
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            for reply in await connection.execute_many(setup):
+                if isinstance(reply, Exception):
+                    connection.close()
+                    raise reply
+        return connection
+
+    async def _execute(self, *commands: tuple) -> list:
+        async with self._slots:
+            connection = self._pool.get_nowait() if not self._pool.empty() else await self._connect()
+            try:
+                replies = await connection.execute_many(list(commands))
+            except BaseException:
+                # Broken, or cancelled mid-reply (replies would be read by the next user): never reuse it
+                connection.close()
+                raise
+            self._pool.put_nowait(connection)
+        for reply in replies:
+            if isinstance(reply, Exception):
+                raise reply
+        return replies
+
+    async def get(self, chat_id: str) -> Dict[str, Any]:
+        [flat] = await self._execute(("HGETALL", self._key(chat_id)))
+        if not flat:
+            return {}
+        return {flat[idx].decode(): json.loads(flat[idx + 1]) for idx in range(0, len(flat), 2)}
+
+    async def update(self, chat_id: str, fields: Dict[str, Any]) -> None:
+        if not fields:
+            return
+        key = self._key(chat_id)
+        hset = ["HSET", key]
+        for field, value in fields.items():
+            hset.extend([field, _encode(value)])
+        await self._execute(tuple(hset), ("EXPIRE", key, self.ttl_seconds))
+
+    async def delete(self, chat_id: str) -> None:
+        await self._execute(("DEL", self._key(chat_id)))
+
+    async def close(self) -> None:
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+
+def create_session_store(url: str = SESSION_STORE_URL) -> SessionStore:
+    scheme = urlparse(url).scheme
+    if scheme in ("redis", "rediss"):
+        if scheme == "rediss":
+            raise ValueError("TLS redis URLs are not supported by the built-in client")
+        print(f"🗄️ Using Redis session store at {url.split('@')[-1]}")
+        return RedisSessionStore(url)
+    return InMemorySessionStore()
+
+
+session_store = create_session_store()
@@ -26,8 +26,13 @@ async def user_middleware(request: Request, call_next):
             email = payload.get("sub")
 
             if email:
-                db = next(get_db_connection())
-                user = get_user_details(email, db)
+                #Close the session explicitly, otherwise its connection stays checked out until gc
+                db_connection = get_db_connection()
+                db = next(db_connection)
+                try:
+                    user = get_user_details(email, db)
+                finally:
+                    db_connection.close()
 
                 if user and user_id_ctx.get() is None:
                     user_id_ctx.set(user)
@@ -0,0 +1,3 @@
+from fastapi import APIRouter
+
+jobs_router = APIRouter(prefix="/jobs", tags=["jobs"])
\ No newline at end of file
@@ -0,0 +1,270 @@
+import os
+import json
+import time
+import zlib
+import struct
+import asyncio
+import hashlib
+import tarfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from core.metrics import registry
+
+ARTIFACT_STORE_DIR = os.getenv("ARTIFACT_STORE_DIR", "./artifacts")
+ARTIFACT_RETENTION_DAYS = float(os.getenv("ARTIFACT_RETENTION_DAYS", "30"))
+# Oldest artifacts are dropped beyond this many stored bytes (0 = no cap)
+ARTIFACT_MAX_BYTES = int(os.getenv("ARTIFACT_MAX_BYTES", str(1024 * 1024 * 1024)))
+ARTIFACT_GC_INTERVAL = float(os.getenv("ARTIFACT_GC_INTERVAL", "3600"))
+# Unreferenced blobs younger than this may belong to a manifest being written
+ARTIFACT_GC_GRACE_SECONDS = float(os.getenv("ARTIFACT_GC_GRACE_SECONDS", "600"))
+ARTIFACT_READ_CHUNK = 64 * 1024
+
+ARCHIVE_FORMATS = {"zip": "application/zip", "tar": "application/x-tar"}
+
+artifact_blobs = registry.counter(
+    "artifact_blobs_total", "Files put into the artifact store", ("result",)
+)
+artifact_gc_deleted = registry.counter(
+    "artifact_gc_deleted_total", "Artifacts and blobs removed by garbage collection", ("kind",)
+)
+artifact_store_bytes = registry.gauge("artifact_store_bytes", "Bytes of blobs in the artifact store")
+
+# Literal bytes, or (blob sha256, offset, length)
+Segment = Union[bytes, Tuple[str, int, int]]
+
+
+def _dos_datetime(timestamp: float) -> Tuple[int, int]:
+    moment = datetime.fromtimestamp(max(timestamp, 315532800), timezone.utc)  # zip cannot go before 1980
+    return (
+        (moment.hour << 11) | (moment.minute << 5) | (moment.second // 2),
+        ((moment.year - 1980) << 9) | (moment.month << 5) | moment.day,
+    )
+
+
+class ArtifactStore:
+    """
+    Content-addressed store for job outputs. Each file is a blob named by its
+    SHA-256 (identical files across jobs are stored once); each job has a JSON
+    manifest of (name, sha256, size, crc32). Archives are laid out from the
+    manifest alone, so their length and ETag are known before any byte is read
+    and a byte range maps straight onto blob offsets.
+    """
+    def __init__(self, root: str = ARTIFACT_STORE_DIR):
+        self.root = Path(root)
+        self.blobs = self.root / "blobs"
+        self.manifests = self.root / "manifests"
+        self._gc_task: Optional[asyncio.Task] = None
+
+    def _blob_path(self, sha: str) -> Path:
+        return self.blobs / sha[:2] / sha
+
+    def _manifest_path(self, job_id: str) -> Path:
+        return self.manifests / f"{job_id}.json"
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        temp.write_bytes(data)
+        os.replace(temp, path)
+
+    def put(self, job_id: str, files: Dict[str, bytes]) -> dict:
+        """Store a job's files (name -> content) and return its manifest"""
+        entries = []
+        for name, content in files.items():
+            sha = hashlib.sha256(content).hexdigest()
+            blob = self._blob_path(sha)
+            if blob.exists():
+                os.utime(blob)  # keeps a blob that GC is about to sweep alive
+                artifact_blobs.inc(result="deduplicated")
+            else:
+                self._write_atomic(blob, content)
+                artifact_blobs.inc(result="stored")
+            entries.append({"name": name, "sha256": sha, "size": len(content), "crc32": zlib.crc32(content)})
+        manifest = {"job_id": job_id, "created_at": time.time(), "files": entries}
+        self._write_atomic(self._manifest_path(job_id), json.dumps(manifest).encode())
+        return manifest
+
+    def put_dir(self, job_id: str, directory: Path, names: List[str]) -> dict:
+        return self.put(job_id, {name: (directory / name).read_bytes() for name in names})
+
+    def get_manifest(self, job_id: str) -> Optional[dict]:
+        try:
+            return json.loads(self._manifest_path(job_id).read_text())
+        except (OSError, ValueError):
+            return None
+
+    def has(self, job_id: str) -> bool:
+        return self._manifest_path(job_id).exists()
+
+    def delete(self, job_id: str) -> bool:
+        """Drop a job's manifest; its blobs go at the next GC unless other jobs share them"""
+        path = self._manifest_path(job_id)
+        existed = path.exists()
+        path.unlink(missing_ok=True)
+        return existed
+
+    def read_file(self, job_id: str, name: str) -> Optional[bytes]:
+        manifest = self.get_manifest(job_id)
+        for entry in (manifest or {}).get("files", []):
+            if entry["name"] == name:
+                return self._blob_path(entry["sha256"]).read_bytes()
+        return None
+
+    # --- archives ---
+
+    def archive_layout(self, manifest: dict, archive_format: str) -> List[Segment]:
+        if archive_format == "zip":
+            return self._zip_layout(manifest)
+        if archive_format == "tar":
+            return self._tar_layout(manifest)
+        raise ValueError(f"Unsupported archive format: {archive_format}")
+
+    def _zip_layout(self, manifest: dict) -> List[Segment]:
+        # Stored (uncompressed) entries: sizes and CRCs come from the manifest
+        dos_time, dos_date = _dos_datetime(manifest["created_at"])
+        segments, central, offset = [], [], 0
+        for entry in manifest["files"]:
+            name = entry["name"].encode()
+            local = struct.pack(
+                "<IHHHHHIIIHH", 0x04034B50, 20, 0x0800, 0, dos_time, dos_date,
+                entry["crc32"], entry["size"], entry["size"], len(name), 0
+            ) + name
+            central.append(struct.pack(
+                "<IHHHHHHIIIHHHHHII", 0x02014B50, 20, 20, 0x0800, 0, dos_time, dos_date,
+                entry["crc32"], entry["size"], entry["size"], len(name), 0, 0, 0, 0, 0o100644 << 16, offset
+            ) + name)
+            segments += [local, (entry["sha256"], 0, entry["size"])]
+            offset += len(local) + entry["size"]
+        directory = b"".join(central)
+        if offset + len(directory) > 0xFFFFFFFF:
+            raise ValueError("Artifact too large for a zip archive, use tar")
+        segments.append(directory + struct.pack(
+            "<IHHHHIIH", 0x06054B50, 0, 0, len(central), len(central), len(directory), offset, 0
+        ))
+        return segments
+
+    def _tar_layout(self, manifest: dict) -> List[Segment]:
+        segments = []
+        for entry in manifest["files"]:
+            info = tarfile.TarInfo(entry["name"])
+            info.size, info.mtime, info.mode = entry["size"], int(manifest["created_at"]), 0o644
+            segments += [info.tobuf(format=tarfile.USTAR_FORMAT), (entry["sha256"], 0, entry["size"])]
+            if entry["size"] % 512:
+                segments.append(b"\0" * (512 - entry["size"] % 512))
+        segments.append(b"\0" * 1024)
+        return segments
+
+    @staticmethod
+    def layout_size(segments: List[Segment]) -> int:
+        return sum(len(s) if isinstance(s, bytes) else s[2] for s in segments)
+
+    @staticmethod
+    def archive_etag(manifest: dict, archive_format: str) -> str:
+        identity = json.dumps([archive_format, manifest["created_at"], [(e["name"], e["sha256"]) for e in manifest["files"]]])
+        return '"' + hashlib.sha256(identity.encode()).hexdigest()[:32] + '"'
+
+    def iter_range(self, segments: List[Segment], start: int, end: int) -> Iterator[bytes]:
+        """
+        Bytes start..end (inclusive) of the archive. A plain generator: the
+        response runs it in a worker thread, so blob reads stay off the event loop.
+        """
+        position = 0
+        for segment in segments:
+            length = len(segment) if isinstance(segment, bytes) else segment[2]
+            segment_start, segment_end = position, position + length - 1
+            position += length
+            if segment_end < start or length == 0:
+                continue
+            if segment_start > end:
+                break
+            low, high = max(start, segment_start) - segment_start, min(end, segment_end) - segment_start
+            if isinstance(segment, bytes):
+                yield segment[low:high + 1]
+                continue
+            with open(self._blob_path(segment[0]), "rb") as blob:
+                blob.seek(segment[1] + low)
+                remaining = high - low + 1
+                while remaining > 0:
+                    chunk = blob.read(min(ARTIFACT_READ_CHUNK, remaining))
+                    if not chunk:
+                        raise IOError(f"Blob {segment[0]} is shorter than its manifest says")
+                    remaining -= len(chunk)
+                    yield chunk
+
+    # --- retention ---
+
+    def collect_garbage(self, now: Optional[float] = None) -> dict:
+        """
+        Drop manifests past the retention period (then the oldest ones while
+        over ARTIFACT_MAX_BYTES), then sweep blobs no manifest references
+        """
+        now = now or time.time()
+        manifests = []
+        for path in self.manifests.glob("*.json") if self.manifests.exists() else []:
+            try:
+                manifests.append((json.loads(path.read_text()), path))
+            except (OSError, ValueError):
+                continue
+        manifests.sort(key=lambda item: item[0].get("created_at", 0))
+
+        expired_before = now - ARTIFACT_RETENTION_DAYS * 86400
+        kept = []
+        deleted_manifests = 0
+        for manifest, path in manifests:
+            if manifest.get("created_at", 0) < expired_before:
+                path.unlink(missing_ok=True)
+                deleted_manifests += 1
+            else:
+                kept.append((manifest, path))
+
+        def referenced_bytes(items):
+            sizes = {e["sha256"]: e["size"] for manifest, _ in items for e in manifest["files"]}
+            return sum(sizes.values())
+        while ARTIFACT_MAX_BYTES and kept and referenced_bytes(kept) > ARTIFACT_MAX_BYTES:
+            _, path = kept.pop(0)
+            path.unlink(missing_ok=True)
+            deleted_manifests += 1
+
+        live = {e["sha256"] for manifest, _ in kept for e in manifest["files"]}
+        deleted_blobs, stored_bytes = 0, 0
+        for blob in self.blobs.glob("*/*") if self.blobs.exists() else []:
+            try:
+                stat = blob.stat()
+            except OSError:
+                continue
+            if blob.name in live or now - stat.st_mtime < ARTIFACT_GC_GRACE_SECONDS:
+                if not blob.name.startswith("."):
+                    stored_bytes += stat.st_size
+                continue
+            blob.unlink(missing_ok=True)  # unreferenced blob or a stale temp file
+            deleted_blobs += 1
+
+        artifact_gc_deleted.inc(deleted_manifests, kind="manifest")
+        artifact_gc_deleted.inc(deleted_blobs, kind="blob")
+        artifact_store_bytes.set(stored_bytes)
+        return {"manifests_deleted": deleted_manifests, "blobs_deleted": deleted_blobs, "bytes": stored_bytes}
+
+    async def _gc_loop(self, interval: float):
+        while True:
+            try:
+                stats = await asyncio.to_thread(self.collect_garbage)
+                if stats["manifests_deleted"] or stats["blobs_deleted"]:
+                    print(f"🧹 Artifact GC: {stats}")
+            except Exception as e:
+                print(f"⚠️ Artifact GC failed: {str(e)}")
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float = ARTIFACT_GC_INTERVAL):
+        if self._gc_task is None:
+            self._gc_task = asyncio.create_task(self._gc_loop(interval))
+
+    async def close(self):
+        if self._gc_task is not None:
+            self._gc_task.cancel()
+            await asyncio.gather(self._gc_task, return_exceptions=True)
+            self._gc_task = None
+
+
+artifact_store = ArtifactStore()
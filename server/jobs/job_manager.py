@@ -0,0 +1,528 @@
+import os
+import json
+import time
+import socket
+import asyncio
+from uuid import uuid4
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Optional
+from sqlalchemy import func, or_
+from config.database import sessionLocal
+from core.metrics import registry
+from core.event_bus import event_bus
+from jobs.models.JobModel import JobModel
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", "100"))
+# Runs interrupted by a crash or restart are retried this many times in total
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Owners refresh their jobs' heartbeat this often; jobs whose owner has been
+# silent for JOB_STALE_AFTER seconds are taken over by another process
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "15"))
+JOB_STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", "60"))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+jobs_queue_depth = registry.gauge(
+    "jobs_queue_depth", "Jobs waiting for a worker", ("kind",)
+)
+jobs_running = registry.gauge(
+    "jobs_running", "Jobs currently executing", ("kind",)
+)
+jobs_total = registry.counter(
+    "jobs_total", "Finished jobs", ("kind", "status")
+)
+job_duration = registry.histogram(
+    "job_duration_seconds", "Job execution time", ("kind", "status"),
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1200, float("inf"))
+)
+job_queue_wait = registry.histogram(
+    "job_queue_wait_seconds", "Time from submission to start", ("kind",),
+    buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 300, 900, float("inf"))
+)
+
+# (job_id, payload) -> JSON-serializable result
+JobHandler = Callable[[str, dict], Awaitable[Optional[dict]]]
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+def _with_db(fn):
+    db = sessionLocal()
+    try:
+        return fn(db)
+    finally:
+        db.close()
+
+
+def _to_dict(job: JobModel) -> dict:
+    return {
+        "job_id": job.job_id,
+        "user_id": job.user_id,
+        "chat_id": job.chat_id,
+        "kind": job.kind,
+        "status": job.status,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "attempts": job.attempts or 0,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+class JobManager:
+    """
+    Bounded pool of workers draining a queue of persisted jobs.
+
+    Every state change is written to the jobs table (off the event loop), so
+    status survives restarts. Each manager owns the jobs it queued or claimed
+    and keeps their heartbeat fresh; jobs left behind by a stopped or crashed
+    process (released or stale) are put back on the queue of whichever
+    process notices first. Started and stopped by the FastAPI lifespan;
+    handlers are registered per job kind at import time. Status changes and
+    progress are also pushed to the owner's event stream.
+    """
+    _instance: Optional['JobManager'] = None
+
+    def __init__(self, workers: int = JOB_WORKERS, queue_limit: int = JOB_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._handlers: Dict[str, JobHandler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: list = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._queued_at: Dict[str, float] = {}
+        # job_id -> (user_id, chat_id, kind) of running jobs, for progress events
+        self._owners: Dict[str, tuple] = {}
+        self._cancel_requested: set = set()
+        # dedupe_key -> job_id of the queued/running job identical requests attach to
+        self._active_keys: Dict[str, str] = {}
+        self._job_keys: Dict[str, str] = {}
+        self._idle_workers: set = set()
+        # Queued/running jobs that interactive work may cancel (speculative generations)
+        self._preemptible: set = set()
+        self._closing = False
+        self._heartbeat: Optional[asyncio.Task] = None
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+
+    @classmethod
+    def get_instance(cls) -> 'JobManager':
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def register(self, kind: str, handler: JobHandler):
+        self._handlers[kind] = handler
+
+    async def _update(self, job_id: str, **fields):
+        def write(db):
+            db.query(JobModel).filter(JobModel.job_id == job_id).update(fields)
+            db.commit()
+        await asyncio.to_thread(_with_db, write)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        def read(db):
+            job = db.query(JobModel).filter(JobModel.job_id == job_id).first()
+            return _to_dict(job) if job else None
+        return await asyncio.to_thread(_with_db, read)
+
+    def _notify(self, job_id: str, kind: str, user_id: Optional[int], chat_id: Optional[str], status: str, **extra):
+        event_bus.publish(user_id, "job", {"job_id": job_id, "kind": kind, "chat_id": chat_id, "status": status, **extra})
+
+    def progress(self, job_id: str, message: str, **data):
+        """Push a progress line (plus any extra fields) for a running job to its owner"""
+        owner = self._owners.get(job_id)
+        if owner is None:
+            return
+        user_id, chat_id, kind = owner
+        event_bus.publish(user_id, "job_progress", {
+            "job_id": job_id, "kind": kind, "chat_id": chat_id, "message": message, **data
+        })
+
+    def _track_key(self, job_id: str, dedupe_key: Optional[str]):
+        if dedupe_key:
+            self._active_keys[dedupe_key] = job_id
+            self._job_keys[job_id] = dedupe_key
+
+    def _release_key(self, job_id: str):
+        dedupe_key = self._job_keys.pop(job_id, None)
+        if dedupe_key and self._active_keys.get(dedupe_key) == job_id:
+            del self._active_keys[dedupe_key]
+
+    def active_job(self, dedupe_key: str) -> Optional[str]:
+        """Queued or running job for an identical request, if any"""
+        return self._active_keys.get(dedupe_key)
+
+    async def find_latest(self, kind: str, dedupe_key: str, status: str = SUCCEEDED) -> Optional[dict]:
+        def read(db):
+            job = (
+                db.query(JobModel)
+                .filter(JobModel.kind == kind, JobModel.dedupe_key == dedupe_key, JobModel.status == status)
+                .order_by(JobModel.finished_at.desc())
+                .first()
+            )
+            return _to_dict(job) if job else None
+        return await asyncio.to_thread(_with_db, read)
+
+    async def find_latest_for_chat(self, kind: str, chat_id: str, user_id: Optional[int],
+                                   status: str = SUCCEEDED) -> Optional[dict]:
+        def read(db):
+            job = (
+                db.query(JobModel)
+                .filter(JobModel.kind == kind, JobModel.chat_id == chat_id,
+                        JobModel.user_id == user_id, JobModel.status == status)
+                .order_by(JobModel.finished_at.desc())
+                .first()
+            )
+            return _to_dict(job) if job else None
+        return await asyncio.to_thread(_with_db, read)
+
+    def _enqueue(self, job_id: str, kind: str):
+        self._queued_at[job_id] = time.monotonic()
+        jobs_queue_depth.inc(kind=kind)
+        self._queue.put_nowait((job_id, kind))
+
+    async def submit(self, kind: str, payload: dict, user_id: Optional[int] = None,
+                     chat_id: Optional[str] = None, job_id: Optional[str] = None,
+                     dedupe_key: Optional[str] = None, attach: bool = True, preemptible: bool = False) -> str:
+        """
+        Queue a job and return its id. With a dedupe_key and attach, an identical
+        queued or running job's id is returned instead of starting another one.
+        Preemptible jobs are cancelled whenever other work would wait for them.
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        if self._queue is None:
+            await self.start()
+        if self._queue.qsize() >= self.queue_limit:
+            raise JobQueueFull(f"{self._queue.qsize()} jobs already queued")
+
+        if dedupe_key and attach and dedupe_key in self._active_keys:
+            existing = self._active_keys[dedupe_key]
+            print(f"🔗 Attached to identical {kind} job {existing}")
+            return existing
+
+        if not preemptible:
+            await self._preempt_for_capacity()
+
+        job_id = job_id or str(uuid4())
+        # Tracked before the insert so concurrent identical submits attach to this one
+        self._track_key(job_id, dedupe_key)
+        if preemptible:
+            self._preemptible.add(job_id)
+
+        def insert(db):
+            db.add(JobModel(
+                job_id=job_id, user_id=user_id, chat_id=chat_id, kind=kind, dedupe_key=dedupe_key,
+                status=QUEUED, payload=json.dumps(payload, default=str), attempts=0,
+                owner=self.worker_id, heartbeat_at=datetime.now(timezone.utc)
+            ))
+            db.commit()
+        try:
+            await asyncio.to_thread(_with_db, insert)
+        except Exception:
+            self._release_key(job_id)
+            self._preemptible.discard(job_id)
+            raise
+        self._enqueue(job_id, kind)
+        self._notify(job_id, kind, user_id, chat_id, QUEUED)
+        print(f"📥 Queued {kind} job {job_id} ({self._queue.qsize()} waiting)")
+        return job_id
+
+    async def _preempt_for_capacity(self):
+        busy = len(self._running) + self._queue.qsize()
+        for job_id in list(self._preemptible):
+            if busy < self.workers:
+                break
+            if await self.cancel(job_id):
+                busy -= 1
+                print(f"⏏️ Preempted job {job_id} for interactive work")
+
+    async def preempt(self, limit: Optional[int] = None, running: Optional[bool] = None) -> int:
+        """
+        Cancel queued or running preemptible jobs, running ones first, up to limit
+        (default all); running=True/False restricts it to running/queued ones.
+        Returns how many were cancelled.
+        """
+        cancelled = 0
+        for job_id in sorted(self._preemptible, key=lambda job_id: job_id not in self._running):
+            if limit is not None and cancelled >= limit:
+                break
+            if running is not None and (job_id in self._running) != running:
+                continue
+            if await self.cancel(job_id):
+                cancelled += 1
+                print(f"⏏️ Preempted job {job_id} for interactive work")
+        return cancelled
+
+    async def adopt(self, job_id: str, chat_id: Optional[str]):
+        """A user now waits on this job: it is no longer preemptible and belongs to chat_id"""
+        self._preemptible.discard(job_id)
+        if job_id in self._owners:
+            user_id, _, kind = self._owners[job_id]
+            self._owners[job_id] = (user_id, chat_id, kind)
+        await self._update(job_id, chat_id=chat_id)
+
+    async def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; False if it already finished"""
+        job = await self.get(job_id)
+        if job is None or job["status"] in FINISHED_STATES:
+            return False
+
+        def cancel_queued(db):
+            # Conditional so a worker claiming the job at the same time wins cleanly
+            updated = db.query(JobModel).filter(JobModel.job_id == job_id, JobModel.status == QUEUED).update(
+                {"status": CANCELLED, "finished_at": datetime.now(timezone.utc)}
+            )
+            db.commit()
+            return updated
+        if await asyncio.to_thread(_with_db, cancel_queued):
+            jobs_total.inc(kind=job["kind"], status=CANCELLED)
+            self._release_key(job_id)
+            self._preemptible.discard(job_id)
+            self._notify(job_id, job["kind"], job["user_id"], job["chat_id"], CANCELLED)
+        elif job_id in self._running or job_id in self._queued_at:
+            # Running here: the worker cancels the handler and records the state
+            self._cancel_requested.add(job_id)
+            task = self._running.get(job_id)
+            if task is not None:
+                task.cancel()
+        else:
+            # Running in another process: flag it for the owner's next heartbeat
+            def request_cancel(db):
+                updated = db.query(JobModel).filter(JobModel.job_id == job_id, JobModel.status == RUNNING).update(
+                    {"cancel_requested": True}, synchronize_session=False
+                )
+                db.commit()
+                return updated
+            if not await asyncio.to_thread(_with_db, request_cancel):
+                return False
+            print(f"🛑 Requested cancel of job {job_id} from its owner")
+            return True
+        print(f"🛑 Cancelled job {job_id}")
+        return True
+
+    async def start(self):
+        if self._queue is not None:
+            return
+        self._closing = False
+        self._queue = asyncio.Queue()
+        try:
+            await self._recover()
+        except Exception as e:
+            print(f"⚠️ Job recovery skipped: {str(e)}")
+        self._workers = [asyncio.create_task(self._worker(idx)) for idx in range(self.workers)]
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+        print(f"👷 Job manager {self.worker_id} started with {self.workers} workers")
+
+    def _orphaned(self, now: datetime):
+        """Filter for queued/running jobs no live process holds: released, or owner silent too long"""
+        return (
+            JobModel.status.in_([QUEUED, RUNNING]),
+            or_(JobModel.owner.is_(None), JobModel.owner != self.worker_id),
+            or_(JobModel.owner.is_(None), JobModel.heartbeat_at.is_(None),
+                JobModel.heartbeat_at < now - timedelta(seconds=JOB_STALE_AFTER)),
+        )
+
+    async def _recover(self):
+        def take_over(db):
+            now = datetime.now(timezone.utc)
+            jobs = [
+                (job.job_id, job.kind, job.status, job.attempts or 0, job.dedupe_key, job.cancel_requested)
+                for job in db.query(JobModel).filter(*self._orphaned(now)).order_by(JobModel.created_at)
+            ]
+            taken = []
+            for job_id, kind, status, attempts, dedupe_key, cancel_requested in jobs:
+                if cancel_requested:
+                    fields = {"status": CANCELLED, "finished_at": now}
+                elif status == RUNNING and attempts >= JOB_MAX_ATTEMPTS:
+                    fields = {"status": FAILED, "error": "Interrupted too many times", "finished_at": now}
+                else:
+                    fields = {"status": QUEUED}
+                # Conditional on the job still being orphaned: other processes recover concurrently
+                updated = db.query(JobModel).filter(JobModel.job_id == job_id, *self._orphaned(now)).update(
+                    {**fields, "owner": self.worker_id, "heartbeat_at": now}, synchronize_session=False
+                )
+                db.commit()
+                if updated:
+                    taken.append((job_id, kind, status, dedupe_key, fields["status"]))
+            return taken
+        for job_id, kind, status, dedupe_key, new_status in await asyncio.to_thread(_with_db, take_over):
+            if new_status != QUEUED:
+                jobs_total.inc(kind=kind, status=new_status)
+                print(f"♻️ Closed orphaned {kind} job {job_id} as {new_status}")
+                continue
+            self._track_key(job_id, dedupe_key)
+            self._enqueue(job_id, kind)
+            print(f"♻️ Recovered {status} {kind} job {job_id}")
+
+    async def _heartbeat_loop(self):
+        while not self._closing:
+            await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+            try:
+                await self._beat()
+                await self._recover()
+            except Exception as e:
+                print(f"⚠️ Job heartbeat failed: {str(e)}")
+
+    async def _beat(self):
+        """Refresh the heartbeat of the jobs this process holds and act on cancels requested elsewhere"""
+        def beat(db):
+            mine = (JobModel.owner == self.worker_id, JobModel.status.in_([QUEUED, RUNNING]))
+            db.query(JobModel).filter(*mine).update(
+                {"heartbeat_at": datetime.now(timezone.utc)}, synchronize_session=False
+            )
+            db.commit()
+            return [row.job_id for row in db.query(JobModel.job_id).filter(*mine, JobModel.cancel_requested.is_(True))]
+        for job_id in await asyncio.to_thread(_with_db, beat):
+            task = self._running.get(job_id)
+            if task is not None and job_id not in self._cancel_requested:
+                self._cancel_requested.add(job_id)
+                task.cancel()
+                print(f"🛑 Cancelled job {job_id} on request from another process")
+
+    async def _worker(self, idx: int):
+        worker = asyncio.current_task()
+        while not self._closing:
+            self._idle_workers.add(worker)
+            try:
+                job_id, kind = await self._queue.get()
+            finally:
+                self._idle_workers.discard(worker)
+            jobs_queue_depth.dec(kind=kind)
+            try:
+                await self._execute(job_id, kind)
+            except Exception as e:
+                print(f"❌ Worker {idx} failed to run job {job_id}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job_id: str, kind: str):
+        def claim(db):
+            # One conditional UPDATE: of several workers (or processes) holding
+            # this job, only the one that flips it out of QUEUED runs it
+            now = datetime.now(timezone.utc)
+            claimed = db.query(JobModel).filter(JobModel.job_id == job_id, JobModel.status == QUEUED).update({
+                "status": RUNNING,
+                "started_at": now,
+                "attempts": func.coalesce(JobModel.attempts, 0) + 1,
+                "owner": self.worker_id,
+                "heartbeat_at": now,
+            }, synchronize_session=False)
+            db.commit()
+            if not claimed:
+                return None
+            job = db.query(JobModel).filter(JobModel.job_id == job_id).first()
+            return json.loads(job.payload) if job.payload else {}, job.user_id, job.chat_id
+        claimed = await asyncio.to_thread(_with_db, claim)
+        queued_at = self._queued_at.pop(job_id, None)
+        if claimed is None:
+            self._release_key(job_id)
+            self._preemptible.discard(job_id)
+            return  # cancelled while queued
+        payload, user_id, chat_id = claimed
+        if queued_at is not None:
+            job_queue_wait.observe(time.monotonic() - queued_at, kind=kind)
+
+        handler = self._handlers.get(kind)
+        if handler is None:
+            error = f"No handler for job kind '{kind}'"
+            await self._update(job_id, status=FAILED, error=error, finished_at=datetime.now(timezone.utc))
+            self._release_key(job_id)
+            self._preemptible.discard(job_id)
+            self._notify(job_id, kind, user_id, chat_id, FAILED, error=error)
+            return
+        started = time.perf_counter()
+        jobs_running.inc(kind=kind)
+        self._owners[job_id] = (user_id, chat_id, kind)
+        self._notify(job_id, kind, user_id, chat_id, RUNNING)
+        task = asyncio.create_task(handler(job_id, payload))
+        self._running[job_id] = task
+        if job_id in self._cancel_requested:
+            task.cancel()
+        result, error = None, None
+        try:
+            result = await task
+            status, fields = SUCCEEDED, {"result": json.dumps(result, default=str) if result is not None else None}
+        except asyncio.CancelledError:
+            if self._closing:
+                # Shutdown, not a user cancel: leave it for recovery on the next start
+                status, fields = QUEUED, {}
+            else:
+                status, fields = CANCELLED, {}
+        except Exception as e:
+            error = str(e)
+            status, fields = FAILED, {"error": error}
+        finally:
+            self._running.pop(job_id, None)
+            self._owners.pop(job_id, None)
+            self._release_key(job_id)
+            self._preemptible.discard(job_id)
+            self._cancel_requested.discard(job_id)
+            jobs_running.dec(kind=kind)
+
+        elapsed = time.perf_counter() - started
+        if status != QUEUED:
+            fields["finished_at"] = datetime.now(timezone.utc)
+            jobs_total.inc(kind=kind, status=status)
+            job_duration.observe(elapsed, kind=kind, status=status)
+        await self._update(job_id, status=status, **fields)
+        if status == QUEUED:
+            print(f"⏸️ Job {job_id} ({kind}) interrupted by shutdown, will resume on restart")
+        else:
+            self._notify(job_id, kind, user_id, chat_id, status, result=result, error=error)
+            print(f"🏁 Job {job_id} ({kind}) {status} in {elapsed:.1f}s")
+
+    def idle(self) -> bool:
+        """No job waiting, being claimed by a worker, or running"""
+        return not self._queued_at and not self._running
+
+    def is_running(self, job_id: str) -> bool:
+        """job_id is running in this process"""
+        return job_id in self._running
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._workers),
+            "queued": self._queue.qsize() if self._queue else 0,
+            "running": len(self._running),
+            "preemptible": len(self._preemptible),
+        }
+
+    async def close(self):
+        if self._queue is None:
+            return
+        self._closing = True
+        # Idle workers just stop; busy ones record their interrupted run as queued, then exit
+        for worker in self._idle_workers:
+            worker.cancel()
+        for task in list(self._running.values()):
+            task.cancel()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+        await asyncio.gather(*self._workers, *filter(None, [self._heartbeat]), return_exceptions=True)
+        self._workers = []
+        self._heartbeat = None
+        self._queue = None
+
+        # Hand the jobs still queued here (including interrupted runs) to the next process to start
+        def release(db):
+            released = db.query(JobModel).filter(JobModel.owner == self.worker_id, JobModel.status == QUEUED).update(
+                {"owner": None}, synchronize_session=False
+            )
+            db.commit()
+            return released
+        try:
+            released = await asyncio.to_thread(_with_db, release)
+        except Exception as e:
+            print(f"⚠️ Could not release queued jobs: {str(e)}")
+            return
+        if released:
+            print(f"📤 Released {released} queued jobs for recovery")
+
+
+job_manager = JobManager.get_instance()
@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Enum, Text
+from sqlalchemy.dialects.mysql import LONGTEXT
+from datetime import datetime, timezone
+from config.database import base as Base
+
+# Base model for common attributes
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class BaseModel(Base):
+    __abstract__ = True  # This will not create a separate table
+    created_at = Column(DateTime, default=_utcnow)
+    updated_at = Column(DateTime, default=_utcnow, onupdate=_utcnow)
+    is_deleted = Column(Boolean, default=False)
+
+
+class JobModel(BaseModel):
+    """
+    Background jobs (e.g. terraform generation) and their state, so queued work
+    survives a restart and clients can poll for status.
+    """
+    __tablename__ = 'jobs'
+
+    job_id = Column(String(36), primary_key=True, index=True)
+    user_id = Column(Integer, index=True)
+    chat_id = Column(String(128))
+    kind = Column(String(50), nullable=False)
+    status = Column(String(20), index=True, nullable=False)  # queued, running, succeeded, failed, cancelled
+    dedupe_key = Column(String(64), index=True)  # identical requests share one job/result
+    payload = Column(Text().with_variant(LONGTEXT, "mysql"))  # JSON handler input
+    result = Column(Text().with_variant(LONGTEXT, "mysql"))   # JSON handler output
+    error = Column(Text)
+    attempts = Column(Integer, default=0)
+    owner = Column(String(128), index=True)  # worker id of the process holding the job
+    heartbeat_at = Column(DateTime)           # refreshed by the owner while queued/running
+    cancel_requested = Column(Boolean, default=False)  # set by other processes for the owner to act on
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
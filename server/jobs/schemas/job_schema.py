@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from typing import Any, Optional
+from datetime import datetime
+
+
+'''RESPONSE SCHEMA SECTION'''
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    kind: str
+    status: str
+    chat_id: Optional[str] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
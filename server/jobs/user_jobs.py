@@ -0,0 +1,110 @@
+import re
+import asyncio
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from jobs import jobs_router
+from jobs.schemas.job_schema import JobResponse
+from jobs.job_manager import job_manager
+from jobs.artifact_store import artifact_store, ARCHIVE_FORMATS
+from core.context_vars import user_id_ctx
+from core.utility import create_response
+import logging
+
+logger = logging.getLogger(__name__)
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _current_user_id() -> int:
+    user_context = user_id_ctx.get()
+    if not user_context or not hasattr(user_context, 'user_id'):
+        raise HTTPException(status_code=401, detail="User not authenticated")
+    return user_context.user_id
+
+
+async def _get_own_job(job_id: str, user_id: int):
+    job = await job_manager.get(job_id)
+    if job is None or job["user_id"] != user_id:
+        return None
+    return job
+
+
+@jobs_router.get("/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    job = await _get_own_job(job_id, _current_user_id())
+    if job is None:
+        return create_response(404, "job_not_found", "Error")
+    return job
+
+
+@jobs_router.delete("/{job_id}")
+async def cancel_job(job_id: str):
+    job = await _get_own_job(job_id, _current_user_id())
+    if job is None:
+        return create_response(404, "job_not_found", "Error")
+    if not await job_manager.cancel(job_id):
+        return create_response(409, "job_already_finished", "Error")
+    return create_response(200, "job_cancelled", "Success")
+
+
+def _parse_range(header: str, total: int):
+    """(start, end) for a single byte range, None to send everything, False if unsatisfiable"""
+    match = _RANGE_RE.match(header.strip())
+    if match is None:
+        return None  # malformed or multi-range: ignored, the full body is sent
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(0, total - int(last)), total - 1
+    else:
+        start, end = int(first), min(int(last), total - 1) if last else total - 1
+    if start >= total or start > end:
+        return False
+    return start, end
+
+
+@jobs_router.get("/{job_id}/artifact")
+async def download_job_artifact(job_id: str, request: Request, format: str = "zip"):
+    """
+    Generated files as a zip (stored, uncompressed) or tar archive, assembled
+    on the fly from the artifact store. Supports ETag / If-None-Match and single
+    byte ranges (with If-Range) for resumable downloads.
+    """
+    job = await _get_own_job(job_id, _current_user_id())
+    if job is None:
+        return create_response(404, "job_not_found", "Error")
+    if format not in ARCHIVE_FORMATS:
+        raise HTTPException(status_code=422, detail=f"format must be one of {sorted(ARCHIVE_FORMATS)}")
+    manifest = await asyncio.to_thread(artifact_store.get_manifest, job_id)
+    if manifest is None:
+        return create_response(404, "artifact_not_found", "Error")
+
+    segments = artifact_store.archive_layout(manifest, format)
+    total = artifact_store.layout_size(segments)
+    etag = artifact_store.archive_etag(manifest, format)
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, max-age=0, must-revalidate",
+        "Content-Disposition": f'attachment; filename="terraform-{job_id[:8]}.{format}"',
+    }
+    if etag in [tag.strip() for tag in request.headers.get("If-None-Match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    requested = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    byte_range = _parse_range(requested, total) if requested and (not if_range or if_range == etag) else None
+    if byte_range is False:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{total}"})
+
+    start, end = byte_range or (0, total - 1)
+    headers["Content-Length"] = str(end - start + 1)
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+    return StreamingResponse(
+        artifact_store.iter_range(segments, start, end),
+        status_code=206 if byte_range else 200,
+        media_type=ARCHIVE_FORMATS[format],
+        headers=headers,
+    )
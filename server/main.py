@@ -1,13 +1,47 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 from auth.user_auth import auth_router
 from chat.user_chat import chat_router
+from analysis.batch_analysis import analysis_router
+from jobs.user_jobs import jobs_router
+from jobs.job_manager import job_manager
+from jobs.artifact_store import artifact_store
 from core.user_middleware import user_middleware
-from config.database import engine, get_db_connection, base
+from config.database import engine, get_db_connection, base, add_missing_columns
+from jobs.models.JobModel import JobModel
+from core.metrics import render_metrics, PROMETHEUS_CONTENT_TYPE
+from core.http_client import http_client
+from core.session_store import session_store
+from agents.terraform_validator import shutdown_validation_pool
+from agents.terraform_speculation import terraform_speculator
 import logging
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    #Shared outgoing HTTP connection pool for the lifetime of the worker
+    await http_client.start()
+    #Background job workers; re-queues jobs interrupted by the last shutdown
+    await job_manager.start()
+    #Periodic retention/GC of generated artifacts
+    artifact_store.start()
+    #Expires unused speculative terraform generations
+    terraform_speculator.start()
+    yield
+    print(f"🔮 Terraform speculation stats: {terraform_speculator.stats()}")
+    await terraform_speculator.close()
+    await job_manager.close()
+    await artifact_store.close()
+    shutdown_validation_pool()
+    print(f"🔌 HTTP client stats: {http_client.stats()}")
+    await http_client.close()
+    await session_store.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 logger = logging.getLogger(__name__)
 
@@ -15,7 +49,7 @@ logger = logging.getLogger(__name__)
 accepted_origins = ["http://localhost:4200", "http://localhost:8000"]
 
 #Application routers
-routers = [auth_router, chat_router]
+routers = [auth_router, chat_router, analysis_router, jobs_router]
 
 #Add the custom middleware and the cors
 app.add_middleware(BaseHTTPMiddleware, dispatch=user_middleware)
@@ -33,7 +67,13 @@ for app_router in routers:
 
 #Spin up all the models that is needed to be created
 base.metadata.create_all(bind=engine)
+#Tables created before a model gained columns are altered in place
+add_missing_columns(JobModel.__table__)
 
 @app.get("/")
 async def root():
-    return {"message": "API is running"}
\ No newline at end of file
+    return {"message": "API is running"}
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
\ No newline at end of file
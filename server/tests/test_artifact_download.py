@@ -0,0 +1,125 @@
+import io
+import tarfile
+import zipfile
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+import jobs.user_jobs as user_jobs
+from jobs.artifact_store import ArtifactStore
+from core.context_vars import user_id_ctx
+
+FILES = {
+    "main.tf": b'provider "aws" {\n  region = var.region\n}\n',
+    "variables.tf": b'variable "region" {\n  default = "us-east-1"\n}\n' * 40,  # spans several tar blocks
+    "outputs.tf": b"",
+}
+
+
+class FakeJobManager:
+    def __init__(self, owners: dict):
+        self.owners = owners
+
+    async def get(self, job_id: str):
+        return {"job_id": job_id, "user_id": self.owners[job_id]} if job_id in self.owners else None
+
+
+class ArtifactDownloadTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = ArtifactStore(tmp.name)
+        self.store.put("job-a", FILES)
+        self.store.put("job-b", {"main.tf": FILES["main.tf"], "extra.tf": b"locals {}\n"})
+        for target, name, value in (
+            (user_jobs, "artifact_store", self.store),
+            (user_jobs, "job_manager", FakeJobManager({"job-a": 7, "job-b": 7, "job-c": 8, "job-none": 7})),
+        ):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        app = FastAPI()
+
+        @app.middleware("http")
+        async def authenticate(request: Request, call_next):
+            # Stands in for core.user_middleware, which resolves the bearer token to a user
+            if request.headers.get("X-Test-User"):
+                user_id_ctx.set(SimpleNamespace(user_id=int(request.headers["X-Test-User"])))
+            return await call_next(request)
+
+        app.include_router(user_jobs.jobs_router)
+        self.client = TestClient(app, headers={"X-Test-User": "7"})
+
+    def download(self, job_id: str = "job-a", archive_format: str = "zip", **headers):
+        return self.client.get(f"/jobs/{job_id}/artifact", params={"format": archive_format}, headers=headers)
+
+    def test_zip_layout(self):
+        response = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/zip")
+        self.assertEqual(int(response.headers["content-length"]), len(response.content))
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            self.assertIsNone(archive.testzip())  # every CRC matches
+            self.assertEqual({name: archive.read(name) for name in archive.namelist()}, FILES)
+            self.assertTrue(all(info.compress_type == zipfile.ZIP_STORED for info in archive.infolist()))
+
+    def test_tar_layout(self):
+        response = self.download(archive_format="tar")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.content) % 512, 0)
+        with tarfile.open(fileobj=io.BytesIO(response.content)) as archive:
+            self.assertEqual({member.name: archive.extractfile(member).read() for member in archive.getmembers()}, FILES)
+
+    def test_unknown_format(self):
+        self.assertEqual(self.download(archive_format="rar").status_code, 422)
+
+    def test_identical_files_are_stored_once(self):
+        blobs = sorted(path.name for path in self.store.blobs.glob("*/*"))
+        self.assertEqual(len(blobs), 4)  # main.tf shared by both jobs
+        shared = {entry["sha256"] for job in ("job-a", "job-b") for entry in self.store.get_manifest(job)["files"]
+                  if entry["name"] == "main.tf"}
+        self.assertEqual(len(shared), 1)
+        self.assertEqual(self.store.read_file("job-b", "main.tf"), FILES["main.tf"])
+
+    def test_ranges(self):
+        full = self.download().content
+        total = len(full)
+        for header, start, end in (("bytes=0-9", 0, 9), ("bytes=-20", total - 20, total - 1),
+                                   ("bytes=100-", 100, total - 1), (f"bytes=30-{total + 50}", 30, total - 1)):
+            with self.subTest(range=header):
+                response = self.download(Range=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response.headers["content-range"], f"bytes {start}-{end}/{total}")
+                self.assertEqual(response.content, full[start:end + 1])
+
+        response = self.download(Range=f"bytes={total}-")
+        self.assertEqual((response.status_code, response.headers["content-range"]), (416, f"bytes */{total}"))
+        # Malformed and multi-range headers are ignored
+        self.assertEqual(self.download(Range="bytes=0-1,5-6").status_code, 200)
+
+    def test_if_range_and_etag(self):
+        first = self.download()
+        etag = first.headers["etag"]
+        self.assertEqual(self.download(**{"If-None-Match": etag}).status_code, 304)
+        self.assertEqual(self.download(**{"If-None-Match": '"stale"'}).status_code, 200)
+
+        self.assertEqual(self.download(Range="bytes=0-9", **{"If-Range": etag}).status_code, 206)
+        stale = self.download(Range="bytes=0-9", **{"If-Range": '"stale"'})
+        self.assertEqual((stale.status_code, stale.content), (200, first.content))
+        # The ETag is per format and per content
+        self.assertNotEqual(self.download(archive_format="tar").headers["etag"], etag)
+        self.assertNotEqual(self.download("job-b").headers["etag"], etag)
+
+    def test_other_users_artifacts(self):
+        self.assertEqual(self.download("job-c").status_code, 404)
+        self.assertEqual(self.client.get("/jobs/job-a/artifact", headers={"X-Test-User": "8"}).status_code, 404)
+        self.assertEqual(self.client.get("/jobs/job-a/artifact", headers={"X-Test-User": ""}).status_code, 401)
+        self.assertEqual(self.download("job-none").status_code, 404)  # job without stored files
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import os
+import stat
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+import chat.user_chat as user_chat
+from chat import chat_router
+from core.env_store import EnvStore, EnvFileTooLarge, parse_env, env_cache_lookups, ENV_UPLOAD_MAX_BYTES
+from core.context_vars import user_id_ctx
+
+ENV = b"# database\nexport DB_HOST=db.internal\nDB_PASSWORD='s3cret=1'\n\nAPI_KEY=\"abc\"\nnot a variable\n"
+
+
+async def chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+class ParseEnvTests(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(parse_env(ENV.decode()), {"DB_HOST": "db.internal", "DB_PASSWORD": "s3cret=1", "API_KEY": "abc"})
+        self.assertEqual(parse_env("=no key\nEMPTY=\nQUOTE='\n"), {"EMPTY": "", "QUOTE": "'"})
+
+
+class EnvStoreTests(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        self.store = EnvStore(tmp.name, max_entries=2)
+
+    def lookups(self) -> tuple:
+        return env_cache_lookups.get(result="hit"), env_cache_lookups.get(result="miss")
+
+    async def test_cached_per_user_and_revalidated(self):
+        await self.store.save(7, chunks(ENV))
+        before = self.lookups()
+        first = await self.store.get(7)
+        self.assertIs(await self.store.get(7), first)
+        self.assertEqual(self.lookups(), (before[0] + 2, before[1]))  # save primed the cache
+
+        # Another worker replaced the file: the stat no longer matches
+        self.store.path(7).write_bytes(b"DB_HOST=replica.internal\n")
+        self.assertEqual((await self.store.get(7)).variables, {"DB_HOST": "replica.internal"})
+        self.assertEqual(self.lookups()[1], before[1] + 1)
+
+        self.store.path(7).unlink()
+        self.assertIsNone(await self.store.get(7))
+        self.assertNotIn(7, self.store._cache)
+
+    async def test_least_recently_used_users_are_evicted(self):
+        for user_id in (1, 2, 3):
+            await self.store.save(user_id, chunks(f"USER={user_id}\n".encode()))
+        await self.store.get(2)
+        await self.store.save(4, chunks(b"USER=4\n"))
+        self.assertEqual(list(self.store._cache), [2, 4])
+        # Evicted users are read from disk again
+        self.assertEqual((await self.store.get(1)).variables, {"USER": "1"})
+
+    async def test_no_user_is_never_cached(self):
+        # A stray "None" directory must not be served to every anonymous run
+        (self.root / "None").mkdir()
+        (self.root / "None" / ".env").write_bytes(ENV)
+        self.assertIsNone(await self.store.get(None))
+        self.assertEqual(self.store._cache, {})
+
+    async def test_oversized_upload_keeps_the_previous_file(self):
+        await self.store.save(7, chunks(ENV))
+        with self.assertRaises(EnvFileTooLarge):
+            await self.store.save(7, chunks(b"A=1\n" * 10, b"B=2\n" * 10), limit=64)
+        self.assertEqual(self.store.path(7).read_bytes(), ENV)
+        self.assertEqual(os.listdir(self.store.path(7).parent), [".env"])  # temp file removed
+        self.assertEqual(stat.S_IMODE(self.store.path(7).stat().st_mode), 0o600)
+        self.assertEqual((await self.store.get(7)).names, ["DB_HOST", "DB_PASSWORD", "API_KEY"])
+
+    async def test_upload_exactly_at_the_limit(self):
+        parsed = await self.store.save(7, chunks(b"A=1\n", b"B=2\n"), limit=8)
+        self.assertEqual(parsed.variables, {"A": "1", "B": "2"})
+
+
+class UploadEndpointTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = EnvStore(tmp.name)
+        patcher = mock.patch.object(user_chat, "env_store", self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        app = FastAPI()
+
+        @app.middleware("http")
+        async def authenticate(request: Request, call_next):
+            # Stands in for core.user_middleware, which resolves the bearer token to a user
+            if request.headers.get("X-Test-User"):
+                user_id_ctx.set(SimpleNamespace(user_id=int(request.headers["X-Test-User"])))
+            return await call_next(request)
+
+        app.include_router(chat_router)
+        self.client = TestClient(app, headers={"X-Test-User": "7"})
+
+    def upload(self, content: bytes, **kwargs):
+        return self.client.post("/chat/upload-env", files={"file": (".env", content)}, **kwargs)
+
+    def test_upload_is_stored_and_parsed(self):
+        self.assertEqual(self.upload(ENV).status_code, 200)
+        self.assertEqual(self.store.path(7).read_bytes(), ENV)
+
+    def test_oversized_file_is_rejected_and_the_previous_one_kept(self):
+        self.upload(ENV)
+        response = self.upload(b"A=" + b"x" * ENV_UPLOAD_MAX_BYTES + b"\n")
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.store.path(7).read_bytes(), ENV)
+
+    def test_announced_oversized_body_is_rejected_unread(self):
+        with mock.patch.object(user_chat, "MultiPartParser") as parser:
+            response = self.client.post("/chat/upload-env", content=b"x" * 10,
+                                        headers={"Content-Type": "multipart/form-data; boundary=x",
+                                                 "Content-Length": str(2 * ENV_UPLOAD_MAX_BYTES)})
+        self.assertEqual(response.status_code, 413)
+        parser.assert_not_called()
+
+    def test_oversized_body_without_content_length(self):
+        def body():
+            yield b"--x\r\nContent-Disposition: form-data; name=\"file\"; filename=\".env\"\r\n\r\n"
+            for _ in range(2 * ENV_UPLOAD_MAX_BYTES // 1024):
+                yield b"A=" + b"x" * 1022
+
+        response = self.client.post("/chat/upload-env", content=body(),
+                                    headers={"Content-Type": "multipart/form-data; boundary=x"})
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(self.store.path(7).exists())
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.post("/chat/upload-env", content=b"A=1",
+                                          headers={"Content-Type": "text/plain"}).status_code, 415)
+        self.assertEqual(self.client.post("/chat/upload-env", data={"other": "1"},
+                                          files={"unrelated": ("x", b"")}).status_code, 422)
+        self.assertEqual(self.upload(b"\xff\xfe=bad\n").status_code, 422)
+        self.assertEqual(self.upload(ENV, headers={"X-Test-User": ""}).status_code, 401)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from fastapi import FastAPI
+from starlette.requests import ClientDisconnect
+import chat.user_chat as user_chat
+from chat import chat_router
+from core.event_bus import EventBus, Subscription, format_sse
+from core.context_vars import user_id_ctx
+
+
+class EventBusTests(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.bus = EventBus(history_size=3, history_users=2)
+
+    async def test_events_reach_only_their_users_streams(self):
+        first, second, other = self.bus.subscribe(1), self.bus.subscribe(1), self.bus.subscribe(2)
+        event_id = self.bus.publish(1, "job", {"status": "running"})
+
+        expected = [{"id": event_id, "event": "job", "data": {"status": "running"}}]
+        self.assertEqual(await first.next_batch(timeout=1), expected)
+        self.assertEqual(await second.next_batch(timeout=1), expected)
+        self.assertEqual(await other.next_batch(timeout=0.01), [])
+        # Anonymous work has nobody to tell
+        self.assertIsNone(self.bus.publish(None, "job", {}))
+        self.assertEqual(await first.next_batch(timeout=0.01), [])
+
+    async def test_waiting_subscriber_wakes_on_publish(self):
+        subscription = self.bus.subscribe(1)
+        waiter = asyncio.create_task(subscription.next_batch(timeout=5))
+        await asyncio.sleep(0)
+        self.bus.publish(1, "message", {"chat_id": "chat"})
+        self.bus.publish(1, "job_progress", {"stage": "Writing main.tf"})
+        # Everything published before the subscriber ran comes in one batch
+        batch = await asyncio.wait_for(waiter, 1)
+        self.assertEqual([event["event"] for event in batch], ["message", "job_progress"])
+        self.assertEqual(await subscription.next_batch(timeout=0.01), [])
+
+    async def test_reconnect_replays_missed_events(self):
+        ids = [self.bus.publish(1, "job", {"n": n}) for n in range(5)]
+        self.bus.publish(2, "job", {"n": "other user"})
+        replayed = await self.bus.subscribe(1, last_event_id=ids[2]).next_batch(timeout=1)
+        self.assertEqual([event["data"]["n"] for event in replayed], [3, 4])
+        # Only history_size events are kept per user
+        replayed = await self.bus.subscribe(1, last_event_id=0).next_batch(timeout=1)
+        self.assertEqual([event["data"]["n"] for event in replayed], [2, 3, 4])
+
+    async def test_history_keeps_the_most_recent_users(self):
+        for user_id in (1, 2, 1, 3):
+            self.bus.publish(user_id, "job", {})
+        self.assertEqual(list(self.bus._history), [1, 3])
+
+    async def test_slow_subscriber_drops_the_oldest_events(self):
+        subscription = Subscription(1, buffer=2)
+        for n in range(4):
+            subscription.deliver({"id": n})
+        self.assertEqual(await subscription.next_batch(timeout=1), [{"id": 2}, {"id": 3}])
+
+    async def test_unsubscribe(self):
+        first, second = self.bus.subscribe(1), self.bus.subscribe(1)
+        self.bus.unsubscribe(first)
+        self.bus.unsubscribe(first)  # a second unsubscribe is a no-op
+        self.assertEqual(self.bus.subscriber_count(), 1)
+        self.bus.publish(1, "job", {})
+        self.assertEqual(await first.next_batch(timeout=0.01), [])
+        self.bus.unsubscribe(second)
+        self.assertEqual((self.bus.subscriber_count(), self.bus._subscribers), (0, {}))
+
+    def test_format_sse(self):
+        self.assertEqual(format_sse({"id": 4, "event": "job", "data": {"status": "queued"}}),
+                         'id: 4\nevent: job\ndata: {"status": "queued"}\n\n')
+
+
+class EventStreamDisconnectTests(unittest.IsolatedAsyncioTestCase):
+    """Drives GET /chat/events as a raw ASGI app so the client can go away mid-stream"""
+
+    async def asyncSetUp(self):
+        self.bus = EventBus()
+        patcher = mock.patch.object(user_chat, "event_bus", self.bus)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.app = FastAPI()
+        self.app.include_router(chat_router)
+        token = user_id_ctx.set(SimpleNamespace(user_id=7))
+        self.addCleanup(user_id_ctx.reset, token)
+
+    def scope(self, spec_version: str, **headers) -> dict:
+        return {
+            "type": "http", "asgi": {"version": "3.0", "spec_version": spec_version}, "http_version": "1.1",
+            "method": "GET", "scheme": "http", "path": "/chat/events", "raw_path": b"/chat/events",
+            "query_string": b"", "root_path": "", "server": ("test", 80), "client": ("test", 1234),
+            "headers": [(key.lower().encode(), value.encode()) for key, value in headers.items()],
+        }
+
+    async def open_stream(self, spec_version: str, **headers):
+        """Runs the request until the given event id arrives; returns the task, the body and a disconnect trigger"""
+        body, arrived, gone = [], asyncio.Event(), asyncio.Event()
+
+        async def receive():
+            await gone.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if gone.is_set():
+                raise OSError("client went away")  # how ASGI 2.4 servers report a disconnect
+            if message["type"] == "http.response.body":
+                body.append(message["body"].decode())
+                arrived.set()
+
+        task = asyncio.create_task(self.app(self.scope(spec_version, **headers), receive, send))
+        return task, body, arrived, gone
+
+    async def test_disconnect_unsubscribes(self):
+        for spec_version in ("2.3", "2.4"):
+            with self.subTest(spec_version=spec_version):
+                task, body, arrived, gone = await self.open_stream(spec_version)
+                await asyncio.wait_for(arrived.wait(), 1)
+                self.assertEqual(self.bus.subscriber_count(), 1)
+
+                arrived.clear()
+                self.bus.publish(7, "job", {"status": "running"})
+                self.bus.publish(8, "job", {"status": "someone else's"})
+                await asyncio.wait_for(arrived.wait(), 1)
+                self.assertIn('event: job\ndata: {"status": "running"}', "".join(body))
+                self.assertNotIn("someone else's", "".join(body))
+
+                gone.set()
+                if spec_version == "2.4":
+                    # The next write finds the client gone; the generator is parked at a yield at that point
+                    self.bus.publish(7, "job", {"status": "succeeded"})
+                    with self.assertRaises(ClientDisconnect):
+                        await asyncio.wait_for(task, 1)
+                else:
+                    await asyncio.wait_for(task, 1)
+                self.assertEqual(self.bus.subscriber_count(), 0)
+
+    async def test_reconnect_with_last_event_id(self):
+        missed = [self.bus.publish(7, "job", {"n": n}) for n in range(3)]
+        task, body, arrived, gone = await self.open_stream("2.3", **{"Last-Event-ID": str(missed[0])})
+        while "id: " not in "".join(body):
+            arrived.clear()
+            await asyncio.wait_for(arrived.wait(), 1)
+        gone.set()
+        await asyncio.wait_for(task, 1)
+        text = "".join(body)
+        self.assertNotIn(f"id: {missed[0]}\n", text)
+        self.assertIn(f"id: {missed[1]}\n", text)
+        self.assertIn(f"id: {missed[2]}\n", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import numpy as np
+from unittest import mock
+import agents.file_index as file_index
+from agents.file_index import FileIndex
+
+PATHS = ["src/app.py", "src/server.py", "src/db.py", "src/config.py", "src/util.py"]
+# Scores against QUERY fall in PATHS order
+VECTORS = np.array([[1.0, 0.0], [0.9, 0.1], [0.8, 0.2], [0.7, 0.3], [0.1, 0.9]], dtype=np.float32)
+QUERY = [1.0, 0.0]
+
+
+class QueryTests(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.fetched = []
+        self.failing = {"src/server.py"}
+        patcher = mock.patch.object(file_index.embedding_cache, "embed", mock.AsyncMock(return_value=[QUERY]))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def fetch_head(self, path: str) -> str:
+        self.fetched.append(path)
+        if path in self.failing:
+            raise OSError("unreadable")
+        return f"# {path}\n"
+
+    def index(self, heads=None, fetch_head=True) -> FileIndex:
+        vectors = VECTORS / np.linalg.norm(VECTORS, axis=1, keepdims=True)
+        return FileIndex(list(PATHS), vectors, dict(heads or {}), "test-model", self.fetch_head if fetch_head else None)
+
+    async def test_unreadable_top_k_file_gives_way_to_the_next_ranked(self):
+        index = self.index()
+        results = await index.query("entrypoint", k=2)
+        self.assertEqual(results, [("src/app.py", "# src/app.py\n"), ("src/db.py", "# src/db.py\n")])
+        self.assertEqual(self.fetched, ["src/app.py", "src/server.py", "src/db.py"])
+
+        # Heads and failures are remembered: the same query fetches nothing
+        self.fetched.clear()
+        self.assertEqual(await index.query("entrypoint", k=2), results)
+        self.assertEqual(self.fetched, [])
+
+    async def test_walks_the_whole_ranking_when_needed(self):
+        self.failing = set(PATHS[:3])
+        results = await self.index().query("entrypoint", k=3)
+        self.assertEqual([path for path, _ in results], ["src/config.py", "src/util.py"])
+        self.assertEqual(self.fetched, PATHS)
+
+    async def test_known_heads_need_no_fetch(self):
+        results = await self.index(heads={"src/server.py": "app = Flask()"}).query("entrypoint", k=2)
+        self.assertEqual(results, [("src/app.py", "# src/app.py\n"), ("src/server.py", "app = Flask()")])
+        self.assertEqual(self.fetched, ["src/app.py"])
+
+    async def test_without_a_fetcher_only_known_heads_are_returned(self):
+        index = self.index(heads={"src/db.py": "engine = create_engine(url)"}, fetch_head=False)
+        self.assertEqual(await index.query("entrypoint", k=2), [("src/db.py", "engine = create_engine(url)")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,161 @@
+import io
+import os
+import gzip
+import asyncio
+import tarfile
+import unittest
+from unittest import mock
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+import agents.repo_analyzer as repo_analyzer
+from agents.repo_analyzer import SimpleGitHubFetcher, GitHubRepoAnalyzer
+from agents.github_archive import TarStreamExtractor, ArchiveBudgetExceeded
+from core.http_client import http_client
+
+COMMIT_SHA = "c" * 40
+PREFIX = "octo-demo-ccccccc/"
+LONG_PATH = "services/" + "nested-directory/" * 8 + "Dockerfile"  # past the 100-byte ustar name field
+
+
+def build_tar(members: list, tar_format=tarfile.PAX_FORMAT, gzipped: bool = True) -> bytes:
+    """A GitHub-style tarball: one top-level directory, the commit SHA in the pax global header"""
+    buffer = io.BytesIO()
+    pax_headers = {"comment": COMMIT_SHA} if tar_format == tarfile.PAX_FORMAT else None
+    with tarfile.open(fileobj=buffer, mode="w", format=tar_format, pax_headers=pax_headers) as tar:
+        directory = tarfile.TarInfo(PREFIX.rstrip("/"))
+        directory.type = tarfile.DIRTYPE
+        tar.addfile(directory)
+        for path, content in members:
+            info = tarfile.TarInfo(PREFIX + path)
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+    data = buffer.getvalue()
+    return gzip.compress(data) if gzipped else data
+
+
+MEMBERS = [
+    ("package.json", b'{"name": "demo"}'),
+    (LONG_PATH, b"FROM node:20\n"),
+    ("README.md", b"# demo\n" * 200),
+    ("package.json", b'{"name": "duplicate"}'),
+    ("docker-compose.yml", b"services: {}\n"),
+]
+WANTED = {"package.json", LONG_PATH, "docker-compose.yml"}
+
+
+def extract(archive: bytes, chunk_size: int, gzipped: bool = True, **limits) -> tuple:
+    extractor = TarStreamExtractor(WANTED.__contains__, max_file_bytes=limits.get("max_file_bytes", 1 << 20),
+                                   max_total_bytes=limits.get("max_total_bytes", 1 << 24), gzipped=gzipped)
+    found = []
+    for start in range(0, len(archive), chunk_size):
+        found.extend(extractor.feed(archive[start:start + chunk_size]))
+    return found, extractor
+
+
+class TarStreamExtractorTests(unittest.TestCase):
+
+    def test_pax_long_names_and_global_header(self):
+        found, extractor = extract(build_tar(MEMBERS), 64 * 1024)
+        self.assertIn((LONG_PATH, b"FROM node:20\n"), found)
+        self.assertEqual(extractor.commit_sha, COMMIT_SHA)
+        self.assertTrue(extractor.finished)
+
+    def test_gnu_long_names(self):
+        found, _ = extract(build_tar(MEMBERS, tar_format=tarfile.GNU_FORMAT), 64 * 1024)
+        self.assertIn((LONG_PATH, b"FROM node:20\n"), found)
+
+    def test_duplicate_members_are_all_reported(self):
+        # The extractor yields every copy; callers keep the first (iter_archive_files)
+        found, _ = extract(build_tar(MEMBERS), 64 * 1024)
+        self.assertEqual([content for path, content in found if path == "package.json"],
+                         [b'{"name": "demo"}', b'{"name": "duplicate"}'])
+
+    def test_chunk_boundaries_inside_headers(self):
+        plain = build_tar(MEMBERS, gzipped=False)
+        expected, _ = extract(plain, len(plain), gzipped=False)
+        for chunk_size in (1, 7, 100, 511, 512, 513, 1000):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(extract(plain, chunk_size, gzipped=False)[0], expected)
+        self.assertEqual(extract(build_tar(MEMBERS), 1)[0], expected)
+
+    def test_oversized_files_are_skipped(self):
+        found, _ = extract(build_tar(MEMBERS), 64 * 1024, max_file_bytes=13)
+        self.assertEqual([path for path, _ in found], [LONG_PATH, "docker-compose.yml"])
+
+    def test_budget_counts_decompressed_bytes(self):
+        archive = build_tar([("big.bin", b"\0" * (4 << 20))])
+        self.assertLess(len(archive), 64 * 1024)
+        with self.assertRaises(ArchiveBudgetExceeded):
+            extract(archive, len(archive), max_total_bytes=1 << 20)
+
+
+class ArchiveDownloadTests(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.archive = build_tar(MEMBERS)
+        self.contents_requests = []
+        self.hold = asyncio.Event()  # never set: the server stalls after `self.stall_after` bytes
+        self.stall_after = None
+
+        async def tarball(request):
+            response = web.StreamResponse()
+            await response.prepare(request)
+            body = self.archive if self.stall_after is None else self.archive[:self.stall_after]
+            for start in range(0, len(body), 100):
+                await response.write(body[start:start + 100])
+            if self.stall_after is not None:
+                await self.hold.wait()
+            await response.write_eof()
+            return response
+
+        async def contents(request):
+            path = request.match_info["path"]
+            self.contents_requests.append(path)
+            return web.Response(text=f"contents of {path}")
+
+        app = web.Application()
+        app.router.add_get("/repos/octo/demo/tarball/{ref}", tarball)
+        app.router.add_get("/repos/octo/demo/contents/{path:.+}", contents)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.fetcher = SimpleGitHubFetcher("token", base_url=str(self.server.make_url("")))
+        self.fetcher.ref = COMMIT_SHA
+
+    async def asyncTearDown(self):
+        self.hold.set()
+        await http_client.close()
+        await self.server.close()
+
+    async def collect(self, paths: list) -> list:
+        return [item async for item in self.fetcher.iter_archive_files("octo", "demo", paths)]
+
+    async def test_first_copy_of_a_duplicate_wins(self):
+        files = dict(await self.collect(["package.json", LONG_PATH, "docker-compose.yml"]))
+        self.assertEqual(files, {"package.json": '{"name": "demo"}', LONG_PATH: "FROM node:20\n",
+                                 "docker-compose.yml": "services: {}\n"})
+
+    async def test_stops_once_every_wanted_path_is_found(self):
+        # The server stalls halfway through a trailing member; reading stops after the last wanted one
+        self.archive = build_tar(MEMBERS[:2] + [("assets/blob.bin", os.urandom(256 * 1024))])
+        self.stall_after = len(self.archive) // 2
+        files = await asyncio.wait_for(self.collect(["package.json", LONG_PATH]), timeout=5)
+        self.assertEqual(sorted(path for path, _ in files), sorted(["package.json", LONG_PATH]))
+
+    async def test_budget_overrun_falls_back_to_contents_api(self):
+        analyzer = GitHubRepoAnalyzer("token", fetch_mode="archive", embed_model=None, summarize=False)
+        analyzer.fetcher = self.fetcher
+        with mock.patch.object(repo_analyzer, "GITHUB_ARCHIVE_MAX_BYTES", 1024):
+            files = dict([item async for item in analyzer._fetch_files("octo", "demo", ["package.json", "app.py"])])
+        self.assertEqual(files, {"package.json": "contents of package.json", "app.py": "contents of app.py"})
+        self.assertEqual(sorted(self.contents_requests), ["app.py", "package.json"])
+
+    async def test_missing_paths_come_back_empty(self):
+        analyzer = GitHubRepoAnalyzer("token", fetch_mode="archive", embed_model=None, summarize=False)
+        analyzer.fetcher = self.fetcher
+        files = dict([item async for item in analyzer._fetch_files("octo", "demo", ["package.json", "missing.txt"])])
+        self.assertEqual(files, {"package.json": '{"name": "demo"}', "missing.txt": ""})
+        self.assertEqual(self.contents_requests, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+import time
+import asyncio
+import unittest
+from unittest import mock
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+import agents.github_scheduler as scheduler_module
+from agents.github_scheduler import GitHubScheduler, GitHubBudgetExhausted, INTERACTIVE, BATCH
+from core.http_client import http_client
+
+
+def rate_limit_headers(remaining: int, limit: int = 5000, reset_in: float = 3600) -> dict:
+    return {
+        "X-RateLimit-Remaining": str(remaining),
+        "X-RateLimit-Limit": str(limit),
+        "X-RateLimit-Reset": str(int(time.time() + reset_in)),
+        "X-RateLimit-Resource": "core",
+    }
+
+
+class SchedulerTestCase(unittest.IsolatedAsyncioTestCase):
+    """Runs the scheduler against a local GitHub stand-in answering from self.responses in order"""
+
+    async def asyncSetUp(self):
+        self.responses = []
+        self.hits = 0
+
+        async def handler(request):
+            self.hits += 1
+            status, headers, body = self.responses.pop(0) if self.responses else (200, {}, "{}")
+            return web.Response(status=status, headers=headers, text=body)
+
+        app = web.Application()
+        app.router.add_get("/{tail:.*}", handler)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.url = str(self.server.make_url("/repos/octo/demo"))
+        # No jitter, so retry timings are deterministic
+        patcher = mock.patch.object(scheduler_module.random, "uniform", lambda low, high: low)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        await http_client.close()
+        await self.server.close()
+
+    async def fetch(self, scheduler: GitHubScheduler, priority: int = INTERACTIVE) -> int:
+        async with await scheduler.get(self.url, priority) as response:
+            await response.read()
+            return response.status
+
+
+class RetryTests(SchedulerTestCase):
+
+    async def test_retry_after_pauses_then_retries(self):
+        self.responses = [(429, {"Retry-After": "1"}, "slow down")]
+        started = time.monotonic()
+        self.assertEqual(await self.fetch(GitHubScheduler()), 200)
+        self.assertEqual(self.hits, 2)
+        self.assertGreaterEqual(time.monotonic() - started, 1.0)
+
+    async def test_429_backs_off_until_retries_run_out(self):
+        self.responses = [(429, {}, "")] * 5
+        with mock.patch.object(scheduler_module, "GITHUB_MAX_RETRIES", 2), \
+                mock.patch.object(scheduler_module, "GITHUB_BACKOFF_BASE", 0.01):
+            self.assertEqual(await self.fetch(GitHubScheduler()), 429)
+        self.assertEqual(self.hits, 3)
+
+    async def test_403_rate_limit_is_retried(self):
+        self.responses = [(403, {}, "API rate limit exceeded for 10.0.0.1")]
+        with mock.patch.object(scheduler_module, "GITHUB_BACKOFF_BASE", 0.01):
+            self.assertEqual(await self.fetch(GitHubScheduler()), 200)
+        self.assertEqual(self.hits, 2)
+
+    async def test_403_permission_error_is_returned(self):
+        self.responses = [(403, {}, "Resource not accessible by integration")]
+        self.assertEqual(await self.fetch(GitHubScheduler()), 403)
+        self.assertEqual(self.hits, 1)
+
+    async def test_exhausted_budget_waits_for_a_close_reset(self):
+        self.responses = [(403, rate_limit_headers(0, reset_in=1), "API rate limit exceeded")]
+        started = time.monotonic()
+        self.assertEqual(await self.fetch(GitHubScheduler()), 200)
+        self.assertEqual(self.hits, 2)
+        self.assertGreater(time.monotonic() - started, 0.5)
+
+    async def test_exhausted_budget_with_a_distant_reset_fails_fast(self):
+        self.responses = [(403, rate_limit_headers(0, reset_in=3600), "API rate limit exceeded")]
+        self.assertEqual(await self.fetch(GitHubScheduler()), 403)
+        self.assertEqual(self.hits, 1)
+
+
+class PacingTests(SchedulerTestCase):
+
+    async def test_refill_rate_follows_rate_limit_headers(self):
+        scheduler = GitHubScheduler(max_rps=20, burst=1)
+        self.responses = [(200, rate_limit_headers(1000, limit=5000), "{}")]
+        await self.fetch(scheduler)
+        # A fifth of the budget left: a fifth of the top speed
+        self.assertAlmostEqual(scheduler.rate, 4.0)
+
+        scheduler.tokens, scheduler._updated = 0, time.monotonic()
+        started = time.monotonic()
+        await scheduler.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+
+    async def test_rate_never_drops_below_spending_the_rest_before_reset(self):
+        scheduler = GitHubScheduler(max_rps=20)
+        self.responses = [(200, rate_limit_headers(100, limit=5000, reset_in=10), "{}")]
+        await self.fetch(scheduler)
+        self.assertGreaterEqual(scheduler.rate, 10.0)
+
+    async def test_interactive_requests_go_before_waiting_batch_ones(self):
+        scheduler = GitHubScheduler(max_rps=20, burst=1)
+        scheduler.tokens = 0
+        order = []
+
+        async def take(name, priority):
+            await scheduler.acquire(priority)
+            order.append(name)
+
+        batch = [asyncio.create_task(take(f"batch-{idx}", BATCH)) for idx in range(3)]
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(take("interactive", INTERACTIVE))
+        await asyncio.gather(*batch, interactive)
+        self.assertEqual(order[0], "interactive")
+
+
+class BatchReserveTests(SchedulerTestCase):
+
+    async def test_reserve_is_left_to_interactive_requests(self):
+        scheduler = GitHubScheduler(batch_max_wait=1)
+        self.responses = [(200, rate_limit_headers(50, limit=1000, reset_in=600), "{}")]
+        await self.fetch(scheduler)
+
+        self.assertEqual(await self.fetch(scheduler, INTERACTIVE), 200)
+        started = time.monotonic()
+        with self.assertRaises(GitHubBudgetExhausted):
+            await scheduler.acquire(BATCH)
+        self.assertLess(time.monotonic() - started, 0.5)
+        # The failed request left the queue: interactive work is not stuck behind it
+        self.assertEqual(scheduler._waiters, [])
+        await scheduler.acquire(INTERACTIVE)
+
+    async def test_batch_waits_for_a_reset_within_the_limit(self):
+        scheduler = GitHubScheduler(batch_max_wait=5)
+        self.responses = [(200, rate_limit_headers(50, limit=1000, reset_in=2), "{}")]
+        await self.fetch(scheduler)
+
+        started = time.monotonic()
+        await scheduler.acquire(BATCH)
+        self.assertGreater(time.monotonic() - started, 0.5)
+
+    async def test_batch_runs_freely_above_the_reserve(self):
+        scheduler = GitHubScheduler(batch_max_wait=0)
+        self.responses = [(200, rate_limit_headers(500, limit=1000), "{}")]
+        await self.fetch(scheduler)
+        self.assertEqual(await self.fetch(scheduler, BATCH), 200)
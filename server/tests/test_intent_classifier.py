@@ -0,0 +1,64 @@
+import asyncio
+import unittest
+from agents.intent_classifier import (
+    IntentClassifier, tokenize,
+    REPO_ANALYZER, TERRAFORM_GENERATOR, DEPLOYMENT_VALIDATOR, CHAT_AGENT
+)
+
+# Labelled utterances: (text, expected intent)
+ACCURACY_SET = [
+    ("https://github.com/vercel/next.js", REPO_ANALYZER),
+    ("Can you analyze https://github.com/tiangolo/fastapi for me?", REPO_ANALYZER),
+    ("deploy this https://github.com/acme/shop please", REPO_ANALYZER),
+    ("Generate terraform for my app", TERRAFORM_GENERATOR),
+    ("Deploy a Python app with MySQL and autoscaling on ECS", TERRAFORM_GENERATOR),
+    ("Add Redis cache to my infrastructure", TERRAFORM_GENERATOR),
+    ("I need an ALB in front of two fargate services", TERRAFORM_GENERATOR),
+    ("generate infra with RDS postgres", TERRAFORM_GENERATOR),
+    ("deploy infrastructure for staging", TERRAFORM_GENERATOR),
+    ("convert my cloudformation stack", TERRAFORM_GENERATOR),
+    ("please validate the generated terraform", TERRAFORM_GENERATOR),
+    ("Can I deploy now?", DEPLOYMENT_VALIDATOR),
+    ("validate deployment", DEPLOYMENT_VALIDATOR),
+    ("check prerequisites before I go live", DEPLOYMENT_VALIDATOR),
+    ("Am I ready to deploy?", DEPLOYMENT_VALIDATOR),
+    ("deploy it", DEPLOYMENT_VALIDATOR),
+    ("What is a blue/green deployment strategy?", CHAT_AGENT),
+    ("Explain the deployment pipeline stages", CHAT_AGENT),
+    ("Why is my app crashing?", CHAT_AGENT),
+    ("hello there", CHAT_AGENT),
+    ("What are the best practices for Docker images?", CHAT_AGENT),
+    ("Summarize the logs from yesterday", CHAT_AGENT),
+    ("my deployments keep failing, any ideas?", CHAT_AGENT),
+]
+
+
+class IntentClassifierTests(unittest.TestCase):
+
+    def setUp(self):
+        self.classifier = IntentClassifier(embed_model=None)
+
+    def test_labelled_utterances(self):
+        for text, expected in ACCURACY_SET:
+            with self.subTest(text=text):
+                self.assertEqual(self.classifier.classify_rules(text).intent, expected)
+
+    def test_github_url_is_extracted(self):
+        result = self.classifier.classify_rules("look at https://github.com/acme/shop) please")
+        self.assertEqual(result.github_url, "https://github.com/acme/shop")
+
+    def test_longest_phrase_wins(self):
+        result = self.classifier.classify_rules("deploy infrastructure")
+        self.assertEqual(result.matched, ["deploy infrastructure"])
+
+    def test_phrases_match_whole_words(self):
+        self.assertEqual(self.classifier.classify_rules("the deployment went fine").matched, [])
+
+    def test_tf_extension_and_non_ascii_text(self):
+        self.assertEqual(tokenize("Fix “main.tf”, s'il vous plaît"),
+                         [b"fix", b"main", b".tf", b"s", b"il", b"vous", b"pla", b"t"])
+        self.assertEqual(self.classifier.classify_rules("edit “main.tf”").intent, TERRAFORM_GENERATOR)
+
+    def test_classify_without_embedding_model_uses_rules(self):
+        result = asyncio.run(self.classifier.classify("validate deployment"))
+        self.assertEqual((result.intent, result.method), (DEPLOYMENT_VALIDATOR, "rules"))
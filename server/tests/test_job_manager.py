@@ -0,0 +1,164 @@
+import os
+import asyncio
+import tempfile
+import unittest
+from types import SimpleNamespace
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+import jobs.job_manager as jm
+import jobs.user_jobs as user_jobs
+from jobs.job_manager import JobManager, QUEUED, RUNNING, SUCCEEDED, CANCELLED, JOB_STALE_AFTER
+from jobs.models.JobModel import JobModel
+from core.context_vars import user_id_ctx
+
+
+class JobManagerTestCase(unittest.IsolatedAsyncioTestCase):
+    """Every test gets its own SQLite file standing in for DATABASE_URL"""
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        engine = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'jobs.db')}",
+                               connect_args={"check_same_thread": False})
+        JobModel.metadata.create_all(engine, tables=[JobModel.__table__])
+        self.engine = engine
+        patcher = mock.patch.object(jm, "sessionLocal", sessionmaker(bind=engine))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.managers = []
+        self.release = asyncio.Event()
+        self.calls = []
+
+    async def asyncTearDown(self):
+        self.release.set()
+        for manager in self.managers:
+            await manager.close()
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def manager(self, workers: int = 1, kind: str = "test") -> JobManager:
+        manager = JobManager(workers=workers)
+        manager.register(kind, self.handler)
+        self.managers.append(manager)
+        return manager
+
+    async def handler(self, job_id: str, payload: dict) -> dict:
+        self.calls.append(job_id)
+        if payload.get("block"):
+            await self.release.wait()
+        return {"echo": payload.get("value")}
+
+    async def wait_for_status(self, manager: JobManager, job_id: str, *statuses: str) -> dict:
+        for _ in range(200):
+            job = await manager.get(job_id)
+            if job["status"] in statuses:
+                return job
+            await asyncio.sleep(0.02)
+        self.fail(f"job {job_id} stuck in {job['status']}, expected {statuses}")
+
+    def insert(self, job_id: str, status: str, owner: str, heartbeat_at: datetime, kind: str = "test"):
+        db = jm.sessionLocal()
+        try:
+            db.add(JobModel(job_id=job_id, kind=kind, status=status, payload="{}", attempts=1 if status == RUNNING else 0,
+                            owner=owner, heartbeat_at=heartbeat_at, created_at=datetime.now(timezone.utc)))
+            db.commit()
+        finally:
+            db.close()
+
+
+class RecoveryTests(JobManagerTestCase):
+
+    async def test_queued_job_survives_a_restart(self):
+        first = self.manager(workers=0)
+        job_id = await first.submit("test", {"value": 1})
+        await first.close()
+        self.assertEqual(self.calls, [])
+
+        second = self.manager()
+        await second.start()
+        job = await self.wait_for_status(second, job_id, SUCCEEDED)
+        self.assertEqual(job["result"], {"echo": 1})
+        self.assertEqual(self.calls, [job_id])
+
+    async def test_running_job_with_fresh_heartbeat_is_not_stolen(self):
+        now = datetime.now(timezone.utc)
+        self.insert("alive", RUNNING, "other-worker", now)
+        self.insert("stale", RUNNING, "dead-worker", now - timedelta(seconds=2 * JOB_STALE_AFTER))
+
+        manager = self.manager()
+        await manager.start()
+        await self.wait_for_status(manager, "stale", SUCCEEDED)
+        self.assertEqual((await manager.get("alive"))["status"], RUNNING)
+        self.assertEqual(self.calls, ["stale"])
+
+    async def test_racing_claims_have_one_winner(self):
+        self.insert("contested", QUEUED, None, None)
+        first, second = self.manager(), self.manager()
+        await asyncio.gather(first._execute("contested", "test"), second._execute("contested", "test"))
+        self.assertEqual(self.calls, ["contested"])
+        job = await first.get("contested")
+        self.assertEqual((job["status"], job["attempts"]), (SUCCEEDED, 1))
+
+
+class CancelEndpointTests(JobManagerTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.jobs = self.manager(workers=1)
+        patcher = mock.patch.object(user_jobs, "job_manager", self.jobs)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        app = FastAPI()
+        app.include_router(user_jobs.jobs_router)
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+        user_id_ctx.set(SimpleNamespace(user_id=7))
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        await super().asyncTearDown()
+
+    async def test_delete_queued_and_running_jobs(self):
+        running = await self.jobs.submit("test", {"block": True}, user_id=7)
+        await self.wait_for_status(self.jobs, running, RUNNING)
+        queued = await self.jobs.submit("test", {}, user_id=7)
+
+        response = await self.client.delete(f"/jobs/{queued}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((await self.jobs.get(queued))["status"], CANCELLED)
+
+        response = await self.client.delete(f"/jobs/{running}")
+        self.assertEqual(response.status_code, 200)
+        await self.wait_for_status(self.jobs, running, CANCELLED)
+
+        self.assertEqual((await self.client.delete(f"/jobs/{running}")).status_code, 409)
+        self.assertEqual(self.calls, [running])
+
+    async def test_other_users_jobs_are_not_found(self):
+        job_id = await self.jobs.submit("test", {"block": True}, user_id=8)
+        self.assertEqual((await self.client.delete(f"/jobs/{job_id}")).status_code, 404)
+        self.assertNotEqual((await self.jobs.get(job_id))["status"], CANCELLED)
+
+
+class MetricsTests(JobManagerTestCase):
+
+    async def test_queue_depth_and_duration(self):
+        manager = self.manager(workers=1, kind="metrics")
+        blocker = await manager.submit("metrics", {"block": True})
+        await self.wait_for_status(manager, blocker, RUNNING)
+        depth = jm.jobs_queue_depth.get(kind="metrics")
+        finished = jm.job_duration._values.get(("metrics", SUCCEEDED), [0])[-1]
+
+        waiting = await manager.submit("metrics", {"value": 2})
+        self.assertEqual(jm.jobs_queue_depth.get(kind="metrics"), depth + 1)
+
+        self.release.set()
+        await self.wait_for_status(manager, waiting, SUCCEEDED)
+        self.assertEqual(jm.jobs_queue_depth.get(kind="metrics"), depth)
+        self.assertEqual(jm.job_duration._values[("metrics", SUCCEEDED)][-1], finished + 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
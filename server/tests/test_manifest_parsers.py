@@ -0,0 +1,179 @@
+import unittest
+from unittest import mock
+import agents.manifest_parsers as manifest_parsers
+from agents.manifest_parsers import build_repo_profile, PARSERS
+
+
+class DockerfileTests(unittest.TestCase):
+
+    def base_images(self, dockerfile: str) -> list:
+        return build_repo_profile({"Dockerfile": dockerfile}).base_images
+
+    def test_platform_flag_is_not_an_image(self):
+        self.assertEqual(self.base_images("FROM --platform=linux/amd64 node:20\nCMD node server.js\n"), ["node:20"])
+
+    def test_build_stages_are_not_images(self):
+        dockerfile = (
+            "FROM --platform=$BUILDPLATFORM golang:1.22 AS build\n"
+            "RUN go build -o /app\n"
+            "FROM build AS test\n"
+            "FROM gcr.io/distroless/base\n"
+            "COPY --from=build /app /app\n"
+        )
+        self.assertEqual(self.base_images(dockerfile), ["golang:1.22", "gcr.io/distroless/base"])
+
+    def test_scratch_and_empty_from(self):
+        self.assertEqual(self.base_images("FROM scratch\nFROM\n"), [])
+
+
+class NodeTests(unittest.TestCase):
+
+    def test_package_json(self):
+        profile = build_repo_profile({"package.json": """{
+            "engines": {"node": ">=20"},
+            "scripts": {"start": "node server.js --port 4000", "build": "tsc"},
+            "dependencies": {"express": "^4.19.0", "pg": "^8.11.0"},
+            "devDependencies": {"@angular/core": "^17.0.0"}
+        }"""})
+        self.assertEqual(profile.runtimes, ["node"])
+        self.assertEqual(profile.runtime_versions, {"node": ">=20"})
+        self.assertEqual(profile.frameworks, ["Express", "Angular"])
+        self.assertEqual(profile.dependencies, {"npm": ["express", "pg"]})
+        self.assertEqual(profile.datastores, ["postgres"])
+        self.assertEqual((profile.start_command, profile.build_command, profile.port), ("npm start", "npm run build", 4000))
+
+
+class PythonTests(unittest.TestCase):
+
+    def test_requirements(self):
+        profile = build_repo_profile({"requirements.txt": (
+            "# web\nFastAPI[all]==0.110  # api\npsycopg2_binary>=2.9\n-r base.txt\ngit+https://x/y.git\n\n"
+        )})
+        self.assertEqual(profile.dependencies, {"pypi": ["fastapi", "psycopg2-binary"]})
+        self.assertEqual((profile.frameworks, profile.datastores, profile.port), (["FastAPI"], ["postgres"], 8000))
+
+    def test_pyproject(self):
+        profile = build_repo_profile({"pyproject.toml": (
+            '[project]\nrequires-python = ">=3.11"\ndependencies = ["flask>=3", "redis"]\n'
+        )})
+        self.assertEqual(profile.runtime_versions, {"python": ">=3.11"})
+        self.assertEqual((profile.package_managers, profile.frameworks, profile.datastores), (["pip"], ["Flask"], ["redis"]))
+
+    def test_poetry(self):
+        profile = build_repo_profile({"pyproject.toml": (
+            '[tool.poetry.dependencies]\npython = "^3.12"\nDjango = "^5.0"\n'
+        )})
+        self.assertEqual((profile.package_managers, profile.frameworks), (["poetry"], ["Django"]))
+        self.assertEqual(profile.runtime_versions, {"python": "^3.12"})
+
+    def test_pipfile_and_setup_py(self):
+        profile = build_repo_profile({
+            "Pipfile": '[packages]\naiohttp = "*"\n[requires]\npython_version = "3.11"\n',
+            "setup.py": "setup(name='x', install_requires=['pymysql>=1.0', 'click'])",
+        })
+        self.assertEqual(profile.dependencies, {"pypi": ["aiohttp", "pymysql", "click"]})
+        self.assertEqual((profile.datastores, profile.package_managers), (["mysql"], ["pipenv"]))
+
+
+class GoTests(unittest.TestCase):
+
+    def test_go_mod(self):
+        profile = build_repo_profile({"go.mod": (
+            "module example.com/api\n\ngo 1.22\n\nrequire (\n\tgithub.com/gin-gonic/gin v1.9.1 // indirect\n"
+            "\tgithub.com/lib/pq v1.10.9\n)\nrequire github.com/google/uuid v1.6.0\n"
+        )})
+        self.assertEqual(profile.runtime_versions, {"go": "1.22"})
+        self.assertEqual(profile.dependencies["go"], ["github.com/gin-gonic/gin", "github.com/lib/pq", "github.com/google/uuid"])
+        self.assertEqual((profile.frameworks, profile.datastores, profile.port), (["Gin"], ["postgres"], 8080))
+
+
+class JavaTests(unittest.TestCase):
+
+    def test_pom(self):
+        profile = build_repo_profile({"pom.xml": """<project xmlns="http://maven.apache.org/POM/4.0.0">
+            <parent><groupId>org.springframework.boot</groupId><artifactId>spring-boot-starter-parent</artifactId></parent>
+            <properties><java.version>21</java.version></properties>
+            <dependencies>
+                <dependency><groupId>org.postgresql</groupId><artifactId>postgresql</artifactId></dependency>
+            </dependencies>
+        </project>"""})
+        self.assertEqual((profile.runtimes, profile.runtime_versions), (["java"], {"java": "21"}))
+        self.assertEqual((profile.frameworks, profile.datastores), (["Spring Boot"], ["postgres"]))
+        self.assertEqual(profile.build_command, "mvn -B package -DskipTests")
+
+    def test_gradle_kotlin(self):
+        profile = build_repo_profile({"build.gradle.kts": (
+            'plugins { id("org.springframework.boot") version "3.2.0"; kotlin("jvm") version "1.9.0" }\n'
+            'java { toolchain { languageVersion = JavaLanguageVersion.of(17) } }\n'
+            'dependencies { implementation("com.mysql:mysql-connector-j:8.3.0") }\n'
+        )})
+        self.assertEqual((profile.runtimes, profile.runtime_versions), (["java", "kotlin"], {"java": "17"}))
+        self.assertEqual((profile.frameworks, profile.datastores), (["Spring Boot"], ["mysql"]))
+
+
+class ComposeTests(unittest.TestCase):
+    COMPOSE = (
+        "services:\n"
+        "  web:\n    build: .\n    ports:\n      - \"8080:3000\"\n    environment:\n      - DATABASE_URL=postgres://db\n"
+        "  db:\n    image: postgres:16\n    ports:\n      - \"5432:5432\"\n"
+        "  cache:\n    image: redis:7\n"
+    )
+
+    def test_compose(self):
+        profile = build_repo_profile({"docker-compose.yml": self.COMPOSE})
+        self.assertEqual(profile.compose_services, ["web", "db", "cache"])
+        self.assertEqual((profile.datastores, profile.ports, profile.env_vars), (["postgres", "redis"], [3000], ["DATABASE_URL"]))
+
+    def test_compose_without_yaml(self):
+        with mock.patch.object(manifest_parsers, "yaml", None):
+            profile = build_repo_profile({"docker-compose.yml": self.COMPOSE})
+        self.assertEqual(profile.compose_services, ["web", "db", "cache"])
+        self.assertEqual((profile.datastores, profile.ports), (["postgres", "redis"], [3000]))
+
+
+class OtherManifestTests(unittest.TestCase):
+
+    def test_procfile_and_env_example(self):
+        profile = build_repo_profile({
+            "Procfile": "release: rake db:migrate\nweb: gunicorn app:app\n",
+            ".env.example": "# settings\nexport PORT=5000\nSECRET_KEY=\nnot a variable\n",
+        })
+        self.assertEqual((profile.start_command, profile.start_command_source), ("gunicorn app:app", "Procfile"))
+        self.assertEqual((profile.env_vars, profile.ports), (["PORT", "SECRET_KEY"], [5000]))
+
+    def test_dockerfile_overrides_package_manager_start(self):
+        profile = build_repo_profile({
+            "package.json": '{"scripts": {"start": "node index.js"}}',
+            "Dockerfile": 'FROM node:20\nENV NODE_ENV=production PORT=8080\nEXPOSE 8080\nCMD ["node", "dist/main.js"]\n',
+        })
+        self.assertEqual((profile.start_command, profile.ports), ("node dist/main.js", [8080]))
+        self.assertEqual(profile.env_vars, ["NODE_ENV", "PORT"])
+
+    def test_cargo_gemfile_composer(self):
+        profile = build_repo_profile({
+            "Cargo.toml": '[package]\nrust-version = "1.75"\n[dependencies]\naxum = "0.7"\n',
+            "Gemfile": "ruby '3.3.0'\ngem 'rails', '~> 7.1'\ngem \"pg\"\n",
+            "composer.json": '{"require": {"php": "^8.2", "laravel/framework": "^11.0"}}',
+        })
+        self.assertEqual(profile.runtimes, ["rust", "ruby", "php"])
+        self.assertEqual(profile.runtime_versions, {"rust": "1.75", "ruby": "3.3.0", "php": "^8.2"})
+        self.assertEqual(profile.frameworks, ["Axum", "Rails", "Laravel"])
+        self.assertEqual(profile.datastores, ["postgres"])
+
+
+class MalformedInputTests(unittest.TestCase):
+
+    def test_no_parser_raises(self):
+        for content in ("{not: valid", "<project><dependency>", "[[[", "\0\xff", "services: [1, 2\n  - :"):
+            for name in PARSERS:
+                with self.subTest(name=name, content=content):
+                    profile = build_repo_profile({name: content, f"nested/{name}": ""})
+                    self.assertEqual(profile.config_files, [name, f"nested/{name}"])
+
+    def test_wrong_shapes_are_skipped(self):
+        profile = build_repo_profile({
+            "package.json": '["not", "an", "object"]',
+            "docker-compose.yml": "services:\n  web:\n    ports: 8080\n",
+            "requirements.txt": "flask\n",
+        })
+        self.assertEqual(profile.frameworks, ["Flask"])
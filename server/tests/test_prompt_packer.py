@@ -0,0 +1,103 @@
+import unittest
+from agents.prompt_packer import PromptPacker, PromptSection, estimate_tokens, file_rank, truncate_to_tokens
+from agents.terraform_agent import _env_keys_only
+
+
+def words(count: int, prefix: str = "w") -> str:
+    # One estimated token per word, ten words per line
+    return "\n".join(
+        " ".join(f"{prefix}{idx % 100}" for idx in range(start, min(start + 10, count))) for start in range(0, count, 10)
+    )
+
+
+class EstimateTokensTests(unittest.TestCase):
+
+    def test_word_pieces_and_punctuation(self):
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("hello world"), 4)  # hell o worl d
+        self.assertEqual(estimate_tokens('{"a": 1}'), 7)
+        self.assertEqual(estimate_tokens(words(50)), 50)
+
+    def test_truncate_keeps_whole_lines(self):
+        text = words(200)
+        cut = truncate_to_tokens(text, 60)
+        self.assertLessEqual(estimate_tokens(cut), 60)
+        self.assertTrue(cut.endswith("more lines omitted]"))
+        self.assertEqual(truncate_to_tokens(text, 0), "")
+        self.assertEqual(truncate_to_tokens(text, 10_000), text)
+
+
+class AllocationTests(unittest.TestCase):
+
+    def test_shares_then_leftovers_by_priority(self):
+        packer = PromptPacker("test", num_ctx=1000, reserve_output=200)
+        packed = packer.pack("", [
+            PromptSection("analysis", words(1000), share=0.5, priority=0),
+            PromptSection("env", words(100), share=0.25, priority=1),
+            PromptSection("notes", words(1000), share=0.1, priority=2),
+        ])
+        self.assertEqual(packed.budget, 800)
+        self.assertLessEqual(packed.total_tokens, packed.budget)
+        # env fits whole (100); analysis gets its 400 plus the 220 left over before the lower-priority notes
+        self.assertEqual(packed.dropped["env"], 0)
+        self.assertTrue(550 < packed.tokens["analysis"] <= 620, packed.tokens)
+        self.assertTrue(0 < packed.tokens["notes"] <= 80, packed.tokens)
+        self.assertGreater(packed.dropped["notes"], 0)
+
+    def test_template_and_output_reserve_shrink_the_budget(self):
+        packer = PromptPacker("test", num_ctx=500, reserve_output=100)
+        packed = packer.pack(words(150), [PromptSection("analysis", words(1000), share=1.0)])
+        self.assertEqual(packed.budget, 250)
+        self.assertLessEqual(packed.tokens["analysis"], 250)
+
+    def test_everything_fits(self):
+        packed = PromptPacker("test", num_ctx=4096).pack("", [PromptSection("analysis", "small", share=0.5)])
+        self.assertEqual(packed["analysis"], "small")
+        self.assertEqual(packed.dropped, {"analysis": 0})
+
+
+class RankingTests(unittest.TestCase):
+
+    def test_manifests_before_lockfiles_and_root_before_nested(self):
+        paths = ["web/package.json", "package-lock.json", "Dockerfile", "package.json", "web/Dockerfile"]
+        self.assertEqual(sorted(paths, key=file_rank),
+                         ["package.json", "Dockerfile", "web/package.json", "web/Dockerfile", "package-lock.json"])
+
+
+class OverflowTests(unittest.TestCase):
+
+    def items(self) -> list:
+        paths = sorted(["package.json", "package-lock.json", "api/requirements.txt", "Dockerfile", "docs/Procfile"],
+                       key=file_rank)
+        return [(path, words(100, path[:2])) for path in paths]
+
+    def test_overflow_drops_the_lowest_ranked_files_deterministically(self):
+        packer = PromptPacker("test", num_ctx=700, reserve_output=200)
+        first = packer.pack("", [PromptSection("config_files", items=self.items(), share=0.5)])
+        second = packer.pack("", [PromptSection("config_files", items=self.items(), share=0.5)])
+        self.assertEqual(first.sections, second.sections)
+
+        text = first["config_files"]
+        self.assertLessEqual(first.tokens["config_files"], first.budget)
+        self.assertTrue(text.startswith("--- package.json ---"))
+        self.assertIn("more files omitted", text)
+        self.assertTrue(text.rstrip("]").endswith("package-lock.json"))
+
+
+class EnvKeysOnlyTests(unittest.TestCase):
+
+    def test_names_are_cut_to_the_budget(self):
+        env = "\n".join(f"VARIABLE_{idx}=secret-{idx}" for idx in range(200))
+        text = _env_keys_only(env, 100)
+        self.assertLessEqual(estimate_tokens(text), 100)
+        self.assertNotIn("secret", text)
+        self.assertIn("VARIABLE_0\n", text)
+        kept = text.count("\nVARIABLE_")
+        self.assertTrue(text.endswith(f"[{200 - kept} more variables omitted]"))
+
+    def test_everything_fits(self):
+        self.assertEqual(_env_keys_only("A=1\nexport B='2'\n", 100), "Variables (values omitted to fit context):\nA\nB")
+
+
+if __name__ == "__main__":
+    unittest.main()
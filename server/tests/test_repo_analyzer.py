@@ -0,0 +1,52 @@
+import unittest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+import agents.repo_analyzer as repo_analyzer
+from agents.repo_analyzer import SimpleGitHubFetcher
+from core.http_client import http_client
+
+FEATURE_TAG_SHA = "1" * 40
+FEATURE_X_BRANCH_SHA = "2" * 40
+
+
+class ResolveRefTests(unittest.IsolatedAsyncioTestCase):
+    """A tag "feature" and a branch "feature/x" in the same repository"""
+
+    async def asyncSetUp(self):
+        self.requested = []
+        refs = {"feature": FEATURE_TAG_SHA, "feature/x": FEATURE_X_BRANCH_SHA}
+
+        async def commit(request):
+            ref = request.match_info["ref"]
+            self.requested.append(ref)
+            if ref not in refs:
+                return web.Response(status=404)
+            return web.Response(text=refs[ref])
+
+        app = web.Application()
+        app.router.add_get("/repos/octo/demo/commits/{ref:.+}", commit)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.fetcher = SimpleGitHubFetcher("token", base_url=str(self.server.make_url("")))
+        repo_analyzer._ref_cache.clear()
+
+    async def asyncTearDown(self):
+        await http_client.close()
+        await self.server.close()
+
+    async def test_longest_resolving_prefix_wins(self):
+        _, _, ref = self.fetcher.parse_url("https://github.com/octo/demo/tree/feature/x/src/app")
+        self.assertEqual(await self.fetcher.resolve_ref("octo", "demo", ref), ("feature/x", FEATURE_X_BRANCH_SHA))
+        self.assertEqual(self.requested, ["feature/x/src/app", "feature/x/src", "feature/x"])
+
+    async def test_shorter_ref_still_resolves(self):
+        self.assertEqual(await self.fetcher.resolve_ref("octo", "demo", "feature/docs/README.md"),
+                         ("feature", FEATURE_TAG_SHA))
+
+    async def test_commit_sha_needs_no_request(self):
+        sha = "A" * 40
+        self.assertEqual(await self.fetcher.resolve_ref("octo", "demo", f"{sha}/src/app.py"), (sha, sha.lower()))
+        self.assertEqual(self.requested, [])
+
+    async def test_unknown_ref(self):
+        self.assertEqual(await self.fetcher.resolve_ref("octo", "demo", "nope/x"), ("", ""))
@@ -0,0 +1,132 @@
+import json
+import unittest
+from unittest import mock
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+import agents.repo_analyzer as repo_analyzer
+from agents.repo_analyzer import SimpleGitHubFetcher, EtagCache
+from agents.repo_tree import TreeStreamParser, ENTRY_KEYS
+from core.http_client import http_client
+
+COMMIT_SHA = "d" * 40
+
+
+def tree_body(sha: str, entries: list, truncated: bool = False) -> bytes:
+    """A git/trees response as GitHub lays it out: sha, url, tree, truncated"""
+    tree = [{"mode": "100644", "url": f"https://api.github.com/blobs/{idx}", **entry} for idx, entry in enumerate(entries)]
+    return json.dumps({"sha": sha, "url": f"https://api.github.com/trees/{sha}", "tree": tree, "truncated": truncated},
+                      ensure_ascii=False).encode()
+
+
+def blob(path: str) -> dict:
+    return {"path": path, "type": "blob", "sha": f"blob-{path}", "size": len(path)}
+
+
+def tree(path: str, sha: str) -> dict:
+    return {"path": path, "type": "tree", "sha": sha}
+
+
+class TreeStreamParserTests(unittest.TestCase):
+
+    def parse(self, chunks: list) -> TreeStreamParser:
+        parser = TreeStreamParser()
+        parser.entries = []
+        for chunk in chunks:
+            parser.entries.extend(parser.feed(chunk))
+        parser.entries.extend(parser.feed(b"", final=True))
+        return parser
+
+    def expected(self, body: bytes) -> list:
+        return [{key: entry[key] for key in ENTRY_KEYS if key in entry} for entry in json.loads(body)["tree"]]
+
+    def test_every_split_point_matches_json_loads(self):
+        body = tree_body("root-sha", [
+            blob("package.json"), tree("src", "src-sha"), blob("src/ünïcode/ファイル.py"),
+            blob('src/quoted "name", [brackets].js'), blob("src/escaped\\\\path.txt"),
+        ], truncated=True)
+        expected = self.expected(body)
+        for split in range(len(body) + 1):
+            parser = self.parse([body[:split], body[split:]])
+            self.assertEqual(parser.entries, expected, f"split at byte {split}")
+            self.assertEqual((parser.sha, parser.truncated, parser.count), ("root-sha", True, len(expected)))
+
+    def test_byte_at_a_time(self):
+        body = tree_body("root-sha", [blob("a.py"), blob("ß/b.py")])
+        parser = self.parse([body[idx:idx + 1] for idx in range(len(body))])
+        self.assertEqual(parser.entries, self.expected(body))
+        self.assertFalse(parser.truncated)
+
+    def test_malformed_entry_raises_at_the_end(self):
+        with self.assertRaises(json.JSONDecodeError):
+            self.parse([b'{"sha": "x", "tree": [{"path": "a.py", '])
+
+
+class TruncatedTreeTests(unittest.IsolatedAsyncioTestCase):
+    """
+    A recursive listing GitHub truncated: the walk rebuilds it from subtrees,
+    descends one more level where a subtree is still truncated, skips ignored
+    directories and fills the rest in from the partial listing
+    """
+    TREES = {
+        (COMMIT_SHA, True): ("root", [blob("README.md"), tree("src", "src"), blob("src/app.py"),
+                                      blob("node_modules/pkg/index.js")], True),
+        ("root", False): ("root", [blob("README.md"), tree("src", "src"), tree("big", "big"),
+                                   tree("node_modules", "nm")], False),
+        ("src", True): ("src", [blob("app.py"), tree("lib", "lib"), blob("lib/util.py")], False),
+        ("big", True): ("big", [blob("a.py"), tree("deep", "deep"), blob("deep/x.py")], True),
+        ("deep", True): ("deep", [blob("x.py"), blob("partial.py")], False),
+    }
+
+    async def asyncSetUp(self):
+        self.requests = []
+
+        async def git_tree(request):
+            sha, recursive = request.match_info["sha"], request.query.get("recursive") == "1"
+            self.requests.append((sha, recursive, request.headers.get("If-None-Match")))
+            if (sha, recursive) not in self.TREES:
+                return web.Response(status=404)
+            etag = f'"{sha}-{recursive}"'
+            if request.headers.get("If-None-Match") == etag:
+                return web.Response(status=304, headers={"ETag": etag})
+            tree_sha, entries, truncated = self.TREES[(sha, recursive)]
+            return web.Response(body=tree_body(tree_sha, entries, truncated), headers={"ETag": etag},
+                                content_type="application/json")
+
+        app = web.Application()
+        app.router.add_get("/repos/octo/demo/git/trees/{sha}", git_tree)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.fetcher = SimpleGitHubFetcher("token", base_url=str(self.server.make_url("")))
+        patcher = mock.patch.object(repo_analyzer, "_etag_cache", EtagCache())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        await http_client.close()
+        await self.server.close()
+
+    async def test_subtree_walk(self):
+        tree_sha, entries = await self.fetcher.get_tree("octo", "demo", COMMIT_SHA)
+        self.assertEqual(tree_sha, "root")
+        paths = [entry["path"] for entry in entries]
+        self.assertEqual(len(paths), len(set(paths)))
+        self.assertEqual(set(paths), {
+            "README.md", "src", "big", "node_modules",
+            "src/app.py", "src/lib", "src/lib/util.py",
+            "big/a.py", "big/deep", "big/deep/x.py", "big/deep/partial.py",
+            "node_modules/pkg/index.js",  # never walked; kept from the truncated listing
+        })
+        self.assertNotIn(("nm", True, None), self.requests)
+
+    async def test_cached_subtrees_are_joined_again(self):
+        _, first = await self.fetcher.get_tree("octo", "demo", COMMIT_SHA)
+        self.requests.clear()
+        _, second = await self.fetcher.get_tree("octo", "demo", COMMIT_SHA)
+        # Every listing came back 304 from the ETag cache, and joining prefixes did not alter the cached entries
+        self.assertTrue(self.requests and all(etag for _, _, etag in self.requests))
+        self.assertEqual(second, first)
+        self.assertNotIn("big/big/a.py", [entry["path"] for entry in second])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+import time
+import asyncio
+import unittest
+from unittest import mock
+from core.session_store import InMemorySessionStore, RedisSessionStore
+
+
+class FakeRedis:
+    """RESP2 server holding hashes in memory; just the commands RedisSessionStore sends"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.expires = {}  # key -> monotonic expiry
+        self.connections = 0
+        self.stall = False  # read commands but never answer
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"redis://{host}:{port}/0"
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _read_command(self, reader) -> list:
+        header = await reader.readline()
+        if not header:
+            raise ConnectionError
+        args = []
+        for _ in range(int(header[1:-2])):
+            length = int((await reader.readline())[1:-2])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                command = await self._read_command(reader)
+                if self.stall:
+                    continue
+                writer.write(self._reply(command[0].decode().upper(), command[1:]))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _live(self, key: bytes) -> dict:
+        if key in self.expires and self.expires[key] <= time.monotonic():
+            self.hashes.pop(key, None)
+            self.expires.pop(key, None)
+        return self.hashes.get(key, {})
+
+    def _reply(self, name: str, args: list) -> bytes:
+        if name in ("AUTH", "SELECT"):
+            return b"+OK\r\n"
+        if name == "HSET":
+            fields = self.hashes.setdefault(args[0], self._live(args[0]))
+            added = sum(1 for field in args[1::2] if field not in fields)
+            fields.update(zip(args[1::2], args[2::2]))
+            return b":%d\r\n" % added
+        if name == "HGETALL":
+            flat = [item for pair in self._live(args[0]).items() for item in pair]
+            return b"*%d\r\n" % len(flat) + b"".join(b"$%d\r\n%s\r\n" % (len(item), item) for item in flat)
+        if name == "EXPIRE":
+            self.expires[args[0]] = time.monotonic() + int(args[1])
+            return b":1\r\n"
+        if name == "DEL":
+            self.expires.pop(args[0], None)
+            return b":%d\r\n" % (self.hashes.pop(args[0], None) is not None)
+        return b"-ERR unknown command '%s'\r\n" % name.encode()
+
+
+class RedisSessionStoreTests(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.redis = FakeRedis()
+        self.store = RedisSessionStore(await self.redis.start(), ttl_seconds=1, pool_size=2)
+
+    async def asyncTearDown(self):
+        await self.store.close()
+        await self.redis.close()
+
+    async def test_update_merges_fields(self):
+        await self.store.update("chat", {"last_agent": "repo_analyzer", "repo_data": {"files": ["a"]}})
+        await self.store.update("chat", {"last_agent": "terraform_generator"})
+        self.assertEqual(await self.store.get("chat"),
+                         {"last_agent": "terraform_generator", "repo_data": {"files": ["a"]}})
+        self.assertEqual(await self.store.get("other"), {})
+
+    async def test_delete(self):
+        await self.store.update("chat", {"last_agent": "chat_agent"})
+        await self.store.delete("chat")
+        self.assertEqual(await self.store.get("chat"), {})
+
+    async def test_sessions_expire_after_ttl(self):
+        await self.store.update("chat", {"last_agent": "chat_agent"})
+        await asyncio.sleep(1.1)
+        self.assertEqual(await self.store.get("chat"), {})
+
+    async def test_connections_are_reused(self):
+        for idx in range(5):
+            await self.store.update("chat", {"turn": idx})
+        self.assertEqual(self.redis.connections, 1)
+
+    async def test_cancelled_command_closes_its_connection(self):
+        opened = []
+        connect = self.store._connect
+
+        async def tracked_connect():
+            opened.append(await connect())
+            return opened[-1]
+        self.store._connect = tracked_connect
+
+        self.redis.stall = True
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(self.store.get("chat"), 0.2)
+        # Closed right away, not left for garbage collection
+        self.assertTrue(opened[0].writer.is_closing())
+        self.redis.stall = False
+        # A reused connection would hand this call the stalled command's reply
+        await self.store.update("chat", {"last_agent": "chat_agent"})
+        self.assertEqual(await self.store.get("chat"), {"last_agent": "chat_agent"})
+        self.assertEqual(self.redis.connections, 2)
+
+
+class InMemorySessionStoreTests(unittest.IsolatedAsyncioTestCase):
+
+    async def test_update_merges_and_get_copies(self):
+        store = InMemorySessionStore()
+        await store.update("chat", {"last_agent": "repo_analyzer", "repo_url": "https://github.com/a/b"})
+        await store.update("chat", {"last_agent": "chat_agent"})
+        session = await store.get("chat")
+        self.assertEqual(session, {"last_agent": "chat_agent", "repo_url": "https://github.com/a/b"})
+        session["last_agent"] = "changed"
+        self.assertEqual((await store.get("chat"))["last_agent"], "chat_agent")
+
+    async def test_sessions_expire_after_ttl(self):
+        store = InMemorySessionStore(ttl_seconds=60)
+        await store.update("chat", {"last_agent": "chat_agent"})
+        later = time.monotonic() + 61
+        with mock.patch("core.session_store.time.monotonic", return_value=later):
+            self.assertEqual(await store.get("chat"), {})
+        self.assertEqual(store.total_bytes, 0)
+
+    async def test_byte_limit_evicts_least_recently_used(self):
+        # Each session is 100 bytes: the field name plus the JSON-encoded value
+        store = InMemorySessionStore(max_bytes=350)
+        for chat_id in ("a", "b", "c"):
+            await store.update(chat_id, {"analysis": "x" * 90})
+        self.assertEqual(store.total_bytes, 300)
+        await store.get("a")  # now more recent than "b"
+        await store.update("d", {"analysis": "x" * 90})
+        self.assertEqual(await store.get("b"), {})
+        for chat_id in ("a", "c", "d"):
+            self.assertNotEqual(await store.get(chat_id), {})
+        self.assertEqual(store.total_bytes, 300)
+
+    async def test_entry_limit(self):
+        store = InMemorySessionStore(max_entries=2)
+        for chat_id in ("a", "b", "c"):
+            await store.update(chat_id, {"turn": 1})
+        self.assertEqual(await store.get("a"), {})
+        self.assertEqual(len(store._entries), 2)
+
+    async def test_oversized_latest_session_is_kept(self):
+        store = InMemorySessionStore(max_bytes=10)
+        await store.update("chat", {"analysis": "x" * 100})
+        self.assertNotEqual(await store.get("chat"), {})
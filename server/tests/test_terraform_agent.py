@@ -0,0 +1,116 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+import agents.terraform_agent as terraform_agent
+from agents.terraform_agent import _stream_from_llm, _modification_base, _generate_in_background
+
+
+def fake_chat(pieces: list, eval_count: int = None):
+    """Stand-in for ollama_client.chat(stream=True): content chunks, then Ollama's final chunk"""
+    async def stream():
+        for piece in pieces:
+            yield {"message": {"content": piece}, "done": False}
+        yield {"message": {"content": ""}, "done": True, "eval_count": eval_count}
+
+    return mock.Mock(chat=mock.Mock(side_effect=lambda **kwargs: stream()))
+
+
+class StreamFromLLMTests(unittest.IsolatedAsyncioTestCase):
+    RESPONSE = "### FILE: main.tf\n```hcl\nterraform {\n  required_version = \">= 1.5\"\n}\n```\n### FILE: ../escape.tf\nlocals {}\n"
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.output_dir = Path(self.tmp.name)
+
+    async def stream(self, pieces: list, eval_count: int = None, base_files: dict = None) -> tuple:
+        written = []
+        with mock.patch.object(terraform_agent, "ollama_client", fake_chat(pieces, eval_count)):
+            tokens, changes = await _stream_from_llm("job", "prompt", "request", self.output_dir, written, base_files)
+        return tokens, changes, written
+
+    async def test_fence_split_across_chunks_is_written_intact(self):
+        pieces = [self.RESPONSE[idx:idx + 5] for idx in range(0, len(self.RESPONSE), 5)]
+        tokens, _, written = await self.stream(pieces, eval_count=17)
+        self.assertEqual(written, ["main.tf"])
+        self.assertEqual((self.output_dir / "main.tf").read_text(), 'terraform {\n  required_version = ">= 1.5"\n}\n')
+        self.assertFalse((self.output_dir.parent / "escape.tf").exists())
+        # Ollama's count, not the number of chunks
+        self.assertEqual(tokens, 17)
+
+    async def test_chunk_count_stands_in_without_eval_count(self):
+        tokens, _, _ = await self.stream(["### FILE: main.tf\n", "locals {}\n"])
+        self.assertEqual(tokens, 3)
+
+
+class ModificationBaseTests(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.latest = {"job_id": "previous"}
+        self.stored = {"previous"}
+        self.find = mock.AsyncMock(side_effect=lambda *args: self.latest)
+        for target, name, value in (
+            (terraform_agent.job_manager, "find_latest_for_chat", self.find),
+            (terraform_agent.artifact_store, "has", lambda job_id: job_id in self.stored),
+        ):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_change_requests_build_on_the_chats_latest_generation(self):
+        for request in ("Add a Redis cache", "please change the instance size", "now remove the NAT gateway"):
+            self.assertEqual(await _modification_base(request, "chat", 7), self.latest, request)
+        self.find.assert_awaited_with("terraform", "chat", 7)
+
+    async def test_fresh_requests_do_not(self):
+        for request in ("Generate terraform for this repo", "add a new terraform config from scratch",
+                        "Start over and use ECS", "what does this module do?"):
+            self.assertIsNone(await _modification_base(request, "chat", 7), request)
+
+    async def test_no_previous_generation(self):
+        self.latest = None
+        self.assertIsNone(await _modification_base("Add a Redis cache", "chat", 7))
+
+    async def test_expired_previous_generation(self):
+        self.stored = set()
+        self.assertIsNone(await _modification_base("Add a Redis cache", "chat", 7))
+
+
+class BaseFilesFallbackTests(unittest.IsolatedAsyncioTestCase):
+
+    async def test_missing_base_files_fall_back_to_full_generation(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+
+        async def stream(job_id, prompt, user_input, output_dir, written, base_files=None):
+            self.assertIsNone(base_files)
+            (output_dir / "main.tf").write_text("locals {}\n")
+            written.append("main.tf")
+            return 5, None
+
+        patches = [
+            mock.patch.object(terraform_agent, "TERRAFORM_OUTPUT_DIR", tmp.name),
+            mock.patch.object(terraform_agent, "_load_artifact_files", return_value={}),
+            mock.patch.object(terraform_agent, "_stream_from_llm", side_effect=stream),
+            mock.patch.object(terraform_agent, "_build_prompt", return_value=("prompt", "request")),
+            mock.patch.object(terraform_agent, "_context_files", mock.AsyncMock(return_value=[])),
+            mock.patch.object(terraform_agent, "_validate_and_repair", mock.AsyncMock(return_value={"error": "skipped"})),
+            mock.patch.object(terraform_agent, "_save_chat_message"),
+            mock.patch.object(terraform_agent.env_store, "get", mock.AsyncMock(return_value=None)),
+            mock.patch.object(terraform_agent.artifact_store, "put_dir",
+                              return_value={"files": [{"name": "main.tf"}]}),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        written, validation, details = await _generate_in_background(
+            "job", "Add a Redis cache", {"profile": None}, "chat", 7, base_job_id="expired"
+        )
+        self.assertEqual((written, details["path"]), (["main.tf"], "llm"))
+        self.assertNotIn("base_job_id", details)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+from agents.terraform_files import TerraformFileParser, safe_file_name, merge_patch, split_blocks
+
+RESPONSE = (
+    "Here is the configuration.\n\n"
+    "### FILE: main.tf\n"
+    "```hcl\n"
+    'provider "aws" {\n  region = var.region\n}\n'
+    "```\n\n"
+    "**FILE: variables.tf**\n"
+    "Variables used above:\n"
+    "```\n"
+    'variable "region" {\n  default = "us-east-1"\n}\n'
+    "```\n"
+)
+EXPECTED = [
+    ("main.tf", 'provider "aws" {\n  region = var.region\n}\n'),
+    ("variables.tf", 'variable "region" {\n  default = "us-east-1"\n}\n'),
+]
+
+
+def parse(chunks: list) -> list:
+    parser = TerraformFileParser()
+    files = []
+    for chunk in chunks:
+        files.extend(parser.feed(chunk))
+    files.extend(parser.finish())
+    return files
+
+
+class TerraformFileParserTests(unittest.TestCase):
+
+    def test_sections_split_at_every_point_come_out_intact(self):
+        for split in range(len(RESPONSE) + 1):
+            self.assertEqual(parse([RESPONSE[:split], RESPONSE[split:]]), EXPECTED, f"split at {split}")
+
+    def test_fence_split_across_many_chunks(self):
+        chunks = [RESPONSE[idx:idx + 3] for idx in range(0, len(RESPONSE), 3)]
+        self.assertEqual(parse(chunks), EXPECTED)
+        self.assertEqual(parse(list(RESPONSE)), EXPECTED)
+
+    def test_response_without_markers_is_main_tf(self):
+        self.assertEqual(parse(['resource "aws_s3_bucket" "b" {}', "\n"]), [("main.tf", 'resource "aws_s3_bucket" "b" {}\n')])
+
+    def test_unsafe_names_are_dropped(self):
+        files = parse(["### FILE: ../x.tf\n", 'output "x" { value = 1 }\n', "### FILE: ok.tf\nlocals {}\n"])
+        self.assertEqual(files, [("ok.tf", "locals {}\n")])
+
+
+class SafeFileNameTests(unittest.TestCase):
+
+    def test_names(self):
+        self.assertEqual(safe_file_name("main.tf"), "main.tf")
+        self.assertEqual(safe_file_name("  modules/vpc/outputs.tf "), "outputs.tf")
+        for name in ("../x.tf", "modules/../../x.tf", "..\\x.tf", "..", ".", ".hidden.tf", "", "a b.tf", "x.tf/"):
+            self.assertIsNone(safe_file_name(name), name)
+
+
+MAIN_TF = """\
+provider "aws" {
+  region = var.region
+}
+
+# Application logs
+resource "aws_s3_bucket" "logs" {
+  bucket = "app-logs"
+}
+
+resource "aws_sqs_queue" "jobs" {
+  name = "jobs"
+}
+"""
+VARIABLES_TF = """\
+variable "region" {
+  default = "us-east-1"
+}
+"""
+
+
+class MergePatchTests(unittest.TestCase):
+
+    def base(self) -> dict:
+        return {"main.tf": MAIN_TF, "variables.tf": VARIABLES_TF}
+
+    def test_split_blocks_round_trips(self):
+        segments = split_blocks(MAIN_TF)
+        self.assertEqual("\n".join(text for _, text in segments), MAIN_TF)
+        self.assertEqual([key for key, _ in segments if key],
+                         ["provider aws", "resource aws_s3_bucket logs", "resource aws_sqs_queue jobs"])
+
+    def test_replace_keeps_the_base_comments_and_the_other_blocks(self):
+        merged, changes = merge_patch(self.base(), {"main.tf": 'resource "aws_s3_bucket" "logs" {\n  bucket = "audit-logs"\n}\n'})
+        self.assertEqual(changes, {"replaced": ["resource aws_s3_bucket logs"], "added": [], "removed": [], "files": ["main.tf"]})
+        self.assertIn('# Application logs\nresource "aws_s3_bucket" "logs" {\n  bucket = "audit-logs"\n}', merged["main.tf"])
+        self.assertIn('resource "aws_sqs_queue" "jobs"', merged["main.tf"])
+        self.assertEqual(merged["variables.tf"], VARIABLES_TF)
+
+    def test_block_is_replaced_in_the_file_that_holds_it(self):
+        merged, changes = merge_patch(self.base(), {"main.tf": 'variable "region" {\n  default = "eu-west-1"\n}\n'})
+        self.assertEqual(changes["files"], ["variables.tf"])
+        self.assertIn("eu-west-1", merged["variables.tf"])
+        self.assertEqual(merged["main.tf"], MAIN_TF)
+
+    def test_add_to_an_existing_and_to_a_new_file(self):
+        merged, changes = merge_patch(self.base(), {
+            "main.tf": 'resource "aws_sns_topic" "alerts" {\n  name = "alerts"\n}\n',
+            "outputs.tf": 'output "queue_url" {\n  value = aws_sqs_queue.jobs.url\n}\n',
+        })
+        self.assertEqual(changes["added"], ["resource aws_sns_topic alerts", "output queue_url"])
+        self.assertTrue(merged["main.tf"].startswith(MAIN_TF))
+        self.assertTrue(merged["main.tf"].endswith('resource "aws_sns_topic" "alerts" {\n  name = "alerts"\n}\n'))
+        self.assertEqual(merged["outputs.tf"], 'output "queue_url" {\n  value = aws_sqs_queue.jobs.url\n}\n')
+
+    def test_remove_directives_and_emptied_files(self):
+        merged, changes = merge_patch(self.base(), {"main.tf": "# REMOVE: aws_sqs_queue.jobs\n# REMOVE: var.region\n"})
+        self.assertEqual(changes["removed"], ["resource aws_sqs_queue jobs", "variable region"])
+        self.assertNotIn("aws_sqs_queue", merged["main.tf"])
+        self.assertNotIn("variables.tf", merged)
+        self.assertEqual(changes["files"], ["main.tf", "variables.tf"])
+
+    def test_unchanged_block_is_not_a_change(self):
+        merged, changes = merge_patch(self.base(), {"variables.tf": VARIABLES_TF})
+        self.assertEqual((merged, changes["files"]), (self.base(), []))
+
+    def test_without_a_previous_generation_the_patch_is_the_result(self):
+        merged, changes = merge_patch({}, {"main.tf": MAIN_TF, "README": "not terraform\n"})
+        self.assertEqual(merged["main.tf"], MAIN_TF)
+        self.assertEqual(merged["README"], "not terraform\n")
+        self.assertEqual(len(changes["added"]), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
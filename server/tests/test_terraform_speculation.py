@@ -0,0 +1,125 @@
+import os
+import asyncio
+import tempfile
+import unittest
+from unittest import mock
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+import jobs.job_manager as jm
+import agents.terraform_speculation as terraform_speculation
+from agents.terraform_speculation import TerraformSpeculator
+from jobs.job_manager import JobManager, QUEUED, RUNNING, SUCCEEDED, CANCELLED
+from jobs.models.JobModel import JobModel
+from core.metrics import llm_in_flight
+
+
+class SpeculationTestCase(unittest.IsolatedAsyncioTestCase):
+    """A real JobManager on SQLite with one worker and one LLM slot"""
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'jobs.db')}",
+                                    connect_args={"check_same_thread": False})
+        JobModel.metadata.create_all(self.engine, tables=[JobModel.__table__])
+        self.release = asyncio.Event()
+        self.manager = JobManager(workers=1)
+        self.manager.register("terraform", self.handler)
+        for target, name, value in (
+            (jm, "sessionLocal", sessionmaker(bind=self.engine)),
+            (terraform_speculation, "job_manager", self.manager),
+        ):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.speculator = TerraformSpeculator(ttl=60, enabled=True, llm_slots=1)
+
+    async def asyncTearDown(self):
+        self.release.set()
+        await self.manager.close()
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    async def handler(self, job_id: str, payload: dict) -> dict:
+        if payload.get("block"):
+            await self.release.wait()
+        return {"files": []}
+
+    def hold_llm_slot(self):
+        """Stands in for an LLM request in flight for as long as the test runs"""
+        llm_in_flight.inc(agent="test", model="test")
+        self.addCleanup(llm_in_flight.dec, agent="test", model="test")
+
+    async def speculate(self, block: bool = True) -> str:
+        job_id = await self.manager.submit("terraform", {"block": block}, user_id=7, preemptible=True)
+        self.speculator.track(job_id)
+        return job_id
+
+    async def wait_for_status(self, job_id: str, *statuses: str) -> dict:
+        for _ in range(200):
+            job = await self.manager.get(job_id)
+            if job["status"] in statuses:
+                return job
+            await asyncio.sleep(0.02)
+        self.fail(f"job {job_id} stuck in {job['status']}, expected {statuses}")
+
+    async def wait_until_running(self, job_id: str):
+        """The row flips to RUNNING in a thread before the worker holds the task; wait for the task"""
+        for _ in range(200):
+            if job_id in self.manager._running:
+                return
+            await asyncio.sleep(0.02)
+        self.fail(f"job {job_id} never started")
+
+
+class MakeRoomTests(SpeculationTestCase):
+
+    async def test_free_slot_cancels_nothing(self):
+        running = await self.speculate()
+        await self.wait_for_status(running, RUNNING)
+        self.assertEqual(await self.speculator.make_room(), 0)
+        self.assertEqual((await self.manager.get(running))["status"], RUNNING)
+
+    async def test_running_speculation_holding_the_slot_is_preempted(self):
+        running = await self.speculate()
+        await self.wait_until_running(running)
+        queued = await self.speculate()
+        self.hold_llm_slot()  # the running speculative job's request
+
+        self.assertEqual(await self.speculator.make_room(), 2)
+        await self.wait_for_status(running, CANCELLED)
+        # The queued one would otherwise take the freed slot straight back
+        self.assertEqual((await self.manager.get(queued))["status"], CANCELLED)
+        self.assertEqual(await self.speculator.sweep(), {running: "preempted", queued: "preempted"})
+
+    async def test_slot_held_by_interactive_work_leaves_queued_speculation_alone(self):
+        interactive = await self.manager.submit("terraform", {"block": True}, user_id=7)
+        await self.wait_until_running(interactive)
+        queued = await self.speculate()
+        self.hold_llm_slot()  # the interactive job's request
+
+        self.assertEqual(await self.speculator.make_room(), 0)
+        self.assertEqual((await self.manager.get(queued))["status"], QUEUED)
+        self.assertEqual((await self.manager.get(interactive))["status"], RUNNING)
+
+        self.release.set()
+        await self.wait_for_status(queued, SUCCEEDED)
+
+
+class ClaimTests(SpeculationTestCase):
+
+    async def test_finished_speculation_is_adopted(self):
+        job_id = await self.speculate(block=False)
+        await self.wait_for_status(job_id, SUCCEEDED)
+
+        self.assertTrue(await self.speculator.claim(job_id, "chat"))
+        job = await self.manager.get(job_id)
+        self.assertEqual((job["status"], job["chat_id"]), (SUCCEEDED, "chat"))
+        self.assertNotIn(job_id, self.manager._preemptible)
+        self.assertEqual((self.speculator.stats()["hit"], self.speculator.stats()["hit_rate"]), (1, 1.0))
+        # A second request for the same job is no longer a speculative hit
+        self.assertFalse(await self.speculator.claim(job_id, "other-chat"))
+        self.assertEqual(await self.speculator.make_room(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import asyncio
+import unittest
+from agents.terraform_templates import select_template, render_template, request_sizing
+from agents.terraform_validator import validate_terraform, shutdown_validation_pool
+
+# What the speculator asks for (agents.terraform_agent.SPECULATIVE_REQUEST)
+SPECULATIVE_REQUEST = "generate terraform for this repository"
+
+
+def context(runtimes=("node",), datastores=(), **profile) -> dict:
+    return {
+        "repo_url": "https://github.com/acme/Shop-API.git",
+        "profile": {"runtimes": list(runtimes), "datastores": list(datastores), **profile},
+    }
+
+
+class SelectTemplateTests(unittest.TestCase):
+
+    def test_runtime_detection(self):
+        for runtime in ("node", "python", "java"):
+            plan = select_template(SPECULATIVE_REQUEST, context((runtime,)))
+            self.assertEqual(plan.runtime, runtime)
+        self.assertEqual(select_template(SPECULATIVE_REQUEST, context(("kotlin", "java"))).runtime, "kotlin")
+        self.assertIsNone(select_template(SPECULATIVE_REQUEST, context(("node", "python"))))
+        self.assertIsNone(select_template(SPECULATIVE_REQUEST, context(("rust",))))
+        self.assertIsNone(select_template(SPECULATIVE_REQUEST, {"repo_url": "x"}))
+
+    def test_database_detection(self):
+        self.assertEqual(select_template(SPECULATIVE_REQUEST, context(datastores=("mysql",))).database, "mysql")
+        self.assertEqual(select_template("deploy it with a database", context()).database, "postgres")
+        self.assertEqual(select_template("deploy it with mysql", context()).database, "mysql")
+        self.assertIsNone(select_template(SPECULATIVE_REQUEST, context()).database)
+        self.assertIsNone(select_template(SPECULATIVE_REQUEST, context(datastores=("postgres", "mysql"))))
+        self.assertIsNone(select_template(SPECULATIVE_REQUEST, context(datastores=("mongodb",))))
+
+    def test_cache_detection(self):
+        self.assertTrue(select_template(SPECULATIVE_REQUEST, context(datastores=("redis",))).cache)
+        self.assertTrue(select_template("deploy with a redis cache", context()).cache)
+        self.assertFalse(select_template(SPECULATIVE_REQUEST, context()).cache)
+
+    def test_plan_name(self):
+        plan = select_template(SPECULATIVE_REQUEST, context(datastores=("postgres", "redis")))
+        self.assertEqual(plan.name, "ecs-fargate-alb+rds-postgres+redis")
+        self.assertEqual(plan.app_name, "shop-api")
+
+    def test_unsupported_requests_go_to_the_llm(self):
+        for request in ("deploy it on lambda", "use eks for this", "make it bigger with more memory",
+                        "scale it out when busy", "run it on a few instances", "give it 3 cores and 1GB memory"):
+            self.assertIsNone(select_template(request, context()), request)
+
+    def test_sizing_is_read_from_the_request(self):
+        plan = select_template("deploy with 4 vCPU and 8GB memory and run 3 replicas on port 8080", context())
+        self.assertEqual((plan.cpu, plan.memory, plan.desired_count, plan.port), (4096, 8192, 3, 8080))
+
+    def test_missing_half_of_the_task_size_is_filled_in(self):
+        plan = select_template("deploy with 2 vCPU", context())
+        self.assertEqual((plan.cpu, plan.memory), (2048, 4096))
+        plan = select_template("give it 2GB of memory", context(("java",)))
+        self.assertEqual((plan.cpu, plan.memory), (512, 2048))
+
+    def test_request_sizing(self):
+        self.assertEqual(request_sizing(SPECULATIVE_REQUEST), {})
+        self.assertEqual(request_sizing("cpu: 1024, memory: 3072"), {"cpu": 1024, "memory": 3072})
+        self.assertEqual(request_sizing("0.5 vCPU and 1 GB of RAM"), {"cpu": 512, "memory": 1024})
+        self.assertEqual(request_sizing("desired count 2"), {"desired_count": 2})
+        self.assertIsNone(request_sizing("run 500 replicas"))
+        self.assertIsNone(request_sizing("cpu 300"))
+
+
+class RenderTemplateTests(unittest.TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutdown_validation_pool()
+
+    def test_sizing_reaches_variables(self):
+        plan = select_template("deploy with 1 vCPU and 3GB memory and 2 replicas", context(("python",)))
+        variables = render_template(plan)["variables.tf"]
+        for expected in ("default = 1024", "default = 3072", "default = 2"):
+            self.assertIn(expected, variables)
+        self.assertNotIn("{{", "".join(render_template(plan).values()))
+
+    def test_rendered_templates_validate(self):
+        for datastores in ((), ("postgres",), ("mysql", "redis")):
+            plan = select_template("run 2 tasks with 2 vCPU", context(datastores=datastores))
+            files = render_template(plan)
+            report = asyncio.run(validate_terraform(files))
+            self.assertTrue(report["valid"], (plan.name, report["diagnostics"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
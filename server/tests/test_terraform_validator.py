@@ -0,0 +1,165 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+from concurrent.futures.process import BrokenProcessPool
+import agents.terraform_validator as terraform_validator
+import agents.terraform_agent as terraform_agent
+from agents.terraform_validator import validate_terraform, failing_files, format_diagnostics, line_depths
+from agents.terraform_agent import _validate_and_repair
+
+MAIN_TF = """\
+# Application bucket
+resource "aws_s3_bucket" "app" {
+  bucket = "${var.name}-app"
+  tags = {
+    Name = "app" // trailing comment with a } brace
+  }
+}
+
+locals {
+  policy = <<EOT
+{ "unbalanced": [
+EOT
+}
+"""
+VARIABLES_TF = """\
+variable "name" {
+  default = "demo"
+}
+
+variable "unused" {}
+"""
+BROKEN_TF = """\
+resource "aws_sqs_queue" "jobs" {
+  name = "jobs
+}
+"""
+
+
+class ValidatorTestCase(unittest.IsolatedAsyncioTestCase):
+    """Syntax goes through the built-in scanner; the process pool is replaced by the thread fallback"""
+
+    async def asyncSetUp(self):
+        for name, value in (("hcl2", None), ("_get_pool", mock.Mock(side_effect=OSError("no spawn here")))):
+            patcher = mock.patch.object(terraform_validator, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class ValidateTerraformTests(ValidatorTestCase):
+
+    async def test_valid_files(self):
+        report = await validate_terraform({"main.tf": MAIN_TF, "variables.tf": VARIABLES_TF, "README.md": "```\n"})
+        self.assertEqual((report["valid"], report["errors"], report["parser"]), (True, 0, "builtin"))
+        self.assertEqual(report["files"], ["main.tf", "variables.tf"])
+        self.assertEqual([(d["check"], d["file"], d["line"]) for d in report["diagnostics"]],
+                         [("unused_variable", "variables.tf", 5)])
+        self.assertTrue(format_diagnostics(report).startswith("✅ Validation passed (2 files, 1 warnings)"))
+
+    async def test_syntax_errors_carry_file_and_line(self):
+        report = await validate_terraform({
+            "broken.tf": BROKEN_TF,
+            "fenced.tf": "```hcl\nlocals {}\n```\n",
+            "unclosed.tf": 'module "vpc" {\n  source = "./vpc"\n',
+            "prose.tf": "Here is the file you asked for:\nlocals {}\n",
+        })
+        self.assertFalse(report["valid"])
+        found = {(d["file"], d["line"]) for d in report["diagnostics"]}
+        self.assertIn(("broken.tf", 2), found)
+        self.assertIn(("fenced.tf", 1), found)
+        self.assertIn(("unclosed.tf", 1), found)
+        self.assertIn(("prose.tf", 1), found)
+        self.assertEqual(failing_files(report), ["broken.tf", "fenced.tf", "prose.tf", "unclosed.tf"])
+        self.assertIn(f"⚠️ Validation found {report['errors']} errors", format_diagnostics(report, limit=2))
+        self.assertIn(f"... and {report['errors'] - 2} more", format_diagnostics(report, limit=2))
+
+    async def test_cross_file_checks(self):
+        report = await validate_terraform({
+            "main.tf": MAIN_TF + 'resource "aws_s3_bucket" "app" {\n  bucket = var.region\n}\n',
+            "variables.tf": VARIABLES_TF,
+        })
+        checks = {(d["check"], d["line"]) for d in report["diagnostics"] if d["severity"] == "error"}
+        self.assertEqual(checks, {("duplicate", 14), ("undeclared_variable", 15)})
+
+    def test_line_depths_skip_strings_comments_and_heredocs(self):
+        self.assertEqual(line_depths(MAIN_TF), [0, 0, 1, 1, 2, 2, 1, 0, 0, 1, 1, 1, 1, 0])
+
+
+@unittest.skipIf(terraform_validator.hcl2 is None, "python-hcl2 is not installed")
+class Hcl2ParserTests(unittest.IsolatedAsyncioTestCase):
+
+    async def test_same_verdicts_as_the_scanner(self):
+        with mock.patch.object(terraform_validator, "_get_pool", mock.Mock(side_effect=OSError("no spawn here"))):
+            valid = await validate_terraform({"main.tf": MAIN_TF, "variables.tf": VARIABLES_TF})
+            invalid = await validate_terraform({"broken.tf": BROKEN_TF})
+        self.assertEqual((valid["parser"], valid["valid"]), ("python-hcl2", True))
+        self.assertEqual(failing_files(invalid), ["broken.tf"])
+
+
+class ValidationPoolTests(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.addCleanup(terraform_validator.shutdown_validation_pool)
+
+    async def test_spawn_pool(self):
+        report = await validate_terraform({"main.tf": MAIN_TF, "variables.tf": VARIABLES_TF})
+        self.assertTrue(report["valid"])
+        self.assertIsNotNone(terraform_validator._pool)
+
+    async def test_broken_pool_falls_back_to_a_thread(self):
+        pool = mock.Mock(submit=mock.Mock(side_effect=BrokenProcessPool("worker died")))
+        with mock.patch.object(terraform_validator, "_pool", pool):
+            report = await validate_terraform({"broken.tf": BROKEN_TF})
+            # The broken pool is dropped so the next validation starts a fresh one
+            self.assertIsNone(terraform_validator._pool)
+        self.assertEqual(failing_files(report), ["broken.tf"])
+
+
+class ValidateAndRepairTests(ValidatorTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.output_dir = Path(tmp.name)
+        (self.output_dir / "main.tf").write_text(MAIN_TF)
+        (self.output_dir / "variables.tf").write_text(VARIABLES_TF)
+        (self.output_dir / "broken.tf").write_text(BROKEN_TF)
+        self.written = ["main.tf", "variables.tf", "broken.tf"]
+        patcher = mock.patch.object(terraform_agent.job_manager, "progress")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def repair(self, fixed: str) -> tuple:
+        repair_file = mock.AsyncMock(return_value=fixed)
+        with mock.patch.object(terraform_agent, "_repair_file", repair_file):
+            report = await _validate_and_repair("job", self.output_dir, self.written)
+        return report, repair_file
+
+    async def test_failing_file_is_repaired(self):
+        fixed = BROKEN_TF.replace('"jobs\n', '"jobs"\n')
+        report, repair_file = await self.repair(fixed)
+        # Only the failing file is re-prompted, with its own diagnostics
+        name, content, diagnostics = repair_file.await_args.args
+        self.assertEqual((name, content), ("broken.tf", BROKEN_TF))
+        self.assertTrue(diagnostics and all(d["file"] == "broken.tf" for d in diagnostics))
+        self.assertEqual((report["valid"], report["repaired"]), (True, ["broken.tf"]))
+        self.assertEqual((self.output_dir / "broken.tf").read_text(), fixed)
+        self.assertEqual(sorted(path.name for path in self.output_dir.iterdir()), sorted(self.written))
+        self.assertIn("🔧 Fixed after re-prompting: broken.tf", format_diagnostics(report))
+
+    async def test_repair_that_does_not_help_is_discarded(self):
+        report, _ = await self.repair("```hcl\nstill broken {\n")
+        self.assertEqual((report["valid"], report["repaired"]), (False, []))
+        self.assertEqual((self.output_dir / "broken.tf").read_text(), BROKEN_TF)
+
+    async def test_valid_files_are_not_re_prompted(self):
+        self.written = ["main.tf", "variables.tf"]
+        report, repair_file = await self.repair("")
+        repair_file.assert_not_awaited()
+        self.assertEqual((report["valid"], report["repaired"]), (True, []))
+
+
+if __name__ == "__main__":
+    unittest.main()